@@ -50,8 +50,8 @@ async def create_tables(conn):
             connector VARCHAR,
             connector_type VARCHAR,
             account VARCHAR,
-            start_time VARCHAR,
-            end_time VARCHAR,
+            start_time TIMESTAMP WITH TIME ZONE,
+            end_time TIMESTAMP WITH TIME ZONE,
             meter_value FLOAT DEFAULT 0,
             charging_duration VARCHAR,
             cost FLOAT DEFAULT 0,
@@ -4,7 +4,7 @@ PostgreSQL Database Configuration and Models
 import os
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy import Column, String, Float, Boolean, DateTime, Text, JSON, ForeignKey, Integer
+from sqlalchemy import Column, String, Float, Boolean, DateTime, Text, JSON, ForeignKey, Integer, BigInteger, Index, Identity, Sequence
 from sqlalchemy.sql import func
 from dotenv import load_dotenv
 from pathlib import Path
@@ -41,7 +41,9 @@ class User(Base):
     role = Column(String, default="user")  # admin, user, viewer
     phone = Column(String, nullable=True)  # Phone number for WhatsApp notifications
     pricing_group_id = Column(String, ForeignKey("pricing_groups.id", ondelete="SET NULL"), nullable=True)
-    # RFID fields - each user has one RFID card
+    # RFID fields - each user has one RFID card; its balance and status live on
+    # the rfid_cards row with this number. rfid_balance is legacy: account sync
+    # moves anything left in it onto the card (services/accounts.py)
     rfid_card_number = Column(String, unique=True, nullable=True, index=True)
     rfid_balance = Column(Float, default=0.0)
     rfid_status = Column(String, default="active")  # active, inactive, blocked
@@ -56,13 +58,13 @@ class Transaction(Base):
     __tablename__ = "transactions"
     
     id = Column(String, primary_key=True, default=generate_uuid)
-    tx_id = Column(String, index=True)
+    tx_id = Column(String, unique=True, index=True)  # Inserts use ON CONFLICT (tx_id) DO NOTHING
     station = Column(String, index=True)
     connector = Column(String)
     connector_type = Column(String)
     account = Column(String, index=True)
-    start_time = Column(String)
-    end_time = Column(String)
+    start_time = Column(DateTime(timezone=True))
+    end_time = Column(DateTime(timezone=True))
     meter_value = Column(Float, default=0)
     charging_duration = Column(String)
     cost = Column(Float, default=0)
@@ -70,6 +72,32 @@ class Transaction(Base):
     payment_type = Column(String)
     payment_date = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Date-range filters, optionally narrowed by station / account
+        Index("ix_transactions_start_time_station", "start_time", "station"),
+        Index("ix_transactions_account_start_time", "account", "start_time"),
+        # Keyset pagination order (services/pagination.py: sort DESC NULLS LAST, id DESC)
+        Index("ix_transactions_start_time_id", start_time.desc().nullslast(), id.desc()),
+    )
+
+
+class TransactionRollup(Base):
+    """Pre-aggregated transaction totals for the dashboard.
+    
+    One row per (dimension, key, payment_status); dimension is one of
+    day, station, account or payment_type. Maintained incrementally by
+    services.rollups whenever transactions are written.
+    """
+    __tablename__ = "transaction_rollups"
+    
+    dimension = Column(String, primary_key=True)  # day, station, account, payment_type
+    key = Column(String, primary_key=True)  # YYYY-MM-DD, station name, account, payment type ('' if unset)
+    payment_status = Column(String, primary_key=True)  # PAID, UNPAID, PENDING, ...
+    tx_count = Column(BigInteger, default=0, nullable=False)
+    energy = Column(Float, default=0, nullable=False)
+    revenue = Column(Float, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 
 class Charger(Base):
@@ -118,6 +146,34 @@ class RFIDCard(Base):
     is_active = Column(Boolean, default=True)
     low_balance_threshold = Column(Float, default=10000)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Keyset pagination order
+        Index("ix_rfid_cards_created_at_id", created_at.desc().nullslast(), id.desc()),
+        # Card number prefix search (LIKE 'abc%') regardless of collation
+        Index("ix_rfid_cards_card_number_prefix", "card_number", postgresql_ops={"card_number": "varchar_pattern_ops"}),
+        Index("ix_rfid_cards_user_id", "user_id"),
+    )
+
+
+class AccountAlias(Base):
+    """
+    Account identifier (card number, email, name or placa; trimmed and
+    lowercased) -> the RFID card its charges settle on. Maintained by
+    services/accounts.py.
+    """
+    __tablename__ = "account_aliases"
+    
+    alias = Column(String, primary_key=True)
+    kind = Column(String, primary_key=True)  # card, email, placa, name
+    card_id = Column(String, ForeignKey("rfid_cards.id", ondelete="CASCADE"), nullable=False)
+    # Owner of email/placa/name aliases; NULL for card aliases
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_account_aliases_card_id", "card_id"),
+        Index("ix_account_aliases_user_id", "user_id"),
+    )
 
 
 class RFIDHistory(Base):
@@ -125,12 +181,17 @@ class RFIDHistory(Base):
     
     id = Column(String, primary_key=True, default=generate_uuid)
     card_id = Column(String, ForeignKey("rfid_cards.id", ondelete="CASCADE"), nullable=False, index=True)
-    transaction_type = Column(String)  # TOPUP, CHARGE, REFUND
+    transaction_type = Column(String)  # TOPUP, CHARGE, REFUND, IMPORT, ADJUSTMENT
     amount = Column(Float)
     balance_before = Column(Float)
     balance_after = Column(Float)
     notes = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Keyset pagination order within a card
+        Index("ix_rfid_history_card_created_at", card_id, created_at.desc().nullslast(), id.desc()),
+    )
 
 
 class OCPPSession(Base):
@@ -246,6 +307,11 @@ class OCPPBoot(Base):
     firmware = Column(String)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     status = Column(String, default="Accepted")
+    
+    __table_args__ = (
+        # Keyset pagination order
+        Index("ix_ocpp_boots_timestamp_id", timestamp.desc().nullslast(), id.desc()),
+    )
 
 
 class OCPPTransaction(Base):
@@ -265,6 +331,86 @@ class OCPPTransaction(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
+class OCPPGatewayWorker(Base):
+    """Live OCPP gateway processes; rows not heartbeated recently are ignored"""
+    __tablename__ = "ocpp_gateway_workers"
+    
+    worker_id = Column(String, primary_key=True)  # hostname:pid
+    hostname = Column(String)
+    pid = Column(Integer)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_seen = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class OCPPConnectionOwner(Base):
+    """Which gateway worker holds each charger's WebSocket"""
+    __tablename__ = "ocpp_connections"
+    
+    charger_id = Column(String, primary_key=True)
+    worker_id = Column(String, nullable=False, index=True)
+    connected_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# OCPP transaction ids are reserved from this sequence in blocks of this size
+OCPP_TRANSACTION_ID_BLOCK = 50
+ocpp_transaction_id_seq = Sequence(
+    "ocpp_transaction_id_seq", increment=OCPP_TRANSACTION_ID_BLOCK, metadata=Base.metadata
+)
+
+
+class MeterSample(Base):
+    """Raw MeterValues samples, range-partitioned by month on sampled_at.
+    
+    Written in batches with COPY by services.meter_values, which also creates
+    the monthly partitions (meter_samples_yYYYYmMM) on demand.
+    """
+    __tablename__ = "meter_samples"
+    
+    id = Column(BigInteger, Identity(), primary_key=True)
+    sampled_at = Column(DateTime(timezone=True), primary_key=True)
+    charger_id = Column(String, nullable=False)
+    connector_id = Column(Integer, nullable=False, default=0)
+    transaction_id = Column(Integer)  # OCPP transaction id, NULL outside a session
+    measurand = Column(String, nullable=False)  # e.g. Energy.Active.Import.Register, Power.Active.Import
+    phase = Column(String, nullable=False, default="")
+    unit = Column(String)
+    value = Column(Float, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_meter_samples_transaction_sampled_at", "transaction_id", "sampled_at"),
+        Index("ix_meter_samples_charger_sampled_at", "charger_id", "sampled_at"),
+        {"postgresql_partition_by": "RANGE (sampled_at)"},
+    )
+
+
+class MeterRollup(Base):
+    """Downsampled MeterValues: one row per series and 1-minute or 15-minute bucket.
+    
+    Maintained incrementally by services.meter_values as samples are flushed;
+    transaction_id is 0 for samples taken outside a session.
+    """
+    __tablename__ = "meter_rollups"
+    
+    resolution = Column(Integer, primary_key=True)  # bucket width in seconds: 60 or 900
+    charger_id = Column(String, primary_key=True)
+    connector_id = Column(Integer, primary_key=True)
+    transaction_id = Column(Integer, primary_key=True)
+    measurand = Column(String, primary_key=True)
+    phase = Column(String, primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    unit = Column(String)
+    samples = Column(Integer, nullable=False, default=0)
+    value_sum = Column(Float, nullable=False, default=0)
+    value_min = Column(Float)
+    value_max = Column(Float)
+    value_last = Column(Float)
+    last_sampled_at = Column(DateTime(timezone=True))
+    
+    __table_args__ = (
+        Index("ix_meter_rollups_transaction", "transaction_id", "resolution", "bucket_start"),
+    )
+
+
 class InvoiceWebhookConfig(Base):
     """Invoice webhook configuration"""
     __tablename__ = "invoice_webhook_config"
@@ -301,6 +447,37 @@ class Expense(Base):
     created_by = Column(String, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    __table_args__ = (
+        # Keyset pagination order
+        Index("ix_expenses_date_id", date.desc().nullslast(), id.desc()),
+    )
+
+
+class Job(Base):
+    """Background import/export jobs run by services.jobs"""
+    __tablename__ = "jobs"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    kind = Column(String, nullable=False)  # users_import, rfid_import, transactions_import, export_*
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed, cancelled
+    user_id = Column(String, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
+    progress = Column(Integer, default=0)  # rows processed so far
+    total = Column(Integer, nullable=True)
+    message = Column(String, nullable=True)
+    errors = Column(JSON, default=list)  # row errors reported so far (capped)
+    result = Column(JSON, nullable=True)  # final ImportResult / export file info
+    error = Column(Text, nullable=True)  # why the job failed
+    cancel_requested = Column(Boolean, default=False)
+    file_path = Column(String, nullable=True)  # export output, served by /jobs/{id}/download
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), server_default=func.now())  # refreshed while queued/running
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_jobs_created_at_id", "created_at", "id"),
+    )
 
 
 # ============== Database Functions ==============
@@ -1,7 +1,9 @@
 """
-Database Migration Script - Add RFID columns to users table
+Database Migration Script - Add RFID columns to users table and convert
+transaction times to TIMESTAMPTZ.
 Run this script once to update your database schema.
 """
+import os
 import psycopg2
 import bcrypt
 
@@ -14,6 +16,22 @@ DB_CONFIG = {
     "port": 5432
 }
 
+# Transaction times without an offset are interpreted in this zone
+LOCAL_TIMEZONE = os.environ.get('LOCAL_TIMEZONE', 'America/Bogota')
+
+TRY_TIMESTAMPTZ_FUNCTION = """
+    CREATE OR REPLACE FUNCTION pg_temp.try_timestamptz(value TEXT) RETURNS TIMESTAMPTZ AS $$
+    BEGIN
+        IF value IS NULL OR btrim(value) IN ('', '-', 'N/A', 'nan', 'NaT', 'None', 'null') THEN
+            RETURN NULL;
+        END IF;
+        RETURN btrim(value)::TIMESTAMPTZ;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
 def run_migration():
     print("Connecting to database...")
     try:
@@ -69,8 +87,41 @@ def run_migration():
             """, ('admin-001', 'admin@evcharge.com', 'Administrator', password_hash, 'admin', 0, 'active'))
             print("  ✓ Admin user created")
         
-        # Step 4: Verify table structure
-        print("\nStep 4: Verifying table structure...")
+        # Step 4: Convert transaction times from strings to TIMESTAMPTZ
+        print("\nStep 4: Converting transaction start/end times to TIMESTAMPTZ...")
+        cur.execute("""
+            SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'transactions' AND column_name = 'start_time'
+        """)
+        start_time_type = cur.fetchone()
+        
+        if start_time_type and start_time_type[0] != 'timestamp with time zone':
+            cur.execute("SET TIME ZONE %s", (LOCAL_TIMEZONE,))
+            cur.execute("SET DateStyle = 'ISO, DMY'")
+            cur.execute(TRY_TIMESTAMPTZ_FUNCTION)
+            cur.execute("""
+                ALTER TABLE transactions
+                    ALTER COLUMN start_time TYPE TIMESTAMP WITH TIME ZONE
+                        USING pg_temp.try_timestamptz(start_time),
+                    ALTER COLUMN end_time TYPE TIMESTAMP WITH TIME ZONE
+                        USING pg_temp.try_timestamptz(end_time)
+            """)
+            print(f"  ✓ Converted start_time/end_time (naive values read as {LOCAL_TIMEZONE})")
+            
+            cur.execute("SELECT to_regclass('transaction_rollups')")
+            if cur.fetchone()[0]:
+                # Day keys are now local dates; the server rebuilds them on start
+                cur.execute("DELETE FROM transaction_rollups")
+                print("  ✓ Cleared dashboard rollups for rebuild")
+        else:
+            print("  - Transaction times already converted")
+        
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_transactions_start_time_station ON transactions (start_time, station)")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_transactions_account_start_time ON transactions (account, start_time)")
+        print("  ✓ Transaction time indexes in place")
+        
+        # Step 5: Verify table structure
+        print("\nStep 5: Verifying table structure...")
         cur.execute("""
             SELECT column_name, data_type 
             FROM information_schema.columns 
@@ -0,0 +1,87 @@
+-- Migration: Add account aliases and consolidate RFID balances
+-- Description: Balances lived both in users.rfid_balance and rfid_cards.balance.
+-- Every users.rfid_card_number gets its balance moved onto the rfid_cards row
+-- with that number: a missing card is created holding it (with the user's
+-- status), an existing card that is unowned or already the user's has it
+-- added. Each moved amount is recorded as an ADJUSTMENT in rfid_history and
+-- users.rfid_balance is zeroed. A card number held by another user's card is
+-- not merged: those users keep their users.rfid_balance and are listed by the
+-- last query below for manual review. From then on rfid_cards is the only
+-- balance store.
+-- account_aliases maps every identifier a transaction's account may hold
+-- (card number, email, placa, name; trimmed and lowercased) to the card it is
+-- charged on, so charges resolve their account with one primary-key lookup
+-- (services/accounts.py). A name or placa shared by several users stays with
+-- the oldest of them.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS account_aliases (
+    alias VARCHAR NOT NULL,
+    kind VARCHAR NOT NULL,
+    card_id VARCHAR NOT NULL REFERENCES rfid_cards(id) ON DELETE CASCADE,
+    user_id VARCHAR REFERENCES users(id) ON DELETE CASCADE,
+    PRIMARY KEY (alias, kind)
+);
+
+CREATE INDEX IF NOT EXISTS ix_account_aliases_card_id ON account_aliases (card_id);
+CREATE INDEX IF NOT EXISTS ix_account_aliases_user_id ON account_aliases (user_id);
+
+-- Move every user balance onto the card with their number
+WITH u AS (
+    SELECT id, email, rfid_card_number, COALESCE(rfid_balance, 0) AS balance,
+           COALESCE(rfid_status, 'active') AS status
+    FROM users
+    WHERE rfid_card_number IS NOT NULL
+), merged AS (
+    INSERT INTO rfid_cards (id, card_number, user_id, balance, status, is_active, low_balance_threshold, created_at)
+    SELECT md5(random()::text || clock_timestamp()::text || u.id)::uuid::text,
+           u.rfid_card_number, u.id, u.balance, u.status, TRUE, 10000, now()
+    FROM u
+    ON CONFLICT (card_number) DO UPDATE
+    SET balance = COALESCE(rfid_cards.balance, 0) + EXCLUDED.balance,
+        user_id = COALESCE(rfid_cards.user_id, EXCLUDED.user_id)
+    WHERE rfid_cards.user_id IS NULL OR rfid_cards.user_id = EXCLUDED.user_id
+    RETURNING id, card_number, balance
+), history AS (
+    INSERT INTO rfid_history (id, card_id, transaction_type, amount, balance_before, balance_after, notes, created_at)
+    SELECT md5(random()::text || clock_timestamp()::text || m.id)::uuid::text,
+           m.id, 'ADJUSTMENT', u.balance, m.balance - u.balance, m.balance,
+           'Merged users.rfid_balance of ' || u.email, now()
+    FROM merged m JOIN u ON u.rfid_card_number = m.card_number
+    WHERE u.balance <> 0
+)
+UPDATE users SET rfid_balance = 0
+FROM merged m JOIN u ON u.rfid_card_number = m.card_number
+WHERE users.id = u.id AND u.balance <> 0;
+
+-- Card numbers
+INSERT INTO account_aliases (alias, kind, card_id, user_id)
+SELECT lower(trim(card_number)), 'card', id, NULL
+FROM rfid_cards
+ORDER BY created_at, id
+ON CONFLICT (alias, kind) DO NOTHING;
+
+-- Users' email, placa and name -> their own card number's card, else their oldest card
+INSERT INTO account_aliases (alias, kind, card_id, user_id)
+SELECT a.alias, a.kind, card.id, u.id
+FROM users u
+JOIN LATERAL (
+    SELECT rc.id FROM rfid_cards rc
+    WHERE rc.card_number = u.rfid_card_number OR rc.user_id = u.id
+    ORDER BY rc.card_number IS NOT DISTINCT FROM u.rfid_card_number DESC, rc.created_at, rc.id
+    LIMIT 1
+) card ON TRUE
+CROSS JOIN LATERAL (VALUES
+    (lower(trim(u.email)), 'email'), (lower(trim(u.placa)), 'placa'), (lower(trim(u.name)), 'name')
+) AS a(alias, kind)
+WHERE COALESCE(a.alias, '') <> ''
+ORDER BY u.created_at, u.id
+ON CONFLICT (alias, kind) DO NOTHING;
+
+-- Not merged: the user's card number is another user's card
+SELECT u.id AS user_id, u.email, u.rfid_card_number, u.rfid_balance, c.user_id AS card_owner
+FROM users u JOIN rfid_cards c ON c.card_number = u.rfid_card_number
+WHERE c.user_id IS DISTINCT FROM u.id;
+
+COMMIT;
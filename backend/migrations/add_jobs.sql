@@ -0,0 +1,28 @@
+-- Migration: Add background jobs
+-- Description: Imports and exports run as background jobs (services/jobs.py).
+-- Each job's progress, row errors and final result are kept here so
+-- /api/jobs/{id} works from any API process; cancel_requested lets another
+-- process cancel a job it does not run. Unfinished jobs whose heartbeat_at
+-- stops advancing belonged to a process that died and are marked failed.
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id VARCHAR PRIMARY KEY,
+    kind VARCHAR NOT NULL,
+    status VARCHAR NOT NULL DEFAULT 'queued',
+    user_id VARCHAR REFERENCES users(id) ON DELETE SET NULL,
+    progress INTEGER DEFAULT 0,
+    total INTEGER,
+    message VARCHAR,
+    errors JSON DEFAULT '[]',
+    result JSON,
+    error TEXT,
+    cancel_requested BOOLEAN DEFAULT FALSE,
+    file_path VARCHAR,
+    created_at TIMESTAMPTZ DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    heartbeat_at TIMESTAMPTZ DEFAULT now(),
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS ix_jobs_user_id ON jobs (user_id);
+CREATE INDEX IF NOT EXISTS ix_jobs_created_at_id ON jobs (created_at, id);
@@ -0,0 +1,41 @@
+-- Migration: Add MeterValues time-series tables
+-- Description: Raw samples from charger MeterValues, range-partitioned by month
+-- (partitions meter_samples_yYYYYmMM are created by the server as samples
+-- arrive), plus 1-minute / 15-minute rollups used by
+-- /api/ocpp/sessions/{transaction_id}/meter-values.
+
+CREATE TABLE IF NOT EXISTS meter_samples (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    sampled_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    charger_id VARCHAR NOT NULL,
+    connector_id INTEGER NOT NULL DEFAULT 0,
+    transaction_id INTEGER,              -- NULL outside a charging session
+    measurand VARCHAR NOT NULL,
+    phase VARCHAR NOT NULL DEFAULT '',
+    unit VARCHAR,
+    value FLOAT NOT NULL,
+    PRIMARY KEY (id, sampled_at)
+) PARTITION BY RANGE (sampled_at);
+
+CREATE INDEX IF NOT EXISTS ix_meter_samples_transaction_sampled_at ON meter_samples (transaction_id, sampled_at);
+CREATE INDEX IF NOT EXISTS ix_meter_samples_charger_sampled_at ON meter_samples (charger_id, sampled_at);
+
+CREATE TABLE IF NOT EXISTS meter_rollups (
+    resolution INTEGER NOT NULL,         -- bucket width in seconds: 60 or 900
+    charger_id VARCHAR NOT NULL,
+    connector_id INTEGER NOT NULL,
+    transaction_id INTEGER NOT NULL,     -- 0 outside a charging session
+    measurand VARCHAR NOT NULL,
+    phase VARCHAR NOT NULL,
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    unit VARCHAR,
+    samples INTEGER NOT NULL DEFAULT 0,
+    value_sum FLOAT NOT NULL DEFAULT 0,
+    value_min FLOAT,
+    value_max FLOAT,
+    value_last FLOAT,
+    last_sampled_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (resolution, charger_id, connector_id, transaction_id, measurand, phase, bucket_start)
+);
+
+CREATE INDEX IF NOT EXISTS ix_meter_rollups_transaction ON meter_rollups (transaction_id, resolution, bucket_start);
@@ -0,0 +1,20 @@
+-- Migration: Add OCPP gateway registry
+-- Description: Tracks which gateway worker process holds each charger's
+-- WebSocket so remote commands can be routed to it. Workers heartbeat
+-- ocpp_gateway_workers.last_seen; rows older than 60s are treated as dead.
+
+CREATE TABLE IF NOT EXISTS ocpp_gateway_workers (
+    worker_id VARCHAR PRIMARY KEY,
+    hostname VARCHAR,
+    pid INTEGER,
+    started_at TIMESTAMPTZ DEFAULT now(),
+    last_seen TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS ocpp_connections (
+    charger_id VARCHAR PRIMARY KEY,
+    worker_id VARCHAR NOT NULL,
+    connected_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_ocpp_connections_worker_id ON ocpp_connections (worker_id);
@@ -0,0 +1,11 @@
+-- Migration: Add OCPP transaction id sequence
+-- Description: Durable source of OCPP transaction ids. The server reserves
+-- blocks of 50 ids per nextval(), so INCREMENT must match
+-- OCPP_TRANSACTION_ID_BLOCK in database.py. Starts after the highest id
+-- already issued so ids never repeat across restarts.
+
+CREATE SEQUENCE IF NOT EXISTS ocpp_transaction_id_seq INCREMENT BY 50;
+
+SELECT setval('ocpp_transaction_id_seq', s.max_id)
+FROM (SELECT max(transaction_id) AS max_id FROM ocpp_transactions) s
+WHERE s.max_id >= (SELECT last_value FROM ocpp_transaction_id_seq);
@@ -0,0 +1,10 @@
+-- Migration: Add keyset pagination indexes
+-- Description: Composite (sort column, id) indexes backing the cursor-paginated
+-- listings (/transactions/page, /rfid-cards/{id}/history/page, /expenses/page,
+-- /ocpp/boots/page) so every page is an index range scan. The column order
+-- matches the listings' ORDER BY sort DESC NULLS LAST, id DESC.
+
+CREATE INDEX IF NOT EXISTS ix_transactions_start_time_id ON transactions (start_time DESC NULLS LAST, id DESC);
+CREATE INDEX IF NOT EXISTS ix_rfid_history_card_created_at ON rfid_history (card_id, created_at DESC NULLS LAST, id DESC);
+CREATE INDEX IF NOT EXISTS ix_ocpp_boots_timestamp_id ON ocpp_boots (timestamp DESC NULLS LAST, id DESC);
+CREATE INDEX IF NOT EXISTS ix_expenses_date_id ON expenses (date DESC NULLS LAST, id DESC);
@@ -0,0 +1,8 @@
+-- Migration: Add RFID card listing indexes
+-- Description: Backs /rfid-cards filtering and pagination: keyset order for
+-- /rfid-cards/page, card number prefix search (varchar_pattern_ops so LIKE
+-- 'prefix%' uses the index under any collation) and the owner filter.
+
+CREATE INDEX IF NOT EXISTS ix_rfid_cards_created_at_id ON rfid_cards (created_at DESC NULLS LAST, id DESC);
+CREATE INDEX IF NOT EXISTS ix_rfid_cards_card_number_prefix ON rfid_cards (card_number varchar_pattern_ops);
+CREATE INDEX IF NOT EXISTS ix_rfid_cards_user_id ON rfid_cards (user_id);
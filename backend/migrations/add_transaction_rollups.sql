@@ -0,0 +1,15 @@
+-- Migration: Add transaction rollups table
+-- Description: Pre-aggregated transaction totals for the dashboard, keyed by
+-- day, station, account and payment type. Populate it afterwards with
+-- `python rebuild_rollups.py` (the server also does this on first start).
+
+CREATE TABLE IF NOT EXISTS transaction_rollups (
+    dimension VARCHAR NOT NULL,          -- day, station, account, payment_type
+    key VARCHAR NOT NULL,                -- '' when the source column is empty
+    payment_status VARCHAR NOT NULL,
+    tx_count BIGINT NOT NULL DEFAULT 0,
+    energy FLOAT NOT NULL DEFAULT 0,
+    revenue FLOAT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (dimension, key, payment_status)
+);
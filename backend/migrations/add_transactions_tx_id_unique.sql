@@ -0,0 +1,21 @@
+-- Migration: Make transactions.tx_id unique
+-- Description: Imports and manual entry insert with ON CONFLICT (tx_id) DO
+-- NOTHING, which needs a unique index; until now duplicates were only kept
+-- out by a pre-check under an advisory lock that not every writer took.
+-- Rows repeating a TxID are removed first, keeping the earliest one. Run
+-- `python rebuild_rollups.py` afterwards so the dashboard totals drop them too.
+
+BEGIN;
+
+DELETE FROM transactions t
+USING (
+    SELECT id, row_number() OVER (PARTITION BY tx_id ORDER BY created_at NULLS LAST, id) AS n
+    FROM transactions
+    WHERE tx_id IS NOT NULL
+) ranked
+WHERE t.id = ranked.id AND ranked.n > 1;
+
+DROP INDEX IF EXISTS ix_transactions_tx_id;
+CREATE UNIQUE INDEX ix_transactions_tx_id ON transactions (tx_id);
+
+COMMIT;
@@ -0,0 +1,31 @@
+-- Migration: Convert transaction start/end times to TIMESTAMPTZ
+-- Description: start_time/end_time were stored as free-form strings, so date
+-- filters compared text and could not use an index. Values without an offset
+-- are read in the local time zone; unparseable values become NULL.
+-- Run once; afterwards restart the server so the dashboard rollups (whose day
+-- keys are now local dates) are rebuilt.
+
+SET TIME ZONE 'America/Bogota';
+SET DateStyle = 'ISO, DMY';
+
+CREATE OR REPLACE FUNCTION pg_temp.try_timestamptz(value TEXT) RETURNS TIMESTAMPTZ AS $$
+BEGIN
+    IF value IS NULL OR btrim(value) IN ('', '-', 'N/A', 'nan', 'NaT', 'None', 'null') THEN
+        RETURN NULL;
+    END IF;
+    RETURN btrim(value)::TIMESTAMPTZ;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE transactions
+    ALTER COLUMN start_time TYPE TIMESTAMP WITH TIME ZONE USING pg_temp.try_timestamptz(start_time),
+    ALTER COLUMN end_time TYPE TIMESTAMP WITH TIME ZONE USING pg_temp.try_timestamptz(end_time);
+
+-- Date-range filters, optionally narrowed by station / account
+CREATE INDEX IF NOT EXISTS ix_transactions_start_time_station ON transactions (start_time, station);
+CREATE INDEX IF NOT EXISTS ix_transactions_account_start_time ON transactions (account, start_time);
+
+-- Rebuilt from the converted column on next server start
+DELETE FROM transaction_rollups;
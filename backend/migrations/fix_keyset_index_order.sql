@@ -0,0 +1,25 @@
+-- Migration: Rebuild keyset pagination indexes in listing order
+-- Description: The listings order by (sort DESC NULLS LAST, id DESC). The
+-- ascending (sort, id) indexes created by add_pagination_indexes.sql and
+-- add_rfid_card_indexes.sql can only be scanned backwards as DESC NULLS FIRST,
+-- so every page sorted the whole filtered set. Recreate them with the
+-- listing's column order.
+
+BEGIN;
+
+DROP INDEX IF EXISTS ix_transactions_start_time_id;
+CREATE INDEX ix_transactions_start_time_id ON transactions (start_time DESC NULLS LAST, id DESC);
+
+DROP INDEX IF EXISTS ix_rfid_history_card_created_at;
+CREATE INDEX ix_rfid_history_card_created_at ON rfid_history (card_id, created_at DESC NULLS LAST, id DESC);
+
+DROP INDEX IF EXISTS ix_ocpp_boots_timestamp_id;
+CREATE INDEX ix_ocpp_boots_timestamp_id ON ocpp_boots (timestamp DESC NULLS LAST, id DESC);
+
+DROP INDEX IF EXISTS ix_expenses_date_id;
+CREATE INDEX ix_expenses_date_id ON expenses (date DESC NULLS LAST, id DESC);
+
+DROP INDEX IF EXISTS ix_rfid_cards_created_at_id;
+CREATE INDEX ix_rfid_cards_created_at_id ON rfid_cards (created_at DESC NULLS LAST, id DESC);
+
+COMMIT;
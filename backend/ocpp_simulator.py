@@ -1,23 +1,145 @@
 #!/usr/bin/env python3
 """
 OCPP 1.6 Charger Simulator
-Simulates a charge point connecting to the central system via WebSocket
+Simulates a charge point connecting to the central system via WebSocket.
+
+With --chargers N it becomes a load generator: N simulated charge points,
+optionally spread over a process pool, each following a scripted profile
+(boot, heartbeat, status, authorize, start, meter values, stop) until
+--duration runs out. It reports message throughput, p50/p95/p99 response
+latency and errors per Action, and exits non-zero when --max-p95-ms or
+--max-error-rate is exceeded, so it can be used as a capacity regression test.
+
+Usage:
+    python ocpp_simulator.py [charger_id] [ws_url]
+    python ocpp_simulator.py --chargers 500 --processes 4 --duration 120 --profile busy --json load.json
 """
+import argparse
 import asyncio
+import json
 import logging
+import math
+import multiprocessing
+import random
+import sys
+import time
+from dataclasses import dataclass, asdict, replace
 from datetime import datetime, timezone
+from typing import Dict, List, Optional
 
 import websockets
 from ocpp.v16 import call, ChargePoint as cp
-from ocpp.v16.enums import RegistrationStatus
+from ocpp.v16.enums import RegistrationStatus, AuthorizationStatus
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('charger_simulator')
 
+DEFAULT_WS_URL = "ws://localhost:9000/ocpp/1.6/"
+
+
+@dataclass
+class LoadProfile:
+    """Message rates for one simulated charge point; intervals in seconds, 0 disables"""
+    heartbeat_interval: float = 30
+    status_interval: float = 300
+    meter_interval: float = 10
+    session_seconds: float = 60
+    idle_seconds: float = 30
+    id_tag: str = "RFID-001"
+
+
+PROFILES = {
+    "idle": LoadProfile(session_seconds=0),
+    "default": LoadProfile(),
+    "busy": LoadProfile(heartbeat_interval=10, status_interval=60, meter_interval=1, session_seconds=30, idle_seconds=5),
+}
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+class LoadStats:
+    """Response latencies (ms) and error counts per Action"""
+    
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {}
+        self.duration = 0.0
+    
+    def record(self, action: str, latency_ms: float):
+        self.latencies.setdefault(action, []).append(latency_ms)
+    
+    def error(self, action: str):
+        self.errors[action] = self.errors.get(action, 0) + 1
+    
+    def reject(self, action: str):
+        self.rejected[action] = self.rejected.get(action, 0) + 1
+    
+    def to_dict(self) -> dict:
+        """Picklable form returned by pool workers"""
+        return {"latencies": self.latencies, "errors": self.errors, "rejected": self.rejected}
+    
+    def merge(self, other: dict):
+        for action, values in other["latencies"].items():
+            self.latencies.setdefault(action, []).extend(values)
+        for action, count in other["errors"].items():
+            self.errors[action] = self.errors.get(action, 0) + count
+        for action, count in other["rejected"].items():
+            self.rejected[action] = self.rejected.get(action, 0) + count
+    
+    def summary(self) -> dict:
+        actions = {}
+        for action in sorted(set(self.latencies) | set(self.errors)):
+            values = sorted(self.latencies.get(action, []))
+            actions[action] = {
+                "count": len(values),
+                "errors": self.errors.get(action, 0),
+                "rejected": self.rejected.get(action, 0),
+                "p50_ms": round(_percentile(values, 50), 2),
+                "p95_ms": round(_percentile(values, 95), 2),
+                "p99_ms": round(_percentile(values, 99), 2),
+                "max_ms": round(values[-1], 2) if values else 0.0,
+            }
+        messages = sum(a["count"] for name, a in actions.items() if name != "Connect")
+        errors = sum(a["errors"] for a in actions.values())
+        return {
+            "duration_s": round(self.duration, 2),
+            "messages": messages,
+            "throughput_msg_s": round(messages / self.duration, 2) if self.duration else 0.0,
+            "errors": errors,
+            "error_rate": round(errors / (messages + errors), 4) if messages + errors else 0.0,
+            "actions": actions,
+        }
+
 
 class ChargerSimulator(cp):
     """Simulated charge point"""
     
+    stats: Optional[LoadStats] = None
+    
+    async def call(self, payload, *args, **kwargs):
+        """Send a request, timing it when load statistics are collected"""
+        if self.stats is None:
+            return await super().call(payload, *args, **kwargs)
+        action = type(payload).__name__.replace("Payload", "")
+        started = time.perf_counter()
+        try:
+            response = await super().call(payload, *args, **kwargs)
+        except Exception:
+            self.stats.error(action)
+            raise
+        if response is None:  # CallError reply
+            self.stats.error(action)
+        else:
+            self.stats.record(action, (time.perf_counter() - started) * 1000)
+        return response
+    
     async def send_boot_notification(self):
         """Send BootNotification to central system"""
         request = call.BootNotification(
@@ -154,15 +276,195 @@ async def simulate_charger(charger_id: str, ws_url: str):
             logger.error(f"Boot rejected: {boot_response.status}")
 
 
-async def main():
-    """Main entry point"""
-    import sys
+# ----- Load generator -----
+
+async def _every(interval: float, deadline: float, send):
+    """Call `send` every `interval` seconds (first one jittered) until the deadline"""
+    await asyncio.sleep(random.uniform(0, interval))
+    while time.monotonic() < deadline:
+        await send()
+        await asyncio.sleep(interval)
+
+
+async def _sleep_until(seconds: float, deadline: float):
+    await asyncio.sleep(max(0.0, min(seconds, deadline - time.monotonic())))
+
+
+async def run_profile(charger_id: str, ws_url: str, profile: LoadProfile, stats: LoadStats, deadline: float):
+    """One scripted charge point: boot, status, then charging sessions until the deadline"""
+    started = time.perf_counter()
+    try:
+        ws = await websockets.connect(f"{ws_url}{charger_id}", subprotocols=['ocpp1.6'])
+    except Exception as e:
+        stats.error("Connect")
+        logger.warning(f"{charger_id} could not connect: {e}")
+        return
+    stats.record("Connect", (time.perf_counter() - started) * 1000)
+    
+    charger = ChargerSimulator(charger_id, ws)
+    charger.stats = stats
+    tasks = [asyncio.create_task(charger.start())]
+    connector_status = "Available"
+    try:
+        boot = await charger.send_boot_notification()
+        if boot is None or boot.status != RegistrationStatus.accepted:
+            stats.reject("BootNotification")
+            return
+        await charger.send_status_notification(0, "Available")
+        await charger.send_status_notification(1, connector_status)
+        
+        if profile.heartbeat_interval:
+            tasks.append(asyncio.create_task(_every(profile.heartbeat_interval, deadline, charger.send_heartbeat)))
+        if profile.status_interval:
+            tasks.append(asyncio.create_task(_every(
+                profile.status_interval, deadline, lambda: charger.send_status_notification(1, connector_status)
+            )))
+        
+        meter = 0
+        while time.monotonic() < deadline:
+            await _sleep_until(random.uniform(0.5, 1.5) * profile.idle_seconds, deadline)
+            if not profile.session_seconds or time.monotonic() >= deadline:
+                await _sleep_until(deadline - time.monotonic(), deadline)
+                break
+            
+            authorized = await charger.send_authorize(profile.id_tag)
+            if authorized is None or authorized.id_tag_info['status'] != AuthorizationStatus.accepted:
+                stats.reject("Authorize")
+                continue
+            
+            connector_status = "Preparing"
+            await charger.send_status_notification(1, connector_status)
+            start = await charger.send_start_transaction(connector_id=1, id_tag=profile.id_tag, meter_start=meter)
+            if start is None:
+                connector_status = "Available"
+                continue
+            connector_status = "Charging"
+            await charger.send_status_notification(1, connector_status)
+            
+            session_end = min(deadline, time.monotonic() + profile.session_seconds)
+            while time.monotonic() < session_end:
+                await _sleep_until(profile.meter_interval or profile.session_seconds, session_end)
+                meter += random.randint(50, 500)
+                if profile.meter_interval:
+                    await charger.send_meter_values(1, start.transaction_id, meter)
+            
+            connector_status = "Finishing"
+            await charger.send_status_notification(1, connector_status)
+            await charger.send_stop_transaction(start.transaction_id, meter)
+            connector_status = "Available"
+            await charger.send_status_notification(1, connector_status)
+    except websockets.exceptions.ConnectionClosed:
+        stats.error("Disconnected")
+    except Exception as e:
+        logger.debug(f"{charger_id} stopped: {e!r}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await ws.close()
+
+
+async def run_load(charger_ids: List[str], ws_url: str, profile: LoadProfile,
+                   duration: float, ramp_up: float) -> LoadStats:
+    """Run the given chargers in this process, starting them evenly over `ramp_up` seconds"""
+    stats = LoadStats()
+    started = time.monotonic()
+    deadline = started + ramp_up + duration
     
-    charger_id = sys.argv[1] if len(sys.argv) > 1 else "SIM-001"
-    ws_url = sys.argv[2] if len(sys.argv) > 2 else "ws://localhost:9000/ocpp/1.6/"
+    async def delayed(index: int, charger_id: str):
+        await asyncio.sleep(ramp_up * index / max(len(charger_ids), 1))
+        await run_profile(charger_id, ws_url, profile, stats, deadline)
     
+    await asyncio.gather(*(delayed(i, charger_id) for i, charger_id in enumerate(charger_ids)))
+    stats.duration = time.monotonic() - started
+    return stats
+
+
+def run_load_worker(charger_ids: List[str], ws_url: str, profile: dict, duration: float, ramp_up: float) -> dict:
+    """Process pool entry point; returns picklable statistics"""
+    logger.setLevel(logging.WARNING)
+    stats = asyncio.run(run_load(charger_ids, ws_url, LoadProfile(**profile), duration, ramp_up))
+    return {**stats.to_dict(), "duration": stats.duration}
+
+
+def print_report(summary: dict, chargers: int, processes: int):
+    print(f"\n{chargers} chargers in {processes} process(es), {summary['duration_s']}s")
+    print(f"{summary['messages']} messages, {summary['throughput_msg_s']} msg/s, "
+          f"{summary['errors']} errors ({summary['error_rate']:.2%})\n")
+    print(f"{'Action':<20}{'count':>9}{'errors':>8}{'rejected':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for action, a in summary["actions"].items():
+        print(f"{action:<20}{a['count']:>9}{a['errors']:>8}{a['rejected']:>10}"
+              f"{a['p50_ms']:>10}{a['p95_ms']:>10}{a['p99_ms']:>10}{a['max_ms']:>10}")
+
+
+def load_test(args) -> int:
+    profile = PROFILES[args.profile]
+    overrides = {
+        key: getattr(args, key) for key in asdict(profile) if getattr(args, key, None) is not None
+    }
+    profile = replace(profile, **overrides)
+    
+    charger_ids = [f"{args.prefix}-{n:05d}" for n in range(1, args.chargers + 1)]
+    processes = max(1, min(args.processes, args.chargers))
+    logger.setLevel(logging.WARNING)
+    
+    stats = LoadStats()
+    if processes == 1:
+        stats = asyncio.run(run_load(charger_ids, args.ws_url, profile, args.duration, args.ramp_up))
+    else:
+        shares = [charger_ids[i::processes] for i in range(processes)]
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.starmap(run_load_worker, [
+                (share, args.ws_url, asdict(profile), args.duration, args.ramp_up) for share in shares
+            ])
+        for result in results:
+            stats.merge(result)
+        stats.duration = max(result["duration"] for result in results)
+    
+    summary = stats.summary()
+    summary.update(chargers=args.chargers, processes=processes, profile=asdict(profile))
+    print_report(summary, args.chargers, processes)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    
+    failed = []
+    if args.max_error_rate is not None and summary["error_rate"] > args.max_error_rate:
+        failed.append(f"error rate {summary['error_rate']:.2%} > {args.max_error_rate:.2%}")
+    if args.max_p95_ms is not None:
+        for action, a in summary["actions"].items():
+            if a["p95_ms"] > args.max_p95_ms:
+                failed.append(f"{action} p95 {a['p95_ms']}ms > {args.max_p95_ms}ms")
+    for reason in failed:
+        print(f"FAILED: {reason}")
+    return 1 if failed else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="OCPP 1.6 charger simulator and load generator")
+    parser.add_argument("charger_id", nargs="?", default="SIM-001", help="charger id (single charger mode)")
+    parser.add_argument("ws_url", nargs="?", default=DEFAULT_WS_URL)
+    parser.add_argument("--chargers", type=int, default=0, help="simulate this many chargers (load mode)")
+    parser.add_argument("--processes", type=int, default=1, help="spread the chargers over a process pool")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to run after ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=10, help="seconds over which chargers connect")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default")
+    parser.add_argument("--prefix", default="LOAD", help="charger id prefix")
+    parser.add_argument("--heartbeat-interval", dest="heartbeat_interval", type=float)
+    parser.add_argument("--status-interval", dest="status_interval", type=float)
+    parser.add_argument("--meter-interval", dest="meter_interval", type=float)
+    parser.add_argument("--session-seconds", dest="session_seconds", type=float)
+    parser.add_argument("--idle-seconds", dest="idle_seconds", type=float)
+    parser.add_argument("--id-tag", dest="id_tag")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="fail if any Action's p95 latency is higher")
+    parser.add_argument("--max-error-rate", type=float, help="fail if the error rate (0-1) is higher")
+    return parser.parse_args(argv)
+
+
+async def main(args):
+    """Single charger entry point"""
     try:
-        await simulate_charger(charger_id, ws_url)
+        await simulate_charger(args.charger_id, args.ws_url)
     except KeyboardInterrupt:
         logger.info("Simulator stopped")
     except Exception as e:
@@ -170,4 +472,7 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    if args.chargers > 0:
+        sys.exit(load_test(args))
+    asyncio.run(main(args))
@@ -0,0 +1,29 @@
+"""
+Rebuild Dashboard Rollups
+Recomputes the transaction_rollups table from the transactions table.
+Run after bulk SQL edits to transactions or if dashboard totals look off.
+
+Usage:
+    cd backend
+    python rebuild_rollups.py
+"""
+import asyncio
+
+from database import engine, Base
+from services.rollups import rebuild_rollups
+
+
+async def main():
+    # Make sure the rollup table exists on databases created before it
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    print("Rebuilding transaction rollups...")
+    rows = await rebuild_rollups()
+    print(f"✓ Rollups rebuilt: {rows} rows")
+    
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -6,13 +6,14 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 from datetime import datetime, timezone, timedelta
-import bcrypt
 import jwt
 import uuid
 import os
 
 from sqlalchemy import select
 from database import async_session, User
+from services.user_cache import user_cache
+from services.passwords import password_hasher
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 security = HTTPBearer()
@@ -66,18 +67,19 @@ class PasswordChangeRequest(BaseModel):
 
 
 # Helper functions
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
 
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+async def verify_password(password: str, hashed: str) -> bool:
+    return await password_hasher.verify(password, hashed)
 
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    now = datetime.now(timezone.utc)
+    expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire, "iat": now})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
@@ -86,31 +88,42 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     token = credentials.credentials
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        async with async_session() as session:
-            result = await session.execute(
-                select(User).where(User.id == user_id)
-            )
-            user = result.scalar_one_or_none()
-            
-            if user is None:
-                raise HTTPException(status_code=401, detail="User not found")
-            
-            return UserResponse(
-                id=user.id,
-                email=user.email,
-                name=user.name,
-                role=user.role,
-                pricing_group_id=user.pricing_group_id,
-                created_at=user.created_at.isoformat() if user.created_at else None
-            )
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    user_id = payload.get("sub")
+    if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid token")
+    
+    # Tokens issued before iat was added share one cache entry per user
+    issued_at = payload.get("iat")
+    cached = user_cache.get(user_id, issued_at)
+    if cached is not None:
+        return cached
+    generation = user_cache.invalidations
+    
+    async with async_session() as session:
+        result = await session.execute(
+            select(User).where(User.id == user_id)
+        )
+        user = result.scalar_one_or_none()
+        
+        if user is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        
+        current_user = UserResponse(
+            id=user.id,
+            email=user.email,
+            name=user.name,
+            role=user.role,
+            pricing_group_id=user.pricing_group_id,
+            created_at=user.created_at.isoformat() if user.created_at else None
+        )
+    
+    user_cache.put(user_id, issued_at, current_user, generation)
+    return current_user
 
 
 def require_role(*allowed_roles: str):
@@ -132,7 +145,7 @@ async def login(credentials: UserLogin):
         )
         user = result.scalar_one_or_none()
         
-        if not user or not verify_password(credentials.password, user.password_hash):
+        if not user or not await verify_password(credentials.password, user.password_hash):
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
         access_token = create_access_token({"sub": user.id})
@@ -167,7 +180,7 @@ async def register(user_data: UserRegister):
             id=str(uuid.uuid4()),
             email=user_data.email,
             name=user_data.name,
-            password_hash=hash_password(user_data.password),
+            password_hash=await hash_password(user_data.password),
             role=user_data.role
         )
         session.add(new_user)
@@ -208,10 +221,11 @@ async def change_password(
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        if not verify_password(request.current_password, user.password_hash):
+        if not await verify_password(request.current_password, user.password_hash):
             raise HTTPException(status_code=400, detail="Current password is incorrect")
         
-        user.password_hash = hash_password(request.new_password)
+        user.password_hash = await hash_password(request.new_password)
         await session.commit()
+        user_cache.invalidate(user.id)
         
         return {"message": "Password changed successfully"}
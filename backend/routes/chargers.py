@@ -11,6 +11,8 @@ from sqlalchemy import select, delete
 from database import async_session, Charger
 
 from routes.auth import get_current_user, require_role, UserResponse
+from services.fleet_state import fleet_state
+from services.charger_status import charger_status
 
 router = APIRouter(prefix="/chargers", tags=["Chargers"])
 
@@ -25,7 +27,7 @@ class ChargerResponse(BaseModel):
     connectors: Optional[List[str]] = []
     last_heartbeat: Optional[str] = None
     created_at: Optional[str] = None
-
+    
     class Config:
         from_attributes = True
 
@@ -112,6 +114,7 @@ async def create_charger(
         )
         session.add(new_charger)
         await session.commit()
+        fleet_state.invalidate()
         await session.refresh(new_charger)
         
         return charger_to_response(new_charger)
@@ -143,6 +146,7 @@ async def update_charger(
             charger.status = charger_data.status
         
         await session.commit()
+        fleet_state.invalidate()
         await session.refresh(charger)
         
         return charger_to_response(charger)
@@ -159,6 +163,7 @@ async def delete_charger(
             delete(Charger).where(Charger.id == charger_id)
         )
         await session.commit()
+        fleet_state.invalidate()
         
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Charger not found")
@@ -168,15 +173,8 @@ async def delete_charger(
 
 @router.post("/{charger_id}/heartbeat")
 async def charger_heartbeat(charger_id: str):
-    """Update charger heartbeat timestamp"""
-    async with async_session() as session:
-        result = await session.execute(
-            select(Charger).where(Charger.charger_id == charger_id)
-        )
-        charger = result.scalar_one_or_none()
-        
-        if charger:
-            charger.last_heartbeat = datetime.now(timezone.utc)
-            await session.commit()
-        
-        return {"currentTime": datetime.now(timezone.utc).isoformat()}
+    """Update charger heartbeat timestamp (written with the next coalesced status flush)"""
+    now = datetime.now(timezone.utc)
+    charger_status.update(charger_id, heartbeat=now)
+    fleet_state.note_heartbeat(charger_id, now.isoformat())
+    return {"currentTime": now.isoformat()}
@@ -7,10 +7,11 @@ from typing import List, Optional
 from datetime import datetime, timezone
 
 from sqlalchemy import select, func
-from database import async_session, Transaction
+from database import async_session, Transaction, TransactionRollup
 
-from routes.auth import get_current_user, UserResponse
+from routes.auth import get_current_user, require_role, UserResponse
 from routes.transactions import TransactionResponse, transaction_to_response
+from services.rollups import rebuild_rollups, get_dimension_keys
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
@@ -31,67 +32,60 @@ class DashboardStats(BaseModel):
 # Routes
 @router.get("/stats", response_model=DashboardStats)
 async def get_dashboard_stats(current_user: UserResponse = Depends(get_current_user)):
-    """Get dashboard statistics"""
+    """Get dashboard statistics from the pre-aggregated transaction rollups"""
     async with async_session() as session:
-        # Total transactions
-        count_result = await session.execute(
-            select(func.count()).select_from(Transaction)
-        )
-        total_transactions = count_result.scalar() or 0
-        
-        # Total energy and revenue
+        # Totals by payment status and type (a handful of rollup rows)
         totals_result = await session.execute(
             select(
-                func.sum(Transaction.meter_value),
-                func.sum(Transaction.cost)
+                TransactionRollup.payment_status,
+                TransactionRollup.key,
+                func.sum(TransactionRollup.tx_count),
+                func.sum(TransactionRollup.energy),
+                func.sum(TransactionRollup.revenue)
             )
+            .where(TransactionRollup.dimension == "payment_type")
+            .group_by(TransactionRollup.payment_status, TransactionRollup.key)
         )
-        totals = totals_result.fetchone()
-        total_energy = float(totals[0] or 0)
-        total_revenue = float(totals[1] or 0)
         
-        # Paid revenue
-        paid_result = await session.execute(
-            select(func.sum(Transaction.cost)).where(Transaction.payment_status == "PAID")
-        )
-        paid_revenue = float(paid_result.scalar() or 0)
+        total_transactions = 0
+        total_energy = 0.0
+        total_revenue = 0.0
+        paid_revenue = 0.0
+        payment_breakdown = {}
+        for status, payment_type, count, energy, revenue in totals_result.fetchall():
+            total_transactions += int(count or 0)
+            total_energy += float(energy or 0)
+            total_revenue += float(revenue or 0)
+            if status == "PAID":
+                paid_revenue += float(revenue or 0)
+                if payment_type and count:
+                    payment_breakdown[payment_type] = {
+                        "count": int(count),
+                        "amount": float(revenue or 0)
+                    }
         unpaid_revenue = total_revenue - paid_revenue
         
-        # Unique stations
-        stations_result = await session.execute(
-            select(Transaction.station).distinct()
-        )
-        stations = [row[0] for row in stations_result.fetchall() if row[0]]
-        active_stations = len(stations)
-        
-        # Unique accounts
-        accounts_result = await session.execute(
-            select(Transaction.account).distinct()
-        )
-        accounts = [row[0] for row in accounts_result.fetchall() if row[0]]
-        unique_accounts = len(accounts)
-        
-        # Payment breakdown
-        payment_result = await session.execute(
+        # Unique stations and accounts
+        distinct_result = await session.execute(
             select(
-                Transaction.payment_type,
-                func.count(),
-                func.sum(Transaction.cost)
-            ).where(Transaction.payment_status == "PAID")
-            .group_by(Transaction.payment_type)
+                TransactionRollup.dimension,
+                func.count(func.distinct(TransactionRollup.key))
+            )
+            .where(
+                TransactionRollup.dimension.in_(["station", "account"]),
+                TransactionRollup.key != "",
+                TransactionRollup.tx_count > 0
+            )
+            .group_by(TransactionRollup.dimension)
         )
-        payment_breakdown = {}
-        for row in payment_result.fetchall():
-            if row[0]:
-                payment_breakdown[row[0]] = {
-                    "count": row[1],
-                    "amount": float(row[2] or 0)
-                }
+        distinct_counts = dict(distinct_result.fetchall())
+        active_stations = distinct_counts.get("station", 0)
+        unique_accounts = distinct_counts.get("account", 0)
         
         # Recent transactions
         recent_result = await session.execute(
             select(Transaction)
-            .order_by(Transaction.start_time.desc())
+            .order_by(Transaction.start_time.desc().nullslast())
             .limit(5)
         )
         recent_transactions = [
@@ -111,24 +105,21 @@ async def get_dashboard_stats(current_user: UserResponse = Depends(get_current_u
         )
 
 
+@router.post("/rollups/rebuild")
+async def rebuild_dashboard_rollups(current_user: UserResponse = Depends(require_role("admin"))):
+    """Rebuild the dashboard rollups from scratch (Admin only)"""
+    rows = await rebuild_rollups()
+    return {"message": "Rollups rebuilt successfully", "rollup_rows": rows}
+
+
 # Filter endpoints
 @router.get("/filters/stations")
 async def get_stations(current_user: UserResponse = Depends(get_current_user)):
     """Get list of unique stations"""
-    async with async_session() as session:
-        result = await session.execute(
-            select(Transaction.station).distinct()
-        )
-        stations = [row[0] for row in result.fetchall() if row[0]]
-        return sorted(stations)
+    return await get_dimension_keys("station")
 
 
 @router.get("/filters/accounts")
 async def get_accounts(current_user: UserResponse = Depends(get_current_user)):
     """Get list of unique accounts"""
-    async with async_session() as session:
-        result = await session.execute(
-            select(Transaction.account).distinct()
-        )
-        accounts = [row[0] for row in result.fetchall() if row[0]]
-        return sorted(accounts)
+    return await get_dimension_keys("account")
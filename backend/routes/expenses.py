@@ -5,11 +5,13 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timezone
-from sqlalchemy import select, func, and_, extract
+from sqlalchemy import select, func, and_, extract, literal_column
 from sqlalchemy.orm import selectinload
 
 from database import async_session, Expense, Transaction
 from routes.auth import UserResponse, get_current_user
+from services.timestamps import local_date_sql
+from services.pagination import fetch_page, estimate_total
 
 router = APIRouter(prefix="/expenses", tags=["expenses"])
 
@@ -36,11 +38,17 @@ class ExpenseResponse(BaseModel):
     reason: Optional[str] = None
     created_by: Optional[str] = None
     created_at: Optional[str] = None
-
+    
     class Config:
         from_attributes = True
 
 
+class ExpensePage(BaseModel):
+    expenses: List[ExpenseResponse]
+    next_cursor: Optional[str] = None
+    total_estimate: Optional[int] = None
+
+
 class MonthlyFinancials(BaseModel):
     month: str  # YYYY-MM
     income: float
@@ -57,6 +65,28 @@ class FinancialSummary(BaseModel):
     monthly_data: List[MonthlyFinancials]
 
 
+def expense_to_response(exp: Expense) -> ExpenseResponse:
+    return ExpenseResponse(
+        id=exp.id,
+        name=exp.name,
+        date=exp.date,
+        cost=exp.cost,
+        reason=exp.reason,
+        created_by=exp.created_by,
+        created_at=exp.created_at.isoformat() if exp.created_at else None
+    )
+
+
+def expense_filters(start_date: Optional[str], end_date: Optional[str]) -> list:
+    """Date conditions (YYYY-MM-DD, inclusive) shared by the expense listings"""
+    conditions = []
+    if start_date:
+        conditions.append(Expense.date >= start_date)
+    if end_date:
+        conditions.append(Expense.date <= end_date)
+    return conditions
+
+
 @router.get("", response_model=List[ExpenseResponse])
 async def get_expenses(
     start_date: Optional[str] = None,
@@ -67,30 +97,44 @@ async def get_expenses(
     async with async_session() as session:
         query = select(Expense).order_by(Expense.date.desc())
         
-        conditions = []
-        if start_date:
-            conditions.append(Expense.date >= start_date)
-        if end_date:
-            conditions.append(Expense.date <= end_date)
-        
+        conditions = expense_filters(start_date, end_date)
         if conditions:
             query = query.where(and_(*conditions))
         
         result = await session.execute(query)
         expenses = result.scalars().all()
         
-        return [
-            ExpenseResponse(
-                id=exp.id,
-                name=exp.name,
-                date=exp.date,
-                cost=exp.cost,
-                reason=exp.reason,
-                created_by=exp.created_by,
-                created_at=exp.created_at.isoformat() if exp.created_at else None
-            )
-            for exp in expenses
-        ]
+        return [expense_to_response(exp) for exp in expenses]
+
+
+@router.get("/page", response_model=ExpensePage)
+async def get_expenses_page(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    include_total: bool = False,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Cursor-paginated expenses, newest date first"""
+    limit = max(1, min(limit, 1000))
+    conditions = expense_filters(start_date, end_date)
+    
+    async with async_session() as session:
+        page, next_cursor = await fetch_page(
+            session, select(Expense).where(*conditions),
+            Expense.date, Expense.id, cursor, limit, "date"
+        )
+        
+        total = None
+        if include_total:
+            total = await estimate_total(session, Expense, conditions)
+        
+        return ExpensePage(
+            expenses=[expense_to_response(exp) for exp in page],
+            next_cursor=next_cursor,
+            total_estimate=total
+        )
 
 
 @router.post("", response_model=ExpenseResponse)
@@ -223,36 +267,28 @@ async def get_financial_summary(
     current_user: UserResponse = Depends(get_current_user)
 ):
     """Get monthly financial summary (income, expenses, profit)"""
+    # Both sides are grouped by month (YYYY-MM) in the database
+    income_month = local_date_sql(Transaction.start_time, "YYYY-MM")
+    expense_month = func.substr(Expense.date, literal_column("1"), literal_column("7"))
+    
     async with async_session() as session:
-        # Get all transactions grouped by month
+        # Income from paid transactions
         tx_result = await session.execute(
-            select(Transaction).order_by(Transaction.start_time.desc())
+            select(income_month, func.coalesce(func.sum(Transaction.cost), 0))
+            .where(
+                Transaction.payment_status == 'PAID',
+                Transaction.start_time.isnot(None)
+            )
+            .group_by(income_month)
         )
-        transactions = tx_result.scalars().all()
+        monthly_income = {month: float(total) for month, total in tx_result.all()}
         
-        # Get all expenses
         exp_result = await session.execute(
-            select(Expense).order_by(Expense.date.desc())
+            select(expense_month, func.coalesce(func.sum(Expense.cost), 0))
+            .where(Expense.date.isnot(None), Expense.date != "")
+            .group_by(expense_month)
         )
-        expenses = exp_result.scalars().all()
-    
-    # Group income by month (from paid transactions)
-    monthly_income = {}
-    for tx in transactions:
-        if tx.start_time and tx.payment_status == 'PAID':
-            month_key = tx.start_time[:7]  # YYYY-MM
-            if month_key not in monthly_income:
-                monthly_income[month_key] = 0
-            monthly_income[month_key] += tx.cost or 0
-    
-    # Group expenses by month
-    monthly_expenses = {}
-    for exp in expenses:
-        if exp.date:
-            month_key = exp.date[:7]  # YYYY-MM
-            if month_key not in monthly_expenses:
-                monthly_expenses[month_key] = 0
-            monthly_expenses[month_key] += exp.cost or 0
+        monthly_expenses = {month: float(total) for month, total in exp_result.all()}
     
     # Combine all months
     all_months = set(list(monthly_income.keys()) + list(monthly_expenses.keys()))
@@ -2,68 +2,72 @@
 Export routes - Export data to Excel/CSV
 """
 from fastapi import APIRouter, Depends
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse
+from starlette.background import BackgroundTask
 from typing import Optional
 from datetime import datetime
-from io import BytesIO
+import os
 
 from sqlalchemy import select
-from database import async_session, User, Transaction, RFIDCard, PricingGroup
+from database import User, Transaction, RFIDCard, PricingGroup
 
 from routes.auth import require_role, UserResponse
+from services.timestamps import format_timestamp, date_range_conditions
+from services.exporter import export_response, export_to_file, XLSX_MEDIA_TYPE
+from services.spreadsheets import spreadsheet_pool
+from services.jobs import job_runner
+from routes.jobs import job_submitted
 
 router = APIRouter(prefix="/export", tags=["Export"])
 
 
+USER_EXPORT_HEADERS = ["Name", "Email", "Role", "Pricing Group", "Created At"]
+
+TRANSACTION_EXPORT_HEADERS = [
+    "TxID", "Station", "Connector", "Connector Type", "Account",
+    "Start Time", "End Time", "Duration", "Meter Value (kWh)", "Cost (COP)",
+    "Payment Status", "Payment Type", "Payment Date"
+]
+
+RFID_EXPORT_HEADERS = ["Card Number", "User Email", "Balance (COP)", "Status", "Active", "Created At"]
+
+
+def format_created_at(value: Optional[datetime]) -> str:
+    return value.strftime("%Y-%m-%d %H:%M") if value else ""
+
+
+async def export(name: str, format: str, background: bool, headers, statement, to_values, current_user: UserResponse):
+    """Stream the export now, or with background=true run it as a job and return its id (202)"""
+    if not background:
+        return export_response(name, format, headers, statement, to_values)
+    kind = f"export_{name}"
+    job_id = await job_runner.submit(kind, current_user.id, export_to_file, name, format, headers, statement, to_values)
+    return JSONResponse(status_code=202, content=job_submitted(job_id, kind).model_dump())
+
+
 @router.get("/users")
 async def export_users(
     format: str = "xlsx",
+    background: bool = False,
     current_user: UserResponse = Depends(require_role("admin"))
 ):
     """Export all users to Excel/CSV"""
-    import pandas as pd
+    statement = (
+        select(User.name, User.email, User.role, PricingGroup.name.label("group_name"), User.created_at)
+        .outerjoin(PricingGroup, PricingGroup.id == User.pricing_group_id)
+        .order_by(User.name)
+    )
     
-    async with async_session() as session:
-        # Get all users with their pricing groups
-        result = await session.execute(
-            select(User).order_by(User.name)
-        )
-        users = result.scalars().all()
-        
-        # Get all pricing groups for lookup
-        groups_result = await session.execute(select(PricingGroup))
-        groups = {g.id: g.name for g in groups_result.scalars().all()}
-        
-        # Build data
-        data = []
-        for user in users:
-            data.append({
-                "Name": user.name,
-                "Email": user.email,
-                "Role": user.role,
-                "Pricing Group": groups.get(user.pricing_group_id, ""),
-                "Created At": user.created_at.strftime("%Y-%m-%d %H:%M") if user.created_at else ""
-            })
-        
-        df = pd.DataFrame(data)
-        
-        output = BytesIO()
-        if format == "csv":
-            df.to_csv(output, index=False)
-            media_type = "text/csv"
-            filename = f"users_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        else:
-            df.to_excel(output, index=False, engine='openpyxl')
-            media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            filename = f"users_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        
-        output.seek(0)
-        
-        return StreamingResponse(
-            output,
-            media_type=media_type,
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+    def to_values(row) -> list:
+        return [
+            row.name,
+            row.email,
+            row.role,
+            row.group_name or "",
+            format_created_at(row.created_at)
+        ]
+    
+    return await export("users", format, background, USER_EXPORT_HEADERS, statement, to_values, current_user)
 
 
 @router.get("/transactions")
@@ -71,163 +75,108 @@ async def export_transactions(
     format: str = "xlsx",
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
+    background: bool = False,
     current_user: UserResponse = Depends(require_role("admin"))
 ):
     """Export transactions to Excel/CSV"""
-    import pandas as pd
-    
-    async with async_session() as session:
-        query = select(Transaction).order_by(Transaction.start_time.desc())
-        
-        if start_date:
-            query = query.where(Transaction.start_time >= start_date)
-        if end_date:
-            query = query.where(Transaction.start_time <= end_date)
-        
-        result = await session.execute(query)
-        transactions = result.scalars().all()
-        
-        data = []
-        for tx in transactions:
-            data.append({
-                "TxID": tx.tx_id,
-                "Station": tx.station,
-                "Connector": tx.connector,
-                "Connector Type": tx.connector_type or "",
-                "Account": tx.account,
-                "Start Time": tx.start_time or "",
-                "End Time": tx.end_time or "",
-                "Duration": tx.charging_duration or "",
-                "Meter Value (kWh)": tx.meter_value or 0,
-                "Cost (COP)": tx.cost or 0,
-                "Payment Status": tx.payment_status or "UNPAID",
-                "Payment Type": tx.payment_type or "",
-                "Payment Date": tx.payment_date or ""
-            })
-        
-        df = pd.DataFrame(data)
-        
-        output = BytesIO()
-        if format == "csv":
-            df.to_csv(output, index=False)
-            media_type = "text/csv"
-            filename = f"transactions_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        else:
-            df.to_excel(output, index=False, engine='openpyxl')
-            media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            filename = f"transactions_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        
-        output.seek(0)
-        
-        return StreamingResponse(
-            output,
-            media_type=media_type,
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+    statement = (
+        select(
+            Transaction.tx_id, Transaction.station, Transaction.connector,
+            Transaction.connector_type, Transaction.account,
+            Transaction.start_time, Transaction.end_time, Transaction.charging_duration,
+            Transaction.meter_value, Transaction.cost, Transaction.payment_status,
+            Transaction.payment_type, Transaction.payment_date
         )
+        .where(*date_range_conditions(Transaction.start_time, start_date, end_date))
+        .order_by(Transaction.start_time.desc().nullslast())
+    )
+    
+    def to_values(row) -> list:
+        return [
+            row.tx_id,
+            row.station,
+            row.connector,
+            row.connector_type or "",
+            row.account,
+            format_timestamp(row.start_time),
+            format_timestamp(row.end_time),
+            row.charging_duration or "",
+            row.meter_value or 0,
+            row.cost or 0,
+            row.payment_status or "UNPAID",
+            row.payment_type or "",
+            row.payment_date or ""
+        ]
+    
+    return await export("transactions", format, background, TRANSACTION_EXPORT_HEADERS, statement, to_values, current_user)
 
 
 @router.get("/rfid-cards")
 async def export_rfid_cards(
     format: str = "xlsx",
+    background: bool = False,
     current_user: UserResponse = Depends(require_role("admin"))
 ):
     """Export RFID cards to Excel/CSV"""
-    import pandas as pd
-    
-    async with async_session() as session:
-        result = await session.execute(
-            select(RFIDCard).order_by(RFIDCard.card_number)
-        )
-        cards = result.scalars().all()
-        
-        # Get users for lookup
-        users_result = await session.execute(select(User))
-        users = {u.id: u.email for u in users_result.scalars().all()}
-        
-        data = []
-        for card in cards:
-            data.append({
-                "Card Number": card.card_number,
-                "User Email": users.get(card.user_id, ""),
-                "Balance (COP)": card.balance or 0,
-                "Status": card.status or "active",
-                "Active": "Yes" if card.is_active else "No",
-                "Created At": card.created_at.strftime("%Y-%m-%d %H:%M") if card.created_at else ""
-            })
-        
-        df = pd.DataFrame(data)
-        
-        output = BytesIO()
-        if format == "csv":
-            df.to_csv(output, index=False)
-            media_type = "text/csv"
-            filename = f"rfid_cards_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        else:
-            df.to_excel(output, index=False, engine='openpyxl')
-            media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            filename = f"rfid_cards_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        
-        output.seek(0)
-        
-        return StreamingResponse(
-            output,
-            media_type=media_type,
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+    statement = (
+        select(
+            RFIDCard.card_number, User.email, RFIDCard.balance, RFIDCard.status,
+            RFIDCard.is_active, RFIDCard.created_at
         )
+        .outerjoin(User, User.id == RFIDCard.user_id)
+        .order_by(RFIDCard.card_number)
+    )
+    
+    def to_values(row) -> list:
+        return [
+            row.card_number,
+            row.email or "",
+            row.balance or 0,
+            row.status or "active",
+            "Yes" if row.is_active else "No",
+            format_created_at(row.created_at)
+        ]
+    
+    return await export("rfid_cards", format, background, RFID_EXPORT_HEADERS, statement, to_values, current_user)
+
+
+async def template_response(filename: str, columns: dict) -> FileResponse:
+    """Import template with the given example columns, rendered off the event loop"""
+    headers = list(columns)
+    
+    async def rows():
+        yield [list(row) for row in zip(*columns.values())]
+    
+    path = await spreadsheet_pool.render_xlsx(headers, rows())
+    return FileResponse(path, media_type=XLSX_MEDIA_TYPE, filename=filename, background=BackgroundTask(os.remove, path))
 
 
 @router.get("/template/users")
 async def download_user_template():
     """Download user import template"""
-    import pandas as pd
-    
-    df = pd.DataFrame({
+    return await template_response("user_import_template.xlsx", {
         "Name": ["John Doe", "Jane Smith"],
         "Email": ["john@example.com", "jane@example.com"],
         "Role": ["user", "admin"],
         "Password": ["Password123", "Password456"],
         "Group": ["Default", "Premium"]
     })
-    
-    output = BytesIO()
-    df.to_excel(output, index=False, engine='openpyxl')
-    output.seek(0)
-    
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=user_import_template.xlsx"}
-    )
 
 
 @router.get("/template/rfid-cards")
 async def download_rfid_template():
     """Download RFID card import template"""
-    import pandas as pd
-    
-    df = pd.DataFrame({
+    return await template_response("rfid_import_template.xlsx", {
         "Card Number": ["RFID001", "RFID002"],
         "User Email": ["john@example.com", "jane@example.com"],
         "Balance": [50000, 100000]
     })
-    
-    output = BytesIO()
-    df.to_excel(output, index=False, engine='openpyxl')
-    output.seek(0)
-    
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=rfid_import_template.xlsx"}
-    )
 
 
 @router.get("/template/transactions")
 async def download_transactions_template():
     """Download transactions import template"""
-    import pandas as pd
-    
-    df = pd.DataFrame({
+    return await template_response("transactions_import_template.xlsx", {
         "TxID": ["TX001", "TX002"],
         "Station": ["Station A", "Station B"],
         "Connector": ["1", "2"],
@@ -236,13 +185,3 @@ async def download_transactions_template():
         "End Time": ["2026-01-01 10:30:00", "2026-01-01 12:00:00"],
         "Meter value(kW.h)": [15.5, 25.0]
     })
-    
-    output = BytesIO()
-    df.to_excel(output, index=False, engine='openpyxl')
-    output.seek(0)
-    
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=transactions_import_template.xlsx"}
-    )
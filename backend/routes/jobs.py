@@ -0,0 +1,141 @@
+"""
+Job routes - Progress, results, cancellation and downloads of background imports/exports
+"""
+import os
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from typing import List, Optional, Any
+
+from sqlalchemy import select
+from database import async_session, Job
+
+from routes.auth import get_current_user, require_role, UserResponse
+from services.jobs import job_runner
+from services.spreadsheets import spreadsheet_pool
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+# Most jobs returned by the listing
+MAX_JOBS_LISTED = 100
+
+
+class JobSubmitted(BaseModel):
+    """Returned (202) by endpoints that run as a background job"""
+    job_id: str
+    kind: str
+    status: str = "queued"
+    status_url: str
+
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    progress: int = 0
+    total: Optional[int] = None
+    message: Optional[str] = None
+    errors: List[dict] = []
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    download_url: Optional[str] = None
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+
+def job_submitted(job_id: str, kind: str) -> JobSubmitted:
+    return JobSubmitted(job_id=job_id, kind=kind, status_url=f"/api/jobs/{job_id}")
+
+
+def job_to_response(job: Job) -> JobResponse:
+    return JobResponse(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        progress=job.progress or 0,
+        total=job.total,
+        message=job.message,
+        errors=job.errors or [],
+        result=job.result,
+        error=job.error,
+        cancel_requested=bool(job.cancel_requested),
+        download_url=f"/api/jobs/{job.id}/download" if job.file_path else None,
+        created_at=job.created_at.isoformat() if job.created_at else None,
+        started_at=job.started_at.isoformat() if job.started_at else None,
+        finished_at=job.finished_at.isoformat() if job.finished_at else None
+    )
+
+
+async def get_visible_job(job_id: str, current_user: UserResponse) -> Job:
+    """The job, if it exists and belongs to the user (admins see every job)"""
+    async with async_session() as session:
+        result = await session.execute(select(Job).where(Job.id == job_id))
+        job = result.scalar_one_or_none()
+    if not job or (current_user.role != "admin" and job.user_id != current_user.id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("", response_model=List[JobResponse])
+async def get_jobs(
+    status: Optional[str] = None,
+    limit: int = 20,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Most recent jobs of the current user (every user's for admins)"""
+    statement = select(Job).order_by(Job.created_at.desc(), Job.id.desc()).limit(min(max(limit, 1), MAX_JOBS_LISTED))
+    if current_user.role != "admin":
+        statement = statement.where(Job.user_id == current_user.id)
+    if status:
+        statement = statement.where(Job.status == status)
+    
+    async with async_session() as session:
+        result = await session.execute(statement)
+        return [job_to_response(job) for job in result.scalars().all()]
+
+
+@router.get("/stats")
+async def get_job_stats(current_user: UserResponse = Depends(require_role("admin"))):
+    """Job runner counters for this process (Admin only)"""
+    return job_runner.stats()
+
+
+@router.get("/spreadsheet-pool")
+async def get_spreadsheet_pool_stats(current_user: UserResponse = Depends(require_role("admin"))):
+    """Spreadsheet process pool saturation, timeouts and queue wait for this process (Admin only)"""
+    return spreadsheet_pool.stats()
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, current_user: UserResponse = Depends(get_current_user)):
+    """Progress, row errors so far and, once finished, the result"""
+    return job_to_response(await get_visible_job(job_id, current_user))
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(job_id: str, current_user: UserResponse = Depends(get_current_user)):
+    """Cancel a queued or running job"""
+    await get_visible_job(job_id, current_user)
+    if not await job_runner.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job already finished")
+    return job_to_response(await get_visible_job(job_id, current_user))
+
+
+@router.get("/{job_id}/download")
+async def download_job_file(job_id: str, current_user: UserResponse = Depends(get_current_user)):
+    """File produced by a finished export job"""
+    job = await get_visible_job(job_id, current_user)
+    if job.status != "succeeded" or not job.file_path:
+        raise HTTPException(status_code=409, detail="Job has no file to download")
+    if not os.path.exists(job.file_path):
+        # Deleted after JOB_FILE_TTL_HOURS
+        raise HTTPException(status_code=410, detail="Export file is no longer available")
+    
+    result = job.result or {}
+    return FileResponse(
+        job.file_path,
+        media_type=result.get("media_type"),
+        filename=result.get("filename") or os.path.basename(job.file_path)
+    )
@@ -2,19 +2,30 @@
 OCPP WebSocket routes and REST API endpoints
 Integrates WebSocket server with FastAPI for real-time and REST control
 """
-from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone
 import uuid
 import asyncio
 import json
+import time
 
 from sqlalchemy import select, func
-from database import async_session, OCPPBoot, OCPPTransaction, OCPPSession, Charger, RFIDCard
+from database import async_session, OCPPBoot, OCPPTransaction, OCPPSession, Charger, MeterSample, MeterRollup
 
 from routes.auth import get_current_user, require_role, UserResponse
 from services.ocpp_server import central_system
+from services.ocpp_journal import ocpp_journal
+from services.ocpp_state import transaction_ids
+from services.ocpp_gateway import ocpp_gateway, NOT_CONNECTED
+from services.meter_values import meter_store, ROLLUP_RESOLUTIONS
+from services.rfid_auth import rfid_auth
+from services.ocpp_broadcast import ocpp_broadcaster
+from services.fleet_state import fleet_state
+from services.charger_status import charger_status
+from services.jobs import job_runner
+from services.pagination import fetch_page, estimate_total
 
 router = APIRouter(prefix="/ocpp", tags=["OCPP"])
 
@@ -62,6 +73,30 @@ class BootNotificationResponse(BaseModel):
     status: str
 
 
+class BootNotificationPage(BaseModel):
+    boots: List[BootNotificationResponse]
+    next_cursor: Optional[str] = None
+    total_estimate: Optional[int] = None
+
+
+class MeterValuePoint(BaseModel):
+    timestamp: str
+    measurand: str
+    phase: str = ""
+    unit: Optional[str] = None
+    value: float  # the sample, or the bucket average
+    min: Optional[float] = None
+    max: Optional[float] = None
+    last: Optional[float] = None  # latest sample in the bucket, e.g. the energy register
+    samples: int = 1
+
+
+class MeterSeriesResponse(BaseModel):
+    transaction_id: int
+    resolution: str
+    points: List[MeterValuePoint]
+
+
 class RemoteCommandRequest(BaseModel):
     connector_id: int = 1
     id_tag: str = "REMOTE"
@@ -72,205 +107,127 @@ class RemoteCommandResponse(BaseModel):
     message: str
 
 
-# WebSocket for real-time updates to frontend
-class ConnectionManager:
-    """Manage WebSocket connections for real-time frontend updates"""
-    
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-    
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-    
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-    
-    async def broadcast(self, message: dict):
-        """Broadcast message to all connected clients"""
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
+class LocalListResponse(BaseModel):
+    sent: int
+    accepted: int
+    results: Dict[str, str]
+
+
+class BulkCommandRequest(BaseModel):
+    charger_ids: Optional[List[str]] = None  # None: every connected charger
+    timeout_seconds: Optional[float] = None
+
+
+class BulkCommandResponse(BaseModel):
+    bulk_id: str
+    command: str
+    sent: int
+    accepted: int
+    results: Dict[str, str]  # charger_id -> status, "Timeout" or "NotConnected"
+    duration_ms: float
 
 
-ws_manager = ConnectionManager()
 
 
 # Database callback for OCPP events
 async def ocpp_db_callback(event_type: str, data: dict):
-    """Handle OCPP events and persist to database"""
-    async with async_session() as session:
-        if event_type == 'charger_connected':
-            # Update charger status in database
-            result = await session.execute(
-                select(Charger).where(Charger.charger_id == data['charger_id'])
-            )
-            charger = result.scalar_one_or_none()
-            if charger:
-                charger.status = 'Available'
-                charger.last_heartbeat = datetime.now(timezone.utc)
-                await session.commit()
-        
-        elif event_type == 'charger_disconnected':
-            result = await session.execute(
-                select(Charger).where(Charger.charger_id == data['charger_id'])
-            )
-            charger = result.scalar_one_or_none()
-            if charger:
-                charger.status = 'Unavailable'
-                await session.commit()
-        
-        elif event_type == 'transaction_started':
-            tx = OCPPTransaction(
-                id=str(uuid.uuid4()),
-                transaction_id=data['transaction_id'],
-                charger_id=data['charger_id'],
-                connector_id=data['connector_id'],
-                id_tag=data['id_tag'],
-                meter_start=data['meter_start'],
-                start_timestamp=data['start_timestamp'],
-                status='active'
-            )
-            session.add(tx)
-            
-            # Update charger status
-            result = await session.execute(
-                select(Charger).where(Charger.charger_id == data['charger_id'])
-            )
-            charger = result.scalar_one_or_none()
-            if charger:
-                charger.status = 'Charging'
-            
-            await session.commit()
-        
-        elif event_type == 'transaction_stopped':
-            # Query by transaction_id and charger_id to handle duplicate transaction IDs
-            result = await session.execute(
-                select(OCPPTransaction).where(
-                    OCPPTransaction.transaction_id == data['transaction_id'],
-                    OCPPTransaction.charger_id == data.get('charger_id'),
-                    OCPPTransaction.status == 'active'
-                )
-            )
-            tx = result.scalar_one_or_none()
-            if tx:
-                tx.meter_stop = data['meter_stop']
-                tx.stop_timestamp = data['stop_timestamp']
-                tx.status = 'completed'
-            
-            # Update charger status
-            result = await session.execute(
-                select(Charger).where(Charger.charger_id == data['charger_id'])
-            )
-            charger = result.scalar_one_or_none()
-            if charger:
-                charger.status = 'Available'
-            
-            # Deduct from RFID card balance if applicable
-            if data.get('id_tag'):
-                card_result = await session.execute(
-                    select(RFIDCard).where(RFIDCard.card_number == data['id_tag'])
-                )
-                card = card_result.scalar_one_or_none()
-                if card:
-                    energy_kwh = data.get('energy_kwh', 0)
-                    # Calculate cost (default 500 COP per kWh)
-                    cost = energy_kwh * 500
-                    card.balance = max(0, (card.balance or 0) - cost)
-            
-            await session.commit()
+    """Journal OCPP events for write-behind persistence and notify the frontend"""
+    # Returns as soon as the event is journaled; the flusher writes it to the database
+    await ocpp_journal.record(event_type, data)
     
-    # Broadcast to frontend websocket clients
-    await ws_manager.broadcast({
+    await publish_ocpp_event(event_type, data)
+
+
+async def ocpp_state_callback(charger_id: str, fields: dict):
+    """Live charger state (boot info, heartbeat, connector status); status and heartbeat are written coalesced"""
+    overall = fields.get('connector_id') in (None, 0)
+    charger_status.update(
+        charger_id,
+        status=fields.get('status') if overall else None,
+        heartbeat=fields.get('last_heartbeat')
+    )
+    await publish_ocpp_event('charger_state', {'charger_id': charger_id, **fields})
+
+
+async def publish_ocpp_event(event_type: str, data: dict):
+    message = {
         'event': event_type,
         'data': data,
         'timestamp': datetime.now(timezone.utc).isoformat()
-    })
+    }
+    if ocpp_gateway.multi_process:
+        # Frontends may be attached to any API process
+        ocpp_gateway.publish_event(message)
+    else:
+        await dispatch_ocpp_event(message)
+
+
+async def dispatch_ocpp_event(message: dict):
+    """Fold an OCPP event into the fleet state and queue it, with the charger's new state, for frontends"""
+    record = fleet_state.apply(message)
+    if record is not None:
+        message = {**message, 'version': fleet_state.version, 'state': record}
+    await ocpp_broadcaster.broadcast(message)
 
 
 # Set up database callback
 central_system.set_db_callback(ocpp_db_callback)
+central_system.set_state_callback(ocpp_state_callback)
+central_system.set_meter_callback(meter_store.add)
+central_system.set_transaction_id_allocator(transaction_ids.next_id)
+central_system.set_authorizer(rfid_auth.authorize, rfid_auth.local_list)
+
+# Background job progress goes to the same frontend stream
+job_runner.set_event_callback(publish_ocpp_event)
+
+# Chargers sent the local authorization list at the same time
+LOCAL_LIST_CONCURRENCY = 20
+
+# Bulk remote commands: chargers commanded at the same time, and how long each may take
+BULK_COMMAND_CONCURRENCY = 50
+BULK_COMMAND_TIMEOUT_SECONDS = 30.0
+MAX_BULK_COMMAND_TIMEOUT_SECONDS = 120.0
+MAX_BULK_COMMAND_CHARGERS = 5000
+
+# Replies counted as success by bulk commands
+ACCEPTED_STATUSES = ("Accepted", "Unlocked")
+
+# Most raw samples returned by one meter-values query
+MAX_RAW_METER_POINTS = 20000
+
+
+def fleet_response(request: Request, kind: str, build) -> Response:
+    """Fleet state rendered once per version; 304 when the client already has this version"""
+    etag = fleet_state.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    body = fleet_state.rendered(kind, build)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 # REST Endpoints
 @router.get("/status", response_model=OCPPStatusResponse)
-async def get_ocpp_status(current_user: UserResponse = Depends(get_current_user)):
-    """Get OCPP system status including WebSocket info"""
-    async with async_session() as session:
-        # Count active transactions from WebSocket
-        active_from_ws = len(central_system.get_active_transactions())
-        
-        # Also count from database
-        active_result = await session.execute(
-            select(func.count()).select_from(OCPPTransaction).where(
-                OCPPTransaction.status == "active"
-            )
-        )
-        active_from_db = active_result.scalar() or 0
-        
-        # Total boots
-        boots_result = await session.execute(
-            select(func.count()).select_from(OCPPBoot)
-        )
-        total_boots = boots_result.scalar() or 0
-        
-        # Total chargers in database
-        chargers_result = await session.execute(
-            select(func.count()).select_from(Charger)
-        )
-        total_chargers = chargers_result.scalar() or 0
-        
-        # Online chargers from WebSocket connections
-        online_chargers = central_system.get_online_chargers()
-        
-        return OCPPStatusResponse(
-            active_transactions=max(active_from_ws, active_from_db),
-            total_boots=total_boots,
-            online_chargers=online_chargers,
-            total_chargers=total_chargers,
-            websocket_port=9000,
-            websocket_url="ws://localhost:9000/ocpp/1.6/"
-        )
+async def get_ocpp_status(request: Request, current_user: UserResponse = Depends(get_current_user)):
+    """Get OCPP system status including WebSocket info (served from the fleet state, supports If-None-Match)"""
+    await fleet_state.ensure_loaded()
+    return fleet_response(
+        request, "status",
+        lambda: OCPPStatusResponse(**fleet_state.summary()).model_dump_json().encode()
+    )
 
 
 @router.get("/chargers/status", response_model=List[ChargerStatusResponse])
-async def get_chargers_status(current_user: UserResponse = Depends(get_current_user)):
-    """Get real-time status of all chargers"""
-    async with async_session() as session:
-        # Get all chargers from database
-        result = await session.execute(select(Charger))
-        chargers = result.scalars().all()
-        
-        response = []
-        for charger in chargers:
-            # Check if connected via WebSocket
-            ws_conn = central_system.get_connection(charger.charger_id)
-            
-            if ws_conn:
-                response.append(ChargerStatusResponse(
-                    charger_id=charger.charger_id,
-                    status=ws_conn.status,
-                    vendor=ws_conn.vendor,
-                    model=ws_conn.model,
-                    serial_number=ws_conn.serial_number,
-                    firmware_version=ws_conn.firmware_version,
-                    connected=True,
-                    last_heartbeat=ws_conn.last_heartbeat.isoformat() if ws_conn.last_heartbeat else None,
-                    connector_status=ws_conn.connector_status,
-                    active_transaction_id=ws_conn.active_transaction_id
-                ))
-            else:
-                response.append(ChargerStatusResponse(
-                    charger_id=charger.charger_id,
-                    status=charger.status or "Unavailable",
-                    connected=False,
-                    last_heartbeat=charger.last_heartbeat.isoformat() if charger.last_heartbeat else None
-                ))
-        
-        return response
+async def get_chargers_status(request: Request, current_user: UserResponse = Depends(get_current_user)):
+    """Get real-time status of all registered chargers (served from the fleet state, supports If-None-Match)"""
+    await fleet_state.ensure_loaded()
+    return fleet_response(
+        request, "chargers",
+        lambda: json.dumps([
+            ChargerStatusResponse(**record).model_dump(mode="json")
+            for record in fleet_state.registered_chargers()
+        ]).encode()
+    )
 
 
 @router.get("/active-transactions", response_model=List[ActiveTransactionResponse])
@@ -314,6 +271,120 @@ async def get_active_transactions(current_user: UserResponse = Depends(get_curre
         ]
 
 
+@router.get("/journal")
+async def get_journal_stats(current_user: UserResponse = Depends(require_role("admin"))):
+    """Write-behind journal backlog and flush counters (Admin only)"""
+    return ocpp_journal.stats()
+
+
+@router.get("/charger-status")
+async def get_charger_status_stats(current_user: UserResponse = Depends(require_role("admin"))):
+    """Coalesced heartbeat/status writes: updates received vs rows written (Admin only)"""
+    return charger_status.stats()
+
+
+@router.get("/sessions/{transaction_id}/meter-values", response_model=MeterSeriesResponse)
+async def get_session_meter_values(
+    transaction_id: int,
+    resolution: str = "1m",
+    measurand: Optional[str] = None,
+    charger_id: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Energy/power curve of a charging session: raw samples or 1m / 15m rollups"""
+    if resolution != "raw" and resolution not in ROLLUP_RESOLUTIONS:
+        raise HTTPException(status_code=400, detail="resolution must be raw, 1m or 15m")
+    
+    async with async_session() as session:
+        if resolution == "raw":
+            query = select(MeterSample).where(MeterSample.transaction_id == transaction_id)
+            if measurand:
+                query = query.where(MeterSample.measurand == measurand)
+            if charger_id:
+                query = query.where(MeterSample.charger_id == charger_id)
+            result = await session.execute(
+                query.order_by(MeterSample.sampled_at).limit(MAX_RAW_METER_POINTS)
+            )
+            points = [
+                MeterValuePoint(
+                    timestamp=s.sampled_at.isoformat(),
+                    measurand=s.measurand,
+                    phase=s.phase or "",
+                    unit=s.unit,
+                    value=s.value
+                )
+                for s in result.scalars().all()
+            ]
+        else:
+            query = select(MeterRollup).where(
+                MeterRollup.transaction_id == transaction_id,
+                MeterRollup.resolution == ROLLUP_RESOLUTIONS[resolution]
+            )
+            if measurand:
+                query = query.where(MeterRollup.measurand == measurand)
+            if charger_id:
+                query = query.where(MeterRollup.charger_id == charger_id)
+            result = await session.execute(query.order_by(MeterRollup.bucket_start, MeterRollup.measurand))
+            points = [
+                MeterValuePoint(
+                    timestamp=r.bucket_start.isoformat(),
+                    measurand=r.measurand,
+                    phase=r.phase or "",
+                    unit=r.unit,
+                    value=r.value_sum / r.samples if r.samples else 0,
+                    min=r.value_min,
+                    max=r.value_max,
+                    last=r.value_last,
+                    samples=r.samples
+                )
+                for r in result.scalars().all()
+            ]
+    
+    return MeterSeriesResponse(transaction_id=transaction_id, resolution=resolution, points=points)
+
+
+@router.get("/gateway")
+async def get_gateway_stats(current_user: UserResponse = Depends(require_role("admin"))):
+    """Gateway mode, registry and command routing counters for this process (Admin only)"""
+    return ocpp_gateway.stats()
+
+
+@router.get("/authorization")
+async def get_authorization_stats(current_user: UserResponse = Depends(require_role("admin"))):
+    """RFID authorization index size and hit counters for this process (Admin only)"""
+    return rfid_auth.stats()
+
+
+@router.get("/broadcaster")
+async def get_broadcaster_stats(current_user: UserResponse = Depends(require_role("admin"))):
+    """Frontend WebSocket clients and queue counters for this process (Admin only)"""
+    return ocpp_broadcaster.stats()
+
+
+@router.get("/fleet")
+async def get_fleet_stats(current_user: UserResponse = Depends(require_role("admin"))):
+    """Fleet state version and counters for this process (Admin only)"""
+    return fleet_state.stats()
+
+
+@router.get("/meter-values/stats")
+async def get_meter_value_stats(current_user: UserResponse = Depends(require_role("admin"))):
+    """Meter sample buffer and flush counters (Admin only)"""
+    return meter_store.stats()
+
+
+def boot_to_response(b: OCPPBoot) -> BootNotificationResponse:
+    return BootNotificationResponse(
+        id=b.id,
+        vendor=b.vendor or "",
+        model=b.model or "",
+        serial=b.serial or "",
+        firmware=b.firmware,
+        timestamp=b.timestamp.isoformat() if b.timestamp else "",
+        status=b.status or "Accepted"
+    )
+
+
 @router.get("/boots", response_model=List[BootNotificationResponse])
 async def get_boot_notifications(
     limit: int = 50,
@@ -326,21 +397,43 @@ async def get_boot_notifications(
         )
         boots = result.scalars().all()
         
-        return [
-            BootNotificationResponse(
-                id=b.id,
-                vendor=b.vendor or "",
-                model=b.model or "",
-                serial=b.serial or "",
-                firmware=b.firmware,
-                timestamp=b.timestamp.isoformat() if b.timestamp else "",
-                status=b.status or "Accepted"
-            )
-            for b in boots
-        ]
+        return [boot_to_response(b) for b in boots]
+
+
+@router.get("/boots/page", response_model=BootNotificationPage)
+async def get_boot_notifications_page(
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    include_total: bool = False,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Cursor-paginated boot notifications, newest first"""
+    limit = max(1, min(limit, 1000))
+    
+    async with async_session() as session:
+        page, next_cursor = await fetch_page(
+            session, select(OCPPBoot), OCPPBoot.timestamp, OCPPBoot.id, cursor, limit, "timestamp"
+        )
+        
+        total = None
+        if include_total:
+            total = await estimate_total(session, OCPPBoot, [])
+        
+        return BootNotificationPage(
+            boots=[boot_to_response(b) for b in page],
+            next_cursor=next_cursor,
+            total_estimate=total
+        )
 
 
 # Remote Control Endpoints
+async def send_charger_command(charger_id: str, command: str, **args) -> str:
+    """Run a command locally when this process holds the charger, otherwise on the owning gateway worker"""
+    if central_system.get_connection(charger_id):
+        return await central_system.execute_command(charger_id, command, args)
+    return await ocpp_gateway.send_command(charger_id, command, args)
+
+
 @router.post("/remote-start/{charger_id}", response_model=RemoteCommandResponse)
 async def remote_start_transaction(
     charger_id: str,
@@ -348,9 +441,11 @@ async def remote_start_transaction(
     current_user: UserResponse = Depends(require_role("admin"))
 ):
     """Send RemoteStartTransaction command to charger"""
-    conn = central_system.get_connection(charger_id)
+    status = await send_charger_command(
+        charger_id, "remote_start", connector_id=request.connector_id, id_tag=request.id_tag
+    )
     
-    if not conn:
+    if status == NOT_CONNECTED:
         # Check if charger exists but not connected
         async with async_session() as session:
             result = await session.execute(
@@ -366,12 +461,6 @@ async def remote_start_transaction(
                 message=f"Charger {charger_id} is not connected via WebSocket"
             )
     
-    status = await central_system.remote_start_transaction(
-        charger_id=charger_id,
-        connector_id=request.connector_id,
-        id_tag=request.id_tag
-    )
-    
     return RemoteCommandResponse(
         status=status,
         message=f"RemoteStartTransaction {'sent successfully' if status == 'Accepted' else 'rejected'}"
@@ -384,19 +473,14 @@ async def remote_stop_transaction(
     current_user: UserResponse = Depends(require_role("admin"))
 ):
     """Send RemoteStopTransaction command to charger"""
-    conn = central_system.get_connection(charger_id)
+    status = await send_charger_command(charger_id, "remote_stop")
     
-    if not conn:
+    if status == NOT_CONNECTED:
         raise HTTPException(status_code=400, detail="Charger not connected via WebSocket")
     
-    if not conn.active_transaction_id:
+    if status == "NoActiveTransaction":
         raise HTTPException(status_code=400, detail="No active transaction on this charger")
     
-    status = await central_system.remote_stop_transaction(
-        charger_id=charger_id,
-        transaction_id=conn.active_transaction_id
-    )
-    
     return RemoteCommandResponse(
         status=status,
         message=f"RemoteStopTransaction {'sent successfully' if status == 'Accepted' else 'rejected'}"
@@ -413,13 +497,11 @@ async def reset_charger(
     if reset_type not in ["Soft", "Hard"]:
         raise HTTPException(status_code=400, detail="Invalid reset type. Use 'Soft' or 'Hard'")
     
-    conn = central_system.get_connection(charger_id)
+    status = await send_charger_command(charger_id, "reset", reset_type=reset_type)
     
-    if not conn:
+    if status == NOT_CONNECTED:
         raise HTTPException(status_code=400, detail="Charger not connected via WebSocket")
     
-    status = await central_system.reset_charger(charger_id, reset_type)
-    
     return RemoteCommandResponse(
         status=status,
         message=f"{reset_type} reset {'sent successfully' if status == 'Accepted' else 'rejected'}"
@@ -433,13 +515,11 @@ async def unlock_connector(
     current_user: UserResponse = Depends(require_role("admin"))
 ):
     """Send UnlockConnector command to charger"""
-    conn = central_system.get_connection(charger_id)
+    status = await send_charger_command(charger_id, "unlock", connector_id=connector_id)
     
-    if not conn:
+    if status == NOT_CONNECTED:
         raise HTTPException(status_code=400, detail="Charger not connected via WebSocket")
     
-    status = await central_system.unlock_connector(charger_id, connector_id)
-    
     return RemoteCommandResponse(
         status=status,
         message=f"UnlockConnector {'sent successfully' if status == 'Unlocked' else 'failed'}"
@@ -457,19 +537,167 @@ async def change_availability(
     if availability_type not in ["Operative", "Inoperative"]:
         raise HTTPException(status_code=400, detail="Invalid type. Use 'Operative' or 'Inoperative'")
     
-    conn = central_system.get_connection(charger_id)
+    status = await send_charger_command(
+        charger_id, "availability", connector_id=connector_id, availability_type=availability_type
+    )
     
-    if not conn:
+    if status == NOT_CONNECTED:
         raise HTTPException(status_code=400, detail="Charger not connected via WebSocket")
     
-    status = await central_system.change_availability(charger_id, connector_id, availability_type)
-    
     return RemoteCommandResponse(
         status=status,
         message=f"ChangeAvailability {'accepted' if status == 'Accepted' else 'rejected or scheduled'}"
     )
 
 
+
+async def connected_charger_ids() -> List[str]:
+    """Chargers connected to this process or, in gateway mode, to any worker"""
+    charger_ids = set(central_system.connections)
+    if ocpp_gateway.multi_process:
+        charger_ids |= await ocpp_gateway.connected_chargers()
+    return sorted(charger_ids)
+
+
+async def run_bulk_command(
+    command: str,
+    charger_ids: List[str],
+    args: dict,
+    concurrency: int = BULK_COMMAND_CONCURRENCY,
+    timeout: float = BULK_COMMAND_TIMEOUT_SECONDS
+) -> BulkCommandResponse:
+    """
+    Send one command to many chargers, at most `concurrency` at a time and each
+    bounded by `timeout`. Progress is published as bulk_command_* events on /ocpp/ws.
+    """
+    bulk_id = str(uuid.uuid4())
+    total = len(charger_ids)
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    results: Dict[str, str] = {}
+    
+    await publish_ocpp_event('bulk_command_started', {
+        'bulk_id': bulk_id, 'command': command, 'total': total
+    })
+    
+    async def send(target: str):
+        async with semaphore:
+            try:
+                status = await asyncio.wait_for(send_charger_command(target, command, **args), timeout=timeout)
+            except asyncio.TimeoutError:
+                status = "Timeout"
+            except Exception:
+                status = "Rejected"
+        results[target] = status
+        await publish_ocpp_event('bulk_command_progress', {
+            'bulk_id': bulk_id, 'command': command, 'charger_id': target,
+            'status': status, 'done': len(results), 'total': total
+        })
+    
+    await asyncio.gather(*(send(target) for target in charger_ids))
+    
+    response = BulkCommandResponse(
+        bulk_id=bulk_id,
+        command=command,
+        sent=total,
+        accepted=sum(1 for status in results.values() if status in ACCEPTED_STATUSES),
+        results={target: results[target] for target in charger_ids},
+        duration_ms=round((time.perf_counter() - started) * 1000, 2)
+    )
+    await publish_ocpp_event('bulk_command_completed', {
+        'bulk_id': bulk_id, 'command': command, 'total': total, 'accepted': response.accepted,
+        'duration_ms': response.duration_ms
+    })
+    return response
+
+
+async def bulk_targets(request: BulkCommandRequest) -> List[str]:
+    """Validate a bulk request; no charger list means every connected charger"""
+    if request.timeout_seconds is not None and not 0 < request.timeout_seconds <= MAX_BULK_COMMAND_TIMEOUT_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"timeout_seconds must be between 0 and {MAX_BULK_COMMAND_TIMEOUT_SECONDS:g}"
+        )
+    if request.charger_ids is None:
+        return await connected_charger_ids()
+    charger_ids = list(dict.fromkeys(request.charger_ids))
+    if not charger_ids:
+        raise HTTPException(status_code=400, detail="charger_ids is empty")
+    if len(charger_ids) > MAX_BULK_COMMAND_CHARGERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_COMMAND_CHARGERS} chargers per request")
+    return charger_ids
+
+
+def bulk_timeout(request: BulkCommandRequest) -> float:
+    return request.timeout_seconds or BULK_COMMAND_TIMEOUT_SECONDS
+
+
+@router.post("/bulk/reset", response_model=BulkCommandResponse)
+async def bulk_reset(
+    request: BulkCommandRequest = BulkCommandRequest(),
+    reset_type: str = "Soft",
+    current_user: UserResponse = Depends(require_role("admin"))
+):
+    """Send Reset to many chargers concurrently (Admin only)"""
+    if reset_type not in ["Soft", "Hard"]:
+        raise HTTPException(status_code=400, detail="Invalid reset type. Use 'Soft' or 'Hard'")
+    charger_ids = await bulk_targets(request)
+    return await run_bulk_command("reset", charger_ids, {"reset_type": reset_type}, timeout=bulk_timeout(request))
+
+
+@router.post("/bulk/availability", response_model=BulkCommandResponse)
+async def bulk_change_availability(
+    request: BulkCommandRequest = BulkCommandRequest(),
+    connector_id: int = 0,
+    availability_type: str = "Operative",
+    current_user: UserResponse = Depends(require_role("admin"))
+):
+    """Send ChangeAvailability to many chargers concurrently (Admin only)"""
+    if availability_type not in ["Operative", "Inoperative"]:
+        raise HTTPException(status_code=400, detail="Invalid type. Use 'Operative' or 'Inoperative'")
+    charger_ids = await bulk_targets(request)
+    return await run_bulk_command(
+        "availability", charger_ids,
+        {"connector_id": connector_id, "availability_type": availability_type},
+        timeout=bulk_timeout(request)
+    )
+
+
+@router.post("/bulk/unlock", response_model=BulkCommandResponse)
+async def bulk_unlock_connector(
+    request: BulkCommandRequest = BulkCommandRequest(),
+    connector_id: int = 1,
+    current_user: UserResponse = Depends(require_role("admin"))
+):
+    """Send UnlockConnector to many chargers concurrently (Admin only)"""
+    charger_ids = await bulk_targets(request)
+    return await run_bulk_command("unlock", charger_ids, {"connector_id": connector_id}, timeout=bulk_timeout(request))
+
+
+@router.post("/bulk/remote-stop", response_model=BulkCommandResponse)
+async def bulk_remote_stop(
+    request: BulkCommandRequest = BulkCommandRequest(),
+    current_user: UserResponse = Depends(require_role("admin"))
+):
+    """Send RemoteStopTransaction for the active session of many chargers concurrently (Admin only)"""
+    charger_ids = await bulk_targets(request)
+    return await run_bulk_command("remote_stop", charger_ids, {}, timeout=bulk_timeout(request))
+
+
+@router.post("/local-list", response_model=LocalListResponse)
+async def push_local_list(
+    charger_id: Optional[str] = None,
+    current_user: UserResponse = Depends(require_role("admin"))
+):
+    """Send the RFID local authorization list to one charger, or to every connected charger (Admin only)"""
+    charger_ids = [charger_id] if charger_id else await connected_charger_ids()
+    bulk = await run_bulk_command("local_list", charger_ids, {}, concurrency=LOCAL_LIST_CONCURRENCY)
+    if charger_id and bulk.results[charger_id] == NOT_CONNECTED:
+        raise HTTPException(status_code=400, detail="Charger not connected via WebSocket")
+    
+    return LocalListResponse(sent=bulk.sent, accepted=bulk.accepted, results=bulk.results)
+
+
 # OCPP Simulation endpoints (for testing without real chargers)
 @router.post("/simulate/boot")
 async def simulate_boot_notification(
@@ -499,6 +727,7 @@ async def simulate_boot_notification(
             charger.last_heartbeat = datetime.now(timezone.utc)
         
         await session.commit()
+    fleet_state.invalidate()
     
     return {
         "status": "Accepted",
@@ -516,14 +745,10 @@ async def simulate_start_transaction(
     current_user: UserResponse = Depends(require_role("admin"))
 ):
     """Simulate a StartTransaction (for testing)"""
+    # Same id source as real chargers, so simulated ids never collide with them
+    transaction_id = await transaction_ids.next_id()
+    
     async with async_session() as session:
-        # Get max transaction ID
-        result = await session.execute(
-            select(func.max(OCPPTransaction.transaction_id))
-        )
-        max_id = result.scalar() or 0
-        transaction_id = max_id + 1
-        
         tx = OCPPTransaction(
             id=str(uuid.uuid4()),
             transaction_id=transaction_id,
@@ -545,6 +770,7 @@ async def simulate_start_transaction(
             charger.status = "Charging"
         
         await session.commit()
+        fleet_state.invalidate()
         
         return {
             "idTagInfo": {"status": "Accepted"},
@@ -585,6 +811,7 @@ async def simulate_stop_transaction(
             charger.status = "Available"
         
         await session.commit()
+        fleet_state.invalidate()
         
         return {
             "idTagInfo": {"status": "Accepted"}
@@ -593,31 +820,58 @@ async def simulate_stop_transaction(
 
 # WebSocket endpoint for frontend real-time updates
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket for real-time OCPP updates to frontend"""
-    await ws_manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, chargers: Optional[str] = None, events: Optional[str] = None):
+    """
+    WebSocket for real-time OCPP updates to frontend.
+    Optional comma-separated `chargers` / `events` limit what the client receives.
+    """
+    client = await ocpp_broadcaster.connect(websocket, chargers=chargers, events=events)
     try:
+        # Current state first; later messages carry `version` and the charger's new `state`
+        await fleet_state.ensure_loaded()
+        ocpp_broadcaster.reply(client, fleet_state.snapshot(client.chargers))
+        
         while True:
             # Keep connection alive and handle any incoming messages
             data = await websocket.receive_text()
             
             # Handle ping/pong or other commands
             if data == "ping":
-                await websocket.send_text("pong")
+                ocpp_broadcaster.reply(client, "pong")
             elif data == "status":
                 # Send current status
-                connections = central_system.get_all_connections()
-                await websocket.send_json({
+                live = [record for record in fleet_state.snapshot()["chargers"] if record["connected"]]
+                ocpp_broadcaster.reply(client, {
                     "event": "status",
-                    "online_chargers": len(connections),
+                    "version": fleet_state.version,
+                    "online_chargers": len(live),
                     "chargers": [
                         {
-                            "charger_id": cid,
-                            "status": conn.status,
+                            "charger_id": record["charger_id"],
+                            "status": record["status"],
                             "connected": True
                         }
-                        for cid, conn in connections.items()
+                        for record in live
                     ]
                 })
+            elif data.startswith("{"):
+                try:
+                    command = json.loads(data)
+                except ValueError:
+                    continue
+                if command.get("action") == "subscribe":
+                    client.subscribe(command.get("chargers"), command.get("events"))
+                elif command.get("action") == "unsubscribe":
+                    client.subscribe()
+                else:
+                    continue
+                ocpp_broadcaster.reply(client, {
+                    "event": "subscribed",
+                    "chargers": sorted(client.chargers) if client.chargers is not None else None,
+                    "events": sorted(client.events) if client.events is not None else None
+                })
+                ocpp_broadcaster.reply(client, fleet_state.snapshot(client.chargers))
     except WebSocketDisconnect:
-        ws_manager.disconnect(websocket)
+        pass
+    finally:
+        ocpp_broadcaster.disconnect(client)
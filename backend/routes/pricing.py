@@ -11,6 +11,8 @@ from sqlalchemy import select, delete, func
 from database import async_session, PricingRule, PricingGroup, User
 
 from routes.auth import get_current_user, require_role, UserResponse
+from services.pricing import pricing_resolver
+from services.user_cache import user_cache
 
 router = APIRouter(tags=["Pricing"])
 
@@ -120,6 +122,8 @@ async def create_pricing_rule(
             await session.commit()
             await session.refresh(rule)
         
+        pricing_resolver.invalidate()
+        
         return PricingRuleResponse(
             id=rule.id,
             account=rule.account,
@@ -141,6 +145,7 @@ async def delete_pricing_rule(
             delete(PricingRule).where(PricingRule.id == pricing_id)
         )
         await session.commit()
+        pricing_resolver.invalidate()
         
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Pricing rule not found")
@@ -148,6 +153,12 @@ async def delete_pricing_rule(
         return {"message": "Pricing rule deleted successfully"}
 
 
+@router.get("/pricing/cache-stats")
+async def get_pricing_cache_stats(current_user: UserResponse = Depends(require_role("admin"))):
+    """Hit/miss counters of the in-memory pricing resolver"""
+    return pricing_resolver.stats()
+
+
 # Pricing Groups Routes
 @router.get("/pricing-groups", response_model=List[PricingGroupResponse])
 async def get_pricing_groups(current_user: UserResponse = Depends(require_role("admin"))):
@@ -233,6 +244,7 @@ async def create_pricing_group(
         session.add(group)
         await session.commit()
         await session.refresh(group)
+        pricing_resolver.invalidate()
         
         return PricingGroupResponse(
             id=group.id,
@@ -283,6 +295,7 @@ async def update_pricing_group(
         
         await session.commit()
         await session.refresh(group)
+        pricing_resolver.invalidate()
         
         count_result = await session.execute(
             select(func.count()).select_from(User).where(User.pricing_group_id == group_id)
@@ -323,6 +336,7 @@ async def delete_pricing_group(
             delete(PricingGroup).where(PricingGroup.id == group_id)
         )
         await session.commit()
+        pricing_resolver.invalidate()
         
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Pricing group not found")
@@ -379,6 +393,8 @@ async def assign_user_to_group(
         
         user.pricing_group_id = group_id
         await session.commit()
+        pricing_resolver.invalidate()
+        user_cache.invalidate(user_id)
         
         return {"message": f"User assigned to group '{group.name}'"}
 
@@ -401,5 +417,7 @@ async def remove_user_from_group(
         
         user.pricing_group_id = None
         await session.commit()
+        pricing_resolver.invalidate()
+        user_cache.invalidate(user_id)
         
         return {"message": "User removed from group"}
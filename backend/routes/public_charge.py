@@ -14,6 +14,8 @@ import time
 
 from sqlalchemy import select
 from database import async_session, Charger, Transaction, Settings, BoldPayment, BoldWebhookLog
+from services.rollups import apply_rollup_delta, transaction_snapshot
+from services.timestamps import format_timestamp
 
 router = APIRouter(prefix="/public", tags=["Public Charging"])
 
@@ -171,6 +173,27 @@ async def get_bold_payment_status(api_key: str, payment_link_id: str) -> dict:
             return {"status": "UNKNOWN"}
 
 
+async def set_payment_status(session, tx: Transaction, new_status: str) -> bool:
+    """
+    Set a transaction's payment status and move it between rollup buckets.
+    The row is re-read FOR UPDATE first, so a webhook and a status poll racing
+    on the same session cannot both subtract the same before-state. Returns
+    False when the status was already `new_status`.
+    """
+    await session.execute(
+        select(Transaction).where(Transaction.id == tx.id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    if tx.payment_status == new_status:
+        return False
+    
+    before = transaction_snapshot(tx)
+    tx.payment_status = new_status
+    await apply_rollup_delta(session, added=[tx], removed=[before])
+    return True
+
+
 @router.get("/charger/{charger_id}", response_model=ChargerInfo)
 async def get_charger_info(charger_id: str):
     """Get charger information for QR code page (no auth required)"""
@@ -246,8 +269,8 @@ async def start_charge_session(request: StartChargeRequest):
             station=request.charger_id,
             connector=request.connector_type,
             account=request.email or request.phone or request.placa or "QR-Guest",
-            start_time=datetime.now(timezone.utc).isoformat(),
-            end_time="",
+            start_time=datetime.now(timezone.utc),
+            end_time=None,
             meter_value=0,
             charging_duration="",
             cost=request.amount,
@@ -255,6 +278,7 @@ async def start_charge_session(request: StartChargeRequest):
         )
         
         session.add(new_tx)
+        await apply_rollup_delta(session, added=[new_tx])
         
         # Get BOLD settings and create payment link
         bold_settings = await get_bold_settings()
@@ -291,7 +315,7 @@ async def start_charge_session(request: StartChargeRequest):
                     status="ACTIVE"
                 )
                 session.add(bold_payment)
-                
+            
             except HTTPException as e:
                 # Log error but don't fail - session is created even without payment link
                 print(f"BOLD payment link creation failed: {e.detail}")
@@ -355,7 +379,7 @@ async def get_session_status(session_id: str):
                         new_status = status_mapping.get(bold_status_value, "PENDING")
                         
                         if new_status != tx.payment_status:
-                            tx.payment_status = new_status
+                            await set_payment_status(session, tx, new_status)
                             bold_payment.status = bold_status_value
                             bold_payment.bold_response = bold_status
                             await session.commit()
@@ -368,8 +392,8 @@ async def get_session_status(session_id: str):
             "connector_type": tx.connector,
             "amount": tx.cost,
             "payment_status": tx.payment_status,
-            "start_time": tx.start_time,
-            "end_time": tx.end_time,
+            "start_time": format_timestamp(tx.start_time),
+            "end_time": format_timestamp(tx.end_time),
             "meter_value": tx.meter_value
         }
 
@@ -386,7 +410,7 @@ async def confirm_payment(session_id: str):
         if not tx:
             raise HTTPException(status_code=404, detail="Session not found")
         
-        tx.payment_status = "PAID"
+        await set_payment_status(session, tx, "PAID")
         await session.commit()
         
         return {
@@ -441,7 +465,7 @@ async def bold_webhook(request: Request):
                     "PROCESSING": "PENDING"
                 }
                 new_status = status_mapping.get(status, tx.payment_status)
-                tx.payment_status = new_status
+                await set_payment_status(session, tx, new_status)
             
             # Update BOLD payment record
             bold_result = await session.execute(
@@ -503,7 +527,7 @@ async def bold_callback(request: Request):
                             
                             bold_status_value = bold_status.get("status", "ACTIVE")
                             if bold_status_value in status_mapping:
-                                tx.payment_status = status_mapping[bold_status_value]
+                                await set_payment_status(session, tx, status_mapping[bold_status_value])
                                 bold_payment.status = bold_status_value
                                 bold_payment.bold_response = bold_status
                                 await session.commit()
@@ -11,9 +11,15 @@ import io
 
 from database import async_session, Transaction
 from routes.auth import UserResponse, get_current_user
+from services.reporting import build_report_conditions, run_report_aggregates, sample_query
+from services.pagination import fetch_page
+from services.timestamps import format_timestamp
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
+# Transactions returned with a generated report (first page)
+REPORT_SAMPLE_SIZE = 100
+
 
 class ReportFilters(BaseModel):
     start_date: Optional[str] = None
@@ -75,6 +81,60 @@ class ReportResponse(BaseModel):
     by_payment_type: List[GroupedData]
     daily_trend: List[DailyData]
     transactions: List[TransactionData]
+    next_cursor: Optional[str] = None
+
+
+class ReportTransactionsPage(BaseModel):
+    transactions: List[TransactionData]
+    next_cursor: Optional[str] = None
+
+
+def transaction_to_data(tx: Transaction) -> TransactionData:
+    return TransactionData(
+        id=tx.id,
+        tx_id=tx.tx_id or "",
+        station=tx.station or "",
+        connector=tx.connector,
+        connector_type=tx.connector_type,
+        account=tx.account or "",
+        start_time=format_timestamp(tx.start_time),
+        end_time=format_timestamp(tx.end_time),
+        charging_duration=tx.charging_duration,
+        meter_value=round(tx.meter_value or 0, 2),
+        cost=round(tx.cost or 0, 2),
+        payment_status=tx.payment_status or "UNPAID",
+        payment_type=tx.payment_type,
+        payment_date=tx.payment_date
+    )
+
+
+def grouped(rows: List[dict], limit: Optional[int] = None) -> List[GroupedData]:
+    """Top groups by revenue"""
+    ranked = sorted(rows, key=lambda r: r["revenue"], reverse=True)
+    if limit:
+        ranked = ranked[:limit]
+    return [
+        GroupedData(
+            name=r["name"],
+            transactions=r["transactions"],
+            energy=round(r["energy"], 2),
+            revenue=round(r["revenue"], 2)
+        )
+        for r in ranked
+    ]
+
+
+async def fetch_transactions_page(
+    session, conditions: list, cursor: Optional[str], limit: int
+) -> ReportTransactionsPage:
+    """Keyset-paginated slice of the transactions matching a report"""
+    page, next_cursor = await fetch_page(
+        session, sample_query(conditions), Transaction.start_time, Transaction.id, cursor, limit, "start_time"
+    )
+    return ReportTransactionsPage(
+        transactions=[transaction_to_data(tx) for tx in page],
+        next_cursor=next_cursor
+    )
 
 
 @router.post("/generate", response_model=ReportResponse)
@@ -82,212 +142,106 @@ async def generate_report(
     filters: ReportFilters,
     current_user: UserResponse = Depends(get_current_user)
 ):
-    """Generate a comprehensive report with filters"""
+    """
+    Generate a comprehensive report with filters.
+    Totals and groupings are exact over the whole filtered range; the
+    transaction list is the first page of /reports/transactions.
+    """
     try:
-        async with async_session() as session:
-            # Build query with filters
-            query = select(Transaction)
-            conditions = []
-            
-            # Date filters
-            if filters.start_date:
-                conditions.append(Transaction.start_time >= filters.start_date)
-            
-            if filters.end_date:
-                conditions.append(Transaction.start_time <= filters.end_date + "T23:59:59")
-            
-            if filters.account:
-                conditions.append(Transaction.account.ilike(f"%{filters.account}%"))
-            
-            if filters.station:
-                conditions.append(Transaction.station.ilike(f"%{filters.station}%"))
-            
-            if filters.connector_type:
-                conditions.append(
-                    (Transaction.connector == filters.connector_type) |
-                    (Transaction.connector_type == filters.connector_type)
-                )
-            
-            if filters.payment_type:
-                conditions.append(Transaction.payment_type == filters.payment_type)
-            
-            if filters.payment_status:
-                conditions.append(Transaction.payment_status == filters.payment_status)
-            
-            if conditions:
-                query = query.where(and_(*conditions))
-            
-            # Limit for performance
-            query = query.order_by(Transaction.start_time.desc()).limit(2000)
-            
-            result = await session.execute(query)
-            transactions = result.scalars().all()
+        conditions = build_report_conditions(filters)
         
-        if not transactions:
-            return ReportResponse(
-                summary=SummaryData(
-                    total_transactions=0, total_energy=0, total_revenue=0,
-                    paid_transactions=0, paid_revenue=0, unpaid_revenue=0,
-                    avg_session_energy=0, avg_session_revenue=0
-                ),
-                by_account=[], by_station=[], by_connector=[],
-                by_payment_type=[], daily_trend=[], transactions=[]
-            )
+        async with async_session() as session:
+            report = await run_report_aggregates(session, conditions)
+            sample = await fetch_transactions_page(session, conditions, None, REPORT_SAMPLE_SIZE)
         
-        # Calculate summary
-        total_revenue = sum(tx.cost or 0 for tx in transactions)
-        total_energy = sum(tx.meter_value or 0 for tx in transactions)
-        paid_txs = [tx for tx in transactions if tx.payment_status == "PAID"]
-        paid_revenue = sum(tx.cost or 0 for tx in paid_txs)
-        unpaid_revenue = total_revenue - paid_revenue
+        totals = report["summary"]
+        total_transactions = int(totals["transactions"])
+        total_energy = float(totals["energy"])
+        total_revenue = float(totals["revenue"])
+        paid_revenue = float(totals["paid_revenue"])
         
         summary = SummaryData(
-            total_transactions=len(transactions),
+            total_transactions=total_transactions,
             total_energy=round(total_energy, 2),
             total_revenue=round(total_revenue, 2),
-            paid_transactions=len(paid_txs),
+            paid_transactions=int(totals["paid_transactions"]),
             paid_revenue=round(paid_revenue, 2),
-            unpaid_revenue=round(unpaid_revenue, 2),
-            avg_session_energy=round(total_energy / len(transactions), 2) if transactions else 0,
-            avg_session_revenue=round(total_revenue / len(transactions), 2) if transactions else 0
+            unpaid_revenue=round(total_revenue - paid_revenue, 2),
+            avg_session_energy=round(total_energy / total_transactions, 2) if total_transactions else 0,
+            avg_session_revenue=round(total_revenue / total_transactions, 2) if total_transactions else 0
         )
         
-        # Group by account
-        account_data = {}
-        for tx in transactions:
-            key = tx.account or "Unknown"
-            if key not in account_data:
-                account_data[key] = {"transactions": 0, "energy": 0, "revenue": 0}
-            account_data[key]["transactions"] += 1
-            account_data[key]["energy"] += tx.meter_value or 0
-            account_data[key]["revenue"] += tx.cost or 0
-        
-        by_account = sorted([
-            GroupedData(name=k, **{kk: round(vv, 2) if isinstance(vv, float) else vv for kk, vv in v.items()})
-            for k, v in account_data.items()
-        ], key=lambda x: x.revenue, reverse=True)[:15]
-        
-        # Group by station
-        station_data = {}
-        for tx in transactions:
-            key = tx.station or "Unknown"
-            if key not in station_data:
-                station_data[key] = {"transactions": 0, "energy": 0, "revenue": 0}
-            station_data[key]["transactions"] += 1
-            station_data[key]["energy"] += tx.meter_value or 0
-            station_data[key]["revenue"] += tx.cost or 0
-        
-        by_station = sorted([
-            GroupedData(name=k, **{kk: round(vv, 2) if isinstance(vv, float) else vv for kk, vv in v.items()})
-            for k, v in station_data.items()
-        ], key=lambda x: x.revenue, reverse=True)[:15]
-        
-        # Group by connector type
-        connector_data = {}
-        for tx in transactions:
-            key = tx.connector_type or tx.connector or "Unknown"
-            if key not in connector_data:
-                connector_data[key] = {"transactions": 0, "energy": 0, "revenue": 0}
-            connector_data[key]["transactions"] += 1
-            connector_data[key]["energy"] += tx.meter_value or 0
-            connector_data[key]["revenue"] += tx.cost or 0
-        
-        by_connector = sorted([
-            GroupedData(name=k, **{kk: round(vv, 2) if isinstance(vv, float) else vv for kk, vv in v.items()})
-            for k, v in connector_data.items()
-        ], key=lambda x: x.revenue, reverse=True)
-        
-        # Group by payment type
-        payment_type_data = {}
-        for tx in transactions:
-            key = tx.payment_type or "Not Specified"
-            if key not in payment_type_data:
-                payment_type_data[key] = {"transactions": 0, "energy": 0, "revenue": 0}
-            payment_type_data[key]["transactions"] += 1
-            payment_type_data[key]["energy"] += tx.meter_value or 0
-            payment_type_data[key]["revenue"] += tx.cost or 0
-        
-        by_payment_type = sorted([
-            GroupedData(name=k, **{kk: round(vv, 2) if isinstance(vv, float) else vv for kk, vv in v.items()})
-            for k, v in payment_type_data.items()
-        ], key=lambda x: x.revenue, reverse=True)
-        
-        # Daily trend
-        daily_data = {}
-        for tx in transactions:
-            if tx.start_time:
-                date_key = tx.start_time[:10]  # YYYY-MM-DD
-                if date_key not in daily_data:
-                    daily_data[date_key] = {"transactions": 0, "energy": 0, "revenue": 0}
-                daily_data[date_key]["transactions"] += 1
-                daily_data[date_key]["energy"] += tx.meter_value or 0
-                daily_data[date_key]["revenue"] += tx.cost or 0
-        
-        daily_trend = sorted([
-            DailyData(date=k, **{kk: round(vv, 2) if isinstance(vv, float) else vv for kk, vv in v.items()})
-            for k, v in daily_data.items()
-        ], key=lambda x: x.date)[-30:]  # Last 30 days
-        
-        # Transaction list (limited)
-        tx_list = [
-            TransactionData(
-                id=tx.id,
-                tx_id=tx.tx_id or "",
-                station=tx.station or "",
-                connector=tx.connector,
-                connector_type=tx.connector_type,
-                account=tx.account or "",
-                start_time=tx.start_time or "",
-                end_time=tx.end_time or "",
-                charging_duration=tx.charging_duration,
-                meter_value=round(tx.meter_value or 0, 2),
-                cost=round(tx.cost or 0, 2),
-                payment_status=tx.payment_status or "UNPAID",
-                payment_type=tx.payment_type,
-                payment_date=tx.payment_date
+        # Daily trend - last 30 days
+        daily_trend = [
+            DailyData(
+                date=r["name"],
+                transactions=r["transactions"],
+                energy=round(r["energy"], 2),
+                revenue=round(r["revenue"], 2)
             )
-            for tx in transactions[:100]
+            for r in sorted(report["daily_trend"], key=lambda r: r["name"])[-30:]
         ]
         
         return ReportResponse(
             summary=summary,
-            by_account=by_account,
-            by_station=by_station,
-            by_connector=by_connector,
-            by_payment_type=by_payment_type,
+            by_account=grouped(report["by_account"], 15),
+            by_station=grouped(report["by_station"], 15),
+            by_connector=grouped(report["by_connector"]),
+            by_payment_type=grouped(report["by_payment_type"]),
             daily_trend=daily_trend,
-            transactions=tx_list
+            transactions=sample.transactions,
+            next_cursor=sample.next_cursor
         )
-        
+    
     except Exception as e:
         import logging
         logging.error(f"Report generation error: {e}")
         raise
 
 
+@router.post("/transactions", response_model=ReportTransactionsPage)
+async def get_report_transactions(
+    filters: ReportFilters,
+    cursor: Optional[str] = None,
+    limit: int = REPORT_SAMPLE_SIZE,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Page through the transactions of a report using the cursor from the previous page"""
+    limit = max(1, min(limit, 500))
+    async with async_session() as session:
+        return await fetch_transactions_page(
+            session, build_report_conditions(filters), cursor, limit
+        )
+
+
 @router.get("/quick-stats")
 async def get_quick_stats(current_user: UserResponse = Depends(get_current_user)):
     """Get quick stats for dashboard without filters"""
     try:
         async with async_session() as session:
-            # Get last 30 days of data
-            thirty_days_ago = datetime.now(timezone.utc).isoformat()[:10]
-            
+            # Aggregate the 500 most recent transactions in the database
+            recent = (
+                select(Transaction.cost, Transaction.meter_value, Transaction.payment_status)
+                .order_by(Transaction.start_time.desc().nullslast())
+                .limit(500)
+                .subquery()
+            )
             result = await session.execute(
-                select(Transaction).order_by(Transaction.start_time.desc()).limit(500)
+                select(
+                    func.count(),
+                    func.coalesce(func.sum(recent.c.meter_value), 0),
+                    func.coalesce(func.sum(recent.c.cost), 0),
+                    func.count().filter(recent.c.payment_status == "PAID")
+                )
             )
-            transactions = result.scalars().all()
-        
-        total_revenue = sum(tx.cost or 0 for tx in transactions)
-        total_energy = sum(tx.meter_value or 0 for tx in transactions)
-        paid_txs = [tx for tx in transactions if tx.payment_status == "PAID"]
+            total, total_energy, total_revenue, paid_count = result.one()
         
         return {
-            "total_transactions": len(transactions),
-            "total_energy": round(total_energy, 2),
-            "total_revenue": round(total_revenue, 2),
-            "paid_count": len(paid_txs),
-            "collection_rate": round(len(paid_txs) / len(transactions) * 100, 1) if transactions else 0
+            "total_transactions": total,
+            "total_energy": round(float(total_energy), 2),
+            "total_revenue": round(float(total_revenue), 2),
+            "paid_count": paid_count,
+            "collection_rate": round(paid_count / total * 100, 1) if total else 0
         }
     except Exception as e:
         return {
@@ -6,15 +6,30 @@ from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timezone
 import uuid
-from io import BytesIO
 
-from sqlalchemy import select, delete, func
+from sqlalchemy import select, delete, update, func
+from sqlalchemy.dialects.postgresql import insert
 from database import async_session, RFIDCard, RFIDHistory, User
 
 from routes.auth import get_current_user, require_role, UserResponse
+from services.pagination import fetch_page, estimate_total
+from services.rfid_auth import rfid_auth
+from services.ledger import rfid_ledger
+from services.accounts import account_index
+from services.jobs import job_runner, JobContext
+from services.spreadsheets import spreadsheet_pool
+from routes.jobs import JobSubmitted, job_submitted
+from routes.transactions import text_column
+from routes.users import set_card_balance
 
 router = APIRouter(prefix="/rfid-cards", tags=["RFID Cards"])
 
+# Cards per multi-row INSERT of an import (asyncpg allows at most 32767 bind parameters)
+IMPORT_CHUNK_SIZE = 2000
+
+# "skip" leaves cards already in the database alone, "upsert" sets their balance and user
+IMPORT_MODES = ("skip", "upsert")
+
 
 # Pydantic Models
 class RFIDCardResponse(BaseModel):
@@ -26,7 +41,7 @@ class RFIDCardResponse(BaseModel):
     status: str
     is_active: bool
     created_at: str
-
+    
     class Config:
         from_attributes = True
 
@@ -58,50 +73,205 @@ class RFIDHistoryResponse(BaseModel):
     balance_after: float
     notes: Optional[str] = None
     created_at: str
-
+    
     class Config:
         from_attributes = True
 
 
+class RFIDHistoryPage(BaseModel):
+    history: List[RFIDHistoryResponse]
+    next_cursor: Optional[str] = None
+    total_estimate: Optional[int] = None
+
+
+class RFIDCardPage(BaseModel):
+    cards: List[RFIDCardResponse]
+    next_cursor: Optional[str] = None
+    total_estimate: Optional[int] = None
+
+
+class RFIDCardLookupRequest(BaseModel):
+    card_numbers: List[str]
+
+
+class RFIDCardLookupResult(BaseModel):
+    cards: List[RFIDCardResponse]
+    missing: List[str]
+
+
 class RFIDImportResult(BaseModel):
     imported: int
     skipped: int
+    updated: int = 0
     errors: List[dict]
 
 
+# Most card numbers accepted by one /lookup call
+MAX_LOOKUP_CARDS = 1000
+
+# Card columns plus the owner's name, resolved by one LEFT JOIN instead of a query per card
+CARD_COLUMNS = (
+    RFIDCard.id,
+    RFIDCard.card_number,
+    RFIDCard.user_id,
+    RFIDCard.balance,
+    RFIDCard.status,
+    RFIDCard.is_active,
+    RFIDCard.created_at,
+    User.name.label("user_name"),
+)
+
+
+def cards_with_owner():
+    return select(*CARD_COLUMNS).outerjoin(User, User.id == RFIDCard.user_id)
+
+
+def card_to_response(card, user_name: Optional[str] = None) -> RFIDCardResponse:
+    """Build the response from an RFIDCard or a row selected with CARD_COLUMNS"""
+    return RFIDCardResponse(
+        id=card.id,
+        card_number=card.card_number,
+        user_id=card.user_id,
+        user_name=user_name,
+        balance=card.balance or 0,
+        status=card.status or "active",
+        is_active=card.is_active if card.is_active is not None else True,
+        created_at=card.created_at.isoformat() if card.created_at else ""
+    )
+
+
+def card_filters(
+    status: Optional[str],
+    user_id: Optional[str],
+    is_active: Optional[bool],
+    search: Optional[str]
+) -> list:
+    """WHERE conditions shared by the card listings; `search` matches a card number prefix"""
+    conditions = []
+    if status:
+        conditions.append(RFIDCard.status == status)
+    if user_id:
+        conditions.append(RFIDCard.user_id == user_id)
+    if is_active is not None:
+        conditions.append(RFIDCard.is_active == is_active)
+    if search:
+        # Plain prefix pattern so ix_rfid_cards_card_number_prefix can serve it
+        escaped = search.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append(RFIDCard.card_number.like(escaped + "%", escape="\\"))
+    return conditions
+
+
+def history_to_response(h: RFIDHistory) -> RFIDHistoryResponse:
+    return RFIDHistoryResponse(
+        id=h.id,
+        card_id=h.card_id,
+        transaction_type=h.transaction_type,
+        amount=h.amount,
+        balance_before=h.balance_before,
+        balance_after=h.balance_after,
+        notes=h.notes,
+        created_at=h.created_at.isoformat() if h.created_at else ""
+    )
+
+
 # Routes
 @router.get("", response_model=List[RFIDCardResponse])
-async def get_rfid_cards(current_user: UserResponse = Depends(get_current_user)):
-    """Get all RFID cards"""
+async def get_rfid_cards(
+    status: Optional[str] = None,
+    user_id: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    search: Optional[str] = None,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Get RFID cards with optional filtering; all matching cards unless limit is given"""
+    query = (
+        cards_with_owner()
+        .where(*card_filters(status, user_id, is_active, search))
+        .order_by(RFIDCard.created_at.desc())
+        .offset(max(skip, 0))
+    )
+    if limit is not None:
+        query = query.limit(max(1, min(limit, 1000)))
+    
     async with async_session() as session:
-        result = await session.execute(
-            select(RFIDCard).order_by(RFIDCard.created_at.desc())
+        result = await session.execute(query)
+        return [card_to_response(row, row.user_name) for row in result.all()]
+
+
+@router.get("/page", response_model=RFIDCardPage)
+async def get_rfid_cards_page(
+    status: Optional[str] = None,
+    user_id: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    include_total: bool = False,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Cursor-paginated RFID cards, newest first"""
+    limit = max(1, min(limit, 1000))
+    conditions = card_filters(status, user_id, is_active, search)
+    
+    async with async_session() as session:
+        page, next_cursor = await fetch_page(
+            session, cards_with_owner().where(*conditions),
+            RFIDCard.created_at, RFIDCard.id, cursor, limit, "created_at", scalars=False
         )
-        cards = result.scalars().all()
         
-        response = []
-        for card in cards:
-            user_name = None
-            if card.user_id:
-                user_result = await session.execute(
-                    select(User).where(User.id == card.user_id)
-                )
-                user = user_result.scalar_one_or_none()
-                if user:
-                    user_name = user.name
-            
-            response.append(RFIDCardResponse(
-                id=card.id,
-                card_number=card.card_number,
-                user_id=card.user_id,
-                user_name=user_name,
-                balance=card.balance or 0,
-                status=card.status or "active",
-                is_active=card.is_active if card.is_active is not None else True,
-                created_at=card.created_at.isoformat() if card.created_at else ""
-            ))
+        total = None
+        if include_total:
+            total = await estimate_total(session, RFIDCard, conditions)
         
-        return response
+        return RFIDCardPage(
+            cards=[card_to_response(row, row.user_name) for row in page],
+            next_cursor=next_cursor,
+            total_estimate=total
+        )
+
+
+@router.post("/lookup", response_model=RFIDCardLookupResult)
+async def lookup_rfid_cards(
+    request: RFIDCardLookupRequest,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Resolve many card numbers in one query; unknown numbers are listed in `missing`"""
+    card_numbers = list(dict.fromkeys(n.strip() for n in request.card_numbers if n and n.strip()))
+    if len(card_numbers) > MAX_LOOKUP_CARDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_LOOKUP_CARDS} card numbers per lookup")
+    if not card_numbers:
+        return RFIDCardLookupResult(cards=[], missing=[])
+    
+    async with async_session() as session:
+        result = await session.execute(
+            cards_with_owner().where(RFIDCard.card_number.in_(card_numbers))
+        )
+        found = {row.card_number: card_to_response(row, row.user_name) for row in result.all()}
+    
+    return RFIDCardLookupResult(
+        cards=[found[n] for n in card_numbers if n in found],
+        missing=[n for n in card_numbers if n not in found]
+    )
+
+
+@router.get("/ledger/stats")
+async def get_ledger_stats(current_user: UserResponse = Depends(require_role("admin"))):
+    """Balance ledger and account resolution counters for this process (Admin only)"""
+    return {**rfid_ledger.stats(), "accounts": account_index.stats()}
+
+
+@router.get("/accounts/resolve", response_model=RFIDCardResponse)
+async def resolve_account(account: str, current_user: UserResponse = Depends(require_role("admin"))):
+    """The card charged for an account: card number, or a user's email, placa or name (Admin only)"""
+    async with async_session() as session:
+        resolved = await account_index.resolve(session, account)
+        if resolved is None:
+            raise HTTPException(status_code=404, detail="No RFID card for this account")
+        result = await session.execute(cards_with_owner().where(RFIDCard.id == resolved.card_id))
+        row = result.one()
+    return card_to_response(row, row.user_name)
 
 
 @router.get("/{card_id}", response_model=RFIDCardResponse)
@@ -112,32 +282,14 @@ async def get_rfid_card(
     """Get a single RFID card"""
     async with async_session() as session:
         result = await session.execute(
-            select(RFIDCard).where(RFIDCard.id == card_id)
+            cards_with_owner().where(RFIDCard.id == card_id)
         )
-        card = result.scalar_one_or_none()
+        row = result.one_or_none()
         
-        if not card:
+        if not row:
             raise HTTPException(status_code=404, detail="RFID card not found")
         
-        user_name = None
-        if card.user_id:
-            user_result = await session.execute(
-                select(User).where(User.id == card.user_id)
-            )
-            user = user_result.scalar_one_or_none()
-            if user:
-                user_name = user.name
-        
-        return RFIDCardResponse(
-            id=card.id,
-            card_number=card.card_number,
-            user_id=card.user_id,
-            user_name=user_name,
-            balance=card.balance or 0,
-            status=card.status or "active",
-            is_active=card.is_active if card.is_active is not None else True,
-            created_at=card.created_at.isoformat() if card.created_at else ""
-        )
+        return card_to_response(row, row.user_name)
 
 
 @router.post("", response_model=RFIDCardResponse)
@@ -174,19 +326,12 @@ async def create_rfid_card(
             is_active=True
         )
         session.add(card)
+        await account_index.sync_cards(session, [card.id])
         await session.commit()
         await session.refresh(card)
+        await rfid_auth.refresh([card.card_number])
         
-        return RFIDCardResponse(
-            id=card.id,
-            card_number=card.card_number,
-            user_id=card.user_id,
-            user_name=user_name,
-            balance=card.balance or 0,
-            status=card.status,
-            is_active=card.is_active,
-            created_at=card.created_at.isoformat() if card.created_at else ""
-        )
+        return card_to_response(card, user_name)
 
 
 @router.patch("/{card_id}", response_model=RFIDCardResponse)
@@ -198,51 +343,42 @@ async def update_rfid_card(
     """Update an RFID card (Admin only)"""
     async with async_session() as session:
         result = await session.execute(
-            select(RFIDCard).where(RFIDCard.id == card_id)
+            select(RFIDCard, User.name)
+            .outerjoin(User, User.id == RFIDCard.user_id)
+            .where(RFIDCard.id == card_id)
         )
-        card = result.scalar_one_or_none()
+        row = result.one_or_none()
         
-        if not card:
+        if not row:
             raise HTTPException(status_code=404, detail="RFID card not found")
+        card, user_name = row
+        previous_user_id = card.user_id
         
         if card_data.user_id is not None:
+            user_name = None
             if card_data.user_id:
                 user_result = await session.execute(
-                    select(User).where(User.id == card_data.user_id)
+                    select(User.name).where(User.id == card_data.user_id)
                 )
-                if not user_result.scalar_one_or_none():
+                user_name = user_result.scalar_one_or_none()
+                if user_name is None:
                     raise HTTPException(status_code=404, detail="User not found")
             card.user_id = card_data.user_id
         
         if card_data.balance is not None:
-            card.balance = card_data.balance
+            # Locked and recorded as an ADJUSTMENT, like every other balance change
+            await set_card_balance(session, card.card_number, card_data.balance, f"Balance set by {current_user.email}")
+            await session.refresh(card, ["balance"])
         if card_data.status is not None:
             card.status = card_data.status
         if card_data.is_active is not None:
             card.is_active = card_data.is_active
         
+        await account_index.sync_cards(session, [card.id], previous_user_ids=[previous_user_id])
         await session.commit()
-        await session.refresh(card)
+        await rfid_auth.refresh([card.card_number])
         
-        user_name = None
-        if card.user_id:
-            user_result = await session.execute(
-                select(User).where(User.id == card.user_id)
-            )
-            user = user_result.scalar_one_or_none()
-            if user:
-                user_name = user.name
-        
-        return RFIDCardResponse(
-            id=card.id,
-            card_number=card.card_number,
-            user_id=card.user_id,
-            user_name=user_name,
-            balance=card.balance or 0,
-            status=card.status or "active",
-            is_active=card.is_active if card.is_active is not None else True,
-            created_at=card.created_at.isoformat() if card.created_at else ""
-        )
+        return card_to_response(card, user_name)
 
 
 @router.delete("/{card_id}")
@@ -253,12 +389,18 @@ async def delete_rfid_card(
     """Delete an RFID card (Admin only)"""
     async with async_session() as session:
         result = await session.execute(
-            delete(RFIDCard).where(RFIDCard.id == card_id)
+            delete(RFIDCard).where(RFIDCard.id == card_id).returning(RFIDCard.card_number, RFIDCard.user_id)
         )
-        await session.commit()
-        
-        if result.rowcount == 0:
+        deleted = result.first()
+        if deleted is None:
             raise HTTPException(status_code=404, detail="RFID card not found")
+        # A user holding this number loses it with the card; the owner's aliases move to their next card
+        await session.execute(
+            update(User).where(User.rfid_card_number == deleted.card_number).values(rfid_card_number=None)
+        )
+        await account_index.sync_users(session, [deleted.user_id])
+        await session.commit()
+        await rfid_auth.refresh([deleted.card_number])
         
         return {"message": "RFID card deleted successfully"}
 
@@ -274,51 +416,17 @@ async def topup_rfid_card(
         raise HTTPException(status_code=400, detail="Amount must be positive")
     
     async with async_session() as session:
-        result = await session.execute(
-            select(RFIDCard).where(RFIDCard.id == card_id)
-        )
-        card = result.scalar_one_or_none()
-        
-        if not card:
+        # Added in the UPDATE itself, so concurrent charges and top-ups are never lost
+        topped_up = await rfid_ledger.apply(session, topup.amount, "TOPUP", topup.notes, card_id=card_id)
+        if topped_up is None:
             raise HTTPException(status_code=404, detail="RFID card not found")
-        
-        balance_before = card.balance or 0
-        card.balance = balance_before + topup.amount
-        
-        # Record history
-        history = RFIDHistory(
-            id=str(uuid.uuid4()),
-            card_id=card_id,
-            transaction_type="TOPUP",
-            amount=topup.amount,
-            balance_before=balance_before,
-            balance_after=card.balance,
-            notes=topup.notes
-        )
-        session.add(history)
-        
         await session.commit()
-        await session.refresh(card)
         
-        user_name = None
-        if card.user_id:
-            user_result = await session.execute(
-                select(User).where(User.id == card.user_id)
-            )
-            user = user_result.scalar_one_or_none()
-            if user:
-                user_name = user.name
-        
-        return RFIDCardResponse(
-            id=card.id,
-            card_number=card.card_number,
-            user_id=card.user_id,
-            user_name=user_name,
-            balance=card.balance or 0,
-            status=card.status or "active",
-            is_active=card.is_active if card.is_active is not None else True,
-            created_at=card.created_at.isoformat() if card.created_at else ""
-        )
+        result = await session.execute(cards_with_owner().where(RFIDCard.id == card_id))
+        row = result.one()
+    
+    await rfid_auth.refresh([topped_up.card_number])
+    return card_to_response(row, row.user_name)
 
 
 @router.get("/{card_id}/history", response_model=List[RFIDHistoryResponse])
@@ -335,37 +443,79 @@ async def get_rfid_history(
         )
         history = result.scalars().all()
         
-        return [
-            RFIDHistoryResponse(
-                id=h.id,
-                card_id=h.card_id,
-                transaction_type=h.transaction_type,
-                amount=h.amount,
-                balance_before=h.balance_before,
-                balance_after=h.balance_after,
-                notes=h.notes,
-                created_at=h.created_at.isoformat() if h.created_at else ""
-            )
-            for h in history
-        ]
+        return [history_to_response(h) for h in history]
 
 
-@router.post("/import", response_model=RFIDImportResult)
+@router.get("/{card_id}/history/page", response_model=RFIDHistoryPage)
+async def get_rfid_history_page(
+    card_id: str,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    include_total: bool = False,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Cursor-paginated history for an RFID card, newest first"""
+    limit = max(1, min(limit, 1000))
+    conditions = [RFIDHistory.card_id == card_id]
+    
+    async with async_session() as session:
+        page, next_cursor = await fetch_page(
+            session, select(RFIDHistory).where(*conditions),
+            RFIDHistory.created_at, RFIDHistory.id, cursor, limit, "created_at"
+        )
+        
+        total = None
+        if include_total:
+            total = await estimate_total(session, RFIDHistory, conditions)
+        
+        return RFIDHistoryPage(
+            history=[history_to_response(h) for h in page],
+            next_cursor=next_cursor,
+            total_estimate=total
+        )
+
+
+@router.post("/import", response_model=JobSubmitted, status_code=202)
 async def import_rfid_cards(
     file: UploadFile = File(...),
+    mode: str = "skip",
     current_user: UserResponse = Depends(require_role("admin"))
 ):
-    """Import RFID cards from Excel/CSV file (Admin only)"""
+    """
+    Import RFID cards from Excel/CSV file as a background job (Admin only); the result is at /api/jobs/{id}.
+    mode=skip leaves existing cards untouched; mode=upsert sets their balance and user from the file
+    and records the balance change in their history.
+    """
     if not file.filename.endswith(('.xlsx', '.xls', '.csv')):
         raise HTTPException(status_code=400, detail="File must be Excel (.xlsx, .xls) or CSV (.csv)")
+    if mode not in IMPORT_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(IMPORT_MODES)}")
+    
+    contents = await file.read()
+    job_id = await job_runner.submit("rfid_import", current_user.id, run_rfid_import, contents, file.filename, mode)
+    return job_submitted(job_id, "rfid_import")
+
+
+async def fetch_user_ids(session, emails: List[str]) -> dict:
+    """Email -> user id for the given (lowercase) emails, IMPORT_CHUNK_SIZE per query"""
+    user_ids = {}
+    for start in range(0, len(emails), IMPORT_CHUNK_SIZE):
+        result = await session.execute(
+            select(User.email, User.id).where(User.email.in_(emails[start:start + IMPORT_CHUNK_SIZE]))
+        )
+        user_ids.update(result.all())
+    return user_ids
+
+
+async def run_rfid_import(job: JobContext, contents: bytes, filename: str, mode: str = "skip") -> RFIDImportResult:
+    """The RFID card import itself, run by the job runner"""
+    import pandas as pd
+    import logging
     
     try:
-        import pandas as pd
-        contents = await file.read()
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(BytesIO(contents))
-        else:
-            df = pd.read_excel(BytesIO(contents))
+        df = await spreadsheet_pool.read_table(contents, filename)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to read file: {str(e)}")
     
@@ -386,63 +536,133 @@ async def import_rfid_cards(
     if not card_col:
         raise HTTPException(status_code=400, detail="Missing required column: Card Number")
     
-    import pandas as pd
+    # Normalize and validate column-wise
+    row_numbers = df.index + 2  # Excel row number (1-indexed + header)
+    card_numbers = text_column(df[card_col])
+    missing_number = card_numbers == ""
+    errors = [
+        {"row": int(row_num), "field": "Card Number", "message": "Card number is required"}
+        for row_num in row_numbers[missing_number]
+    ]
+    
+    # Blank or invalid balances are NaN: 0 for a new card, unchanged for an existing one
+    if balance_col:
+        balances = pd.to_numeric(df[balance_col], errors="coerce")
+    else:
+        balances = pd.Series(float("nan"), index=df.index)
+    emails = text_column(df[user_col]).str.lower() if user_col else pd.Series("", index=df.index)
     
+    # The first row of a card number repeated within the file wins
+    repeated = ~missing_number & card_numbers.where(~missing_number).duplicated()
+    candidates = ~missing_number & ~repeated
+    skipped = int(repeated.sum())
     imported = 0
-    skipped = 0
-    errors = []
+    updated = 0
+    changed_numbers = []
     
-    for idx, row in df.iterrows():
-        row_num = idx + 2
-        
-        card_number = str(row[card_col]).strip() if not pd.isna(row[card_col]) else ""
-        
-        if not card_number:
-            errors.append({"row": row_num, "field": "Card Number", "message": "Card number is required"})
-            continue
-        
-        async with async_session() as session:
-            # Check if card exists
-            result = await session.execute(
-                select(RFIDCard).where(RFIDCard.card_number == card_number)
-            )
-            if result.scalar_one_or_none():
-                skipped += 1
-                continue
+    await job.update(total=int(candidates.sum()), errors=errors, message="Importing cards", force=True)
+    
+    async with async_session() as session:
+        user_ids = await fetch_user_ids(session, emails[candidates & (emails != "")].unique().tolist())
+    
+    rows = pd.DataFrame({
+        "card_number": card_numbers[candidates],
+        "balance": balances[candidates],
+        "user_id": emails[candidates].map(user_ids),
+    })
+    
+    # Each chunk is its own transaction; the cards written before a failure or cancellation are still indexed
+    try:
+        for start in range(0, len(rows), IMPORT_CHUNK_SIZE):
+            chunk = rows.iloc[start:start + IMPORT_CHUNK_SIZE]
             
-            # Get balance
-            balance = 0.0
-            if balance_col and not pd.isna(row.get(balance_col)):
+            async with async_session() as session:
                 try:
-                    balance = float(row[balance_col])
-                except:
-                    pass
-            
-            # Get user by email if provided
-            user_id = None
-            if user_col and not pd.isna(row.get(user_col)):
-                email = str(row[user_col]).strip().lower()
-                user_result = await session.execute(
-                    select(User).where(User.email == email)
-                )
-                user = user_result.scalar_one_or_none()
-                if user:
-                    user_id = user.id
+                    statement = select(
+                        RFIDCard.id, RFIDCard.card_number, RFIDCard.balance, RFIDCard.user_id
+                    ).where(RFIDCard.card_number.in_(chunk["card_number"].tolist()))
+                    if mode == "upsert":
+                        # Locked so the history below records the balance actually replaced
+                        statement = statement.with_for_update()
+                    result = await session.execute(statement)
+                    existing = {card.card_number: card for card in result.all()}
+                    
+                    records = []
+                    for row in chunk.itertuples(index=False):
+                        card = existing.get(row.card_number)
+                        balance = None if pd.isna(row.balance) else float(row.balance)
+                        user_id = None if pd.isna(row.user_id) else row.user_id
+                        if card is not None:
+                            if mode == "skip":
+                                skipped += 1
+                                continue
+                            # Blank cells keep the card's current value
+                            if balance is None:
+                                balance = card.balance
+                            user_id = user_id or card.user_id
+                        records.append({
+                            "id": str(uuid.uuid4()),
+                            "card_number": row.card_number,
+                            "user_id": user_id,
+                            "balance": balance or 0.0,
+                            "status": "active",
+                            "is_active": True,
+                        })
+                    
+                    written = []
+                    if records:
+                        statement = insert(RFIDCard).values(records)
+                        if mode == "upsert":
+                            statement = statement.on_conflict_do_update(
+                                index_elements=[RFIDCard.card_number],
+                                set_={"balance": statement.excluded.balance, "user_id": statement.excluded.user_id}
+                            )
+                        else:
+                            statement = statement.on_conflict_do_nothing(index_elements=[RFIDCard.card_number])
+                        result = await session.execute(
+                            statement.returning(RFIDCard.id, RFIDCard.card_number, RFIDCard.balance)
+                        )
+                        written = result.all()
+                    
+                    history = []
+                    for card in written:
+                        previous = existing.get(card.card_number)
+                        if previous is None:
+                            imported += 1
+                            continue
+                        updated += 1
+                        balance_before = previous.balance or 0
+                        if card.balance != balance_before:
+                            history.append({
+                                "id": str(uuid.uuid4()),
+                                "card_id": card.id,
+                                "transaction_type": "IMPORT",
+                                "amount": card.balance - balance_before,
+                                "balance_before": balance_before,
+                                "balance_after": card.balance,
+                                "notes": f"Balance set by import of {filename}",
+                            })
+                    if history:
+                        await session.execute(insert(RFIDHistory).values(history))
+                    await account_index.sync_cards(
+                        session, [card.id for card in written],
+                        previous_user_ids=[card.user_id for card in existing.values()] if mode == "upsert" else []
+                    )
+                    
+                    # Created concurrently by someone else since the lookup above
+                    skipped += len(records) - len(written)
+                    await session.commit()
+                    changed_numbers.extend(card.card_number for card in written)
+                
+                except Exception as e:
+                    logging.error(f"Database error during RFID card import: {e}")
+                    await session.rollback()
+                    raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
             
-            card = RFIDCard(
-                id=str(uuid.uuid4()),
-                card_number=card_number,
-                user_id=user_id,
-                balance=balance,
-                status="active",
-                is_active=True
-            )
-            
-            try:
-                session.add(card)
-                await session.commit()
-                imported += 1
-            except Exception as e:
-                errors.append({"row": row_num, "field": "Database", "message": str(e)})
+            await job.update(progress=start + len(chunk), errors=errors)
+        
+        await job.update(progress=len(rows), errors=errors, force=True)
+    finally:
+        await rfid_auth.refresh(changed_numbers)
     
-    return RFIDImportResult(imported=imported, skipped=skipped, errors=errors)
+    return RFIDImportResult(imported=imported, skipped=skipped, updated=updated, errors=errors)
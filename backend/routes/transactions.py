@@ -3,18 +3,34 @@ Transaction management routes
 """
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timezone
 import uuid
-from io import BytesIO
 
-from sqlalchemy import select, delete, func
-from database import async_session, Transaction, PricingRule, PricingGroup, User
+from sqlalchemy import select, delete, update, func
+from sqlalchemy.dialects.postgresql import insert
+from database import async_session, Transaction, User, RFIDCard
 
 from routes.auth import get_current_user, require_role, UserResponse
+from services.rollups import apply_rollup_delta, transaction_snapshot, ROLLUP_COLUMNS
+from services.timestamps import parse_timestamp_strict, parse_timestamp_series, format_timestamp, date_range_conditions
+from services.pagination import fetch_page, estimate_total
+from services.pricing import pricing_resolver
+from services.rfid_auth import rfid_auth
+from services.ledger import rfid_ledger, Charge, latest_balances
+from services.accounts import account_index
+from services.jobs import job_runner, JobContext
+from services.spreadsheets import spreadsheet_pool
+from routes.jobs import JobSubmitted, job_submitted
 
 router = APIRouter(prefix="/transactions", tags=["Transactions"])
 
+# Rows per multi-row INSERT (asyncpg allows at most 32767 bind parameters)
+IMPORT_CHUNK_SIZE = 2000
+
+# pg_advisory_xact_lock key held while an Excel import checks for duplicate TxIDs
+IMPORT_LOCK_KEY = 7301
+
 
 # Pydantic Models
 class TransactionResponse(BaseModel):
@@ -33,7 +49,7 @@ class TransactionResponse(BaseModel):
     payment_type: Optional[str] = None
     payment_date: Optional[str] = None
     created_at: str
-
+    
     class Config:
         from_attributes = True
 
@@ -62,6 +78,12 @@ class TransactionUpdate(BaseModel):
     payment_date: Optional[str] = None
 
 
+class TransactionPage(BaseModel):
+    transactions: List[TransactionResponse]
+    next_cursor: Optional[str] = None
+    total_estimate: Optional[int] = None
+
+
 class BulkDeleteRequest(BaseModel):
     ids: List[str]
 
@@ -96,12 +118,10 @@ class TransactionImportRequest(BaseModel):
     transactions: List[dict]  # Accept raw dict to handle various column names
 
 
-def calculate_charging_duration(start_time: str, end_time: str) -> str:
+def calculate_charging_duration(start_time: Optional[datetime], end_time: Optional[datetime]) -> str:
     """Calculate duration between start and end times"""
     try:
-        start = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-        end = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-        duration = end - start
+        duration = end_time - start_time
         hours = duration.seconds // 3600
         minutes = (duration.seconds % 3600) // 60
         return f"{hours}h {minutes}m"
@@ -111,55 +131,81 @@ def calculate_charging_duration(start_time: str, end_time: str) -> str:
 
 async def deduct_rfid_balance(account: str, cost: float) -> dict:
     """
-    Deduct cost from user's RFID balance based on account.
-    Account can be user's name, email, or RFID card number.
+    Deduct cost from the RFID card charged for an account.
+    Account can be an RFID card number or a user's email, placa or name.
     Returns dict with deduction status.
     """
     if cost <= 0:
         return {"deducted": False, "reason": "No cost to deduct"}
     
     async with async_session() as session:
-        # Try to find user by RFID card number, name, or email
-        result = await session.execute(
-            select(User).where(
-                (User.rfid_card_number == account) |
-                (User.name == account) |
-                (User.email == account)
-            )
-        )
-        user = result.scalar_one_or_none()
-        
-        if not user:
-            return {"deducted": False, "reason": "User not found"}
+        # One primary-key lookup in account_aliases
+        card = await account_index.resolve(session, account)
         
-        if not user.rfid_card_number:
-            return {"deducted": False, "reason": "User has no RFID card"}
+        if not card:
+            return {"deducted": False, "reason": "No RFID card for this account"}
         
-        if user.rfid_status != "active":
-            return {"deducted": False, "reason": f"RFID card is {user.rfid_status}"}
+        if card.status != "active":
+            return {"deducted": False, "reason": f"RFID card is {card.status}"}
+        if card.is_active is False:
+            return {"deducted": False, "reason": "RFID card is inactive"}
         
-        current_balance = user.rfid_balance or 0
-        if current_balance < cost:
+        # Checked and deducted in one UPDATE, so concurrent charges cannot both spend the same balance
+        charged = await rfid_ledger.apply(session, -cost, "CHARGE", f"Transaction for {account}", card_id=card.card_id)
+        if charged is None:
             return {
                 "deducted": False, 
-                "reason": f"Insufficient balance: {current_balance} < {cost}",
-                "user_id": user.id,
-                "balance": current_balance
+                "reason": f"Insufficient balance: {card.balance} < {cost}",
+                "user_id": card.user_id,
+                "balance": card.balance
             }
-        
-        # Deduct balance
-        user.rfid_balance = current_balance - cost
         await session.commit()
+        await rfid_auth.refresh([card.card_number])
         
         return {
             "deducted": True,
-            "user_id": user.id,
-            "previous_balance": current_balance,
-            "new_balance": user.rfid_balance,
+            "user_id": card.user_id,
+            "card_number": card.card_number,
+            "previous_balance": charged.balance_before,
+            "new_balance": charged.balance_after,
             "amount_deducted": cost
         }
 
 
+async def collect_import_charges(session, records: List[dict]) -> Tuple[List[Charge], List[str]]:
+    """
+    RFID charges for imported transactions, resolved in the import's session.
+    The cards are locked and their balances tracked row by row, so a row the
+    remaining balance cannot cover stays UNPAID instead of being clamped.
+    Returns the charges and the ids of the transactions they pay for.
+    """
+    cards = {}
+    for account in {record["account"] for record in records if record["cost"] > 0}:
+        card = await account_index.resolve(session, account)
+        if card and card.status == "active" and card.is_active is not False:
+            cards[account] = card
+    if not cards:
+        return [], []
+    
+    result = await session.execute(
+        select(RFIDCard.card_number, RFIDCard.balance)
+        .where(RFIDCard.card_number.in_({card.card_number for card in cards.values()}))
+        .with_for_update()
+    )
+    balances: Dict[str, float] = {row.card_number: row.balance or 0 for row in result}
+    
+    charges = []
+    paid_ids = []
+    for record in records:
+        card = cards.get(record["account"])
+        if card is None or record["cost"] <= 0 or balances.get(card.card_number, 0) < record["cost"]:
+            continue
+        balances[card.card_number] -= record["cost"]
+        charges.append(Charge(card.card_number, record["cost"], f"Transaction for {record['account']}"))
+        paid_ids.append(record["id"])
+    return charges, paid_ids
+
+
 async def get_pricing(account: str, connector: str, connector_type: Optional[str] = None, user_id: Optional[str] = None) -> float:
     """
     Get price per kWh based on account, connector type, and user's pricing group.
@@ -168,77 +214,9 @@ async def get_pricing(account: str, connector: str, connector_type: Optional[str
     - CCS = 2500 COP/kWh
     - CHADEMO = 2000 COP/kWh
     - J1772 = 1500 COP/kWh
-    - Default = 500 COP/kWh
+    - Unknown = 2000 COP/kWh
     """
-    # Default pricing by connector type
-    DEFAULT_CONNECTOR_PRICING = {
-        'CCS': 2500.0,
-        'CCS2': 2500.0,
-        'CHADEMO': 2000.0,
-        'J1772': 1500.0,
-        'TYPE2': 1500.0,
-        'Type2': 1500.0,
-    }
-    
-    # Normalize connector type for matching
-    connector_normalized = (connector or '').upper().strip()
-    connector_type_normalized = (connector_type or '').upper().strip()
-    
-    # Check which one to use for pricing
-    pricing_key = connector_type_normalized or connector_normalized
-    
-    async with async_session() as session:
-        # First, try to find user by account and check their pricing group
-        user_result = await session.execute(
-            select(User).where(
-                (User.name == account) |
-                (User.email == account) |
-                (User.rfid_card_number == account)
-            )
-        )
-        user = user_result.scalar_one_or_none()
-        
-        if user and user.pricing_group_id:
-            # Get user's pricing group
-            group_result = await session.execute(
-                select(PricingGroup).where(PricingGroup.id == user.pricing_group_id)
-            )
-            group = group_result.scalar_one_or_none()
-            if group and group.connector_pricing:
-                # Check for exact match in pricing group
-                for key, price in group.connector_pricing.items():
-                    if key.upper() == pricing_key:
-                        return float(price)
-        
-        # Check for custom pricing rules
-        result = await session.execute(
-            select(PricingRule).where(
-                PricingRule.account == account,
-                PricingRule.connector == connector
-            )
-        )
-        pricing = result.scalar_one_or_none()
-        if pricing:
-            return pricing.price_per_kwh
-        
-        # Check for account-level default pricing
-        result = await session.execute(
-            select(PricingRule).where(
-                PricingRule.account == account,
-                PricingRule.connector == "*"
-            )
-        )
-        pricing = result.scalar_one_or_none()
-        if pricing:
-            return pricing.price_per_kwh
-        
-        # Use default connector type pricing
-        for key, price in DEFAULT_CONNECTOR_PRICING.items():
-            if key.upper() == pricing_key:
-                return price
-        
-        # Default fallback for unknown connector types
-        return 2000.0
+    return await pricing_resolver.get_price(account, connector, connector_type, user_id)
 
 
 def transaction_to_response(tx: Transaction) -> TransactionResponse:
@@ -249,8 +227,8 @@ def transaction_to_response(tx: Transaction) -> TransactionResponse:
         connector=tx.connector,
         connector_type=tx.connector_type,
         account=tx.account,
-        start_time=tx.start_time or "",
-        end_time=tx.end_time or "",
+        start_time=format_timestamp(tx.start_time),
+        end_time=format_timestamp(tx.end_time),
         meter_value=tx.meter_value or 0,
         charging_duration=tx.charging_duration,
         cost=tx.cost or 0,
@@ -261,6 +239,24 @@ def transaction_to_response(tx: Transaction) -> TransactionResponse:
     )
 
 
+def transaction_filters(
+    start_date: Optional[str],
+    end_date: Optional[str],
+    station: Optional[str],
+    account: Optional[str],
+    payment_status: Optional[str]
+) -> list:
+    """WHERE conditions shared by the transaction listings"""
+    conditions = date_range_conditions(Transaction.start_time, start_date, end_date)
+    if station:
+        conditions.append(Transaction.station == station)
+    if account:
+        conditions.append(Transaction.account == account)
+    if payment_status:
+        conditions.append(Transaction.payment_status == payment_status)
+    return conditions
+
+
 # Routes
 @router.get("", response_model=List[TransactionResponse])
 async def get_transactions(
@@ -275,20 +271,11 @@ async def get_transactions(
 ):
     """Get transactions with optional filtering"""
     async with async_session() as session:
-        query = select(Transaction)
-        
-        if station:
-            query = query.where(Transaction.station == station)
-        if account:
-            query = query.where(Transaction.account == account)
-        if payment_status:
-            query = query.where(Transaction.payment_status == payment_status)
-        if start_date:
-            query = query.where(Transaction.start_time >= start_date)
-        if end_date:
-            query = query.where(Transaction.start_time <= end_date)
+        query = select(Transaction).where(
+            *transaction_filters(start_date, end_date, station, account, payment_status)
+        )
         
-        query = query.order_by(Transaction.start_time.desc())
+        query = query.order_by(Transaction.start_time.desc().nullslast())
         query = query.offset(skip).limit(limit)
         
         result = await session.execute(query)
@@ -297,6 +284,42 @@ async def get_transactions(
         return [transaction_to_response(tx) for tx in transactions]
 
 
+@router.get("/page", response_model=TransactionPage)
+async def get_transactions_page(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    station: Optional[str] = None,
+    account: Optional[str] = None,
+    payment_status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    include_total: bool = False,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Cursor-paginated transactions, newest first.
+    Pass the previous page's next_cursor to continue; stable while rows are being imported.
+    """
+    limit = max(1, min(limit, 1000))
+    conditions = transaction_filters(start_date, end_date, station, account, payment_status)
+    
+    async with async_session() as session:
+        page, next_cursor = await fetch_page(
+            session, select(Transaction).where(*conditions),
+            Transaction.start_time, Transaction.id, cursor, limit, "start_time"
+        )
+        
+        total = None
+        if include_total:
+            total = await estimate_total(session, Transaction, conditions)
+        
+        return TransactionPage(
+            transactions=[transaction_to_response(tx) for tx in page],
+            next_cursor=next_cursor,
+            total_estimate=total
+        )
+
+
 @router.post("", response_model=TransactionResponse)
 async def create_transaction(
     tx_data: TransactionCreate,
@@ -305,31 +328,46 @@ async def create_transaction(
     """Create a new transaction and deduct from RFID balance if applicable"""
     price_per_kwh = await get_pricing(tx_data.account, tx_data.connector, tx_data.connector_type)
     cost = tx_data.meter_value * price_per_kwh
-    charging_duration = calculate_charging_duration(tx_data.start_time, tx_data.end_time)
-    
-    # Determine payment status based on RFID balance deduction
-    payment_status = "UNPAID"
-    deduction_result = await deduct_rfid_balance(tx_data.account, round(cost, 2))
-    
-    if deduction_result.get("deducted"):
-        payment_status = "PAID"
+    try:
+        start_time = parse_timestamp_strict(tx_data.start_time)
+        end_time = parse_timestamp_strict(tx_data.end_time)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    charging_duration = calculate_charging_duration(start_time, end_time)
     
     async with async_session() as session:
-        new_tx = Transaction(
-            id=str(uuid.uuid4()),
-            tx_id=tx_data.tx_id,
-            station=tx_data.station,
-            connector=tx_data.connector,
-            connector_type=tx_data.connector_type,
-            account=tx_data.account,
-            start_time=tx_data.start_time,
-            end_time=tx_data.end_time,
-            meter_value=tx_data.meter_value,
-            charging_duration=charging_duration,
-            cost=round(cost, 2),
-            payment_status=payment_status
+        # Inserted first: the unique tx_id index turns a duplicate away before any balance is touched
+        result = await session.execute(
+            insert(Transaction)
+            .values(
+                id=str(uuid.uuid4()),
+                tx_id=tx_data.tx_id,
+                station=tx_data.station,
+                connector=tx_data.connector,
+                connector_type=tx_data.connector_type,
+                account=tx_data.account,
+                start_time=start_time,
+                end_time=end_time,
+                meter_value=tx_data.meter_value,
+                charging_duration=charging_duration,
+                cost=round(cost, 2),
+                payment_status="UNPAID"
+            )
+            .on_conflict_do_nothing(index_elements=[Transaction.tx_id])
+            .returning(Transaction.id)
         )
-        session.add(new_tx)
+        new_id = result.scalar_one_or_none()
+        if new_id is None:
+            raise HTTPException(status_code=400, detail="Transaction with this TxID already exists")
+        
+        new_tx = await session.get(Transaction, new_id)
+        
+        # Determine payment status based on RFID balance deduction
+        deduction_result = await deduct_rfid_balance(tx_data.account, round(cost, 2))
+        if deduction_result.get("deducted"):
+            new_tx.payment_status = "PAID"
+        
+        await apply_rollup_delta(session, added=[new_tx])
         await session.commit()
         await session.refresh(new_tx)
         
@@ -344,17 +382,26 @@ async def update_transaction(
 ):
     """Update a transaction"""
     async with async_session() as session:
+        # Locked so concurrent updates cannot both subtract the same before-state from the rollups
         result = await session.execute(
-            select(Transaction).where(Transaction.id == transaction_id)
+            select(Transaction).where(Transaction.id == transaction_id).with_for_update()
         )
         tx = result.scalar_one_or_none()
         
         if not tx:
             raise HTTPException(status_code=404, detail="Transaction not found")
         
+        before = transaction_snapshot(tx)
+        
         # Update fields
         for field, value in tx_data.model_dump(exclude_unset=True).items():
             if value is not None:
+                if field in ("start_time", "end_time"):
+                    # Only a blank value clears a time; a typo must not erase it
+                    try:
+                        value = parse_timestamp_strict(value)
+                    except ValueError:
+                        raise HTTPException(status_code=400, detail=f"Invalid {field}: {value}")
                 setattr(tx, field, value)
         
         # Recalculate cost if needed
@@ -369,10 +416,10 @@ async def update_transaction(
         
         # Recalculate duration if times changed
         if tx_data.start_time or tx_data.end_time:
-            start_time = tx_data.start_time or tx.start_time
-            end_time = tx_data.end_time or tx.end_time
-            tx.charging_duration = calculate_charging_duration(start_time, end_time)
+            tx.charging_duration = calculate_charging_duration(tx.start_time, tx.end_time)
         
+        if transaction_snapshot(tx) != before:
+            await apply_rollup_delta(session, added=[tx], removed=[before])
         await session.commit()
         await session.refresh(tx)
         
@@ -387,13 +434,18 @@ async def delete_transaction(
     """Delete a transaction (Admin only)"""
     async with async_session() as session:
         result = await session.execute(
-            delete(Transaction).where(Transaction.id == transaction_id)
+            delete(Transaction)
+            .where(Transaction.id == transaction_id)
+            .returning(*ROLLUP_COLUMNS)
         )
-        await session.commit()
+        removed = result.mappings().all()
         
-        if result.rowcount == 0:
+        if not removed:
             raise HTTPException(status_code=404, detail="Transaction not found")
         
+        await apply_rollup_delta(session, removed=removed)
+        await session.commit()
+        
         return {"message": "Transaction deleted successfully"}
 
 
@@ -411,17 +463,45 @@ async def bulk_delete_transactions(
     
     async with async_session() as session:
         result = await session.execute(
-            delete(Transaction).where(Transaction.id.in_(request.ids))
+            delete(Transaction)
+            .where(Transaction.id.in_(request.ids))
+            .returning(*ROLLUP_COLUMNS)
         )
+        removed = result.mappings().all()
+        await apply_rollup_delta(session, removed=removed)
         await session.commit()
         
         return {
-            "message": f"Successfully deleted {result.rowcount} transaction(s)",
-            "deleted_count": result.rowcount
+            "message": f"Successfully deleted {len(removed)} transaction(s)",
+            "deleted_count": len(removed)
         }
 
 
-@router.post("/import", response_model=ImportResult)
+def text_column(values):
+    """Strip a spreadsheet column to strings, '' for empty cells"""
+    return values.where(values.notna(), "").astype(str).str.strip()
+
+
+def duration_column(start_times, end_times):
+    """Column-wise calculate_charging_duration()"""
+    seconds = (end_times - start_times).dt.seconds
+    hours = (seconds // 3600).astype("Int64").astype(str)
+    minutes = ((seconds % 3600) // 60).astype("Int64").astype(str)
+    return (hours + "h " + minutes + "m").where(seconds.notna(), "N/A")
+
+
+async def fetch_existing_tx_ids(session, tx_ids: List[str]) -> set:
+    """TxIDs from `tx_ids` that are already stored"""
+    existing = set()
+    for start in range(0, len(tx_ids), IMPORT_CHUNK_SIZE):
+        result = await session.execute(
+            select(Transaction.tx_id).where(Transaction.tx_id.in_(tx_ids[start:start + IMPORT_CHUNK_SIZE]))
+        )
+        existing.update(result.scalars().all())
+    return existing
+
+
+@router.post("/import", response_model=JobSubmitted, status_code=202)
 async def import_transactions(
     file: UploadFile = File(...),
     current_user: UserResponse = Depends(require_role("admin", "user"))
@@ -430,21 +510,31 @@ async def import_transactions(
     Import transactions from Excel file.
     Required columns: TxID, Station, Connector, Account, Start Time, End Time, Meter value(kW.h)
     All other columns are ignored. Duplicates (same TxID) are skipped.
+    Runs as a background job: returns its id at once, the ImportResult is at /api/jobs/{id}.
     """
-    import pandas as pd
-    import logging
-    
     # Validate file extension
     filename = file.filename.lower()
     if not (filename.endswith('.xlsx') or filename.endswith('.xls')):
         raise HTTPException(status_code=400, detail="Only Excel files (.xlsx, .xls) are allowed")
     
+    contents = await file.read()
+    job_id = await job_runner.submit("transactions_import", current_user.id, run_transaction_import, contents, filename)
+    return job_submitted(job_id, "transactions_import")
+
+
+async def run_transaction_import(job: JobContext, contents: bytes, filename: str) -> ImportResult:
+    """The Excel import itself, run by the job runner"""
+    import pandas as pd
+    import logging
+    
     # Read file content
     try:
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
+        df = await spreadsheet_pool.read_table(contents, filename)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to read Excel file: {str(e)}")
+    await job.update(total=len(df), message="Validating rows", force=True)
     
     # Normalize column names - strip whitespace and convert to lowercase for matching
     df.columns = df.columns.str.strip()
@@ -503,94 +593,105 @@ async def import_transactions(
             detail=f"Missing required columns: {', '.join(missing)}. Found: {', '.join(df.columns.tolist())}"
         )
     
-    # Process rows
-    errors = []
+    # Normalize and validate column-wise
+    row_numbers = df.index + 2  # Excel row number (1-indexed + header)
+    tx_ids = text_column(df['TxID'])
+    
+    meter_raw = df['Meter value(kW.h)']
+    meter_values = pd.to_numeric(
+        meter_raw.astype(str).str.replace(',', '.', regex=False).str.strip(),  # comma decimals
+        errors="coerce"
+    ).where(meter_raw.notna(), 0.0)
+    
+    missing_tx_id = tx_ids == ""
+    invalid_meter = ~missing_tx_id & meter_raw.notna() & meter_values.isna()
+    
+    errors = [
+        ImportValidationError(row=int(row_num), field="TxID", message="TxID is required")
+        for row_num in row_numbers[missing_tx_id]
+    ] + [
+        ImportValidationError(row=int(row_num), field="Meter value", message=f"Invalid number: {raw}")
+        for row_num, raw in zip(row_numbers[invalid_meter], meter_raw[invalid_meter])
+    ]
+    errors.sort(key=lambda error: error.row)
+    await job.update(errors=errors)
+    
+    # Zero meter values and repeated TxIDs within the file are skipped
+    valid = ~missing_tx_id & ~invalid_meter
+    importable = valid & (meter_values != 0)
+    repeated = importable & tx_ids.where(importable).duplicated()
+    candidates = importable & ~repeated
+    skipped = int(valid.sum() - candidates.sum())
     imported = 0
-    skipped = 0
-    transactions_to_add = []
     
-    # Use a single session for all operations
+    rows = pd.DataFrame({
+        "tx_id": tx_ids[candidates],
+        "station": text_column(df.loc[candidates, 'Station']),
+        "connector": text_column(df.loc[candidates, 'Connector']),
+        "account": text_column(df.loc[candidates, 'Account']),
+        "start_time": parse_timestamp_series(df.loc[candidates, 'Start Time']),
+        "end_time": parse_timestamp_series(df.loc[candidates, 'End Time']),
+        "meter_value": meter_values[candidates].astype(float),
+    })
+    
     async with async_session() as session:
         try:
-            # Get existing transaction IDs to check for duplicates
-            result = await session.execute(select(Transaction.tx_id))
-            existing_tx_ids = {tx_id for tx_id in result.scalars().all() if tx_id}
+            # The unique tx_id index rejects duplicates; serializing imports and
+            # dropping known TxIDs up front only saves pricing them
+            await session.execute(select(func.pg_advisory_xact_lock(IMPORT_LOCK_KEY)))
             
-            for idx, row in df.iterrows():
-                row_num = idx + 2  # Excel row number (1-indexed + header)
-                
-                try:
-                    # Get TxID
-                    tx_id_raw = row['TxID']
-                    if pd.isna(tx_id_raw) or str(tx_id_raw).strip() == '':
-                        errors.append(ImportValidationError(row=row_num, field="TxID", message="TxID is required"))
-                        continue
-                    tx_id = str(tx_id_raw).strip()
-                    
-                    # Get meter value
-                    meter_raw = row['Meter value(kW.h)']
-                    try:
-                        if pd.isna(meter_raw):
-                            meter_value = 0.0
-                        elif isinstance(meter_raw, str):
-                            # Handle comma decimal separator
-                            meter_value = float(meter_raw.replace(',', '.').strip())
-                        else:
-                            meter_value = float(meter_raw)
-                    except (ValueError, TypeError):
-                        errors.append(ImportValidationError(row=row_num, field="Meter value", message=f"Invalid number: {meter_raw}"))
-                        continue
-                    
-                    # Skip zero meter value
-                    if meter_value == 0:
-                        skipped += 1
-                        continue
-                    
-                    # Check for duplicate TxID
-                    if tx_id in existing_tx_ids:
-                        skipped += 1
-                        continue
-                    
-                    # Extract other fields with safe defaults
-                    station = str(row['Station']).strip() if pd.notna(row['Station']) else ""
-                    connector = str(row['Connector']).strip() if pd.notna(row['Connector']) else ""
-                    account = str(row['Account']).strip() if pd.notna(row['Account']) else ""
-                    start_time = str(row['Start Time']).strip() if pd.notna(row['Start Time']) else ""
-                    end_time = str(row['End Time']).strip() if pd.notna(row['End Time']) else ""
-                    
-                    # Calculate pricing and duration
-                    price_per_kwh = await get_pricing(account, connector, None)
-                    cost = round(meter_value * price_per_kwh, 2)
-                    duration = calculate_charging_duration(start_time, end_time)
-                    
-                    # Create transaction
-                    new_tx = Transaction(
-                        id=str(uuid.uuid4()),
-                        tx_id=tx_id,
-                        station=station,
-                        connector=connector,
-                        account=account,
-                        start_time=start_time,
-                        end_time=end_time,
-                        meter_value=meter_value,
-                        charging_duration=duration,
-                        cost=cost,
-                        payment_status="UNPAID"
-                    )
-                    
-                    transactions_to_add.append(new_tx)
-                    existing_tx_ids.add(tx_id)
-                    imported += 1
-                    
-                except Exception as e:
-                    logging.error(f"Error processing row {row_num}: {e}")
-                    errors.append(ImportValidationError(row=row_num, field="Processing", message=str(e)))
+            existing_tx_ids = await fetch_existing_tx_ids(session, rows["tx_id"].unique().tolist())
+            is_duplicate = rows["tx_id"].isin(existing_tx_ids)
+            skipped += int(is_duplicate.sum())
+            rows = rows[~is_duplicate]
             
-            # Bulk add all transactions in a single commit
-            if transactions_to_add:
-                session.add_all(transactions_to_add)
-                await session.commit()
-                
+            # One pricing lookup for every distinct (account, connector)
+            prices = await pricing_resolver.get_prices(
+                (account, connector, None) for account, connector in zip(rows["account"], rows["connector"])
+            )
+            price_table = pd.DataFrame(
+                [(account, connector, price) for (account, connector, _), price in prices.items()],
+                columns=["account", "connector", "price_per_kwh"]
+            )
+            rows = rows.merge(price_table, on=["account", "connector"], how="left")
+            
+            rows["cost"] = (rows["meter_value"] * rows["price_per_kwh"]).round(2)
+            rows["charging_duration"] = duration_column(rows["start_time"], rows["end_time"])
+            
+            records = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "tx_id": row.tx_id,
+                    "station": row.station,
+                    "connector": row.connector,
+                    "account": row.account,
+                    "start_time": None if pd.isna(row.start_time) else row.start_time.to_pydatetime(),
+                    "end_time": None if pd.isna(row.end_time) else row.end_time.to_pydatetime(),
+                    "meter_value": float(row.meter_value),
+                    "charging_duration": row.charging_duration,
+                    "cost": float(row.cost),
+                    "payment_status": "UNPAID",
+                }
+                for row in rows.itertuples(index=False)
+            ]
+            
+            # One multi-row INSERT per chunk
+            for start in range(0, len(records), IMPORT_CHUNK_SIZE):
+                chunk = records[start:start + IMPORT_CHUNK_SIZE]
+                result = await session.execute(
+                    insert(Transaction)
+                    .values(chunk)
+                    .on_conflict_do_nothing(index_elements=[Transaction.tx_id])
+                    .returning(*ROLLUP_COLUMNS)
+                )
+                inserted = result.mappings().all()
+                await apply_rollup_delta(session, added=inserted)
+                imported += len(inserted)
+                skipped += len(chunk) - len(inserted)
+                await job.update(progress=start + len(chunk), total=len(records), message="Inserting transactions")
+            
+            await session.commit()
+        
         except Exception as e:
             logging.error(f"Database error during transaction import: {e}")
             await session.rollback()
@@ -619,14 +720,16 @@ async def import_transactions_json(
     errors = []
     imported = 0
     skipped = 0
-    transactions_to_add = []
+    records = []
     
     # Use a single session for all operations
     async with async_session() as session:
         try:
-            # Get existing transaction IDs to check for duplicates
-            result = await session.execute(select(Transaction.tx_id))
-            existing_tx_ids = {tx_id for tx_id in result.scalars().all() if tx_id}
+            # Known TxIDs are skipped before pricing; the unique tx_id index below is what
+            # keeps out rows stored concurrently
+            existing_tx_ids = await fetch_existing_tx_ids(session, list({
+                str(row.get('TxID', '')).strip() for row in request.transactions
+            }))
             
             for idx, row in enumerate(request.transactions):
                 row_num = idx + 2  # Excel row number
@@ -663,53 +766,82 @@ async def import_transactions_json(
                     station = str(row.get('Station', '')).strip()
                     connector = str(row.get('Connector', '')).strip()
                     account = str(row.get('Account', '')).strip()
-                    start_time = str(row.get('Start Time', '')).strip()
-                    end_time = str(row.get('End Time', '')).strip()
+                    try:
+                        start_time = parse_timestamp_strict(row.get('Start Time'))
+                    except ValueError as e:
+                        errors.append(ImportValidationError(row=row_num, field="Start Time", message=str(e)))
+                        continue
+                    try:
+                        end_time = parse_timestamp_strict(row.get('End Time'))
+                    except ValueError as e:
+                        errors.append(ImportValidationError(row=row_num, field="End Time", message=str(e)))
+                        continue
                     
                     # Calculate pricing and duration
                     price_per_kwh = await get_pricing(account, connector, None)
                     cost = round(meter_value * price_per_kwh, 2)
                     duration = calculate_charging_duration(start_time, end_time)
                     
-                    # Try to deduct from RFID balance
-                    payment_status = "UNPAID"
-                    deduction_result = await deduct_rfid_balance(account, cost)
-                    if deduction_result.get("deducted"):
-                        payment_status = "PAID"
-                    
-                    # Create transaction
-                    new_tx = Transaction(
-                        id=str(uuid.uuid4()),
-                        tx_id=tx_id,
-                        station=station,
-                        connector=connector,
-                        account=account,
-                        start_time=start_time,
-                        end_time=end_time,
-                        meter_value=meter_value,
-                        charging_duration=duration,
-                        cost=cost,
-                        payment_status=payment_status
-                    )
-                    
-                    transactions_to_add.append(new_tx)
+                    records.append({
+                        "id": str(uuid.uuid4()),
+                        "tx_id": tx_id,
+                        "station": station,
+                        "connector": connector,
+                        "account": account,
+                        "start_time": start_time,
+                        "end_time": end_time,
+                        "meter_value": meter_value,
+                        "charging_duration": duration,
+                        "cost": cost,
+                        "payment_status": "UNPAID",
+                    })
                     existing_tx_ids.add(tx_id)
-                    imported += 1
-                    
+                
                 except Exception as e:
                     logging.error(f"Error processing row {row_num}: {e}")
                     errors.append(ImportValidationError(row=row_num, field="Processing", message=str(e)))
             
-            # Bulk add all transactions in a single commit
-            if transactions_to_add:
-                session.add_all(transactions_to_add)
-                await session.commit()
-                
+            # Rows are inserted before any RFID balance is charged, so a TxID stored
+            # concurrently is skipped instead of charged twice
+            inserted = []
+            for start in range(0, len(records), IMPORT_CHUNK_SIZE):
+                chunk = records[start:start + IMPORT_CHUNK_SIZE]
+                result = await session.execute(
+                    insert(Transaction)
+                    .values(chunk)
+                    .on_conflict_do_nothing(index_elements=[Transaction.tx_id])
+                    .returning(Transaction.id)
+                )
+                inserted_ids = set(result.scalars().all())
+                inserted.extend(record for record in chunk if record["id"] in inserted_ids)
+                skipped += len(chunk) - len(inserted_ids)
+            
+            # Charged in the import's transaction with one ledger statement, so the
+            # rows and the balances they paid from commit or roll back together
+            charges, paid_ids = await collect_import_charges(session, inserted)
+            settled = await rfid_ledger.settle(session, charges)
+            if paid_ids:
+                paid = set(paid_ids)
+                for record in inserted:
+                    if record["id"] in paid:
+                        record["payment_status"] = "PAID"
+                await session.execute(
+                    update(Transaction).where(Transaction.id.in_(paid_ids)).values(payment_status="PAID")
+                )
+            
+            imported = len(inserted)
+            if inserted:
+                await apply_rollup_delta(session, added=inserted)
+            await session.commit()
+        
         except Exception as e:
             logging.error(f"Database error during transaction import: {e}")
             await session.rollback()
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     
+    if settled:
+        await rfid_auth.refresh(list(latest_balances(settled)))
+    
     return ImportResult(
         success=len(errors) == 0,
         imported_count=imported,
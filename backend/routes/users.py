@@ -5,14 +5,21 @@ from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional
 from datetime import datetime, timezone
-import bcrypt
 import uuid
-from io import BytesIO
 
-from sqlalchemy import select, delete
-from database import async_session, User, PricingGroup
+from sqlalchemy import select, delete, update
+from database import async_session, User, PricingGroup, RFIDCard
 
 from routes.auth import get_current_user, require_role, UserResponse
+from services.pricing import pricing_resolver
+from services.user_cache import user_cache
+from services.passwords import password_hasher
+from services.rfid_auth import rfid_auth
+from services.accounts import account_index
+from services.ledger import rfid_ledger
+from services.jobs import job_runner, JobContext
+from services.spreadsheets import spreadsheet_pool
+from routes.jobs import JobSubmitted, job_submitted
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -48,33 +55,73 @@ class UserImportResult(BaseModel):
     errors: List[dict]
 
 
+def users_with_card():
+    """Users with the balance and status of their card, which is where they are kept"""
+    return (
+        select(User, RFIDCard.balance, RFIDCard.status)
+        .outerjoin(RFIDCard, RFIDCard.card_number == User.rfid_card_number)
+    )
+
+
+def user_to_response(user: User, card_balance: Optional[float] = None, card_status: Optional[str] = None) -> UserResponse:
+    return UserResponse(
+        id=user.id,
+        email=user.email,
+        name=user.name,
+        role=user.role,
+        phone=user.phone,
+        pricing_group_id=user.pricing_group_id,
+        rfid_card_number=user.rfid_card_number,
+        rfid_balance=(card_balance if card_balance is not None else user.rfid_balance) or 0.0,
+        rfid_status=card_status or user.rfid_status or "active",
+        placa=user.placa,
+        whatsapp_enabled=user.whatsapp_enabled if hasattr(user, 'whatsapp_enabled') else True,
+        created_at=user.created_at.isoformat() if user.created_at else None
+    )
+
+
+async def get_user_response(session, user_id: str) -> UserResponse:
+    result = await session.execute(users_with_card().where(User.id == user_id))
+    return user_to_response(*result.one())
+
+
+async def set_card_balance(session, card_number: str, balance: float, notes: str):
+    """Bring a card to `balance` through the ledger, as one ADJUSTMENT in its history"""
+    if balance < 0:
+        raise HTTPException(status_code=400, detail="RFID balance cannot be negative")
+    result = await session.execute(
+        select(RFIDCard.id, RFIDCard.balance).where(RFIDCard.card_number == card_number).with_for_update()
+    )
+    card = result.one_or_none()
+    if card is None:
+        raise HTTPException(status_code=404, detail="RFID card not found")
+    difference = balance - (card.balance or 0)
+    if difference:
+        await rfid_ledger.apply(session, difference, "ADJUSTMENT", notes, card_id=card.id)
+
+
+async def check_card_number_free(session, card_number: str, user_id: Optional[str] = None):
+    """400 if another user holds this RFID card number, as theirs or as a card they own"""
+    conflict = await session.execute(
+        select(User.id).where(User.rfid_card_number == card_number, User.id != user_id)
+    )
+    owner = await session.execute(
+        select(RFIDCard.user_id).where(RFIDCard.card_number == card_number)
+    )
+    card_owner = owner.scalar_one_or_none()
+    if conflict.first() is not None or card_owner not in (None, user_id):
+        raise HTTPException(status_code=400, detail="RFID card number already assigned")
+
+
 # Routes
 @router.get("", response_model=List[UserResponse])
 async def get_users(current_user: UserResponse = Depends(require_role("admin"))):
     """Get all users (Admin only)"""
     async with async_session() as session:
         result = await session.execute(
-            select(User).order_by(User.created_at.desc())
+            users_with_card().order_by(User.created_at.desc())
         )
-        users = result.scalars().all()
-        
-        return [
-            UserResponse(
-                id=u.id,
-                email=u.email,
-                name=u.name,
-                role=u.role,
-                phone=u.phone,
-                pricing_group_id=u.pricing_group_id,
-                rfid_card_number=u.rfid_card_number,
-                rfid_balance=u.rfid_balance or 0.0,
-                rfid_status=u.rfid_status or "active",
-                placa=u.placa,
-                whatsapp_enabled=u.whatsapp_enabled if hasattr(u, 'whatsapp_enabled') else True,
-                created_at=u.created_at.isoformat() if u.created_at else None
-            )
-            for u in users
-        ]
+        return [user_to_response(*row) for row in result.all()]
 
 
 @router.get("/{user_id}", response_model=UserResponse)
@@ -85,27 +132,14 @@ async def get_user(
     """Get a single user by ID"""
     async with async_session() as session:
         result = await session.execute(
-            select(User).where(User.id == user_id)
+            users_with_card().where(User.id == user_id)
         )
-        user = result.scalar_one_or_none()
+        row = result.one_or_none()
         
-        if not user:
+        if not row:
             raise HTTPException(status_code=404, detail="User not found")
         
-        return UserResponse(
-            id=user.id,
-            email=user.email,
-            name=user.name,
-            role=user.role,
-            phone=user.phone,
-            pricing_group_id=user.pricing_group_id,
-            rfid_card_number=user.rfid_card_number,
-            rfid_balance=user.rfid_balance or 0.0,
-            rfid_status=user.rfid_status or "active",
-            placa=user.placa,
-            whatsapp_enabled=user.whatsapp_enabled if hasattr(user, 'whatsapp_enabled') else True,
-            created_at=user.created_at.isoformat() if user.created_at else None
-        )
+        return user_to_response(*row)
 
 
 @router.post("", response_model=UserResponse)
@@ -124,19 +158,14 @@ async def create_user(
         
         # Check if RFID card number exists
         if user_data.rfid_card_number:
-            result = await session.execute(
-                select(User).where(User.rfid_card_number == user_data.rfid_card_number)
-            )
-            if result.scalar_one_or_none():
-                raise HTTPException(status_code=400, detail="RFID card number already assigned")
+            await check_card_number_free(session, user_data.rfid_card_number)
+        elif user_data.rfid_balance:
+            raise HTTPException(status_code=400, detail="User has no RFID card")
         
         if user_data.role not in ["admin", "user", "viewer"]:
             raise HTTPException(status_code=400, detail="Invalid role")
         
-        password_hash = bcrypt.hashpw(
-            user_data.password.encode('utf-8'), 
-            bcrypt.gensalt()
-        ).decode('utf-8')
+        password_hash = await password_hasher.hash(user_data.password)
         
         new_user = User(
             id=str(uuid.uuid4()),
@@ -146,29 +175,22 @@ async def create_user(
             role=user_data.role,
             phone=user_data.phone,
             rfid_card_number=user_data.rfid_card_number,
-            rfid_balance=user_data.rfid_balance or 0.0,
             rfid_status="active",
             placa=user_data.placa,
             whatsapp_enabled=user_data.whatsapp_enabled if user_data.whatsapp_enabled is not None else True
         )
         session.add(new_user)
+        # Creates the user's card and indexes their identifiers
+        await account_index.sync_users(session, [new_user.id])
+        if user_data.rfid_balance:
+            await set_card_balance(
+                session, new_user.rfid_card_number, user_data.rfid_balance, f"Initial balance set by {current_user.email}"
+            )
         await session.commit()
-        await session.refresh(new_user)
+        pricing_resolver.invalidate()
+        await rfid_auth.refresh([new_user.rfid_card_number])
         
-        return UserResponse(
-            id=new_user.id,
-            email=new_user.email,
-            name=new_user.name,
-            role=new_user.role,
-            phone=new_user.phone,
-            pricing_group_id=new_user.pricing_group_id,
-            rfid_card_number=new_user.rfid_card_number,
-            rfid_balance=new_user.rfid_balance or 0.0,
-            rfid_status=new_user.rfid_status or "active",
-            placa=new_user.placa,
-            whatsapp_enabled=new_user.whatsapp_enabled if hasattr(new_user, 'whatsapp_enabled') else True,
-            created_at=new_user.created_at.isoformat() if new_user.created_at else None
-        )
+        return await get_user_response(session, new_user.id)
 
 
 @router.patch("/{user_id}", response_model=UserResponse)
@@ -186,6 +208,7 @@ async def update_user(
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
+        previous_card_number = user.rfid_card_number
         
         if user_data.name:
             user.name = user_data.name
@@ -200,24 +223,17 @@ async def update_user(
             user.email = user_data.email
         
         if user_data.password:
-            user.password_hash = bcrypt.hashpw(
-                user_data.password.encode('utf-8'),
-                bcrypt.gensalt()
-            ).decode('utf-8')
+            user.password_hash = await password_hasher.hash(user_data.password)
         
         # Update RFID fields
         if user_data.rfid_card_number is not None:
             if user_data.rfid_card_number:
                 # Check if RFID card number is used by another user
-                rfid_check = await session.execute(
-                    select(User).where(User.rfid_card_number == user_data.rfid_card_number, User.id != user_id)
-                )
-                if rfid_check.scalar_one_or_none():
-                    raise HTTPException(status_code=400, detail="RFID card number already assigned")
+                await check_card_number_free(session, user_data.rfid_card_number, user_id)
             user.rfid_card_number = user_data.rfid_card_number or None
         
-        if user_data.rfid_balance is not None:
-            user.rfid_balance = user_data.rfid_balance
+        if user_data.rfid_balance is not None and not user.rfid_card_number:
+            raise HTTPException(status_code=400, detail="User has no RFID card")
         
         if user_data.rfid_status is not None:
             if user_data.rfid_status not in ["active", "inactive", "blocked"]:
@@ -236,23 +252,35 @@ async def update_user(
         if user_data.whatsapp_enabled is not None:
             user.whatsapp_enabled = user_data.whatsapp_enabled
         
+        # A new number for the user's card keeps its balance and history
+        card_number = user.rfid_card_number
+        if previous_card_number and card_number and card_number != previous_card_number:
+            taken = await session.execute(select(RFIDCard.id).where(RFIDCard.card_number == card_number))
+            if taken.first() is None:
+                await session.execute(
+                    update(RFIDCard)
+                    .where(RFIDCard.card_number == previous_card_number, RFIDCard.user_id == user_id)
+                    .values(card_number=card_number)
+                )
+        
+        await account_index.sync_users(session, [user_id])
+        
+        # Balance and status are kept on the card; balance edits go through the ledger
+        if user_data.rfid_balance is not None:
+            await set_card_balance(
+                session, card_number, user_data.rfid_balance, f"Balance set by {current_user.email}"
+            )
+        if user_data.rfid_status is not None and card_number:
+            await session.execute(
+                update(RFIDCard).where(RFIDCard.card_number == card_number).values(status=user_data.rfid_status)
+            )
+        
         await session.commit()
-        await session.refresh(user)
+        pricing_resolver.invalidate()
+        user_cache.invalidate(user_id)
+        await rfid_auth.refresh([previous_card_number, card_number])
         
-        return UserResponse(
-            id=user.id,
-            email=user.email,
-            name=user.name,
-            role=user.role,
-            phone=user.phone,
-            pricing_group_id=user.pricing_group_id,
-            rfid_card_number=user.rfid_card_number,
-            rfid_balance=user.rfid_balance or 0.0,
-            rfid_status=user.rfid_status or "active",
-            placa=user.placa,
-            whatsapp_enabled=user.whatsapp_enabled if hasattr(user, 'whatsapp_enabled') else True,
-            created_at=user.created_at.isoformat() if user.created_at else None
-        )
+        return await get_user_response(session, user_id)
 
 
 @router.patch("/{user_id}/role")
@@ -276,6 +304,7 @@ async def update_user_role(
         
         user.role = role
         await session.commit()
+        user_cache.invalidate(user_id)
         
         return {"message": "Role updated successfully"}
 
@@ -296,19 +325,27 @@ async def topup_rfid_balance(
     
     async with async_session() as session:
         result = await session.execute(
-            select(User).where(User.id == user_id)
+            select(User.rfid_card_number).where(User.id == user_id)
         )
-        user = result.scalar_one_or_none()
+        user = result.one_or_none()
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
+        if not user.rfid_card_number:
+            raise HTTPException(status_code=400, detail="User has no RFID card")
         
-        user.rfid_balance = (user.rfid_balance or 0) + request.amount
+        # Credited on the user's card, in one UPDATE with its history row
+        topped_up = await rfid_ledger.apply(
+            session, request.amount, "TOPUP", card_number=user.rfid_card_number
+        )
+        if topped_up is None:
+            raise HTTPException(status_code=404, detail="RFID card not found")
         await session.commit()
+        await rfid_auth.refresh([user.rfid_card_number])
         
         return {
             "message": "Balance topped up successfully",
-            "new_balance": user.rfid_balance
+            "new_balance": topped_up.balance_after
         }
 
 
@@ -323,34 +360,43 @@ async def delete_user(
     
     async with async_session() as session:
         result = await session.execute(
-            delete(User).where(User.id == user_id)
+            delete(User).where(User.id == user_id).returning(User.rfid_card_number)
         )
+        deleted = result.first()
         await session.commit()
+        pricing_resolver.invalidate()
+        user_cache.invalidate(user_id)
         
-        if result.rowcount == 0:
+        if deleted is None:
             raise HTTPException(status_code=404, detail="User not found")
+        await rfid_auth.refresh([deleted.rfid_card_number])
         
         return {"message": "User deleted successfully"}
 
 
-@router.post("/import", response_model=UserImportResult)
+@router.post("/import", response_model=JobSubmitted, status_code=202)
 async def import_users(
     file: UploadFile = File(...),
     current_user: UserResponse = Depends(require_role("admin"))
 ):
-    """Import users from Excel/CSV file (Admin only)"""
-    import pandas as pd
-    import logging
-    
+    """Import users from Excel/CSV file as a background job (Admin only); the result is at /api/jobs/{id}"""
     if not file.filename.endswith(('.xlsx', '.xls', '.csv')):
         raise HTTPException(status_code=400, detail="File must be Excel (.xlsx, .xls) or CSV (.csv)")
     
+    contents = await file.read()
+    job_id = await job_runner.submit("users_import", current_user.id, run_user_import, contents, file.filename)
+    return job_submitted(job_id, "users_import")
+
+
+async def run_user_import(job: JobContext, contents: bytes, filename: str) -> UserImportResult:
+    """The user import itself, run by the job runner"""
+    import pandas as pd
+    import logging
+    
     try:
-        contents = await file.read()
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(BytesIO(contents))
-        else:
-            df = pd.read_excel(BytesIO(contents))
+        df = await spreadsheet_pool.read_table(contents, filename)
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Failed to read import file: {e}")
         raise HTTPException(status_code=400, detail=f"Failed to read file: {str(e)}")
@@ -381,6 +427,7 @@ async def import_users(
         raise HTTPException(status_code=400, detail="Missing required column: Name")
     if not email_col:
         raise HTTPException(status_code=400, detail="Missing required column: Email")
+    await job.update(total=len(df), message="Importing users", force=True)
     
     imported = 0
     skipped = 0
@@ -401,11 +448,16 @@ async def import_users(
             # Get existing RFID cards
             result = await session.execute(select(User.rfid_card_number).where(User.rfid_card_number.isnot(None)))
             existing_rfids = {rfid for rfid in result.scalars().all() if rfid}
+            # Cards owned by someone are taken too
+            result = await session.execute(select(RFIDCard.card_number).where(RFIDCard.user_id.isnot(None)))
+            existing_rfids.update(result.scalars().all())
             
             users_to_add = []
+            passwords = []
             
             for idx, row in df.iterrows():
                 row_num = idx + 2
+                await job.update(progress=idx, errors=errors)
                 
                 try:
                     name = str(row[name_col]).strip() if pd.notna(row[name_col]) else ""
@@ -440,8 +492,6 @@ async def import_users(
                         if len(pwd) >= 6:
                             password = pwd
                     
-                    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-                    
                     # Get pricing group
                     pricing_group_id = None
                     if group_col and pd.notna(row.get(group_col)):
@@ -465,7 +515,6 @@ async def import_users(
                         id=str(uuid.uuid4()),
                         name=name,
                         email=email,
-                        password_hash=password_hash,
                         role=role,
                         phone=phone,
                         rfid_card_number=rfid_card_number,
@@ -474,18 +523,28 @@ async def import_users(
                     )
                     
                     users_to_add.append(new_user)
+                    passwords.append(password)
                     existing_emails.add(email)
                     imported += 1
-                    
+                
                 except Exception as e:
                     logging.error(f"Error processing row {row_num}: {e}")
                     errors.append({"row": row_num, "field": "Processing", "message": str(e)})
             
+            # Hash off the event loop; only the default password we assign is hashed once and shared
+            await job.update(progress=len(df), errors=errors, message="Saving users", force=True)
+            hashes = await password_hasher.hash_many(passwords, shared=[default_password])
+            for new_user, password_hash in zip(users_to_add, hashes):
+                new_user.password_hash = password_hash
+            
             # Bulk add all users in a single transaction
             if users_to_add:
                 session.add_all(users_to_add)
+                await account_index.sync_users(session, [u.id for u in users_to_add])
                 await session.commit()
-                
+                pricing_resolver.invalidate()
+                await rfid_auth.refresh([u.rfid_card_number for u in users_to_add])
+        
         except Exception as e:
             logging.error(f"Database error during user import: {e}")
             await session.rollback()
@@ -0,0 +1,99 @@
+"""
+Standalone OCPP Gateway
+Runs the charger-facing OCPP WebSocket server in N worker processes, apart
+from the API. Start the API with OCPP_GATEWAY_MODE=external so it does not
+run its own OCPP server; commands and events are routed through the
+ocpp_connections registry (see services/ocpp_gateway.py).
+
+With --reuse-port all workers share one port (SO_REUSEPORT, Linux only).
+Without it worker i listens on port + i, so put a TCP load balancer in front.
+
+Usage:
+    cd backend
+    set OCPP_GATEWAY_MODE=external
+    python run_ocpp_gateway.py --workers 4 --port 9000 [--reuse-port]
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+from pathlib import Path
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("ocpp_gateway")
+
+
+async def serve(index: int, host: str, port: int, reuse_port: bool):
+    # Imported here so every worker process builds its own engine and event loop
+    from services.ocpp_journal import ocpp_journal
+    from services.ocpp_gateway import ocpp_gateway, start_ocpp_runtime, stop_ocpp_runtime
+    import routes.ocpp  # noqa: F401 - registers the database callbacks on the central system
+    
+    # Each worker replays only its own journal
+    journal = Path(ocpp_journal.path)
+    ocpp_journal.path = str(journal.with_name(f"{journal.stem}_{index}{journal.suffix}"))
+    # Chargers here are always reached through the registry
+    ocpp_gateway.multi_process = True
+    
+    server = await start_ocpp_runtime(host=host, port=port, reuse_port=reuse_port)
+    if server is None:
+        await stop_ocpp_runtime()
+        return
+    logger.info(f"Worker {index} (pid {os.getpid()}) serving ws://{host}:{port}")
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C raises KeyboardInterrupt instead
+    
+    try:
+        await stop.wait()
+    finally:
+        await stop_ocpp_runtime(server)
+        logger.info(f"Worker {index} stopped")
+
+
+def run_worker(index: int, host: str, port: int, reuse_port: bool):
+    try:
+        asyncio.run(serve(index, host, port, reuse_port))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run OCPP gateway workers")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--reuse-port", action="store_true", help="share one port between workers (Linux only)")
+    args = parser.parse_args()
+    
+    if args.reuse_port and not hasattr(__import__("socket"), "SO_REUSEPORT"):
+        parser.error("--reuse-port is not supported on this platform")
+    if os.environ.get('OCPP_GATEWAY_MODE', 'embedded').lower() != 'external':
+        logger.warning("OCPP_GATEWAY_MODE is not 'external'; the API will also run an OCPP server")
+    
+    processes = []
+    for index in range(args.workers):
+        port = args.port if args.reuse_port else args.port + index
+        process = multiprocessing.Process(
+            target=run_worker, args=(index, args.host, port, args.reuse_port), name=f"ocpp-gateway-{index}"
+        )
+        process.start()
+        processes.append(process)
+    
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
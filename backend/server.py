@@ -11,8 +11,9 @@ from fastapi import FastAPI, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 import bcrypt
 import uuid
-
 from database import engine, Base, async_session, User
+from services.passwords import password_hasher
+from services.user_cache import user_cache
 
 # Configure logging
 logging.basicConfig(
@@ -74,14 +75,40 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Admin user check failed: {e}")
     
-    # Start OCPP WebSocket server
-    logger.info("Starting OCPP 1.6 WebSocket server...")
+    # Build dashboard rollups if this database predates them
     try:
-        from services.ocpp_server import start_ocpp_server
-        ocpp_server = await start_ocpp_server(host="0.0.0.0", port=9000)
-        logger.info("✓ OCPP WebSocket server running on ws://0.0.0.0:9000")
+        from services.rollups import ensure_rollups
+        await ensure_rollups()
+        logger.info("✓ Transaction rollups ready")
     except Exception as e:
-        logger.error(f"Failed to start OCPP server: {e}")
+        logger.error(f"Transaction rollup check failed: {e}")
+    
+    # Start OCPP (unless a separate run_ocpp_gateway.py process runs it)
+    from services.ocpp_gateway import ocpp_gateway, start_ocpp_runtime, stop_ocpp_runtime
+    from services.ocpp_broadcast import ocpp_broadcaster
+    from services.charger_status import charger_status
+    from routes.ocpp import dispatch_ocpp_event
+    ocpp_server = None
+    if ocpp_gateway.runs_ocpp_server:
+        logger.info("Starting OCPP 1.6 WebSocket server...")
+        ocpp_server = await start_ocpp_runtime(host="0.0.0.0", port=9000, event_handler=dispatch_ocpp_event)
+    else:
+        try:
+            # HTTP heartbeats are still coalesced in this process
+            await charger_status.start()
+            await ocpp_gateway.start(owns_chargers=False, event_handler=dispatch_ocpp_event)
+            logger.info("✓ OCPP gateway mode: chargers served by run_ocpp_gateway.py")
+        except Exception as e:
+            logger.error(f"Failed to connect to OCPP gateway registry: {e}")
+    
+    # Background imports/exports
+    from services.jobs import job_runner
+    from services.spreadsheets import spreadsheet_pool
+    try:
+        await job_runner.start()
+        logger.info("✓ Job runner started")
+    except Exception as e:
+        logger.error(f"Failed to start job runner: {e}")
     
     logger.info("✓ Server startup complete")
     yield
@@ -90,6 +117,11 @@ async def lifespan(app: FastAPI):
     logger.info("Server shutting down...")
     if ocpp_server_task:
         ocpp_server_task.cancel()
+    
+    await job_runner.stop()
+    spreadsheet_pool.shutdown()
+    await stop_ocpp_runtime(ocpp_server)
+    await ocpp_broadcaster.stop()
 
 
 # Create FastAPI app
@@ -126,6 +158,7 @@ from routes.email import router as email_router
 from routes.reports import router as reports_router
 from routes.public_charge import router as public_charge_router
 from routes.expenses import router as expenses_router
+from routes.jobs import router as jobs_router
 
 # Register all routers under /api prefix
 app.include_router(auth_router, prefix="/api")
@@ -142,6 +175,7 @@ app.include_router(email_router, prefix="/api")
 app.include_router(reports_router, prefix="/api")
 app.include_router(public_charge_router, prefix="/api")
 app.include_router(expenses_router, prefix="/api")
+app.include_router(jobs_router, prefix="/api")
 
 
 # Health check endpoint
@@ -151,7 +185,8 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now(timezone.utc).isoformat(),
-        "version": "2.0.0"
+        "version": "2.0.0",
+        "password_pool": password_hasher.stats()
     }
 
 
@@ -172,32 +207,16 @@ async def test_upload(file: UploadFile = File(...)):
 @app.get("/api/filters/stations")
 async def get_stations():
     """Get unique stations (backwards compatibility)"""
-    from routes.dashboard import get_stations as dashboard_get_stations
-    from routes.auth import get_current_user, security
+    from services.rollups import get_dimension_keys
     # This is a public endpoint for filters
-    from sqlalchemy import select
-    from database import Transaction
-    
-    async with async_session() as session:
-        result = await session.execute(
-            select(Transaction.station).distinct()
-        )
-        stations = [row[0] for row in result.fetchall() if row[0]]
-        return sorted(stations)
+    return await get_dimension_keys("station")
 
 
 @app.get("/api/filters/accounts")
 async def get_accounts():
     """Get unique accounts (backwards compatibility)"""
-    from sqlalchemy import select
-    from database import Transaction
-    
-    async with async_session() as session:
-        result = await session.execute(
-            select(Transaction.account).distinct()
-        )
-        accounts = [row[0] for row in result.fetchall() if row[0]]
-        return sorted(accounts)
+    from services.rollups import get_dimension_keys
+    return await get_dimension_keys("account")
 
 
 # Admin setup endpoint for manual admin creation/reset
@@ -211,16 +230,15 @@ async def setup_admin():
         )
         admin = result.scalar_one_or_none()
         
-        password_hash = bcrypt.hashpw(
-            "admin123".encode('utf-8'),
-            bcrypt.gensalt()
-        ).decode('utf-8')
+        password_hash = await password_hasher.hash("admin123")
         
         if admin:
             admin.password_hash = password_hash
             admin.name = "Administrator"
             admin.role = "admin"
             await session.commit()
+            # Tokens cached with the old role or password must be checked again
+            user_cache.invalidate(admin.id)
             return {"message": "Admin password reset to: admin123"}
         else:
             admin = User(
@@ -0,0 +1,225 @@
+"""
+Account resolution
+A transaction's account may hold a card number, a user's email, name or
+placa. account_aliases maps each of them (trimmed, lowercased) to the one
+RFID card whose balance is charged, so resolving an account is a single
+primary-key lookup instead of an OR across unindexed users columns.
+
+The card is the only balance store: a user's rfid_card_number gets an
+rfid_cards row, any balance left in users.rfid_balance is moved onto it with
+an ADJUSTMENT history entry, and the user's other aliases point at that
+card, or at their oldest card when they have no number of their own. A name
+or placa shared by several users stays with the user who claimed it first.
+
+Writers call sync_users()/sync_cards() in their transaction after changing
+users or cards; migrations/add_account_aliases.sql builds the table once.
+"""
+import logging
+from typing import Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import text
+
+from database import AccountAlias, RFIDCard, RFIDHistory, User
+
+logger = logging.getLogger(__name__)
+
+# Lookup order when one identifier matches several kinds
+ALIAS_KINDS = ("card", "email", "placa", "name")
+
+ALIASES = AccountAlias.__tablename__
+CARDS = RFIDCard.__tablename__
+HISTORY = RFIDHistory.__tablename__
+USERS = User.__tablename__
+
+# Card and history ids generated in SQL (gen_random_uuid() needs PostgreSQL 13)
+NEW_CARD_ID = "md5(random()::text || clock_timestamp()::text || u.id)::uuid::text"
+NEW_HISTORY_ID = "md5(random()::text || clock_timestamp()::text || m.id)::uuid::text"
+
+RESOLVE = text(
+    f"SELECT c.id AS card_id, c.card_number, c.user_id, COALESCE(c.balance, 0) AS balance, "
+    "COALESCE(c.status, 'active') AS status, c.is_active "
+    f"FROM {ALIASES} a JOIN {CARDS} c ON c.id = a.card_id "
+    "WHERE a.alias = CAST(:alias AS text) "
+    "ORDER BY array_position(CAST(:kinds AS text[]), a.kind) LIMIT 1"
+)
+
+# Users' rfid_card_number -> their card. A missing card is created holding the
+# user's users.rfid_balance/rfid_status; an existing card that is unowned or
+# already theirs gets that balance added. Either way the amount moves in one
+# ADJUSTMENT history row and users.rfid_balance is zeroed, so syncing again
+# adds nothing. A card owned by another user is left alone and the user is
+# returned as unmerged, keeping their users.rfid_balance.
+CONSOLIDATE_USER_CARDS = text(
+    "WITH u AS ("
+    "SELECT id, email, rfid_card_number, COALESCE(rfid_balance, 0) AS balance, "
+    "COALESCE(rfid_status, 'active') AS status "
+    f"FROM {USERS} WHERE id = ANY(CAST(:user_ids AS text[])) AND rfid_card_number IS NOT NULL"
+    "), merged AS ("
+    f"INSERT INTO {CARDS} (id, card_number, user_id, balance, status, is_active, low_balance_threshold, created_at) "
+    f"SELECT {NEW_CARD_ID}, u.rfid_card_number, u.id, u.balance, u.status, TRUE, "
+    f"{RFIDCard.low_balance_threshold.default.arg}, now() FROM u "
+    f"ON CONFLICT (card_number) DO UPDATE SET balance = COALESCE({CARDS}.balance, 0) + EXCLUDED.balance, "
+    f"user_id = COALESCE({CARDS}.user_id, EXCLUDED.user_id) "
+    f"WHERE {CARDS}.user_id IS NULL OR {CARDS}.user_id = EXCLUDED.user_id "
+    "RETURNING id, card_number, balance"
+    "), history AS ("
+    f"INSERT INTO {HISTORY} (id, card_id, transaction_type, amount, balance_before, balance_after, notes, created_at) "
+    f"SELECT {NEW_HISTORY_ID}, m.id, 'ADJUSTMENT', u.balance, m.balance - u.balance, m.balance, "
+    "'Merged users.rfid_balance of ' || u.email, now() "
+    "FROM merged m JOIN u ON u.rfid_card_number = m.card_number WHERE u.balance <> 0"
+    "), cleared AS ("
+    f"UPDATE {USERS} SET rfid_balance = 0 FROM merged m JOIN u ON u.rfid_card_number = m.card_number "
+    f"WHERE {USERS}.id = u.id AND u.balance <> 0"
+    ") SELECT m.id AS card_id, NULL AS user_id, NULL AS card_number, NULL AS balance FROM merged m "
+    "UNION ALL SELECT NULL, u.id, u.rfid_card_number, u.balance FROM u "
+    "WHERE NOT EXISTS (SELECT 1 FROM merged m WHERE m.card_number = u.rfid_card_number)"
+)
+
+DROP_USER_ALIASES = text(
+    f"DELETE FROM {ALIASES} WHERE user_id = ANY(CAST(:user_ids AS text[]))"
+)
+
+USER_ALIASES = text(
+    f"INSERT INTO {ALIASES} (alias, kind, card_id, user_id) "
+    "SELECT a.alias, a.kind, card.id, u.id "
+    f"FROM {USERS} u "
+    "JOIN LATERAL ("
+    f"SELECT rc.id FROM {CARDS} rc "
+    "WHERE rc.card_number = u.rfid_card_number OR rc.user_id = u.id "
+    "ORDER BY rc.card_number IS NOT DISTINCT FROM u.rfid_card_number DESC, rc.created_at, rc.id LIMIT 1"
+    ") card ON TRUE "
+    "CROSS JOIN LATERAL (VALUES "
+    "(lower(trim(u.email)), 'email'), (lower(trim(u.placa)), 'placa'), (lower(trim(u.name)), 'name')"
+    ") AS a(alias, kind) "
+    "WHERE u.id = ANY(CAST(:user_ids AS text[])) AND COALESCE(a.alias, '') <> '' "
+    "ORDER BY u.created_at, u.id "
+    "ON CONFLICT (alias, kind) DO NOTHING"
+)
+
+DROP_STALE_CARD_ALIASES = text(
+    f"DELETE FROM {ALIASES} a USING {CARDS} c "
+    "WHERE a.card_id = c.id AND a.kind = 'card' AND c.id = ANY(CAST(:card_ids AS text[])) "
+    "AND a.alias <> lower(trim(c.card_number))"
+)
+
+CARD_ALIASES = text(
+    f"INSERT INTO {ALIASES} (alias, kind, card_id, user_id) "
+    f"SELECT DISTINCT ON (lower(trim(card_number))) lower(trim(card_number)), 'card', id, NULL FROM {CARDS} "
+    "WHERE id = ANY(CAST(:card_ids AS text[])) "
+    "ORDER BY lower(trim(card_number)), created_at, id "
+    "ON CONFLICT (alias, kind) DO UPDATE SET card_id = EXCLUDED.card_id"
+)
+
+CARD_OWNERS = text(
+    f"SELECT DISTINCT user_id FROM {CARDS} "
+    "WHERE id = ANY(CAST(:card_ids AS text[])) AND user_id IS NOT NULL"
+)
+
+
+class UnmergedBalance(NamedTuple):
+    """A user whose card number is another user's card; their balance stays on the users row"""
+    user_id: str
+    card_number: str
+    balance: float
+
+
+class ResolvedAccount(NamedTuple):
+    card_id: str
+    card_number: str
+    user_id: Optional[str]
+    balance: float
+    status: str
+    is_active: Optional[bool]
+
+
+def normalize_alias(value) -> str:
+    return str(value or "").strip().lower()
+
+
+def _ids(values: Iterable[Optional[str]]) -> list:
+    return sorted({value for value in values if value})
+
+
+class AccountIndex:
+    """Resolution of account identifiers to cards, backed by account_aliases"""
+    
+    def __init__(self):
+        self.lookups = 0
+        self.misses = 0
+        self.synced_users = 0
+        self.synced_cards = 0
+        self.unmerged = 0
+    
+    async def resolve(self, session, account: str) -> Optional[ResolvedAccount]:
+        """The card charged for `account` (card number, email, placa or name), or None"""
+        alias = normalize_alias(account)
+        self.lookups += 1
+        if not alias:
+            self.misses += 1
+            return None
+        result = await session.execute(RESOLVE, {"alias": alias, "kinds": list(ALIAS_KINDS)})
+        row = result.first()
+        if row is None:
+            self.misses += 1
+            return None
+        return ResolvedAccount(*row)
+    
+    async def sync_users(self, session, user_ids: Iterable[Optional[str]]) -> List[UnmergedBalance]:
+        """
+        After users were created or changed: give their card numbers a card
+        and point their email/placa/name at their card. Returns the users
+        whose card number is held by another user's card.
+        """
+        user_ids = _ids(user_ids)
+        if not user_ids:
+            return []
+        await session.flush()
+        result = await session.execute(CONSOLIDATE_USER_CARDS, {"user_ids": user_ids})
+        rows = result.all()
+        unmerged = [
+            UnmergedBalance(row.user_id, row.card_number, row.balance)
+            for row in rows if row.card_id is None
+        ]
+        for entry in unmerged:
+            logger.warning(
+                f"User {entry.user_id}: card {entry.card_number} belongs to another user; "
+                f"users.rfid_balance {entry.balance} left unmerged"
+            )
+        self.unmerged += len(unmerged)
+        await self._sync_card_aliases(session, [row.card_id for row in rows if row.card_id is not None])
+        await session.execute(DROP_USER_ALIASES, {"user_ids": user_ids})
+        await session.execute(USER_ALIASES, {"user_ids": user_ids})
+        self.synced_users += len(user_ids)
+        return unmerged
+    
+    async def sync_cards(self, session, card_ids: Iterable[Optional[str]], previous_user_ids: Iterable[Optional[str]] = ()):
+        """
+        After cards were created or changed: index their numbers and re-point
+        the aliases of their owners (and of the owners they had before).
+        """
+        card_ids = _ids(card_ids)
+        if not card_ids:
+            return
+        await session.flush()
+        await self._sync_card_aliases(session, card_ids)
+        result = await session.execute(CARD_OWNERS, {"card_ids": card_ids})
+        owners = result.scalars().all()
+        self.synced_cards += len(card_ids)
+        await self.sync_users(session, list(owners) + list(previous_user_ids))
+    
+    async def _sync_card_aliases(self, session, card_ids: list):
+        if card_ids:
+            await session.execute(DROP_STALE_CARD_ALIASES, {"card_ids": card_ids})
+            await session.execute(CARD_ALIASES, {"card_ids": card_ids})
+    
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "misses": self.misses,
+            "synced_users": self.synced_users,
+            "synced_cards": self.synced_cards,
+            "unmerged_balances": self.unmerged,
+        }
+
+
+account_index = AccountIndex()
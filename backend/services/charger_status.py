@@ -0,0 +1,149 @@
+"""
+Coalesced charger status and heartbeat writes
+Heartbeats, StatusNotifications and connection events only update an
+in-memory map of the latest status / heartbeat per charger. Every
+CHARGER_STATUS_FLUSH_MS the chargers that changed are written with one
+UPDATE ... FROM unnest(...), however many updates each of them received.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from database import async_session, Charger
+
+logger = logging.getLogger(__name__)
+
+CHARGER_STATUS_FLUSH_MS = int(os.environ.get('CHARGER_STATUS_FLUSH_MS', '5000'))
+
+PendingStatus = Tuple[Optional[str], Optional[datetime]]  # (status, last heartbeat); None = unchanged
+
+BULK_UPDATE = text(
+    f"UPDATE {Charger.__tablename__} AS c "
+    "SET status = COALESCE(v.status, c.status), "
+    "last_heartbeat = COALESCE(v.last_heartbeat, c.last_heartbeat) "
+    "FROM unnest(CAST(:charger_ids AS text[]), CAST(:statuses AS text[]), "
+    "CAST(:heartbeats AS timestamptz[])) AS v(charger_id, status, last_heartbeat) "
+    "WHERE c.charger_id = v.charger_id"
+)
+
+
+def _parse_time(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+class ChargerStatusCoalescer:
+    """Latest status/heartbeat per charger, written in one bulk UPDATE per interval"""
+    
+    def __init__(self, flush_interval_ms: int = CHARGER_STATUS_FLUSH_MS):
+        self.flush_interval = flush_interval_ms / 1000
+        self._pending: Dict[str, PendingStatus] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self.updates = 0
+        self.flushed = 0
+        self.rows_written = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_flush_ms = 0.0
+    
+    def update(self, charger_id: str, status: Optional[str] = None, heartbeat=None):
+        """Remember the newest status and/or heartbeat; never touches the database"""
+        if not charger_id or (status is None and heartbeat is None):
+            return
+        heartbeat = _parse_time(heartbeat)
+        previous_status, previous_heartbeat = self._pending.get(charger_id, (None, None))
+        self._pending[charger_id] = (
+            status if status is not None else previous_status,
+            heartbeat if heartbeat is not None else previous_heartbeat,
+        )
+        self.updates += 1
+    
+    async def start(self):
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Write what is pending and stop the flusher"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+    
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            try:
+                await self.flush()
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Charger status flush failed: {e}")
+                if self._closing:
+                    logger.error(f"Discarding status of {len(self._pending)} chargers on shutdown")
+            
+            if self._closing:
+                return
+    
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        started = time.perf_counter()
+        charger_ids = list(pending)
+        
+        try:
+            async with async_session() as session:
+                result = await session.execute(BULK_UPDATE, {
+                    "charger_ids": charger_ids,
+                    "statuses": [pending[charger_id][0] for charger_id in charger_ids],
+                    "heartbeats": [pending[charger_id][1] for charger_id in charger_ids],
+                })
+                await session.commit()
+        except Exception:
+            # Keep anything newer that arrived during the failed flush
+            for charger_id, (status, heartbeat) in pending.items():
+                newer_status, newer_heartbeat = self._pending.get(charger_id, (None, None))
+                self._pending[charger_id] = (
+                    newer_status if newer_status is not None else status,
+                    newer_heartbeat if newer_heartbeat is not None else heartbeat,
+                )
+            raise
+        
+        self.flushed += len(pending)
+        self.rows_written += result.rowcount or 0
+        self.batches += 1
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+    
+    def stats(self) -> dict:
+        return {
+            "pending_chargers": len(self._pending),
+            "updates": self.updates,
+            "flushed_chargers": self.flushed,
+            "rows_written": self.rows_written,
+            # Each update would otherwise have been its own UPDATE statement
+            "writes_saved": self.updates - self.batches,
+            "batches": self.batches,
+            "failures": self.failures,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+charger_status = ChargerStatusCoalescer()
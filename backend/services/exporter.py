@@ -0,0 +1,152 @@
+"""
+Streaming exports - CSV/XLSX written while rows are fetched
+Rows come from a server-side cursor in chunks, so memory stays bounded no
+matter how large the table is. CSV bytes go out as each chunk arrives; XLSX
+rows are spooled to a temp file and rendered into a workbook in the
+spreadsheet process pool (services/spreadsheets.py).
+export_to_file() writes the same bytes to a file for background export jobs.
+"""
+import asyncio
+import csv
+import io
+import os
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Sequence
+
+from fastapi.responses import StreamingResponse
+
+from database import async_session
+from services.spreadsheets import spreadsheet_pool
+
+# Rows fetched per round trip of the server-side cursor
+EXPORT_CHUNK_SIZE = 1000
+
+# Bytes per chunk when sending a finished XLSX file
+FILE_CHUNK_SIZE = 64 * 1024
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+async def iter_partitions(statement, chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[Sequence]:
+    """Yield lists of rows from a server-side cursor, `chunk_size` at a time"""
+    async with async_session() as session:
+        result = await session.stream(statement.execution_options(yield_per=chunk_size))
+        async for partition in result.partitions():
+            yield partition
+
+
+async def csv_stream(
+    headers: List[str],
+    statement,
+    to_values: Callable[[object], list]
+) -> AsyncIterator[bytes]:
+    """Encode the header and then each fetched chunk as CSV"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    
+    writer.writerow(headers)
+    yield buffer.getvalue().encode("utf-8")
+    
+    async for partition in iter_partitions(statement):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(to_values(row) for row in partition)
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def xlsx_stream(
+    headers: List[str],
+    statement,
+    to_values: Callable[[object], list]
+) -> AsyncIterator[bytes]:
+    """
+    Build a workbook from the fetched chunks and send it.
+    The zip container can only be written once all rows are known, so bytes
+    start flowing after the last chunk; memory use stays bounded either way.
+    """
+    async def chunks():
+        async for partition in iter_partitions(statement):
+            yield [to_values(row) for row in partition]
+    
+    path = await spreadsheet_pool.render_xlsx(headers, chunks())
+    try:
+        with open(path, "rb") as output:
+            while True:
+                chunk = await asyncio.to_thread(output.read, FILE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def export_filename(name: str, format: str) -> str:
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"{name}_export_{timestamp}.{'csv' if format == 'csv' else 'xlsx'}"
+
+
+async def export_to_file(
+    job,
+    name: str,
+    format: str,
+    headers: List[str],
+    statement,
+    to_values: Callable[[object], list]
+) -> dict:
+    """
+    Background-job version of export_response(): write the export to the
+    job's output file, reporting the rows written after each fetched chunk.
+    """
+    filename = export_filename(name, format)
+    path = job.output_path(os.path.splitext(filename)[1])
+    rows = 0
+    
+    if format == "csv":
+        with open(path, "w", encoding="utf-8", newline="") as output:
+            writer = csv.writer(output, lineterminator="\n")
+            writer.writerow(headers)
+            async for partition in iter_partitions(statement):
+                writer.writerows(to_values(row) for row in partition)
+                rows += len(partition)
+                await job.update(progress=rows, message="Exporting rows")
+    else:
+        async def chunks():
+            nonlocal rows
+            async for partition in iter_partitions(statement):
+                yield [to_values(row) for row in partition]
+                rows += len(partition)
+                await job.update(progress=rows, message="Exporting rows")
+            await job.update(message="Writing file", force=True)
+        
+        await spreadsheet_pool.render_xlsx(headers, chunks(), output_path=path)
+    
+    return {
+        "filename": filename,
+        "media_type": "text/csv" if format == "csv" else XLSX_MEDIA_TYPE,
+        "rows": rows,
+        "bytes": os.path.getsize(path),
+    }
+
+
+def export_response(
+    name: str,
+    format: str,
+    headers: List[str],
+    statement,
+    to_values: Callable[[object], list]
+) -> StreamingResponse:
+    """StreamingResponse for `statement` as CSV (format == "csv") or XLSX"""
+    filename = export_filename(name, format)
+    
+    if format == "csv":
+        body = csv_stream(headers, statement, to_values)
+        media_type = "text/csv"
+    else:
+        body = xlsx_stream(headers, statement, to_values)
+        media_type = XLSX_MEDIA_TYPE
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
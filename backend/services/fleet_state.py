@@ -0,0 +1,258 @@
+"""
+In-memory fleet state
+Charger status, connectors, heartbeat and active transaction for the whole
+fleet, kept current from OCPP events. Registered chargers, boot count and
+active transactions are read from the database on first use and again only
+after invalidate(), which the endpoints writing those tables call.
+
+Every change bumps `version`; REST responses are rendered once per version
+and tagged with an ETag, and /api/ocpp/ws clients get a snapshot followed by
+versioned per-charger deltas.
+"""
+import asyncio
+import logging
+import uuid
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, func
+
+from database import async_session, Charger, OCPPBoot, OCPPTransaction
+
+logger = logging.getLogger(__name__)
+
+# Live fields set by charger_state events
+STATE_FIELDS = ('status', 'vendor', 'model', 'serial_number', 'firmware_version', 'last_heartbeat')
+
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+class FleetState:
+    """Process-wide charger state answering the status endpoints and WebSocket snapshots"""
+    
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]  # ETags from another process or run never match
+        self.version = 0
+        self._rows: Dict[str, dict] = {}  # registered chargers: charger_id -> {status, last_heartbeat}
+        self._live: Dict[str, dict] = {}  # chargers with an open WebSocket
+        self._active: Dict[int, str] = {}  # active transaction id -> charger id
+        self.total_boots = 0
+        self._loaded = False
+        self._seeded = False
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self._rendered: Dict[str, Tuple[int, bytes]] = {}
+        self.loads = 0
+        self.events = 0
+        self.invalidations = 0
+    
+    @property
+    def etag(self) -> str:
+        return f'"{self.epoch}-{self.version}"'
+    
+    def invalidate(self):
+        """Re-read the database part on next use"""
+        self._generation += 1
+        self._loaded = False
+        self.invalidations += 1
+    
+    async def ensure_loaded(self):
+        if self._loaded:
+            return
+        async with self._lock:
+            if self._loaded:
+                return
+            generation = self._generation
+            if not self._seeded:
+                await self._seed_live()
+            
+            async with async_session() as session:
+                chargers_result = await session.execute(
+                    select(Charger.charger_id, Charger.status, Charger.last_heartbeat)
+                )
+                boots_result = await session.execute(select(func.count()).select_from(OCPPBoot))
+                active_result = await session.execute(
+                    select(OCPPTransaction.transaction_id, OCPPTransaction.charger_id).where(
+                        OCPPTransaction.status == 'active', OCPPTransaction.transaction_id.isnot(None)
+                    )
+                )
+            
+            from services.ocpp_server import central_system
+            
+            self._rows = {
+                charger_id: {'status': status, 'last_heartbeat': _iso(last_heartbeat)}
+                for charger_id, status, last_heartbeat in chargers_result.all()
+            }
+            self.total_boots = boots_result.scalar() or 0
+            # Starts still waiting in the journal are not in the table yet
+            active = dict(active_result.all())
+            active.update((tx_id, tx['charger_id']) for tx_id, tx in central_system.transactions.items())
+            self._active = active
+            self.version += 1
+            self.loads += 1
+            self._loaded = generation == self._generation
+    
+    async def _seed_live(self):
+        """Chargers connected before this process started listening for events"""
+        from services.ocpp_server import central_system
+        from services.ocpp_gateway import ocpp_gateway
+        
+        for charger_id, conn in central_system.get_all_connections().items():
+            self._live[charger_id] = {
+                'status': conn.status,
+                'vendor': conn.vendor,
+                'model': conn.model,
+                'serial_number': conn.serial_number,
+                'firmware_version': conn.firmware_version,
+                'last_heartbeat': _iso(conn.last_heartbeat),
+                'connector_status': dict(conn.connector_status),
+                'active_transaction_id': conn.active_transaction_id,
+            }
+        if ocpp_gateway.multi_process:
+            for charger_id in await ocpp_gateway.connected_chargers():
+                self._live.setdefault(charger_id, self._new_live())
+        self._seeded = True
+    
+    @staticmethod
+    def _new_live() -> dict:
+        return {
+            'status': 'Available', 'vendor': None, 'model': None, 'serial_number': None,
+            'firmware_version': None, 'last_heartbeat': None, 'connector_status': {},
+            'active_transaction_id': None,
+        }
+    
+    # ----- Events -----
+    
+    def apply(self, message: dict) -> Optional[dict]:
+        """Fold one OCPP event into the state; returns the charger's new record if it changed"""
+        event = message.get('event')
+        data = message.get('data')
+        charger_id = data.get('charger_id') if isinstance(data, dict) else None
+        if not charger_id:
+            return None
+        
+        if event == 'charger_connected':
+            live = self._new_live()
+            # Resume a session that was active when the charger dropped off
+            for tx_id, tx_charger_id in self._active.items():
+                if tx_charger_id == charger_id:
+                    live['active_transaction_id'] = tx_id
+            live['last_heartbeat'] = data.get('timestamp')
+            self._live[charger_id] = live
+        elif event == 'charger_disconnected':
+            if self._live.pop(charger_id, None) is None:
+                return None
+            if charger_id in self._rows:
+                self._rows[charger_id]['status'] = 'Unavailable'
+        elif event == 'transaction_started':
+            self._active[data.get('transaction_id')] = charger_id
+            live = self._live.setdefault(charger_id, self._new_live())
+            live['active_transaction_id'] = data.get('transaction_id')
+            live['status'] = 'Charging'
+        elif event == 'transaction_stopped':
+            self._active.pop(data.get('transaction_id'), None)
+            live = self._live.get(charger_id)
+            if live is not None:
+                if live['active_transaction_id'] == data.get('transaction_id'):
+                    live['active_transaction_id'] = None
+                live['status'] = 'Available'
+        elif event == 'charger_state':
+            live = self._live.setdefault(charger_id, self._new_live())
+            if data.get('connector_id') is not None:
+                connector_id = int(data['connector_id'])
+                live['connector_status'][connector_id] = data.get('status')
+                if connector_id == 0:  # Overall charger status
+                    live['status'] = data.get('status')
+            else:
+                for key in STATE_FIELDS:
+                    if key in data:
+                        live[key] = data[key]
+        else:
+            return None
+        
+        self.version += 1
+        self.events += 1
+        return self.record(charger_id)
+    
+    def note_heartbeat(self, charger_id: str, timestamp: str):
+        """HTTP heartbeat of a registered charger, without re-reading the table"""
+        row = self._rows.get(charger_id)
+        if row is None:
+            return
+        row['last_heartbeat'] = timestamp
+        self.version += 1
+    
+    # ----- Reads -----
+    
+    def record(self, charger_id: str) -> dict:
+        row = self._rows.get(charger_id) or {}
+        live = self._live.get(charger_id)
+        if live is None:
+            return {
+                'charger_id': charger_id,
+                'status': row.get('status') or "Unavailable",
+                'vendor': None,
+                'model': None,
+                'serial_number': None,
+                'firmware_version': None,
+                'connected': False,
+                'last_heartbeat': row.get('last_heartbeat'),
+                'connector_status': {},
+                'active_transaction_id': None,
+            }
+        return {
+            'charger_id': charger_id,
+            **live,
+            'connector_status': dict(live['connector_status']),
+            'connected': True,
+            'last_heartbeat': live['last_heartbeat'] or row.get('last_heartbeat'),
+        }
+    
+    def registered_chargers(self) -> List[dict]:
+        """Records for chargers that exist in the chargers table"""
+        return [self.record(charger_id) for charger_id in sorted(self._rows)]
+    
+    def summary(self) -> dict:
+        return {
+            'active_transactions': len(self._active),
+            'total_boots': self.total_boots,
+            'online_chargers': len(self._live),
+            'total_chargers': len(self._rows),
+        }
+    
+    def snapshot(self, chargers: Optional[Set[str]] = None) -> dict:
+        """Full state for a WebSocket client, limited to its charger subscription"""
+        charger_ids = sorted(set(self._rows) | set(self._live))
+        if chargers is not None:
+            charger_ids = [charger_id for charger_id in charger_ids if charger_id in chargers]
+        return {
+            'event': 'snapshot',
+            'version': self.version,
+            'summary': self.summary(),
+            'chargers': [self.record(charger_id) for charger_id in charger_ids],
+        }
+    
+    def rendered(self, kind: str, build: Callable[[], bytes]) -> bytes:
+        """Response body for this version, built once"""
+        cached = self._rendered.get(kind)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        body = build()
+        self._rendered[kind] = (self.version, body)
+        return body
+    
+    def stats(self) -> dict:
+        return {
+            'version': self.version,
+            'loaded': self._loaded,
+            'registered_chargers': len(self._rows),
+            'live_chargers': len(self._live),
+            'active_transactions': len(self._active),
+            'loads': self.loads,
+            'events': self.events,
+            'invalidations': self.invalidations,
+        }
+
+
+fleet_state = FleetState()
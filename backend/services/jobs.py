@@ -0,0 +1,331 @@
+"""
+Background jobs for imports and exports
+Endpoints submit a coroutine and return the job id at once. Jobs run in this
+process as asyncio tasks, at most JOB_CONCURRENCY at a time. Progress, row
+errors and the final result are written to the jobs table, so /api/jobs/{id}
+answers from any process, and published as job_* events on /api/ocpp/ws.
+
+A job running here is cancelled through its task; one running in another
+process sees cancel_requested at its next progress update. Unfinished jobs
+are heartbeated, and ones whose process died are marked failed. Export files
+are deleted JOB_FILE_TTL_HOURS after they were written; downloading one later
+answers 410.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import update
+
+from database import async_session, Job
+
+logger = logging.getLogger(__name__)
+
+# Jobs running at the same time in this process; the rest wait as "queued"
+JOB_CONCURRENCY = int(os.environ.get('JOB_CONCURRENCY', '2'))
+
+# Progress is written and published at most this often per job
+JOB_PROGRESS_INTERVAL_SECONDS = float(os.environ.get('JOB_PROGRESS_INTERVAL_SECONDS', '1'))
+
+# Unfinished jobs not heartbeated for JOB_STALE_SECONDS lost their process
+JOB_HEARTBEAT_SECONDS = 10
+JOB_STALE_SECONDS = 60
+
+# Row errors kept on the job row, and sent with each WebSocket event
+JOB_MAX_ERRORS = 500
+JOB_EVENT_MAX_ERRORS = 20
+
+# Export files written by jobs
+JOB_FILES_DIR = os.environ.get(
+    'JOB_FILES_DIR',
+    str(Path(__file__).resolve().parent.parent / 'data' / 'jobs')
+)
+
+# Export files older than this are deleted (0 keeps them forever), checked every JOB_FILE_SWEEP_SECONDS
+JOB_FILE_TTL_HOURS = float(os.environ.get('JOB_FILE_TTL_HOURS', '24'))
+JOB_FILE_SWEEP_SECONDS = 600
+
+ACTIVE_STATUSES = ("queued", "running")
+
+JobFunction = Callable[..., Awaitable[object]]
+EventCallback = Callable[[str, dict], Awaitable[None]]
+
+
+class JobCancelled(asyncio.CancelledError):
+    """Raised in a job whose cancellation was requested by another process"""
+
+
+class JobContext:
+    """Passed to a job coroutine to report progress and row errors"""
+    
+    def __init__(self, runner: "JobRunner", job_id: str, kind: str):
+        self.runner = runner
+        self.id = job_id
+        self.kind = kind
+        self.progress = 0
+        self.total: Optional[int] = None
+        self.message: Optional[str] = None
+        self.errors: List[dict] = []
+        self.error_count = 0
+        self.file_path: Optional[str] = None
+        self._saved_at = 0.0
+    
+    def output_path(self, suffix: str) -> str:
+        """Where an export job writes its file; served by /api/jobs/{id}/download"""
+        Path(JOB_FILES_DIR).mkdir(parents=True, exist_ok=True)
+        self.file_path = str(Path(JOB_FILES_DIR) / f"{self.id}{suffix}")
+        return self.file_path
+    
+    async def update(self, progress: Optional[int] = None, total: Optional[int] = None,
+                     message: Optional[str] = None, errors: Optional[List] = None, force: bool = False):
+        """Record progress and the row errors so far; written and published at most every JOB_PROGRESS_INTERVAL_SECONDS"""
+        if progress is not None:
+            self.progress = progress
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        if errors is not None:
+            self.error_count = len(errors)
+            self.errors = [
+                error.model_dump() if hasattr(error, 'model_dump') else error for error in errors[:JOB_MAX_ERRORS]
+            ]
+        if not force and time.monotonic() - self._saved_at < JOB_PROGRESS_INTERVAL_SECONDS:
+            return
+        self._saved_at = time.monotonic()
+        if await self.runner._save_progress(self):
+            raise JobCancelled()
+    
+    def event(self) -> dict:
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'progress': self.progress,
+            'total': self.total,
+            'message': self.message,
+            'error_count': self.error_count,
+            'errors': self.errors[:JOB_EVENT_MAX_ERRORS],
+        }
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _remove_files_older_than(cutoff: float) -> int:
+    """Delete files in JOB_FILES_DIR last written before `cutoff` (epoch seconds); returns how many"""
+    try:
+        entries = list(os.scandir(JOB_FILES_DIR))
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            pass  # removed by another process
+    return removed
+
+
+class JobRunner:
+    """In-process executor for jobs persisted in the jobs table"""
+    
+    def __init__(self, concurrency: int = JOB_CONCURRENCY):
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._event_callback: Optional[EventCallback] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._swept_at = 0.0
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.interrupted = 0
+        self.files_expired = 0
+    
+    def set_event_callback(self, callback: EventCallback):
+        """Set callback publishing job events to frontends"""
+        self._event_callback = callback
+    
+    async def _publish(self, event: str, data: dict):
+        if self._event_callback is None:
+            return
+        try:
+            await self._event_callback(event, data)
+        except Exception as e:
+            logger.error(f"Failed to publish {event} for job {data.get('job_id')}: {e}")
+    
+    # ----- Lifecycle -----
+    
+    async def start(self):
+        if self._heartbeat_task is None:
+            await self._expire_stale()
+            await self._expire_files()
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
+    
+    async def stop(self):
+        """Cancel the jobs of this process and stop heartbeating"""
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                if self._tasks:
+                    async with async_session() as session:
+                        await session.execute(
+                            update(Job).where(Job.id.in_(list(self._tasks))).values(heartbeat_at=_now())
+                        )
+                        await session.commit()
+                await self._expire_stale()
+                if time.monotonic() - self._swept_at >= JOB_FILE_SWEEP_SECONDS:
+                    await self._expire_files()
+            except Exception as e:
+                logger.error(f"Job heartbeat failed: {e}")
+    
+    async def _expire_stale(self):
+        """Fail unfinished jobs whose process stopped heartbeating them"""
+        async with async_session() as session:
+            result = await session.execute(
+                update(Job)
+                .where(
+                    Job.status.in_(ACTIVE_STATUSES),
+                    Job.heartbeat_at < _now() - timedelta(seconds=JOB_STALE_SECONDS)
+                )
+                .values(status="failed", error="Interrupted: the server running this job stopped", finished_at=_now())
+                .returning(Job.id)
+            )
+            expired = result.scalars().all()
+            await session.commit()
+        if expired:
+            self.interrupted += len(expired)
+            logger.warning(f"Marked {len(expired)} interrupted jobs as failed")
+    
+    async def _expire_files(self):
+        """Delete export files past JOB_FILE_TTL_HOURS, including ones left by jobs that never finished"""
+        self._swept_at = time.monotonic()
+        if JOB_FILE_TTL_HOURS <= 0:
+            return
+        removed = await asyncio.to_thread(_remove_files_older_than, time.time() - JOB_FILE_TTL_HOURS * 3600)
+        if removed:
+            self.files_expired += removed
+            logger.info(f"Deleted {removed} job files older than {JOB_FILE_TTL_HOURS:g}h")
+    
+    # ----- Jobs -----
+    
+    async def submit(self, kind: str, user_id: Optional[str], func: JobFunction, *args) -> str:
+        """Persist a queued job and schedule `func(job_context, *args)`; returns the job id"""
+        job_id = str(uuid.uuid4())
+        async with async_session() as session:
+            session.add(Job(id=job_id, kind=kind, status="queued", user_id=user_id, errors=[]))
+            await session.commit()
+        
+        self.submitted += 1
+        self._tasks[job_id] = asyncio.create_task(self._run(JobContext(self, job_id, kind), func, args))
+        await self._publish('job_queued', {'job_id': job_id, 'kind': kind})
+        return job_id
+    
+    async def _run(self, job: JobContext, func: JobFunction, args: tuple):
+        status, result, error = "failed", None, None
+        try:
+            async with self._semaphore:
+                if await self._save_progress(job, status="running", started_at=_now()):
+                    raise JobCancelled()
+                await self._publish('job_started', job.event())
+                value = await func(job, *args)
+            status = "succeeded"
+            result = value.model_dump() if hasattr(value, 'model_dump') else value
+        except asyncio.CancelledError:  # includes JobCancelled
+            status = "cancelled"
+        except HTTPException as e:
+            error = str(e.detail)
+        except Exception as e:
+            logger.exception(f"Job {job.id} ({job.kind}) failed")
+            error = str(e)
+        finally:
+            self._tasks.pop(job.id, None)
+        
+        if status != "succeeded" and job.file_path:
+            try:
+                os.remove(job.file_path)
+            except OSError:
+                pass
+        
+        setattr(self, status, getattr(self, status) + 1)
+        try:
+            await self._save_progress(
+                job, status=status, result=result, error=error, finished_at=_now(),
+                file_path=job.file_path if status == "succeeded" else None
+            )
+        except Exception as e:
+            logger.error(f"Failed to record the end of job {job.id}: {e}")
+        
+        event = job.event()
+        if result is not None and isinstance(result.get('errors'), list):
+            result = {**result, 'errors': result['errors'][:JOB_EVENT_MAX_ERRORS]}
+        await self._publish('job_finished', {**event, 'status': status, 'result': result, 'error': error})
+    
+    async def _save_progress(self, job: JobContext, **values) -> bool:
+        """Write the job's progress (and any other columns); True if cancellation was requested"""
+        async with async_session() as session:
+            result = await session.execute(
+                update(Job)
+                .where(Job.id == job.id)
+                .values(
+                    progress=job.progress, total=job.total, message=job.message,
+                    errors=job.errors, heartbeat_at=_now(), **values
+                )
+                .returning(Job.cancel_requested)
+            )
+            cancel_requested = result.scalar()
+            await session.commit()
+        if 'status' not in values:
+            await self._publish('job_progress', job.event())
+        return bool(cancel_requested)
+    
+    async def cancel(self, job_id: str) -> bool:
+        """Request cancellation; False if the job is unknown or already finished"""
+        async with async_session() as session:
+            result = await session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status.in_(ACTIVE_STATUSES))
+                .values(cancel_requested=True)
+                .returning(Job.id)
+            )
+            found = result.scalar() is not None
+            await session.commit()
+        task = self._tasks.get(job_id)
+        if found and task is not None:
+            task.cancel()
+        return found
+    
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "active": len(self._tasks),
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "interrupted": self.interrupted,
+            "files_expired": self.files_expired,
+        }
+
+
+job_runner = JobRunner()
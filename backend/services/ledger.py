@@ -0,0 +1,156 @@
+"""
+RFID balance ledger
+Balances are never read into Python, changed and written back: every credit
+or debit is one UPDATE that computes the new balance in PostgreSQL and, in
+the same statement, appends the matching rfid_history row. Concurrent
+charges and top-ups therefore cannot lose each other's updates, and no row
+lock is held across awaits.
+
+- apply() credits or debits one card; a debit only succeeds while the
+  balance covers it (WHERE balance >= amount).
+- settle() charges many finished sessions in one round trip. A session
+  costing more than what is left takes the balance down to 0, as chargers
+  have already delivered the energy.
+
+Callers pass their session and commit it, so ledger writes are part of
+their transaction.
+"""
+import logging
+import uuid
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import text
+
+from database import RFIDCard, RFIDHistory
+
+logger = logging.getLogger(__name__)
+
+APPLY = text(
+    f"WITH changed AS ("
+    f"UPDATE {RFIDCard.__tablename__} "
+    "SET balance = COALESCE(balance, 0) + CAST(:amount AS float8) "
+    "WHERE (id = CAST(:card_id AS text) OR card_number = CAST(:card_number AS text)) "
+    "AND COALESCE(balance, 0) + CAST(:amount AS float8) >= 0 "
+    "RETURNING id, card_number, balance - CAST(:amount AS float8) AS balance_before, balance AS balance_after"
+    f"), history AS (INSERT INTO {RFIDHistory.__tablename__} "
+    "(id, card_id, transaction_type, amount, balance_before, balance_after, notes, created_at) "
+    "SELECT CAST(:history_id AS text), id, CAST(:transaction_type AS text), CAST(:amount AS float8), "
+    "balance_before, balance_after, CAST(:notes AS text), now() FROM changed"
+    ") SELECT card_number, balance_before, balance_after FROM changed"
+)
+
+# One row per entry, in order; several entries for one card are applied one after the other
+SETTLE = text(
+    "WITH entry AS ("
+    "SELECT * FROM unnest(CAST(:card_numbers AS text[]), CAST(:amounts AS float8[]), "
+    "CAST(:notes AS text[]), CAST(:history_ids AS text[])) "
+    "WITH ORDINALITY AS e(card_number, amount, notes, history_id, n)"
+    "), card AS ("
+    f"SELECT id, card_number, COALESCE(balance, 0) AS balance FROM {RFIDCard.__tablename__} "
+    "WHERE card_number IN (SELECT card_number FROM entry) FOR UPDATE"
+    "), running AS ("
+    "SELECT e.n, e.card_number, e.notes, e.history_id, card.id AS card_id, "
+    "GREATEST(card.balance - (SUM(e.amount) OVER w - e.amount), 0) AS balance_before, "
+    "GREATEST(card.balance - SUM(e.amount) OVER w, 0) AS balance_after "
+    "FROM entry e JOIN card ON card.card_number = e.card_number "
+    "WINDOW w AS (PARTITION BY e.card_number ORDER BY e.n)"
+    "), charged AS ("
+    f"UPDATE {RFIDCard.__tablename__} AS c SET balance = last.balance_after "
+    "FROM (SELECT DISTINCT ON (card_id) card_id, balance_after FROM running ORDER BY card_id, n DESC) AS last "
+    "WHERE c.id = last.card_id RETURNING c.id"
+    "), history AS ("
+    f"INSERT INTO {RFIDHistory.__tablename__} "
+    "(id, card_id, transaction_type, amount, balance_before, balance_after, notes, created_at) "
+    "SELECT history_id, card_id, 'CHARGE', balance_after - balance_before, balance_before, balance_after, notes, now() "
+    "FROM running"
+    ") SELECT n, card_number, balance_before, balance_after FROM running ORDER BY n"
+)
+
+class LedgerResult(NamedTuple):
+    card_number: str
+    balance_before: float
+    balance_after: float
+
+
+class Charge(NamedTuple):
+    """A finished charging session to settle against a card"""
+    card_number: str
+    amount: float
+    notes: Optional[str] = None
+
+
+def latest_balances(results: List[LedgerResult]) -> Dict[str, float]:
+    """Card number -> balance after the last of its results"""
+    return {result.card_number: result.balance_after for result in results}
+
+
+class RFIDLedger:
+    """Atomic credits and debits of RFID card balances, with their history"""
+    
+    def __init__(self):
+        self.credits = 0
+        self.debits = 0
+        self.rejected = 0
+        self.settled = 0
+        self.settlements = 0
+    
+    async def apply(self, session, amount: float, transaction_type: str, notes: Optional[str] = None,
+                    card_id: Optional[str] = None, card_number: Optional[str] = None) -> Optional[LedgerResult]:
+        """
+        Add `amount` (negative for a debit) to the card with this id or number
+        and record it in its history. None if the card does not exist or a
+        debit exceeds its balance; nothing is written then.
+        """
+        result = await session.execute(APPLY, {
+            "amount": amount,
+            "card_id": card_id,
+            "card_number": card_number,
+            "history_id": str(uuid.uuid4()),
+            "transaction_type": transaction_type,
+            "notes": notes,
+        })
+        row = result.first()
+        if row is None:
+            self.rejected += 1
+            return None
+        if amount >= 0:
+            self.credits += 1
+        else:
+            self.debits += 1
+        return LedgerResult(row.card_number, row.balance_before, row.balance_after)
+    
+    async def settle(self, session, charges: List[Charge]) -> List[LedgerResult]:
+        """
+        Debit every charge in one statement, in order, stopping each card at a
+        balance of 0. Charges for unknown cards are skipped. Returns one result
+        per charge applied.
+        """
+        if not charges:
+            return []
+        result = await session.execute(SETTLE, {
+            "card_numbers": [charge.card_number for charge in charges],
+            "amounts": [float(charge.amount) for charge in charges],
+            "notes": [charge.notes for charge in charges],
+            "history_ids": [str(uuid.uuid4()) for _ in charges],
+        })
+        settled = [
+            LedgerResult(row.card_number, row.balance_before, row.balance_after)
+            for row in result.all()
+        ]
+        self.settled += len(settled)
+        self.settlements += 1
+        return settled
+    
+    def stats(self) -> dict:
+        return {
+            "credits": self.credits,
+            "debits": self.debits,
+            "rejected": self.rejected,
+            "settled_charges": self.settled,
+            "settlements": self.settlements,
+            # Charges per settlement statement
+            "avg_settlement_size": round(self.settled / self.settlements, 2) if self.settlements else 0.0,
+        }
+
+
+rfid_ledger = RFIDLedger()
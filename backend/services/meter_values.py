@@ -0,0 +1,306 @@
+"""
+MeterValues time series
+Sampled values from MeterValues (and StopTransaction transactionData) are
+buffered in memory and written in batches with COPY into meter_samples, which
+is range-partitioned by month. Each flush also folds the batch into 1-minute
+and 15-minute rollups (meter_rollups) so session curves never scan raw samples.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, case, text
+from sqlalchemy.dialects.postgresql import insert
+
+from database import async_session, MeterSample, MeterRollup
+
+logger = logging.getLogger(__name__)
+
+METER_FLUSH_INTERVAL_MS = int(os.environ.get('METER_FLUSH_INTERVAL_MS', '1000'))
+METER_FLUSH_BATCH_SIZE = int(os.environ.get('METER_FLUSH_BATCH_SIZE', '5000'))
+
+# Samples kept while the database is unreachable; the oldest are dropped beyond this
+METER_BUFFER_LIMIT = int(os.environ.get('METER_BUFFER_LIMIT', '200000'))
+
+# Query resolution -> rollup bucket width in seconds
+ROLLUP_RESOLUTIONS = {"1m": 60, "15m": 900}
+
+# OCPP 1.6 defaults for optional SampledValue fields
+DEFAULT_MEASURAND = "Energy.Active.Import.Register"
+DEFAULT_UNIT = "Wh"
+
+SAMPLE_COLUMNS = [
+    "sampled_at", "charger_id", "connector_id", "transaction_id",
+    "measurand", "phase", "unit", "value",
+]
+
+# asyncpg accepts at most 32767 bind parameters per statement
+UPSERT_CHUNK_SIZE = 2000
+
+# Serializes partition creation across worker processes
+PARTITION_LOCK_KEY = 7302
+
+Sample = Tuple[datetime, str, int, Optional[int], str, str, Optional[str], float]
+
+
+def _sample_time(value) -> datetime:
+    """OCPP timestamps are UTC; naive values are taken as UTC, missing ones as now"""
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00')) if value else None
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        return datetime.now(timezone.utc)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def parse_meter_values(
+    charger_id: str,
+    connector_id: Optional[int],
+    transaction_id: Optional[int],
+    meter_value: Optional[list]
+) -> List[Sample]:
+    """Flatten an OCPP MeterValue list into sample rows; non-numeric values are skipped"""
+    samples = []
+    for entry in meter_value or []:
+        sampled_at = _sample_time(entry.get('timestamp'))
+        for sampled in entry.get('sampled_value') or entry.get('sampledValue') or []:
+            try:
+                value = float(sampled.get('value'))
+            except (TypeError, ValueError):
+                continue
+            samples.append((
+                sampled_at,
+                charger_id,
+                connector_id or 0,
+                transaction_id,
+                sampled.get('measurand') or DEFAULT_MEASURAND,
+                sampled.get('phase') or "",
+                sampled.get('unit') or DEFAULT_UNIT,
+                value,
+            ))
+    return samples
+
+
+def bucket_start(sampled_at: datetime, seconds: int) -> datetime:
+    epoch = int(sampled_at.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=timezone.utc)
+
+
+def rollup_rows(samples: List[Sample]) -> List[dict]:
+    """Aggregate samples into one row per series and bucket for every resolution"""
+    buckets: Dict[tuple, dict] = {}
+    for sampled_at, charger_id, connector_id, transaction_id, measurand, phase, unit, value in samples:
+        for seconds in ROLLUP_RESOLUTIONS.values():
+            key = (seconds, charger_id, connector_id, transaction_id or 0, measurand, phase, bucket_start(sampled_at, seconds))
+            row = buckets.get(key)
+            if row is None:
+                buckets[key] = {
+                    "resolution": seconds,
+                    "charger_id": charger_id,
+                    "connector_id": connector_id,
+                    "transaction_id": transaction_id or 0,
+                    "measurand": measurand,
+                    "phase": phase,
+                    "bucket_start": key[-1],
+                    "unit": unit,
+                    "samples": 1,
+                    "value_sum": value,
+                    "value_min": value,
+                    "value_max": value,
+                    "value_last": value,
+                    "last_sampled_at": sampled_at,
+                }
+                continue
+            row["samples"] += 1
+            row["value_sum"] += value
+            row["value_min"] = min(row["value_min"], value)
+            row["value_max"] = max(row["value_max"], value)
+            if sampled_at >= row["last_sampled_at"]:
+                row["value_last"] = value
+                row["last_sampled_at"] = sampled_at
+    # Sorted so concurrent writers lock rollup rows in the same order
+    return [buckets[key] for key in sorted(buckets)]
+
+
+def _month_start(value: datetime) -> datetime:
+    value = value.astimezone(timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def _next_month(value: datetime) -> datetime:
+    if value.month == 12:
+        return value.replace(year=value.year + 1, month=1)
+    return value.replace(month=value.month + 1)
+
+
+class MeterValueStore:
+    """In-memory sample buffer flushed to meter_samples/meter_rollups in batches"""
+    
+    def __init__(
+        self,
+        flush_interval_ms: int = METER_FLUSH_INTERVAL_MS,
+        batch_size: int = METER_FLUSH_BATCH_SIZE,
+        buffer_limit: int = METER_BUFFER_LIMIT
+    ):
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.buffer_limit = buffer_limit
+        self._buffer: Deque[Sample] = deque()
+        self._partitions: Set[datetime] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self.received = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_flush_ms = 0.0
+    
+    def add(self, charger_id: str, connector_id: Optional[int], transaction_id: Optional[int], meter_value: Optional[list]):
+        """Buffer the samples of one MeterValues message; never touches the database"""
+        samples = parse_meter_values(charger_id, connector_id, transaction_id, meter_value)
+        self._buffer.extend(samples)
+        self.received += len(samples)
+        
+        overflow = len(self._buffer) - self.buffer_limit
+        if overflow > 0:
+            for _ in range(overflow):
+                self._buffer.popleft()
+            self.dropped += overflow
+            logger.warning(f"Meter sample buffer full, dropped {overflow} oldest samples")
+        
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+    
+    async def start(self):
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Flush what is buffered and stop the flusher"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+    
+    async def _run(self):
+        retry_delay = self.flush_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            try:
+                while self._buffer:
+                    await self.flush()
+                    if len(self._buffer) < self.batch_size and not self._closing:
+                        break
+                retry_delay = self.flush_interval
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Meter sample flush failed, retrying in {retry_delay:.1f}s: {e}")
+                if self._closing:
+                    logger.error(f"Discarding {len(self._buffer)} meter samples on shutdown")
+                    return
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 10.0)
+                continue
+            
+            if self._closing:
+                return
+    
+    async def flush(self):
+        """COPY one batch of samples and upsert its rollups in a single transaction"""
+        samples = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+        if not samples:
+            return
+        started = time.perf_counter()
+        
+        try:
+            async with async_session() as session:
+                created = await self._ensure_partitions(session, {_month_start(s[0]) for s in samples})
+                
+                connection = await session.connection()
+                raw = await connection.get_raw_connection()
+                await raw.driver_connection.copy_records_to_table(
+                    MeterSample.__tablename__, records=samples, columns=SAMPLE_COLUMNS
+                )
+                
+                await self._upsert_rollups(session, rollup_rows(samples))
+                await session.commit()
+        except Exception:
+            self._buffer.extendleft(reversed(samples))
+            raise
+        
+        self._partitions.update(created)
+        self.written += len(samples)
+        self.batches += 1
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+    
+    async def _ensure_partitions(self, session, months: Set[datetime]) -> List[datetime]:
+        """Create the monthly partitions this batch needs; returns the months checked"""
+        missing = sorted(months - self._partitions)
+        if not missing:
+            return []
+        await session.execute(text(f"SELECT pg_advisory_xact_lock({PARTITION_LOCK_KEY})"))
+        for month in missing:
+            name = f"{MeterSample.__tablename__}_y{month.year}m{month.month:02d}"
+            await session.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {MeterSample.__tablename__} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+            ))
+        return missing
+    
+    async def _upsert_rollups(self, session, rows: List[dict]):
+        for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            stmt = insert(MeterRollup).values(rows[start:start + UPSERT_CHUNK_SIZE])
+            excluded = stmt.excluded
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[
+                    MeterRollup.resolution,
+                    MeterRollup.charger_id,
+                    MeterRollup.connector_id,
+                    MeterRollup.transaction_id,
+                    MeterRollup.measurand,
+                    MeterRollup.phase,
+                    MeterRollup.bucket_start,
+                ],
+                set_={
+                    "unit": excluded.unit,
+                    "samples": MeterRollup.samples + excluded.samples,
+                    "value_sum": MeterRollup.value_sum + excluded.value_sum,
+                    "value_min": func.least(MeterRollup.value_min, excluded.value_min),
+                    "value_max": func.greatest(MeterRollup.value_max, excluded.value_max),
+                    "value_last": case(
+                        (excluded.last_sampled_at >= MeterRollup.last_sampled_at, excluded.value_last),
+                        else_=MeterRollup.value_last
+                    ),
+                    "last_sampled_at": func.greatest(MeterRollup.last_sampled_at, excluded.last_sampled_at),
+                }
+            )
+            await session.execute(stmt)
+    
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "received": self.received,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "failures": self.failures,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+meter_store = MeterValueStore()
@@ -0,0 +1,173 @@
+"""
+Frontend WebSocket fan-out for OCPP events
+Each event is serialized once and queued per client; every client has its own
+sender task, so a slow browser only delays itself. Queues are bounded: state
+events (see COALESCED_EVENTS) replace the queued one for the same charger,
+and when a queue is still full its oldest message is dropped. Clients that
+stop reading for WS_SEND_TIMEOUT_SECONDS are disconnected.
+
+Clients may subscribe to chargers and/or event types, either with query
+parameters (?chargers=CP1,CP2&events=transaction_started) or by sending
+{"action": "subscribe", "chargers": [...], "events": [...]}.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+WS_CLIENT_QUEUE_SIZE = int(os.environ.get('WS_CLIENT_QUEUE_SIZE', '256'))
+WS_SEND_TIMEOUT_SECONDS = float(os.environ.get('WS_SEND_TIMEOUT_SECONDS', '10'))
+
+# Only the latest of these per charger matters to a client that is behind
+COALESCED_EVENTS = {"status", "status_notification", "heartbeat", "meter_values", "charger_state"}
+
+
+def _topic_set(values: Optional[Iterable[str]]) -> Optional[Set[str]]:
+    """None (everything) for a missing or empty filter"""
+    if values is None:
+        return None
+    if isinstance(values, str):
+        values = values.split(",")
+    topics = {value.strip() for value in values if value and value.strip()}
+    return topics or None
+
+
+class BroadcastClient:
+    """One frontend socket: its subscriptions, bounded queue and sender task"""
+    
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue_size = queue_size
+        self.chargers: Optional[Set[str]] = None
+        self.events: Optional[Set[str]] = None
+        self._queue: "OrderedDict[object, str]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self._keys = itertools.count()
+        self.task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+    
+    def subscribe(self, chargers=None, events=None):
+        self.chargers = _topic_set(chargers)
+        self.events = _topic_set(events)
+    
+    def wants(self, event: Optional[str], charger_id: Optional[str]) -> bool:
+        if self.events is not None and event not in self.events:
+            return False
+        # Events not tied to a charger go to every client
+        if self.chargers is not None and charger_id and charger_id not in self.chargers:
+            return False
+        return True
+    
+    def enqueue(self, text: str, coalesce_key: Optional[tuple] = None):
+        if coalesce_key is not None and coalesce_key in self._queue:
+            del self._queue[coalesce_key]
+            self.coalesced += 1
+        elif len(self._queue) >= self.queue_size:
+            self._queue.popitem(last=False)
+            self.dropped += 1
+        self._queue[coalesce_key if coalesce_key is not None else next(self._keys)] = text
+        self._ready.set()
+    
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+    
+    async def run(self):
+        """Send queued messages until the socket fails or stalls"""
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._queue:
+                _, text = self._queue.popitem(last=False)
+                await asyncio.wait_for(self.websocket.send_text(text), timeout=WS_SEND_TIMEOUT_SECONDS)
+                self.sent += 1
+
+
+class OCPPBroadcaster:
+    """Registry of frontend sockets with per-client queues"""
+    
+    def __init__(self, queue_size: int = WS_CLIENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.clients: Dict[int, BroadcastClient] = {}
+        self.broadcasts = 0
+        self.evicted = 0
+        self.dropped = 0
+    
+    async def connect(self, websocket: WebSocket, chargers=None, events=None) -> BroadcastClient:
+        await websocket.accept()
+        client = BroadcastClient(websocket, self.queue_size)
+        client.subscribe(chargers, events)
+        client.task = asyncio.create_task(self._serve(client))
+        self.clients[id(websocket)] = client
+        return client
+    
+    async def _serve(self, client: BroadcastClient):
+        try:
+            await client.run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.evicted += 1
+            logger.info(f"Dropping frontend WebSocket after failed send: {e!r}")
+            self._remove(client)
+            try:
+                await client.websocket.close()
+            except Exception:
+                pass
+    
+    def _remove(self, client: BroadcastClient):
+        if self.clients.pop(id(client.websocket), None) is not None:
+            self.dropped += client.dropped
+    
+    def disconnect(self, client: BroadcastClient):
+        self._remove(client)
+        if client.task and not client.task.done():
+            client.task.cancel()
+    
+    async def broadcast(self, message: dict):
+        """Queue one event for every subscribed client; never waits on a socket"""
+        event = message.get('event')
+        data = message.get('data')
+        charger_id = data.get('charger_id') if isinstance(data, dict) else message.get('charger_id')
+        coalesce_key = (event, charger_id) if event in COALESCED_EVENTS else None
+        
+        text = None
+        for client in list(self.clients.values()):
+            if not client.wants(event, charger_id):
+                continue
+            if text is None:
+                text = json.dumps(message, default=str)
+            client.enqueue(text, coalesce_key)
+        self.broadcasts += 1
+    
+    def reply(self, client: BroadcastClient, message) -> None:
+        """Answer one client's request through its queue, ignoring subscriptions"""
+        client.enqueue(message if isinstance(message, str) else json.dumps(message, default=str))
+    
+    async def stop(self):
+        for client in list(self.clients.values()):
+            self.disconnect(client)
+    
+    def stats(self) -> dict:
+        clients = list(self.clients.values())
+        return {
+            "clients": len(clients),
+            "queued": sum(client.queued for client in clients),
+            "sent": sum(client.sent for client in clients),
+            "coalesced": sum(client.coalesced for client in clients),
+            "dropped": self.dropped + sum(client.dropped for client in clients),
+            "evicted": self.evicted,
+            "broadcasts": self.broadcasts,
+        }
+
+
+ocpp_broadcaster = OCPPBroadcaster()
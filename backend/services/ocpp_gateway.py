@@ -0,0 +1,437 @@
+"""
+Multi-process OCPP gateway
+Lets several processes terminate charger WebSockets while any API process can
+reach any charger:
+
+- Every gateway worker keeps its live charger ids in ocpp_connections
+  (synced in batches) and heartbeats its row in ocpp_gateway_workers.
+- Remote commands for a charger owned by another worker are sent over
+  Postgres NOTIFY and answered the same way.
+- Charger events are relayed to the API processes over NOTIFY so every
+  frontend WebSocket sees them.
+
+OCPP_GATEWAY_MODE=embedded (default) runs the OCPP server inside the API
+process; =external leaves it to `python run_ocpp_gateway.py`. The registry is
+only used when more than one process can own chargers (external mode or
+OCPP_REUSE_PORT=1).
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+import asyncpg
+from sqlalchemy import select, delete, func, text
+from sqlalchemy.dialects.postgresql import insert
+
+from database import DATABASE_URL, async_session, OCPPGatewayWorker, OCPPConnectionOwner
+
+logger = logging.getLogger(__name__)
+
+OCPP_GATEWAY_MODE = os.environ.get('OCPP_GATEWAY_MODE', 'embedded').lower()  # embedded | external
+
+# Let several processes bind the OCPP port (SO_REUSEPORT; Linux/BSD only)
+OCPP_REUSE_PORT = os.environ.get('OCPP_REUSE_PORT', '').lower() in ('1', 'true', 'yes')
+
+OCPP_REGISTRY_SYNC_MS = int(os.environ.get('OCPP_REGISTRY_SYNC_MS', '500'))
+OCPP_COMMAND_TIMEOUT = float(os.environ.get('OCPP_COMMAND_TIMEOUT', '30'))
+
+# Workers that have not heartbeated for this long no longer own their chargers
+WORKER_HEARTBEAT_SECONDS = 15
+WORKER_STALE_SECONDS = 60
+
+COMMAND_CHANNEL = "ocpp_commands"
+REPLY_CHANNEL = "ocpp_replies"
+EVENT_CHANNEL = "ocpp_events"
+RFID_CHANNEL = "rfid_changes"
+
+# NOTIFY payloads are limited to 8000 bytes; beyond RFID_RELOAD_THRESHOLD cards
+# the workers reload their whole authorization index instead
+RFID_NOTIFY_CHUNK = 200
+RFID_RELOAD_THRESHOLD = 2000
+
+# Returned when no live worker holds the charger's WebSocket
+NOT_CONNECTED = "NotConnected"
+
+EventHandler = Callable[[dict], Awaitable[None]]
+
+
+def asyncpg_dsn(url: str = DATABASE_URL) -> str:
+    """SQLAlchemy URL -> plain asyncpg DSN"""
+    return url.replace('postgresql+asyncpg://', 'postgresql://', 1)
+
+
+class OCPPGateway:
+    """Connection registry and NOTIFY-based command/event routing"""
+    
+    def __init__(self):
+        self.mode = OCPP_GATEWAY_MODE
+        self.multi_process = OCPP_GATEWAY_MODE == 'external' or OCPP_REUSE_PORT
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._listener: Optional[asyncpg.Connection] = None
+        self._owns_chargers = False
+        self._event_handler: Optional[EventHandler] = None
+        self._synced: Set[str] = set()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._outbox: Deque[str] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.commands_sent = 0
+        self.commands_served = 0
+        self.events_published = 0
+        self.events_received = 0
+    
+    @property
+    def runs_ocpp_server(self) -> bool:
+        """Whether this (API) process should start the OCPP WebSocket server"""
+        return self.mode != 'external'
+    
+    async def start(self, owns_chargers: bool, event_handler: Optional[EventHandler] = None):
+        """
+        Start routing. `owns_chargers` for processes running the OCPP server;
+        `event_handler` for processes serving frontend WebSockets.
+        """
+        if not self.multi_process or self._task is not None:
+            return
+        self._owns_chargers = owns_chargers
+        self._event_handler = event_handler
+        self._closing = False
+        
+        self._listener = await asyncpg.connect(asyncpg_dsn())
+        await self._listener.add_listener(REPLY_CHANNEL, self._on_reply)
+        if owns_chargers:
+            await self._listener.add_listener(COMMAND_CHANNEL, self._on_command)
+            await self._listener.add_listener(RFID_CHANNEL, self._on_rfid_change)
+        if event_handler:
+            await self._listener.add_listener(EVENT_CHANNEL, self._on_event)
+        
+        if owns_chargers:
+            await self._heartbeat()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"OCPP gateway {self.worker_id} started (mode={self.mode}, owns_chargers={owns_chargers})")
+    
+    async def stop(self):
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        
+        if self._owns_chargers:
+            try:
+                async with async_session() as session:
+                    await session.execute(delete(OCPPConnectionOwner).where(OCPPConnectionOwner.worker_id == self.worker_id))
+                    await session.execute(delete(OCPPGatewayWorker).where(OCPPGatewayWorker.worker_id == self.worker_id))
+                    await session.commit()
+            except Exception as e:
+                logger.error(f"Failed to deregister OCPP gateway worker: {e}")
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+    
+    # ----- Background sync -----
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_heartbeat = loop.time() + WORKER_HEARTBEAT_SECONDS
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=OCPP_REGISTRY_SYNC_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            try:
+                await self._flush_outbox()
+                if self._owns_chargers:
+                    await self._sync_connections()
+                    if loop.time() >= next_heartbeat:
+                        await self._heartbeat()
+                        next_heartbeat = loop.time() + WORKER_HEARTBEAT_SECONDS
+            except Exception as e:
+                logger.error(f"OCPP gateway sync failed: {e}")
+        
+        try:
+            await self._flush_outbox()
+        except Exception as e:
+            logger.error(f"OCPP gateway could not relay {len(self._outbox)} events on shutdown: {e}")
+    
+    async def _heartbeat(self):
+        hostname, pid = self.worker_id.rsplit(":", 1)
+        async with async_session() as session:
+            stmt = insert(OCPPGatewayWorker).values(
+                worker_id=self.worker_id, hostname=hostname, pid=int(pid), last_seen=func.now()
+            )
+            await session.execute(stmt.on_conflict_do_update(
+                index_elements=[OCPPGatewayWorker.worker_id],
+                set_={"last_seen": func.now()}
+            ))
+            await session.commit()
+    
+    async def _sync_connections(self):
+        """Write the difference between local connections and the registry in one transaction"""
+        from services.ocpp_server import central_system
+        
+        local = set(central_system.connections)
+        added = sorted(local - self._synced)
+        removed = sorted(self._synced - local)
+        if not added and not removed:
+            return
+        
+        async with async_session() as session:
+            if added:
+                stmt = insert(OCPPConnectionOwner).values([
+                    {"charger_id": charger_id, "worker_id": self.worker_id} for charger_id in added
+                ])
+                await session.execute(stmt.on_conflict_do_update(
+                    index_elements=[OCPPConnectionOwner.charger_id],
+                    set_={"worker_id": stmt.excluded.worker_id, "connected_at": func.now()}
+                ))
+            if removed:
+                # Only drop rows still ours; the charger may already have reconnected elsewhere
+                await session.execute(
+                    delete(OCPPConnectionOwner).where(
+                        OCPPConnectionOwner.charger_id.in_(removed),
+                        OCPPConnectionOwner.worker_id == self.worker_id
+                    )
+                )
+            await session.commit()
+        self._synced = local
+    
+    # ----- Registry queries -----
+    
+    def _live_owners(self):
+        return (
+            select(OCPPConnectionOwner.charger_id, OCPPConnectionOwner.worker_id)
+            .join(OCPPGatewayWorker, OCPPGatewayWorker.worker_id == OCPPConnectionOwner.worker_id)
+            .where(OCPPGatewayWorker.last_seen > func.now() - text(f"interval '{WORKER_STALE_SECONDS} seconds'"))
+        )
+    
+    async def owner_of(self, charger_id: str) -> Optional[str]:
+        async with async_session() as session:
+            result = await session.execute(
+                self._live_owners().where(OCPPConnectionOwner.charger_id == charger_id)
+            )
+            row = result.first()
+        return row.worker_id if row else None
+    
+    async def connected_chargers(self) -> Set[str]:
+        """Charger ids connected to any live worker"""
+        async with async_session() as session:
+            result = await session.execute(self._live_owners())
+            return {row.charger_id for row in result.all()}
+    
+    # ----- Commands -----
+    
+    async def send_command(self, charger_id: str, command: str, args: dict) -> str:
+        """Run a central system command on the worker that owns the charger"""
+        if not self.multi_process or self._listener is None:
+            return NOT_CONNECTED
+        worker_id = await self.owner_of(charger_id)
+        if worker_id is None:
+            return NOT_CONNECTED
+        
+        request_id = str(uuid.uuid4())
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self._notify(COMMAND_CHANNEL, {
+                "id": request_id,
+                "target": worker_id,
+                "reply_to": self.worker_id,
+                "charger_id": charger_id,
+                "command": command,
+                "args": args,
+            })
+            self.commands_sent += 1
+            return await asyncio.wait_for(future, timeout=OCPP_COMMAND_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error(f"OCPP command {command} for {charger_id} timed out on worker {worker_id}")
+            return "Rejected"
+        finally:
+            self._pending.pop(request_id, None)
+    
+    def _on_command(self, connection, pid, channel, payload):
+        message = json.loads(payload)
+        if message.get("target") == self.worker_id:
+            asyncio.create_task(self._serve_command(message))
+    
+    async def _serve_command(self, message: dict):
+        from services.ocpp_server import central_system
+        
+        try:
+            status = await central_system.execute_command(message["charger_id"], message["command"], message.get("args") or {})
+        except Exception as e:
+            logger.error(f"OCPP command {message.get('command')} failed: {e}")
+            status = "Rejected"
+        self.commands_served += 1
+        try:
+            await self._notify(REPLY_CHANNEL, {"id": message["id"], "reply_to": message["reply_to"], "status": status})
+        except Exception as e:
+            logger.error(f"Failed to reply to OCPP command {message['id']}: {e}")
+    
+    def _on_reply(self, connection, pid, channel, payload):
+        message = json.loads(payload)
+        if message.get("reply_to") != self.worker_id:
+            return
+        future = self._pending.get(message.get("id"))
+        if future is not None and not future.done():
+            future.set_result(message.get("status") or "Rejected")
+    
+    # ----- Events -----
+    
+    def publish_event(self, message: dict):
+        """Queue a frontend event for every API process; never waits on the database"""
+        self._outbox.append(json.dumps(message, default=str))
+        self._wakeup.set()
+    
+    async def _flush_outbox(self):
+        if not self._outbox:
+            return
+        payloads = [self._outbox.popleft() for _ in range(len(self._outbox))]
+        try:
+            async with async_session() as session:
+                await session.execute(
+                    text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+                    {"channel": EVENT_CHANNEL, "payloads": payloads}
+                )
+                await session.commit()
+        except Exception:
+            self._outbox.extendleft(reversed(payloads))
+            raise
+        self.events_published += len(payloads)
+    
+    def _on_event(self, connection, pid, channel, payload):
+        self.events_received += 1
+        if self._event_handler:
+            asyncio.create_task(self._event_handler(json.loads(payload)))
+    
+    # ----- RFID authorization -----
+    
+    async def publish_rfid_changes(self, card_numbers: List[str]):
+        """Ask the charger-owning workers to re-read these tags"""
+        if not self.multi_process or self._listener is None:
+            return
+        if len(card_numbers) > RFID_RELOAD_THRESHOLD:
+            await self._notify(RFID_CHANNEL, {"origin": self.worker_id, "all": True})
+            return
+        for start in range(0, len(card_numbers), RFID_NOTIFY_CHUNK):
+            await self._notify(RFID_CHANNEL, {
+                "origin": self.worker_id,
+                "cards": card_numbers[start:start + RFID_NOTIFY_CHUNK],
+            })
+    
+    def _on_rfid_change(self, connection, pid, channel, payload):
+        message = json.loads(payload)
+        if message.get("origin") != self.worker_id:
+            asyncio.create_task(self._apply_rfid_change(message))
+    
+    async def _apply_rfid_change(self, message: dict):
+        from services.rfid_auth import rfid_auth
+        
+        try:
+            if message.get("all"):
+                await rfid_auth.warm()
+            else:
+                await rfid_auth.refresh(message.get("cards") or [], publish=False)
+        except Exception as e:
+            logger.error(f"Failed to apply RFID changes: {e}")
+    
+    async def _notify(self, channel: str, message: dict):
+        async with async_session() as session:
+            await session.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": channel, "payload": json.dumps(message, default=str)}
+            )
+            await session.commit()
+    
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "mode": self.mode,
+            "multi_process": self.multi_process,
+            "registered_chargers": len(self._synced),
+            "pending_commands": len(self._pending),
+            "commands_sent": self.commands_sent,
+            "commands_served": self.commands_served,
+            "events_published": self.events_published,
+            "events_received": self.events_received,
+            "outbox": len(self._outbox),
+        }
+
+
+ocpp_gateway = OCPPGateway()
+
+
+async def start_ocpp_runtime(
+    host: str = "0.0.0.0",
+    port: int = 9000,
+    reuse_port: bool = OCPP_REUSE_PORT,
+    event_handler: Optional[EventHandler] = None
+):
+    """
+    Start everything a charger-facing process needs, in order: charger status
+    writer, event journal, meter sample writer, restored transaction state, RFID authorization index,
+    gateway registry and finally the WebSocket server. Returns the server (None if it failed).
+    """
+    from services.ocpp_journal import ocpp_journal
+    from services.meter_values import meter_store
+    from services.ocpp_state import restore_ocpp_state
+    from services.ocpp_server import start_ocpp_server
+    from services.rfid_auth import rfid_auth
+    from services.charger_status import charger_status
+    
+    try:
+        await charger_status.start()
+        await ocpp_journal.start()
+        await meter_store.start()
+        logger.info("✓ OCPP event journal running")
+    except Exception as e:
+        logger.error(f"Failed to start OCPP event journal: {e}")
+    
+    # Reload active OCPP transactions once replayed journal events are written
+    try:
+        await ocpp_journal.drain()
+        await restore_ocpp_state()
+        logger.info("✓ OCPP transaction state restored")
+    except Exception as e:
+        logger.error(f"Failed to restore OCPP transaction state: {e}")
+    
+    try:
+        await rfid_auth.warm()
+    except Exception as e:
+        logger.error(f"Failed to load RFID authorization index: {e}")
+    
+    try:
+        await ocpp_gateway.start(owns_chargers=True, event_handler=event_handler)
+    except Exception as e:
+        logger.error(f"Failed to start OCPP gateway registry: {e}")
+    
+    try:
+        server = await start_ocpp_server(host=host, port=port, reuse_port=reuse_port)
+        logger.info(f"✓ OCPP WebSocket server running on ws://{host}:{port}")
+        return server
+    except Exception as e:
+        logger.error(f"Failed to start OCPP server: {e}")
+        return None
+
+
+async def stop_ocpp_runtime(server=None):
+    """Stop accepting chargers, then flush journal, charger status, meter samples and registry"""
+    from services.ocpp_journal import ocpp_journal
+    from services.meter_values import meter_store
+    from services.charger_status import charger_status
+    
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+    await ocpp_journal.stop()
+    await charger_status.stop()
+    await meter_store.stop()
+    await ocpp_gateway.stop()
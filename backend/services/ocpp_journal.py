@@ -0,0 +1,476 @@
+"""
+Write-behind journal for OCPP events
+Charger events are queued in memory and persisted by a background flusher in
+batched transactions, so replies to chargers never wait on PostgreSQL.
+
+- Charger status is handed to services.charger_status, which coalesces it per
+  charger and writes it with the heartbeats.
+- Transaction starts/stops are applied in the order they were received; the
+  RFID charges of all stops in a batch are settled in one ledger statement.
+- Every event is appended to a local journal file and fsynced before it is
+  acknowledged; concurrent events share one fsync (group commit). After each
+  committed batch the acknowledged sequence is written to a checkpoint file
+  (temp file, fsync, rename), so events accepted before a crash, restart or
+  power loss are replayed on the next start.
+- A batch that keeps failing on its data (not on a lost connection) is split
+  until the failing entry is found; that entry is moved to a dead-letter file
+  next to the journal and logged, and the rest of the journal moves on.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Deque, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import DBAPIError, DisconnectionError, InterfaceError, OperationalError
+from sqlalchemy.dialects.postgresql import insert
+
+from database import async_session, OCPPTransaction
+from services.charger_status import charger_status
+from services.ledger import rfid_ledger, Charge, latest_balances
+
+logger = logging.getLogger(__name__)
+
+OCPP_JOURNAL_PATH = os.environ.get(
+    'OCPP_JOURNAL_PATH',
+    str(Path(__file__).resolve().parent.parent / 'data' / 'ocpp_journal.jsonl')
+)
+
+# A batch is flushed every OCPP_FLUSH_INTERVAL_MS or as soon as OCPP_FLUSH_BATCH_SIZE events are queued
+OCPP_FLUSH_INTERVAL_MS = int(os.environ.get('OCPP_FLUSH_INTERVAL_MS', '200'))
+OCPP_FLUSH_BATCH_SIZE = int(os.environ.get('OCPP_FLUSH_BATCH_SIZE', '200'))
+
+# Producers wait (back-pressure) once this many transaction events are unflushed
+OCPP_JOURNAL_MAX_PENDING = int(os.environ.get('OCPP_JOURNAL_MAX_PENDING', '10000'))
+
+# Failed attempts at one batch before it is split to find the entry that fails
+OCPP_FLUSH_MAX_ATTEMPTS = int(os.environ.get('OCPP_FLUSH_MAX_ATTEMPTS', '3'))
+
+# Charger status written for each event type
+EVENT_STATUS = {
+    'charger_connected': 'Available',
+    'charger_disconnected': 'Unavailable',
+    'transaction_started': 'Charging',
+    'transaction_stopped': 'Available',
+}
+
+TRANSACTION_EVENTS = ('transaction_started', 'transaction_stopped')
+
+# Cost deducted from RFID cards per kWh (COP)
+RFID_PRICE_PER_KWH = 500
+
+Entry = dict  # {"seq", "event", "data"}
+
+
+def _fsync_directory(path: str):
+    """Persist a file's directory entry (creation, rename); not possible on Windows"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _is_transient(error: Exception) -> bool:
+    """Lost or refused database connection: retried forever, never blamed on an entry"""
+    if isinstance(error, (OSError, asyncio.TimeoutError, DisconnectionError, InterfaceError, OperationalError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+class OCPPJournal:
+    """Ordered transaction events, flushed in batches"""
+    
+    def __init__(
+        self,
+        path: str = OCPP_JOURNAL_PATH,
+        flush_interval_ms: int = OCPP_FLUSH_INTERVAL_MS,
+        batch_size: int = OCPP_FLUSH_BATCH_SIZE,
+        max_pending: int = OCPP_JOURNAL_MAX_PENDING,
+        max_attempts: int = OCPP_FLUSH_MAX_ATTEMPTS
+    ):
+        self.path = path
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._events: Deque[Entry] = deque()
+        self._seq = 0
+        self._file = None
+        self._appended_seq = 0
+        self._synced_seq = 0
+        self._syncing: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._has_room = asyncio.Event()
+        self._has_room.set()
+        self._closing = False
+        # Narrowed while a failing batch is split; restored once its entries are through
+        self._batch_limit = batch_size
+        self._attempts = 0
+        self._suspect_seq = 0
+        self.recorded = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.replayed = 0
+        self.dead_lettered = 0
+        self.fsyncs = 0
+        self.last_flush_ms = 0.0
+    
+    # ----- Producer side -----
+    
+    async def record(self, event_type: str, data: dict):
+        """Queue an event; returns once it is journaled on disk, without touching the database"""
+        if event_type in TRANSACTION_EVENTS and len(self._events) >= self.max_pending:
+            logger.warning(f"OCPP journal backlog at {len(self._events)} events, waiting for the flusher")
+            self._has_room.clear()
+            await self._has_room.wait()
+        
+        if event_type not in TRANSACTION_EVENTS:
+            # Status only: nothing to replay, the coalescer writes it with the heartbeats
+            self._enqueue({"seq": None, "event": event_type, "data": data})
+            self.recorded += 1
+            return
+        
+        self._seq += 1
+        entry = {"seq": self._seq, "event": event_type, "data": dict(data)}
+        if event_type == 'transaction_started':
+            # Fixed row id keeps the insert idempotent if the entry is replayed
+            entry["data"]["row_id"] = str(uuid.uuid4())
+        self._append(entry)
+        self._enqueue(entry)
+        self.recorded += 1
+        
+        if len(self._events) >= self.batch_size:
+            self._wakeup.set()
+        await self._sync(entry["seq"])
+    
+    def _enqueue(self, entry: Entry):
+        data = entry["data"]
+        status = EVENT_STATUS.get(entry["event"])
+        charger_id = data.get('charger_id')
+        if status and charger_id:
+            heartbeat = data.get('timestamp') if entry["event"] == 'charger_connected' else None
+            charger_status.update(charger_id, status=status, heartbeat=heartbeat)
+        if entry["event"] in TRANSACTION_EVENTS:
+            self._events.append(entry)
+    
+    def _append(self, entry):
+        if self._file is None:
+            return
+        try:
+            self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self._file.flush()
+            self._appended_seq = entry["seq"]
+        except OSError as e:
+            logger.error(f"OCPP journal write failed: {e}")
+    
+    async def _sync(self, seq: int):
+        """
+        Wait until entry `seq` is on disk. One fsync covers every entry appended
+        before it starts; entries appended while it runs share the next one.
+        """
+        while self._synced_seq < seq and self._file is not None:
+            if self._syncing is None:
+                self._syncing = asyncio.create_task(self._fsync_journal())
+            await asyncio.shield(self._syncing)
+    
+    async def _fsync_journal(self):
+        upto = self._appended_seq
+        try:
+            await asyncio.to_thread(os.fsync, self._file.fileno())
+            self.fsyncs += 1
+        except (OSError, ValueError) as e:  # ValueError: closed during shutdown
+            logger.error(f"OCPP journal fsync failed: {e}")
+        finally:
+            self._synced_seq = max(self._synced_seq, upto)
+            self._syncing = None
+    
+    # ----- Lifecycle -----
+    
+    async def start(self):
+        """Replay unflushed entries from the journal file and start the flusher"""
+        if self._task is not None:
+            return
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._replay()
+        self._file = open(self.path, "a", encoding="utf-8")
+        _fsync_directory(self.path)
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"OCPP journal started ({self.replayed} events replayed)")
+    
+    async def stop(self):
+        """Flush what is left and stop the flusher"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    async def drain(self, timeout: float = 10.0) -> bool:
+        """Wait until everything queued so far is written; False on timeout"""
+        deadline = time.monotonic() + timeout
+        while self._events:
+            if self._task is None or time.monotonic() > deadline:
+                return False
+            self._wakeup.set()
+            await asyncio.sleep(self.flush_interval / 4)
+        return True
+    
+    @property
+    def checkpoint_path(self) -> str:
+        return self.path + ".ack"
+    
+    @property
+    def dead_letter_path(self) -> str:
+        return self.path + ".dead"
+    
+    def _replay(self):
+        acked = 0
+        if os.path.exists(self.checkpoint_path):
+            try:
+                with open(self.checkpoint_path, encoding="utf-8") as f:
+                    acked = json.load(f)["ack"]
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"OCPP journal checkpoint unreadable, replaying everything: {e}")
+        # Sequence numbers continue after the checkpoint even when the journal was truncated
+        self._seq = max(self._seq, acked)
+        if not os.path.exists(self.path):
+            return
+        entries = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line after a crash
+                if "ack" in record:  # checkpoints written inline by older versions
+                    acked = max(acked, record["ack"])
+                elif "seq" in record:
+                    entries.append(record)
+        for entry in entries:
+            self._seq = max(self._seq, entry["seq"])
+            if entry["seq"] > acked:
+                self._enqueue(entry)
+                self.replayed += 1
+    
+    # ----- Flusher -----
+    
+    async def _run(self):
+        retry_delay = self.flush_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            try:
+                while self._events:
+                    await self.flush()
+                    if len(self._events) < self.batch_size and not self._closing:
+                        break
+                retry_delay = self.flush_interval
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"OCPP journal flush failed, retrying in {retry_delay:.1f}s: {e}")
+                if self._closing:
+                    logger.error(f"OCPP journal stopping with {len(self._events)} events kept in {self.path}")
+                    return
+                if not _is_transient(e):
+                    await self._isolate_failure(e)
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 5.0)
+                continue
+            
+            if self._closing:
+                return
+    
+    async def flush(self):
+        """Write one batch of transaction events, in order"""
+        events = [self._events.popleft() for _ in range(min(self._batch_limit, len(self._events)))]
+        last_seq = self._seq
+        started = time.perf_counter()
+        
+        try:
+            async with async_session() as session:
+                starts = []
+                charges = []
+                for entry in events:
+                    if entry["event"] == 'transaction_started':
+                        starts.append(entry["data"])
+                        continue
+                    # Keep order: earlier starts must exist before a stop is applied
+                    await self._insert_starts(session, starts)
+                    starts = []
+                    charge = await self._apply_stop(session, entry["data"])
+                    if charge:
+                        charges.append(charge)
+                await self._insert_starts(session, starts)
+                settled = await rfid_ledger.settle(session, charges)
+                await session.commit()
+        except Exception:
+            # Put the batch back in front
+            self._events.extendleft(reversed(events))
+            raise
+        
+        from services.rfid_auth import rfid_auth
+        for card_number, balance in latest_balances(settled).items():
+            rfid_auth.set_balance(card_number, balance)
+        
+        self.flushed += len(events)
+        self.batches += 1
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+        self._attempts = 0
+        if not self._events or self._events[0]["seq"] > self._suspect_seq:
+            self._batch_limit = self.batch_size
+        await self._checkpoint(self._acked_seq(last_seq))
+        if len(self._events) < self.max_pending:
+            self._has_room.set()
+    
+    def _acked_seq(self, last_seq: int) -> int:
+        """Everything up to the oldest entry still queued (or recorded mid-flush) is done with"""
+        return min([last_seq] + ([self._events[0]["seq"] - 1] if self._events else []))
+    
+    async def _isolate_failure(self, error: Exception):
+        """
+        Count a failed attempt at the batch in front. After max_attempts the
+        batch is halved; a single entry that still fails is dead-lettered.
+        """
+        self._attempts += 1
+        if self._attempts < self.max_attempts or not self._events:
+            return
+        self._attempts = 0
+        
+        if self._batch_limit > 1:
+            if self._batch_limit == self.batch_size:
+                self._suspect_seq = self._events[min(self._batch_limit, len(self._events)) - 1]["seq"]
+            self._batch_limit = max(1, self._batch_limit // 2)
+            logger.warning(f"OCPP journal batch keeps failing, retrying in batches of {self._batch_limit}")
+            return
+        
+        last_seq = self._seq
+        entry = self._events[0]
+        try:
+            await asyncio.to_thread(self._write_dead_letter, entry, str(error))
+        except OSError as e:
+            logger.error(f"OCPP journal dead-letter write failed, keeping entry {entry['seq']}: {e}")
+            return
+        self._events.popleft()
+        self.dead_lettered += 1
+        self._batch_limit = self.batch_size
+        logger.error(
+            f"OCPP journal entry {entry['seq']} ({entry['event']}) moved to {self.dead_letter_path}: "
+            f"{error}; data: {json.dumps(entry['data'])}"
+        )
+        await self._checkpoint(self._acked_seq(last_seq))
+        if len(self._events) < self.max_pending:
+            self._has_room.set()
+    
+    def _write_dead_letter(self, entry: Entry, error: str):
+        """Append an entry that cannot be applied, fsynced before the checkpoint moves past it"""
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(dict(entry, error=error), separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    async def _insert_starts(self, session, starts: List[dict]):
+        if not starts:
+            return
+        await session.execute(
+            insert(OCPPTransaction).values([
+                {
+                    "id": data['row_id'],
+                    "transaction_id": data['transaction_id'],
+                    "charger_id": data['charger_id'],
+                    "connector_id": data['connector_id'],
+                    "id_tag": data['id_tag'],
+                    "meter_start": data['meter_start'],
+                    "start_timestamp": data['start_timestamp'],
+                    "status": 'active',
+                }
+                for data in starts
+            ]).on_conflict_do_nothing(index_elements=[OCPPTransaction.id])
+        )
+    
+    async def _apply_stop(self, session, data: dict) -> Optional[Charge]:
+        """Complete a transaction; returns the charge for its card, settled with the rest of the batch"""
+        # Query by transaction_id and charger_id to handle duplicate transaction IDs
+        result = await session.execute(
+            update(OCPPTransaction)
+            .where(
+                OCPPTransaction.transaction_id == data['transaction_id'],
+                OCPPTransaction.charger_id == data.get('charger_id'),
+                OCPPTransaction.status == 'active'
+            )
+            .values(meter_stop=data['meter_stop'], stop_timestamp=data['stop_timestamp'], status='completed')
+            .returning(OCPPTransaction.meter_start, OCPPTransaction.id_tag)
+        )
+        # Only charge the card when this stop completed the transaction, so a replay never charges twice
+        stopped = result.first()
+        if stopped is None or not stopped.id_tag:
+            return None
+        energy_kwh = max(0, data['meter_stop'] - (stopped.meter_start or 0)) / 1000.0
+        cost = energy_kwh * RFID_PRICE_PER_KWH
+        if cost <= 0:
+            return None
+        return Charge(
+            stopped.id_tag, cost,
+            f"Transaction {data['transaction_id']} on {data.get('charger_id')}: {energy_kwh:.3f} kWh"
+        )
+    
+    async def _checkpoint(self, acked_seq: int):
+        """Record that every entry up to `acked_seq` is committed; truncate the journal once drained"""
+        if self._file is None:
+            return
+        try:
+            # Decided and truncated on the event loop so no entry is appended in between
+            if not self._events and acked_seq == self._seq:
+                self._file.truncate(0)
+                self._file.flush()
+            await asyncio.to_thread(self._write_checkpoint, acked_seq)
+        except OSError as e:
+            logger.error(f"OCPP journal checkpoint failed: {e}")
+    
+    def _write_checkpoint(self, acked_seq: int):
+        """Replace the checkpoint file atomically: temp file, fsync, rename, fsync directory"""
+        temp_path = self.checkpoint_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"ack": acked_seq}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.checkpoint_path)
+        _fsync_directory(self.checkpoint_path)
+    
+    def stats(self) -> dict:
+        return {
+            "pending_events": len(self._events),
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failures": self.failures,
+            "replayed": self.replayed,
+            "dead_lettered": self.dead_lettered,
+            "fsyncs": self.fsyncs,
+            "last_flush_ms": self.last_flush_ms,
+            "backpressure": not self._has_room.is_set(),
+        }
+
+
+ocpp_journal = OCPPJournal()
@@ -5,6 +5,8 @@ Handles real-time communication with EV charging stations
 import asyncio
 import logging
 import json
+import os
+import time
 import uuid
 from datetime import datetime, timezone
 from typing import Dict, Optional, Set
@@ -13,18 +15,21 @@ from dataclasses import dataclass, field
 import websockets
 from websockets.server import WebSocketServerProtocol
 
-from ocpp.routing import on
+from ocpp.routing import on, after
 from ocpp.v16 import ChargePoint as cp, call, call_result
 from ocpp.v16.enums import (
     Action, RegistrationStatus, AuthorizationStatus,
     ChargePointStatus, ChargePointErrorCode, ResetType, ResetStatus,
-    RemoteStartStopStatus, UnlockStatus, AvailabilityType, AvailabilityStatus
+    RemoteStartStopStatus, UnlockStatus, AvailabilityType, AvailabilityStatus, UpdateType
 )
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('ocpp')
 
+# Send the local authorization list to every charger after its BootNotification
+OCPP_PUSH_LOCAL_LIST = os.environ.get('OCPP_PUSH_LOCAL_LIST', '').lower() in ('1', 'true', 'yes')
+
 
 @dataclass
 class ChargerConnection:
@@ -49,16 +54,75 @@ class OCPPCentralSystem:
     def __init__(self):
         self.connections: Dict[str, ChargerConnection] = {}
         self.transaction_counter: int = 0
-        self.transactions: Dict[int, dict] = {}
+        self.transactions: Dict[int, dict] = {}  # active transactions only
         self._db_callback = None
+        self._state_callback = None
+        self._meter_callback = None
+        self._id_allocator = None
+        self._authorizer = None
+        self._local_list = None
+        self._remote_tags: Dict[str, str] = {}  # charger_id -> id_tag of an accepted RemoteStart
         self._lock = asyncio.Lock()
     
     def set_db_callback(self, callback):
         """Set callback for database operations"""
         self._db_callback = callback
     
+    def set_state_callback(self, callback):
+        """Set callback receiving (charger_id, changed fields) for live charger state"""
+        self._state_callback = callback
+    
+    async def publish_state(self, charger_id: str, **fields):
+        if self._state_callback:
+            try:
+                await self._state_callback(charger_id, fields)
+            except Exception as e:
+                logger.error(f"Failed to publish state of {charger_id}: {e}")
+    
+    def set_transaction_id_allocator(self, allocator):
+        """Set coroutine function returning durable transaction ids"""
+        self._id_allocator = allocator
+    
+    def set_authorizer(self, authorizer, local_list=None):
+        """
+        Set coroutine function id_tag -> AuthorizationStatus, and optionally a
+        function returning SendLocalList entries
+        """
+        self._authorizer = authorizer
+        self._local_list = local_list
+    
+    async def authorize(self, charger_id: str, id_tag: str, starting: bool = False) -> str:
+        """Authorization status for a tag presented at a charger; accepts everything without an authorizer"""
+        # Tags we sent in a RemoteStartTransaction are ours, whatever the card index says
+        if self._remote_tags.get(charger_id) == id_tag:
+            if starting:
+                del self._remote_tags[charger_id]
+            return AuthorizationStatus.accepted
+        if not self._authorizer:
+            return AuthorizationStatus.accepted
+        try:
+            return await self._authorizer(id_tag)
+        except Exception as e:
+            logger.error(f"Authorization of {id_tag} failed: {e}")
+            return AuthorizationStatus.accepted
+    
+    def set_meter_callback(self, callback):
+        """Set (synchronous) callback receiving sampled meter values"""
+        self._meter_callback = callback
+    
+    def record_meter_values(self, charger_id: str, connector_id: Optional[int],
+                            transaction_id: Optional[int], meter_value: list):
+        """Hand sampled values to the time-series store without waiting on it"""
+        if self._meter_callback and meter_value:
+            try:
+                self._meter_callback(charger_id, connector_id, transaction_id, meter_value)
+            except Exception as e:
+                logger.error(f"Failed to buffer meter values from {charger_id}: {e}")
+    
     async def get_next_transaction_id(self) -> int:
         """Generate next transaction ID"""
+        if self._id_allocator:
+            return await self._id_allocator()
         async with self._lock:
             self.transaction_counter += 1
             return self.transaction_counter
@@ -85,6 +149,16 @@ class OCPPCentralSystem:
             if tx
         ]
     
+    def rehydrate(self, transactions: list):
+        """Load active transactions persisted before a restart"""
+        for tx in transactions:
+            self.transactions[tx['transaction_id']] = tx
+            conn = self.connections.get(tx['charger_id'])
+            if conn:
+                conn.active_transaction_id = tx['transaction_id']
+        if self.transactions:
+            self.transaction_counter = max(self.transaction_counter, max(self.transactions))
+    
     async def register_charger(self, charger_id: str, websocket: WebSocketServerProtocol, 
                                 charge_point: 'ChargePointHandler'):
         """Register a new charger connection"""
@@ -96,6 +170,11 @@ class OCPPCentralSystem:
         self.connections[charger_id] = connection
         logger.info(f"Charger {charger_id} connected")
         
+        # Resume a session that was active when the charger dropped off
+        for tx_id, tx in self.transactions.items():
+            if tx['charger_id'] == charger_id:
+                connection.active_transaction_id = tx_id
+        
         # Notify database if callback set
         if self._db_callback:
             await self._db_callback('charger_connected', {
@@ -122,6 +201,10 @@ class OCPPCentralSystem:
             for key, value in kwargs.items():
                 if hasattr(conn, key):
                     setattr(conn, key, value)
+            await self.publish_state(charger_id, **{
+                key: value.isoformat() if isinstance(value, datetime) else value
+                for key, value in kwargs.items()
+            })
     
     async def start_transaction(self, charger_id: str, connector_id: int, 
                                  id_tag: str, meter_start: int) -> int:
@@ -147,17 +230,21 @@ class OCPPCentralSystem:
         return tx_id
     
     async def stop_transaction(self, transaction_id: int, meter_stop: int, 
-                                reason: str = "Local") -> dict:
+                                reason: str = "Local", charger_id: Optional[str] = None) -> dict:
         """Record transaction stop"""
-        if transaction_id not in self.transactions:
+        if transaction_id in self.transactions:
+            tx = self.transactions[transaction_id]
+            tx['energy_kwh'] = (meter_stop - tx['meter_start']) / 1000.0
+        elif charger_id:
+            # Started under another gateway worker; the stored row supplies the rest
+            tx = {'transaction_id': transaction_id, 'charger_id': charger_id}
+        else:
             return {'status': 'Invalid'}
         
-        tx = self.transactions[transaction_id]
         tx['meter_stop'] = meter_stop
         tx['stop_timestamp'] = datetime.now(timezone.utc).isoformat()
         tx['reason'] = reason
         tx['status'] = 'completed'
-        tx['energy_kwh'] = (meter_stop - tx['meter_start']) / 1000.0
         
         # Clear active transaction from charger
         charger_id = tx.get('charger_id')
@@ -167,8 +254,38 @@ class OCPPCentralSystem:
         if self._db_callback:
             await self._db_callback('transaction_stopped', tx)
         
+        # Completed transactions live in the database only
+        self.transactions.pop(transaction_id, None)
+        
         return {'status': 'Accepted'}
     
+    async def execute_command(self, charger_id: str, command: str, args: dict) -> str:
+        """
+        Run a remote command on a locally connected charger.
+        Used for API requests in this process and ones routed from other processes.
+        """
+        conn = self.get_connection(charger_id)
+        if not conn:
+            return "NotConnected"
+        
+        if command == "remote_start":
+            return await self.remote_start_transaction(charger_id, args.get('connector_id', 1), args.get('id_tag', "REMOTE"))
+        if command == "remote_stop":
+            if not conn.active_transaction_id:
+                return "NoActiveTransaction"
+            return await self.remote_stop_transaction(charger_id, conn.active_transaction_id)
+        if command == "reset":
+            return await self.reset_charger(charger_id, args.get('reset_type', "Soft"))
+        if command == "unlock":
+            return await self.unlock_connector(charger_id, args.get('connector_id', 1))
+        if command == "availability":
+            return await self.change_availability(charger_id, args.get('connector_id', 0), args.get('availability_type', "Operative"))
+        if command == "local_list":
+            return await self.send_local_list(charger_id)
+        
+        logger.warning(f"Unknown command {command} for {charger_id}")
+        return "Rejected"
+    
     # Remote commands
     async def remote_start_transaction(self, charger_id: str, connector_id: int = 1, 
                                         id_tag: str = "REMOTE") -> str:
@@ -183,6 +300,8 @@ class OCPPCentralSystem:
                 connector_id=connector_id
             )
             response = await conn.charge_point.call(request)
+            if response.status == RemoteStartStopStatus.accepted:
+                self._remote_tags[charger_id] = id_tag
             return response.status
         except Exception as e:
             logger.error(f"RemoteStartTransaction failed: {e}")
@@ -247,6 +366,24 @@ class OCPPCentralSystem:
         except Exception as e:
             logger.error(f"ChangeAvailability failed: {e}")
             return "Rejected"
+    
+    async def send_local_list(self, charger_id: str) -> str:
+        """Replace the charger's local authorization list with the current tag index"""
+        conn = self.get_connection(charger_id)
+        if not conn or not self._local_list:
+            return "Rejected"
+        
+        try:
+            request = call.SendLocalList(
+                list_version=int(time.time()),
+                update_type=UpdateType.full,
+                local_authorization_list=self._local_list()
+            )
+            response = await conn.charge_point.call(request)
+            return response.status
+        except Exception as e:
+            logger.error(f"SendLocalList failed: {e}")
+            return "Rejected"
 
 
 class ChargePointHandler(cp):
@@ -278,6 +415,13 @@ class ChargePointHandler(cp):
             status=RegistrationStatus.accepted
         )
     
+    @after(Action.boot_notification)
+    async def after_boot_notification(self, **kwargs):
+        """Push the local authorization list once the charger is accepted"""
+        if OCPP_PUSH_LOCAL_LIST:
+            status = await self.central_system.send_local_list(self.charger_id)
+            logger.info(f"SendLocalList to {self.charger_id}: {status}")
+    
     @on(Action.heartbeat)
     async def on_heartbeat(self):
         """Handle Heartbeat from charger"""
@@ -303,6 +447,7 @@ class ChargePointHandler(cp):
             conn.connector_status[connector_id] = status
             if connector_id == 0:  # Overall charger status
                 conn.status = status
+            await self.central_system.publish_state(self.charger_id, connector_id=connector_id, status=status)
         
         return call_result.StatusNotification()
     
@@ -311,10 +456,9 @@ class ChargePointHandler(cp):
         """Handle Authorize request from charger"""
         logger.info(f"Authorize request from {self.charger_id} for tag: {id_tag}")
         
-        # Check if RFID tag is valid (integrate with database later)
-        # For now, accept all tags
+        status = await self.central_system.authorize(self.charger_id, id_tag)
         return call_result.Authorize(
-            id_tag_info={'status': AuthorizationStatus.accepted}
+            id_tag_info={'status': status}
         )
     
     @on(Action.start_transaction)
@@ -323,6 +467,8 @@ class ChargePointHandler(cp):
         """Handle StartTransaction from charger"""
         logger.info(f"StartTransaction from {self.charger_id} connector {connector_id}")
         
+        # The transaction is recorded either way; a charger told Invalid/Blocked stops it again
+        status = await self.central_system.authorize(self.charger_id, id_tag, starting=True)
         tx_id = await self.central_system.start_transaction(
             charger_id=self.charger_id,
             connector_id=connector_id,
@@ -332,7 +478,7 @@ class ChargePointHandler(cp):
         
         return call_result.StartTransaction(
             transaction_id=tx_id,
-            id_tag_info={'status': AuthorizationStatus.accepted}
+            id_tag_info={'status': status}
         )
     
     @on(Action.stop_transaction)
@@ -342,10 +488,18 @@ class ChargePointHandler(cp):
         logger.info(f"StopTransaction from {self.charger_id}: tx_id={transaction_id}")
         
         reason = kwargs.get('reason', 'Local')
+        tx = self.central_system.transactions.get(transaction_id)
+        self.central_system.record_meter_values(
+            self.charger_id,
+            tx.get('connector_id') if tx else None,
+            transaction_id,
+            kwargs.get('transaction_data')
+        )
         result = await self.central_system.stop_transaction(
             transaction_id=transaction_id,
             meter_stop=meter_stop,
-            reason=reason
+            reason=reason,
+            charger_id=self.charger_id
         )
         
         return call_result.StopTransaction(
@@ -357,8 +511,9 @@ class ChargePointHandler(cp):
         """Handle MeterValues from charger"""
         logger.debug(f"MeterValues from {self.charger_id} connector {connector_id}")
         
-        # Process meter values (can be stored for detailed analytics)
-        # For now, just acknowledge
+        self.central_system.record_meter_values(
+            self.charger_id, connector_id, kwargs.get('transaction_id'), meter_value
+        )
         return call_result.MeterValues()
     
     @on(Action.data_transfer)
@@ -398,7 +553,7 @@ async def on_connect(websocket):
         
         # Start message handling
         await charge_point.start()
-        
+    
     except websockets.exceptions.ConnectionClosed as e:
         logger.info(f"Connection closed for {charger_id}: {e}")
     except Exception as e:
@@ -409,8 +564,12 @@ async def on_connect(websocket):
         await central_system.unregister_charger(charger_id)
 
 
-async def start_ocpp_server(host: str = "0.0.0.0", port: int = 9000):
-    """Start the OCPP WebSocket server"""
+async def start_ocpp_server(host: str = "0.0.0.0", port: int = 9000, reuse_port: bool = False):
+    """
+    Start the OCPP WebSocket server.
+    With reuse_port, several processes can listen on the same port (SO_REUSEPORT)
+    and the kernel spreads new charger connections across them.
+    """
     logger.info(f"Starting OCPP 1.6 WebSocket server on ws://{host}:{port}")
     
     server = await websockets.serve(
@@ -419,7 +578,8 @@ async def start_ocpp_server(host: str = "0.0.0.0", port: int = 9000):
         port,
         subprotocols=['ocpp1.6', 'ocpp1.6j'],
         ping_interval=30,
-        ping_timeout=10
+        ping_timeout=10,
+        reuse_port=reuse_port or None
     )
     
     logger.info(f"OCPP WebSocket server running on ws://{host}:{port}")
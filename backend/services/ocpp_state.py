@@ -0,0 +1,90 @@
+"""
+Persistent OCPP session state
+Transaction ids come from the ocpp_transaction_id_seq sequence, reserved in
+blocks so a StartTransaction only hits the database once per block, and active
+transactions are reloaded into the central system on startup.
+"""
+import asyncio
+import logging
+from typing import List
+
+from sqlalchemy import select, text
+
+from database import (
+    async_session, OCPPTransaction, ocpp_transaction_id_seq, OCPP_TRANSACTION_ID_BLOCK
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TransactionIdAllocator:
+    """Hands out ids from blocks reserved with one nextval() each; unused ids are skipped on restart"""
+    
+    def __init__(self, block_size: int = OCPP_TRANSACTION_ID_BLOCK):
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0  # exclusive
+        self._lock = asyncio.Lock()
+        self.reservations = 0
+    
+    async def next_id(self) -> int:
+        async with self._lock:
+            if self._next >= self._end:
+                await self._reserve()
+            value = self._next
+            self._next += 1
+            return value
+    
+    async def _reserve(self):
+        async with async_session() as session:
+            result = await session.execute(select(ocpp_transaction_id_seq.next_value()))
+            start = result.scalar()
+        self._next, self._end = start, start + self.block_size
+        self.reservations += 1
+        logger.info(f"Reserved OCPP transaction ids {start}-{start + self.block_size - 1}")
+
+
+transaction_ids = TransactionIdAllocator()
+
+
+def transaction_to_state(tx: OCPPTransaction) -> dict:
+    """Central system representation of a stored transaction"""
+    return {
+        'transaction_id': tx.transaction_id,
+        'charger_id': tx.charger_id,
+        'connector_id': tx.connector_id or 1,
+        'id_tag': tx.id_tag or "",
+        'meter_start': tx.meter_start or 0,
+        'start_timestamp': tx.start_timestamp or "",
+        'status': 'active'
+    }
+
+
+async def load_active_transactions() -> List[dict]:
+    """
+    Active transactions in one query, oldest first.
+    Also moves the id sequence past ids issued before it existed.
+    """
+    async with async_session() as session:
+        await session.execute(text(
+            "SELECT setval('ocpp_transaction_id_seq', s.max_id) "
+            "FROM (SELECT max(transaction_id) AS max_id FROM ocpp_transactions) s "
+            "WHERE s.max_id >= (SELECT last_value FROM ocpp_transaction_id_seq)"
+        ))
+        result = await session.execute(
+            select(OCPPTransaction)
+            .where(OCPPTransaction.status == 'active', OCPPTransaction.transaction_id.isnot(None))
+            .order_by(OCPPTransaction.created_at)
+        )
+        transactions = [transaction_to_state(tx) for tx in result.scalars().all()]
+        await session.commit()
+    return transactions
+
+
+async def restore_ocpp_state():
+    """Rehydrate the central system's active transactions after a restart"""
+    from services.ocpp_server import central_system
+    
+    transactions = await load_active_transactions()
+    central_system.rehydrate(transactions)
+    logger.info(f"Restored {len(transactions)} active OCPP transactions")
@@ -0,0 +1,118 @@
+"""
+Keyset (cursor) pagination helpers
+Pages are ordered by (sort column DESC NULLS LAST, id DESC) and resumed from an
+opaque cursor, so fetching page N costs the same as fetching page 1.
+"""
+import base64
+import json
+from datetime import datetime, date
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select, func, text, and_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def encode_cursor(sort_value: Any, row_id: str) -> str:
+    """Encode the last row's sort value and id as an opaque URL-safe cursor"""
+    if isinstance(sort_value, datetime):
+        payload = ["dt", sort_value.isoformat(), row_id]
+    elif isinstance(sort_value, date):
+        payload = ["d", sort_value.isoformat(), row_id]
+    else:
+        payload = ["v", sort_value, row_id]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """Decode a cursor produced by encode_cursor()"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        kind, value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if value is not None and kind == "dt":
+            value = datetime.fromisoformat(value)
+        elif value is not None and kind == "d":
+            value = date.fromisoformat(value)
+        return value, row_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_keyset(query, sort_column, id_column, cursor: Optional[str], limit: int):
+    """
+    Order `query` newest first and resume after `cursor`.
+    Fetches one extra row so the caller can tell whether another page exists.
+    The order matches the (sort DESC NULLS LAST, id DESC) indexes and the cursor
+    is a plain row comparison, so each page is a bounded index range scan. A
+    cursor with a sort value only reaches rows that have one; fetch_page()
+    carries on into the NULL tail.
+    """
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        if sort_value is None:
+            # Already inside the NULLS LAST tail
+            query = query.where(and_(sort_column.is_(None), id_column < row_id))
+        else:
+            query = query.where(tuple_(sort_column, id_column) < tuple_(sort_value, row_id))
+    
+    return query.order_by(
+        sort_column.desc().nullslast(),
+        id_column.desc()
+    ).limit(limit + 1)
+
+
+def null_tail(query, sort_column, id_column, limit: int):
+    """The first `limit` rows of `query` without a sort value, in page order"""
+    return query.where(sort_column.is_(None)).order_by(
+        sort_column.desc().nullslast(),
+        id_column.desc()
+    ).limit(limit)
+
+
+async def fetch_page(session: AsyncSession, query, sort_column, id_column, cursor: Optional[str],
+                     limit: int, sort_attr: str, scalars: bool = True) -> Tuple[List, Optional[str]]:
+    """
+    One page of `query` after `cursor` and the cursor for the next one.
+    `scalars=False` returns rows for queries selecting several columns.
+    """
+    result = await session.execute(apply_keyset(query, sort_column, id_column, cursor, limit))
+    rows = list(result.scalars().all() if scalars else result.all())
+    
+    if cursor and len(rows) <= limit and decode_cursor(cursor)[0] is not None:
+        # Rows with a sort value ran out mid-page; continue with the NULL tail
+        result = await session.execute(null_tail(query, sort_column, id_column, limit + 1 - len(rows)))
+        rows.extend(result.scalars().all() if scalars else result.all())
+    
+    return split_page(rows, limit, sort_attr)
+
+
+def split_page(rows: List, limit: int, sort_attr: str) -> Tuple[List, Optional[str]]:
+    """Trim the look-ahead row and build the cursor for the next page"""
+    if len(rows) <= limit:
+        return list(rows), None
+    page = list(rows[:limit])
+    last = page[-1]
+    return page, encode_cursor(getattr(last, sort_attr), last.id)
+
+
+async def estimate_total(session: AsyncSession, model, conditions: List) -> int:
+    """
+    Total rows for a paginated listing.
+    Unfiltered listings use the planner's estimate (pg_class.reltuples) instead
+    of scanning the table; filtered listings are counted exactly.
+    """
+    if not conditions:
+        result = await session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": model.__tablename__}
+        )
+        estimate = result.scalar()
+        if estimate is not None and estimate >= 0:  # -1 until the table is analyzed
+            return estimate
+    
+    query = select(func.count()).select_from(model)
+    if conditions:
+        query = query.where(and_(*conditions))
+    result = await session.execute(query)
+    return result.scalar() or 0
@@ -0,0 +1,94 @@
+"""
+Password hashing off the event loop
+bcrypt is deliberately slow (~100-300 ms per hash); running it inside async
+handlers stalls every other request, including OCPP replies. Hashes and checks
+run on a bounded thread pool instead (bcrypt releases the GIL while hashing).
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List
+
+import bcrypt
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_POOL_WORKERS = int(os.environ.get('PASSWORD_POOL_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# Requests beyond this many queued hashes are turned away with 503
+PASSWORD_QUEUE_LIMIT = int(os.environ.get('PASSWORD_QUEUE_LIMIT', '256'))
+
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+class PasswordHasher:
+    """Bounded bcrypt worker pool with queue-depth counters"""
+    
+    def __init__(self, workers: int = PASSWORD_POOL_WORKERS, queue_limit: int = PASSWORD_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.pending = 0  # submitted and not finished (queued + running)
+        self.max_pending = 0
+        self.completed = 0
+        self.rejected = 0
+    
+    async def _run(self, func, *args):
+        if self.pending >= self.queue_limit:
+            self.rejected += 1
+            logger.warning(f"Password pool saturated ({self.pending} pending), rejecting request")
+            raise HTTPException(status_code=503, detail="Server busy, please retry")
+        
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+    
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+    
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(_verify, password, hashed)
+    
+    async def hash_many(self, passwords: List[str], shared: Iterable[str] = ()) -> List[str]:
+        """
+        Hash `passwords` in batches of the pool size; returns their hashes in order.
+        Each password gets its own salt, so accounts sharing a password cannot be
+        told apart by their hashes. Only passwords in `shared` (e.g. a default the
+        caller assigned itself) are hashed once and reused.
+        """
+        shared = set(shared)
+        distinct_shared = list(dict.fromkeys(password for password in passwords if password in shared))
+        jobs = distinct_shared + [password for password in passwords if password not in shared]
+        results = []
+        for start in range(0, len(jobs), self.workers):
+            batch = jobs[start:start + self.workers]
+            results.extend(await asyncio.gather(*[self.hash(password) for password in batch]))
+        
+        shared_hashes = dict(zip(distinct_shared, results))
+        own_hashes = iter(results[len(distinct_shared):])
+        return [shared_hashes[password] if password in shared else next(own_hashes) for password in passwords]
+    
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "queue_depth": max(0, self.pending - self.workers),
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,183 @@
+"""
+Pricing resolution - price per kWh for (account, connector) pairs
+Resolution order: the account's pricing group, an account + connector rule,
+an account-wide ("*") rule, the default connector price, then FALLBACK_PRICE.
+Lookups are served from in-memory indexes instead of per-call queries.
+"""
+import asyncio
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select
+
+from database import async_session, User, PricingRule, PricingGroup
+
+logger = logging.getLogger(__name__)
+
+# Default pricing by connector type (PORTERIA)
+DEFAULT_CONNECTOR_PRICING = {
+    'CCS': 2500.0,
+    'CCS2': 2500.0,
+    'CHADEMO': 2000.0,
+    'J1772': 1500.0,
+    'TYPE2': 1500.0,
+}
+
+# Unknown connector types
+FALLBACK_PRICE = 2000.0
+
+PricingPair = Tuple[str, str, Optional[str]]  # (account, connector, connector_type)
+
+
+def pricing_key(connector: Optional[str], connector_type: Optional[str] = None) -> str:
+    """Normalized connector type used to match group and default prices"""
+    return (connector_type or '').upper().strip() or (connector or '').upper().strip()
+
+
+def resolve_price(
+    account: str,
+    connector: str,
+    connector_type: Optional[str],
+    group_pricing: Optional[Dict[str, float]],
+    rules: Dict[Tuple[str, str], float]
+) -> float:
+    """
+    Pick the price for one pair from already loaded group pricing and rules.
+    `group_pricing` keys are upper-cased connector types.
+    """
+    key = pricing_key(connector, connector_type)
+    
+    if group_pricing and key in group_pricing:
+        return group_pricing[key]
+    
+    if (account, connector) in rules:
+        return rules[(account, connector)]
+    
+    if (account, "*") in rules:
+        return rules[(account, "*")]
+    
+    return DEFAULT_CONNECTOR_PRICING.get(key, FALLBACK_PRICE)
+
+
+def _normalize_group_pricing(connector_pricing: Optional[dict]) -> Dict[str, float]:
+    normalized = {}
+    for name, price in (connector_pricing or {}).items():
+        if price is not None:
+            normalized.setdefault(name.upper(), float(price))
+    return normalized
+
+
+class PricingResolver:
+    """
+    Process-wide pricing indexes: rules, groups and the account/user to group maps.
+    
+    Loaded lazily on first use and reloaded after invalidate(), which the
+    pricing, pricing group and user write endpoints call once they commit.
+    """
+    
+    def __init__(self):
+        self._rules: Dict[Tuple[str, str], float] = {}
+        self._groups: Dict[str, Dict[str, float]] = {}
+        self._account_groups: Dict[str, str] = {}  # user name / email / RFID card -> group id
+        self._user_groups: Dict[str, str] = {}  # user id -> group id
+        self._loaded = False
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+    
+    def invalidate(self):
+        """Drop the indexes; the next lookup reloads them"""
+        self._generation += 1
+        self._loaded = False
+        self.invalidations += 1
+    
+    async def _load(self):
+        async with self._lock:
+            if self._loaded:
+                return
+            generation = self._generation
+            
+            async with async_session() as session:
+                rules_result = await session.execute(
+                    select(PricingRule.account, PricingRule.connector, PricingRule.price_per_kwh)
+                )
+                groups_result = await session.execute(
+                    select(PricingGroup.id, PricingGroup.connector_pricing)
+                )
+                users_result = await session.execute(
+                    select(User.id, User.name, User.email, User.rfid_card_number, User.pricing_group_id)
+                    .where(User.pricing_group_id.isnot(None))
+                    .order_by(User.created_at)
+                )
+            
+            rules = {(account, connector): price for account, connector, price in rules_result.all()}
+            groups = {
+                group_id: _normalize_group_pricing(connector_pricing)
+                for group_id, connector_pricing in groups_result.all()
+            }
+            account_groups = {}
+            user_groups = {}
+            for user_id, name, email, card_number, group_id in users_result.all():
+                user_groups[user_id] = group_id
+                for account in (name, email, card_number):
+                    if account:
+                        account_groups.setdefault(account, group_id)
+            
+            self._rules = rules
+            self._groups = groups
+            self._account_groups = account_groups
+            self._user_groups = user_groups
+            self.loads += 1
+            # A write committed while loading leaves the indexes marked stale
+            self._loaded = generation == self._generation
+            logger.info(f"Pricing indexes loaded: {len(rules)} rules, {len(groups)} groups, {len(user_groups)} grouped users")
+    
+    async def _ensure_loaded(self):
+        if self._loaded:
+            self.hits += 1
+        else:
+            self.misses += 1
+            await self._load()
+    
+    def _price(self, account: str, connector: str, connector_type: Optional[str], user_id: Optional[str]) -> float:
+        group_id = self._user_groups.get(user_id) if user_id else None
+        if group_id is None:
+            group_id = self._account_groups.get(account)
+        return resolve_price(account, connector, connector_type, self._groups.get(group_id), self._rules)
+    
+    async def get_price(
+        self,
+        account: str,
+        connector: str,
+        connector_type: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> float:
+        """Price per kWh for one transaction"""
+        await self._ensure_loaded()
+        return self._price(account, connector, connector_type, user_id)
+    
+    async def get_prices(self, pairs: Iterable[PricingPair]) -> Dict[PricingPair, float]:
+        """Prices for many (account, connector, connector_type) pairs at once"""
+        await self._ensure_loaded()
+        return {
+            (account, connector, connector_type): self._price(account, connector, connector_type, None)
+            for account, connector, connector_type in set(pairs)
+        }
+    
+    def stats(self) -> dict:
+        return {
+            "loaded": self._loaded,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+            "rules": len(self._rules),
+            "groups": len(self._groups),
+            "grouped_users": len(self._user_groups),
+        }
+
+
+pricing_resolver = PricingResolver()
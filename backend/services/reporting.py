@@ -0,0 +1,133 @@
+"""
+Reporting engine - transaction report aggregates computed in PostgreSQL
+All groupings (account, station, connector, payment type, day) and the overall
+summary come from a single GROUPING SETS query over the full filtered range.
+"""
+from typing import Dict, List
+
+from sqlalchemy import select, func, and_, tuple_, literal_column, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Transaction
+from services.timestamps import date_range_conditions, local_date_sql
+
+
+# Constants are rendered inline (not as bind parameters) so PostgreSQL sees the
+# SELECT and GROUP BY expressions as identical
+EMPTY = literal_column("''")
+UNKNOWN = literal_column("'Unknown'")
+
+# Group keys, mirroring the Python fallbacks the report has always used
+ACCOUNT_KEY = func.coalesce(func.nullif(Transaction.account, EMPTY), UNKNOWN)
+STATION_KEY = func.coalesce(func.nullif(Transaction.station, EMPTY), UNKNOWN)
+CONNECTOR_KEY = func.coalesce(
+    func.nullif(Transaction.connector_type, EMPTY),
+    func.nullif(Transaction.connector, EMPTY),
+    UNKNOWN
+)
+PAYMENT_TYPE_KEY = func.coalesce(
+    func.nullif(Transaction.payment_type, EMPTY),
+    literal_column("'Not Specified'")
+)
+DAY_KEY = local_date_sql(Transaction.start_time)
+
+GROUP_KEYS = [
+    ("by_account", ACCOUNT_KEY),
+    ("by_station", STATION_KEY),
+    ("by_connector", CONNECTOR_KEY),
+    ("by_payment_type", PAYMENT_TYPE_KEY),
+    ("daily_trend", DAY_KEY),
+]
+
+
+def _grouping_ids() -> Dict[int, str]:
+    """
+    Map GROUPING(k1..kn) bitmasks to group names.
+    A bit is 1 when that key is aggregated away, first key = most significant bit.
+    """
+    width = len(GROUP_KEYS)
+    all_bits = (1 << width) - 1
+    ids = {all_bits: "summary"}
+    for position, (name, _) in enumerate(GROUP_KEYS):
+        ids[all_bits & ~(1 << (width - 1 - position))] = name
+    return ids
+
+
+def build_report_conditions(filters) -> List:
+    """Translate report filters into WHERE conditions"""
+    conditions = date_range_conditions(Transaction.start_time, filters.start_date, filters.end_date)
+    
+    if filters.account:
+        conditions.append(Transaction.account.ilike(f"%{filters.account}%"))
+    
+    if filters.station:
+        conditions.append(Transaction.station.ilike(f"%{filters.station}%"))
+    
+    if filters.connector_type:
+        conditions.append(
+            (Transaction.connector == filters.connector_type) |
+            (Transaction.connector_type == filters.connector_type)
+        )
+    
+    if filters.payment_type:
+        conditions.append(Transaction.payment_type == filters.payment_type)
+    
+    if filters.payment_status:
+        conditions.append(Transaction.payment_status == filters.payment_status)
+    
+    return conditions
+
+
+async def run_report_aggregates(session: AsyncSession, conditions: List) -> dict:
+    """
+    Run the GROUPING SETS aggregate and return
+    {"summary": {...}, "by_account": [...], ..., "daily_trend": [...]}
+    with exact totals over every matching transaction.
+    """
+    keys = [key for _, key in GROUP_KEYS]
+    is_paid = Transaction.payment_status == "PAID"
+    
+    query = select(
+        func.grouping(*keys).label("grouping_id"),
+        *[key.label(name) for name, key in GROUP_KEYS],
+        func.count().label("transactions"),
+        func.coalesce(func.sum(Transaction.meter_value), 0).label("energy"),
+        func.coalesce(func.sum(Transaction.cost), 0).label("revenue"),
+        func.count().filter(is_paid).label("paid_transactions"),
+        func.coalesce(func.sum(Transaction.cost).filter(is_paid), 0).label("paid_revenue"),
+    )
+    if conditions:
+        query = query.where(and_(*conditions))
+    query = query.group_by(
+        func.grouping_sets(text("()"), *[tuple_(key) for key in keys])
+    )
+    
+    grouping_ids = _grouping_ids()
+    report = {name: [] for name, _ in GROUP_KEYS}
+    report["summary"] = None
+    
+    result = await session.execute(query)
+    for row in result.mappings().all():
+        group = grouping_ids.get(row["grouping_id"])
+        if group == "summary":
+            report["summary"] = dict(row)
+        elif group:
+            key = row[group]
+            if key is None:
+                continue  # e.g. transactions without a start time in the daily trend
+            report[group].append({
+                "name": key,
+                "transactions": int(row["transactions"]),
+                "energy": float(row["energy"]),
+                "revenue": float(row["revenue"]),
+            })
+    
+    return report
+
+
+def sample_query(conditions: List):
+    """Base query for the paginated transaction sample shown under a report"""
+    query = select(Transaction)
+    if conditions:
+        query = query.where(and_(*conditions))
+    return query
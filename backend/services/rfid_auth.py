@@ -0,0 +1,199 @@
+"""
+RFID authorization for OCPP Authorize / StartTransaction
+Card status and balance are kept in an in-memory index (RFID cards first,
+then users' rfid_card_number), warmed when the OCPP server starts and
+refreshed by the card and user write endpoints once they commit, so chargers
+are answered without a query. Unknown tags are looked up once and then
+remembered as unknown for RFID_NEGATIVE_TTL_SECONDS.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from database import async_session, RFIDCard, User
+
+logger = logging.getLogger(__name__)
+
+RFID_NEGATIVE_TTL_SECONDS = float(os.environ.get('RFID_NEGATIVE_TTL_SECONDS', '60'))
+RFID_NEGATIVE_CACHE_SIZE = 10000
+
+# Tags at or below this balance are answered Blocked
+RFID_MIN_BALANCE = float(os.environ.get('RFID_MIN_BALANCE', '0'))
+
+# Most entries sent in one SendLocalList (chargers advertise SendLocalListMaxLength)
+OCPP_LOCAL_LIST_MAX = int(os.environ.get('OCPP_LOCAL_LIST_MAX', '5000'))
+
+# asyncpg accepts at most 32767 bind parameters per statement
+FETCH_CHUNK_SIZE = 5000
+
+# OCPP 1.6 AuthorizationStatus values
+ACCEPTED = "Accepted"
+BLOCKED = "Blocked"
+INVALID = "Invalid"
+
+AuthEntry = Tuple[str, float]  # (card status, balance)
+
+
+def authorization_status(entry: Optional[AuthEntry]) -> str:
+    if entry is None:
+        return INVALID
+    status, balance = entry
+    if status == "blocked":
+        return BLOCKED
+    if status != "active":
+        return INVALID
+    if balance <= RFID_MIN_BALANCE:
+        return BLOCKED
+    return ACCEPTED
+
+
+def _index(user_rows, card_rows) -> Dict[str, AuthEntry]:
+    """(number, status, balance) user rows and (number, status, is_active, balance) card rows"""
+    entries = {number: (status or "active", balance or 0.0) for number, status, balance in user_rows}
+    # Cards win over a user field holding the same number
+    for number, status, is_active, balance in card_rows:
+        entries[number] = (status if is_active is not False else "inactive", balance or 0.0)
+    return entries
+
+
+class RFIDAuthorizer:
+    """Process-wide card_number -> (status, balance) index answering OCPP authorization"""
+    
+    def __init__(self, negative_ttl: float = RFID_NEGATIVE_TTL_SECONDS):
+        self.negative_ttl = negative_ttl
+        self._entries: Dict[str, AuthEntry] = {}
+        self._unknown: Dict[str, float] = {}  # card number -> expiry (monotonic)
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.lookups = 0
+        self.refreshes = 0
+    
+    async def warm(self):
+        """Load every card and user tag in two queries"""
+        async with self._lock:
+            async with async_session() as session:
+                users_result = await session.execute(
+                    select(User.rfid_card_number, User.rfid_status, User.rfid_balance)
+                    .where(User.rfid_card_number.isnot(None))
+                )
+                cards_result = await session.execute(
+                    select(RFIDCard.card_number, RFIDCard.status, RFIDCard.is_active, RFIDCard.balance)
+                )
+            
+            entries = _index(users_result.all(), cards_result.all())
+            self._entries = entries
+            self._unknown.clear()
+            self._loaded = True
+            logger.info(f"RFID authorization index loaded: {len(entries)} tags")
+    
+    async def _fetch(self, card_numbers: List[str]) -> Dict[str, AuthEntry]:
+        users = []
+        cards = []
+        async with async_session() as session:
+            for start in range(0, len(card_numbers), FETCH_CHUNK_SIZE):
+                chunk = card_numbers[start:start + FETCH_CHUNK_SIZE]
+                users_result = await session.execute(
+                    select(User.rfid_card_number, User.rfid_status, User.rfid_balance)
+                    .where(User.rfid_card_number.in_(chunk))
+                )
+                cards_result = await session.execute(
+                    select(RFIDCard.card_number, RFIDCard.status, RFIDCard.is_active, RFIDCard.balance)
+                    .where(RFIDCard.card_number.in_(chunk))
+                )
+                users.extend(users_result.all())
+                cards.extend(cards_result.all())
+        return _index(users, cards)
+    
+    async def refresh(self, card_numbers: Iterable[Optional[str]], publish: bool = True):
+        """
+        Re-read these tags after a committed write (created, changed or deleted)
+        and tell the other OCPP processes to do the same.
+        """
+        card_numbers = sorted({number for number in card_numbers if number})
+        if not card_numbers:
+            return
+        if self._loaded:
+            found = await self._fetch(card_numbers)
+            for number in card_numbers:
+                self._unknown.pop(number, None)
+                if number in found:
+                    self._entries[number] = found[number]
+                else:
+                    self._entries.pop(number, None)
+            self.refreshes += 1
+        
+        if publish:
+            from services.ocpp_gateway import ocpp_gateway
+            try:
+                await ocpp_gateway.publish_rfid_changes(card_numbers)
+            except Exception as e:
+                logger.error(f"Failed to publish RFID changes: {e}")
+    
+    def set_balance(self, card_number: str, balance: float):
+        """Balance after a committed charge; the status is unchanged"""
+        entry = self._entries.get(card_number)
+        if entry is not None:
+            self._entries[card_number] = (entry[0], balance or 0.0)
+    
+    async def authorize(self, id_tag: str) -> str:
+        """OCPP AuthorizationStatus for a tag; only tags never seen before query the database"""
+        entry = self._entries.get(id_tag)
+        if entry is not None:
+            self.hits += 1
+            return authorization_status(entry)
+        
+        expiry = self._unknown.get(id_tag)
+        if expiry is not None:
+            if expiry > time.monotonic():
+                self.negative_hits += 1
+                return INVALID
+            del self._unknown[id_tag]
+        
+        self.lookups += 1
+        try:
+            found = await self._fetch([id_tag])
+        except Exception as e:
+            # Keep chargers working through a database outage, as before this check existed
+            logger.error(f"RFID lookup for {id_tag} failed, accepting: {e}")
+            return ACCEPTED
+        
+        entry = found.get(id_tag)
+        if entry is None:
+            if len(self._unknown) >= RFID_NEGATIVE_CACHE_SIZE:
+                self._unknown.pop(next(iter(self._unknown)))
+            self._unknown[id_tag] = time.monotonic() + self.negative_ttl
+            return INVALID
+        self._entries[id_tag] = entry
+        return authorization_status(entry)
+    
+    def local_list(self) -> List[dict]:
+        """SendLocalList entries for every known tag, accepted tags first"""
+        entries = sorted(
+            ({"id_tag": number, "id_tag_info": {"status": authorization_status(entry)}}
+             for number, entry in self._entries.items()),
+            key=lambda item: (item["id_tag_info"]["status"] != ACCEPTED, item["id_tag"])
+        )
+        if len(entries) > OCPP_LOCAL_LIST_MAX:
+            logger.warning(f"Local authorization list truncated to {OCPP_LOCAL_LIST_MAX} of {len(entries)} tags")
+            entries = entries[:OCPP_LOCAL_LIST_MAX]
+        return entries
+    
+    def stats(self) -> dict:
+        return {
+            "loaded": self._loaded,
+            "tags": len(self._entries),
+            "unknown_cached": len(self._unknown),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "lookups": self.lookups,
+            "refreshes": self.refreshes,
+        }
+
+
+rfid_auth = RFIDAuthorizer()
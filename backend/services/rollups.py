@@ -0,0 +1,201 @@
+"""
+Transaction rollups - incrementally maintained aggregates for the dashboard
+Totals are kept per day, station, account and payment type so the dashboard
+never has to scan the transactions table.
+"""
+import logging
+from collections import defaultdict
+from collections.abc import Mapping
+from typing import Iterable
+
+from sqlalchemy import select, delete, func, literal, literal_column, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session, Transaction, TransactionRollup
+from services.timestamps import local_date_key, local_date_sql
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_DIMENSIONS = ("day", "station", "account", "payment_type")
+
+# asyncpg accepts at most 32767 bind parameters per statement
+UPSERT_CHUNK_SIZE = 2000
+
+
+# Columns to RETURN from DELETE statements so removed rows can be subtracted
+ROLLUP_COLUMNS = (
+    Transaction.start_time,
+    Transaction.station,
+    Transaction.account,
+    Transaction.payment_status,
+    Transaction.payment_type,
+    Transaction.meter_value,
+    Transaction.cost,
+)
+
+
+def transaction_snapshot(tx: Transaction) -> dict:
+    """Capture the fields that feed the rollups, e.g. before a transaction is modified"""
+    return {
+        "start_time": tx.start_time,
+        "station": tx.station,
+        "account": tx.account,
+        "payment_status": tx.payment_status,
+        "payment_type": tx.payment_type,
+        "meter_value": tx.meter_value,
+        "cost": tx.cost,
+    }
+
+
+def _rollup_keys(snapshot: Mapping) -> dict:
+    """Map a transaction snapshot to its key in every rollup dimension"""
+    return {
+        "day": local_date_key(snapshot.get("start_time")),
+        "station": snapshot.get("station") or "",
+        "account": snapshot.get("account") or "",
+        "payment_type": snapshot.get("payment_type") or "",
+    }
+
+
+async def apply_rollup_delta(
+    session: AsyncSession,
+    added: Iterable = (),
+    removed: Iterable = (),
+):
+    """
+    Add `added` and subtract `removed` transactions from the rollups.
+    
+    Items may be Transaction objects, snapshots from transaction_snapshot()
+    or RETURNING row mappings. Runs inside the caller's session so the
+    rollups commit (or roll back) together with the transaction rows.
+    """
+    deltas = defaultdict(lambda: [0, 0.0, 0.0])
+    
+    for sign, items in ((1, added), (-1, removed)):
+        for item in items:
+            snapshot = item if isinstance(item, Mapping) else transaction_snapshot(item)
+            status = snapshot.get("payment_status") or "UNPAID"
+            energy = float(snapshot.get("meter_value") or 0)
+            revenue = float(snapshot.get("cost") or 0)
+            for dimension, key in _rollup_keys(snapshot).items():
+                delta = deltas[(dimension, key, status)]
+                delta[0] += sign
+                delta[1] += sign * energy
+                delta[2] += sign * revenue
+    
+    # Sorted so concurrent writers lock rollup rows in the same order
+    rows = [
+        {
+            "dimension": dimension,
+            "key": key,
+            "payment_status": status,
+            "tx_count": count,
+            "energy": energy,
+            "revenue": revenue,
+        }
+        for (dimension, key, status), (count, energy, revenue) in sorted(deltas.items())
+        if count or energy or revenue
+    ]
+    
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = insert(TransactionRollup).values(rows[start:start + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                TransactionRollup.dimension,
+                TransactionRollup.key,
+                TransactionRollup.payment_status,
+            ],
+            set_={
+                "tx_count": TransactionRollup.tx_count + stmt.excluded.tx_count,
+                "energy": TransactionRollup.energy + stmt.excluded.energy,
+                "revenue": TransactionRollup.revenue + stmt.excluded.revenue,
+                "updated_at": func.now(),
+            }
+        )
+        await session.execute(stmt)
+
+
+def _dimension_key_expressions() -> dict:
+    """
+    SQL expressions matching _rollup_keys(), used for full rebuilds.
+    Constants are inlined so the GROUP BY matches the SELECT list.
+    """
+    empty = literal_column("''")
+    return {
+        "day": func.coalesce(local_date_sql(Transaction.start_time), empty),
+        "station": func.coalesce(Transaction.station, empty),
+        "account": func.coalesce(Transaction.account, empty),
+        "payment_type": func.coalesce(Transaction.payment_type, empty),
+    }
+
+
+async def rebuild_rollups() -> int:
+    """
+    Recompute all rollups from the transactions table.
+    Writers are blocked for the duration so no delta is lost.
+    Returns the number of rollup rows written.
+    """
+    status_expr = func.coalesce(Transaction.payment_status, literal_column("'UNPAID'"))
+    
+    async with async_session() as session:
+        await session.execute(text("LOCK TABLE transactions IN SHARE MODE"))
+        await session.execute(delete(TransactionRollup))
+        
+        for dimension, key_expr in _dimension_key_expressions().items():
+            source = (
+                select(
+                    literal(dimension),
+                    key_expr,
+                    status_expr,
+                    func.count(),
+                    func.coalesce(func.sum(Transaction.meter_value), 0),
+                    func.coalesce(func.sum(Transaction.cost), 0),
+                )
+                .group_by(key_expr, status_expr)
+            )
+            await session.execute(
+                insert(TransactionRollup).from_select(
+                    ["dimension", "key", "payment_status", "tx_count", "energy", "revenue"],
+                    source
+                )
+            )
+        
+        count_result = await session.execute(
+            select(func.count()).select_from(TransactionRollup)
+        )
+        rows = count_result.scalar() or 0
+        await session.commit()
+    
+    logger.info(f"Rebuilt transaction rollups: {rows} rows")
+    return rows
+
+
+async def ensure_rollups():
+    """Build the rollups on first start if transactions exist but rollups do not"""
+    async with async_session() as session:
+        has_rollups = await session.execute(select(TransactionRollup.dimension).limit(1))
+        if has_rollups.first():
+            return
+        has_transactions = await session.execute(select(Transaction.id).limit(1))
+        if not has_transactions.first():
+            return
+    
+    logger.info("Transaction rollups empty, rebuilding from transactions...")
+    await rebuild_rollups()
+
+
+async def get_dimension_keys(dimension: str) -> list:
+    """Sorted keys that currently have transactions in a dimension"""
+    async with async_session() as session:
+        result = await session.execute(
+            select(TransactionRollup.key)
+            .where(
+                TransactionRollup.dimension == dimension,
+                TransactionRollup.key != "",
+                TransactionRollup.tx_count > 0
+            )
+            .distinct()
+            .order_by(TransactionRollup.key)
+        )
+        return [row[0] for row in result.fetchall()]
@@ -0,0 +1,281 @@
+"""
+Spreadsheet parsing and rendering off the event loop
+pandas/openpyxl parsing and XLSX generation are CPU-bound and hold the GIL,
+so a large workbook would stall every request and OCPP reply in the process.
+They run in a process pool instead. Uploads and rows travel through temp
+files (never pickled through the pool's pipe): the parent writes the input
+file, the worker writes its result next to it and only paths and counts are
+returned.
+
+Each call has a wall-clock budget; a call exceeding it fails with 504. A
+process pool cannot cancel a running task and loses every call when one of
+its workers is killed, so the stuck pool is retired instead: new calls go to
+a fresh pool, the calls still running in the old one finish there, and only
+then are its processes (the stuck one included) terminated. A call that still
+finds its pool broken is retried once on a fresh pool.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterable, Dict, List, Optional, Sequence, Set
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# 0 runs the work on a thread instead (no isolation from the GIL)
+SPREADSHEET_POOL_WORKERS = int(os.environ.get('SPREADSHEET_POOL_WORKERS', str(min(2, os.cpu_count() or 1))))
+
+# Workers start from a clean server process instead of forking this one, which
+# holds the event loop, DB connection pool and their threads; spawn where forkserver is missing
+SPREADSHEET_POOL_START_METHOD = os.environ.get(
+    'SPREADSHEET_POOL_START_METHOD',
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+
+# Wall-clock seconds one parse/render may take, queueing included
+SPREADSHEET_BUDGET_SECONDS = float(os.environ.get('SPREADSHEET_BUDGET_SECONDS', '120'))
+
+# Calls beyond this many queued or running are turned away with 503
+SPREADSHEET_QUEUE_LIMIT = int(os.environ.get('SPREADSHEET_QUEUE_LIMIT', '32'))
+
+
+# ----- Worker side (module-level so they can be pickled) -----
+
+def _parse_table(source_path: str, is_csv: bool, output_path: str) -> tuple:
+    """Parse an uploaded CSV/Excel file into a pickled DataFrame at output_path"""
+    import pandas as pd
+    
+    started = time.time()
+    df = pd.read_csv(source_path) if is_csv else pd.read_excel(source_path)
+    df.to_pickle(output_path)
+    return started, len(df)
+
+
+def _render_xlsx(rows_path: str, output_path: str) -> tuple:
+    """Build a workbook from the pickled row chunks in rows_path (header row first)"""
+    from openpyxl import Workbook
+    
+    started = time.time()
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    rows = 0
+    with open(rows_path, "rb") as source:
+        while True:
+            try:
+                chunk = pickle.load(source)
+            except EOFError:
+                break
+            for row in chunk:
+                sheet.append(row)
+            rows += len(chunk)
+    workbook.save(output_path)
+    return started, rows - 1
+
+
+def _temp_path(suffix: str) -> str:
+    handle, path = tempfile.mkstemp(prefix="smartcharge_", suffix=suffix)
+    os.close(handle)
+    return path
+
+
+def _write_bytes(path: str, contents: bytes):
+    with open(path, "wb") as target:
+        target.write(contents)
+
+
+def _remove(*paths: Optional[str]):
+    for path in paths:
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class SpreadsheetPool:
+    """Process pool for pandas/openpyxl work with saturation counters"""
+    
+    def __init__(self, workers: int = SPREADSHEET_POOL_WORKERS, budget: float = SPREADSHEET_BUDGET_SECONDS,
+                 queue_limit: int = SPREADSHEET_QUEUE_LIMIT):
+        self.workers = workers
+        self.budget = budget
+        self.queue_limit = queue_limit
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Calls submitted to each pool, and the ones that blew their budget there
+        self._inflight: Dict[ProcessPoolExecutor, Set[Future]] = {}
+        self._stuck: Dict[ProcessPoolExecutor, Set[Future]] = {}
+        self.pending = 0  # submitted and not finished (queued + running)
+        self.max_pending = 0
+        self.saturated = 0  # calls that found every worker busy
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.recycled = 0
+        self.retried = 0
+        self.queue_wait_ms = 0.0  # total time calls waited for a worker
+        self.run_ms = 0.0
+    
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(SPREADSHEET_POOL_START_METHOD)
+            )
+            self._inflight[self._executor] = set()
+            self._stuck[self._executor] = set()
+        return self._executor
+    
+    def _retire(self, executor: ProcessPoolExecutor, stuck: Optional[Future] = None):
+        """Stop sending calls to `executor`; terminate it once its other calls are done"""
+        if stuck is not None:
+            self._stuck.setdefault(executor, set()).add(stuck)
+        if self._executor is executor:
+            self._executor = None
+            self.recycled += 1
+            asyncio.get_running_loop().create_task(self._terminate_when_drained(executor))
+    
+    async def _terminate_when_drained(self, executor: ProcessPoolExecutor):
+        # Calls that overrun their own budget meanwhile join the stuck set, so this ends within one budget
+        while any(
+            not future.done() and future not in self._stuck.get(executor, ())
+            for future in self._inflight.get(executor, ())
+        ):
+            await asyncio.sleep(0.25)
+        # ProcessPoolExecutor cannot cancel a running call; stop its processes instead
+        for process in list(getattr(executor, '_processes', {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+        self._inflight.pop(executor, None)
+        self._stuck.pop(executor, None)
+    
+    async def _submit(self, func, args, timeout: float):
+        if self.workers <= 0:
+            return await asyncio.wait_for(asyncio.to_thread(func, *args), timeout=timeout)
+        
+        executor = self._pool()
+        future = executor.submit(func, *args)
+        self._inflight[executor].add(future)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._retire(executor, stuck=future)
+            raise
+        except BrokenProcessPool:
+            self._retire(executor)
+            raise
+        finally:
+            if future.done():
+                self._inflight.get(executor, set()).discard(future)
+    
+    async def _run(self, func, *args):
+        if self.pending >= self.queue_limit:
+            self.rejected += 1
+            logger.warning(f"Spreadsheet pool saturated ({self.pending} pending), rejecting request")
+            raise HTTPException(status_code=503, detail="Server busy, please retry")
+        
+        if self.pending >= max(self.workers, 1):
+            self.saturated += 1
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        submitted = time.time()
+        deadline = time.monotonic() + self.budget
+        try:
+            try:
+                started, result = await self._submit(func, args, self.budget)
+            except BrokenProcessPool:
+                # The pool died under this call (a worker crashed); one more try on a fresh pool
+                self.retried += 1
+                logger.warning(f"{func.__name__} lost its worker, retrying on a fresh pool")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                started, result = await self._submit(func, args, remaining)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.error(f"{func.__name__} exceeded its {self.budget:g}s budget")
+            raise HTTPException(status_code=504, detail=f"Spreadsheet processing exceeded {self.budget:g}s")
+        except HTTPException:
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+        
+        finished = time.time()
+        self.completed += 1
+        self.queue_wait_ms += max(0.0, started - submitted) * 1000
+        self.run_ms += (finished - started) * 1000
+        return result
+    
+    async def read_table(self, contents: bytes, filename: str):
+        """DataFrame of an uploaded CSV (by extension) or Excel file"""
+        import pandas as pd
+        
+        is_csv = filename.lower().endswith('.csv')
+        source = _temp_path(".csv" if is_csv else os.path.splitext(filename)[1] or ".xlsx")
+        output = _temp_path(".pkl")
+        try:
+            await asyncio.to_thread(_write_bytes, source, contents)
+            await self._run(_parse_table, source, is_csv, output)
+            return await asyncio.to_thread(pd.read_pickle, output)
+        finally:
+            _remove(source, output)
+    
+    async def render_xlsx(self, headers: Sequence, chunks: AsyncIterable[List], output_path: Optional[str] = None) -> str:
+        """
+        Write `headers` and the row chunks to an XLSX file and return its path
+        (a new temp file unless `output_path` is given; the caller removes it).
+        Chunks are spooled to disk as they arrive, then rendered in the pool.
+        """
+        spool = _temp_path(".rows")
+        output = output_path or _temp_path(".xlsx")
+        try:
+            with open(spool, "wb") as target:
+                pickle.dump([list(headers)], target)
+                async for chunk in chunks:
+                    pickle.dump(chunk, target, protocol=pickle.HIGHEST_PROTOCOL)
+            await self._run(_render_xlsx, spool, output)
+        except BaseException:
+            if output_path is None:
+                _remove(output)
+            raise
+        finally:
+            _remove(spool)
+        return output
+    
+    def shutdown(self):
+        for executor in list(self._inflight):
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._inflight.clear()
+        self._stuck.clear()
+        self._executor = None
+    
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "queued": max(0, self.pending - self.workers),
+            "max_pending": self.max_pending,
+            "saturated": self.saturated,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "recycled": self.recycled,
+            "retiring_pools": sum(1 for executor in self._inflight if executor is not self._executor),
+            "retried": self.retried,
+            "avg_queue_wait_ms": round(self.queue_wait_ms / self.completed, 2) if self.completed else 0.0,
+            "avg_run_ms": round(self.run_ms / self.completed, 2) if self.completed else 0.0,
+        }
+
+
+spreadsheet_pool = SpreadsheetPool()
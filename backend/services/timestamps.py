@@ -0,0 +1,141 @@
+"""
+Timestamp helpers for transaction start/end times
+Values are parsed once at ingest into timezone-aware datetimes; naive values
+(e.g. charger vendor Excel exports) are interpreted in LOCAL_TIMEZONE.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Any, List, Optional
+from zoneinfo import ZoneInfo
+
+from dateutil import parser as date_parser
+from fastapi import HTTPException
+from sqlalchemy import func, literal_column
+
+LOCAL_TIMEZONE = os.environ.get('LOCAL_TIMEZONE', 'America/Bogota')
+LOCAL_TZ = ZoneInfo(LOCAL_TIMEZONE)
+
+# Placeholders older importers stored instead of a time
+EMPTY_VALUES = {"", "n/a", "nan", "nat", "none", "null", "-"}
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """
+    Parse an ISO string, Excel/pandas timestamp or datetime into an aware datetime.
+    Returns None for empty or unparseable values.
+    """
+    if value is None:
+        return None
+    
+    if isinstance(value, datetime):  # includes pandas.Timestamp
+        if value != value:  # NaT
+            return None
+        parsed = value.to_pydatetime() if hasattr(value, "to_pydatetime") else value
+    else:
+        text = str(value).strip()
+        if text.lower() in EMPTY_VALUES:
+            return None
+        try:
+            parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+        except ValueError:
+            try:
+                parsed = date_parser.parse(text, dayfirst=True)
+            except (ValueError, OverflowError):
+                return None
+    
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=LOCAL_TZ)
+    return parsed
+
+
+def parse_timestamp_strict(value: Any) -> Optional[datetime]:
+    """
+    parse_timestamp() for user input: empty values still return None, but a
+    value that cannot be parsed raises ValueError instead of erasing the time.
+    """
+    parsed = parse_timestamp(value)
+    if parsed is None and value is not None and not isinstance(value, datetime):
+        if str(value).strip().lower() not in EMPTY_VALUES:
+            raise ValueError(f"Invalid time: {value}")
+    return parsed
+
+
+def parse_timestamp_series(values):
+    """
+    Vectorized parse_timestamp() for a pandas Series.
+    Returns a Series of aware Timestamps (NaT for empty or unparseable values).
+    """
+    import pandas as pd
+    
+    if pd.api.types.is_datetime64_any_dtype(values):
+        parsed = values
+    else:
+        text = values.astype("string").str.strip()
+        text = text.mask(text.str.lower().isin(EMPTY_VALUES))
+        try:
+            parsed = pd.to_datetime(text, errors="coerce", format="ISO8601")
+        except (ValueError, TypeError):
+            parsed = None
+        if parsed is None or not pd.api.types.is_datetime64_any_dtype(parsed):
+            # Mixed UTC offsets (or naive and aware values) cannot share one dtype
+            parsed = pd.Series(pd.NaT, index=values.index, dtype=f"datetime64[ns, {LOCAL_TIMEZONE}]")
+        
+        # Anything pandas could not read goes through the lenient parser
+        leftover = parsed.isna() & text.notna()
+        if leftover.any():
+            if parsed.dt.tz is None:
+                parsed = parsed.dt.tz_localize(LOCAL_TZ, ambiguous="NaT", nonexistent="NaT")
+            fallback = text[leftover].map(parse_timestamp)
+            parsed = parsed.astype(object)
+            parsed[leftover] = fallback
+            parsed = pd.to_datetime(parsed, utc=True).dt.tz_convert(LOCAL_TZ)
+    
+    if parsed.dt.tz is None:
+        parsed = parsed.dt.tz_localize(LOCAL_TZ, ambiguous="NaT", nonexistent="NaT")
+    return parsed.dt.tz_convert(LOCAL_TZ)
+
+
+def format_timestamp(value: Optional[datetime]) -> str:
+    """ISO-8601 string for API responses ('' when unset)"""
+    return value.isoformat() if value else ""
+
+
+def date_range_conditions(column, start_date: Optional[str], end_date: Optional[str]) -> List:
+    """
+    Range conditions for a timestamptz column from API date filters.
+    A date-only end_date (YYYY-MM-DD) includes that whole day.
+    """
+    conditions = []
+    
+    if start_date:
+        start = parse_timestamp(start_date)
+        if not start:
+            raise HTTPException(status_code=400, detail=f"Invalid start_date: {start_date}")
+        conditions.append(column >= start)
+    
+    if end_date:
+        end = parse_timestamp(end_date)
+        if not end:
+            raise HTTPException(status_code=400, detail=f"Invalid end_date: {end_date}")
+        if len(end_date.strip()) <= 10:
+            conditions.append(column < end + timedelta(days=1))
+        else:
+            conditions.append(column <= end)
+    
+    return conditions
+
+
+def local_date_key(value: Optional[datetime], length: int = 10) -> str:
+    """YYYY-MM-DD (or YYYY-MM with length=7) of a timestamp in local time"""
+    if not value:
+        return ""
+    return value.astimezone(LOCAL_TZ).strftime("%Y-%m-%d")[:length]
+
+
+def local_date_sql(column, pattern: str = "YYYY-MM-DD"):
+    """SQL equivalent of local_date_key(). Constants are inlined so the
+    expression can be used in both SELECT and GROUP BY."""
+    return func.to_char(
+        func.timezone(literal_column(f"'{LOCAL_TIMEZONE}'"), column),
+        literal_column(f"'{pattern}'")
+    )
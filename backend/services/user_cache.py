@@ -0,0 +1,88 @@
+"""
+Authenticated user cache
+Bounded LRU of the users resolved from access tokens, keyed by (user id, token iat),
+so authenticated requests skip the users table. Entries expire after a short TTL,
+which also bounds staleness when several worker processes serve the API.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '60'))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', '1024'))
+
+CacheKey = Tuple[str, Optional[int]]
+
+
+class UserCache:
+    """TTL + LRU cache with per-user invalidation"""
+    
+    def __init__(self, ttl: float = USER_CACHE_TTL_SECONDS, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self._keys_by_user: Dict[str, Set[CacheKey]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    def get(self, user_id: str, issued_at: Optional[int]) -> Optional[Any]:
+        key = (user_id, issued_at)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+    
+    def put(self, user_id: str, issued_at: Optional[int], value: Any, generation: Optional[int] = None):
+        """
+        Cache `value`. Pass the `generation` read before loading it so a value
+        loaded while an invalidation happened is not stored.
+        """
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        if generation is not None and generation != self.invalidations:
+            return
+        key = (user_id, issued_at)
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        self._keys_by_user.setdefault(user_id, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+    
+    def invalidate(self, user_id: str):
+        """Forget every cached token of a user, e.g. after a profile, role or password change"""
+        for key in self._keys_by_user.pop(user_id, set()):
+            self._entries.pop(key, None)
+        self.invalidations += 1
+    
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_user.clear()
+    
+    def _remove(self, key: CacheKey):
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+    
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+user_cache = UserCache()
@@ -0,0 +1,127 @@
+"""
+Account Resolution Tests
+Tests the unified balance store and account aliases:
+- A user's card number gets the card holding their balance; email, placa and name resolve to it
+- User balance edits and top-ups land on the card, recorded in its history
+- A transaction for any of the user's identifiers is charged to the card
+"""
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestAccountResolution:
+    """account_aliases -> RFID card"""
+    
+    @pytest.fixture
+    def auth_headers(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@evcharge.com",
+            "password": "admin123"
+        })
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    @pytest.fixture
+    def user(self, auth_headers):
+        suffix = uuid.uuid4().hex[:8].upper()
+        response = requests.post(f"{BASE_URL}/api/users", headers=auth_headers, json={
+            "name": f"Test Alias {suffix}",
+            "email": f"alias_{suffix.lower()}@example.com",
+            "password": "Password123",
+            "rfid_card_number": f"TESTALIAS{suffix}",
+            "rfid_balance": 10000000,
+            "placa": f"ALS{suffix[:3]}"
+        })
+        assert response.status_code == 200, response.text
+        user = response.json()
+        yield user
+        card = self.resolve(auth_headers, user["rfid_card_number"])
+        requests.delete(f"{BASE_URL}/api/users/{user['id']}", headers=auth_headers)
+        if card.status_code == 200:
+            requests.delete(f"{BASE_URL}/api/rfid-cards/{card.json()['id']}", headers=auth_headers)
+    
+    def resolve(self, auth_headers, account):
+        return requests.get(
+            f"{BASE_URL}/api/rfid-cards/accounts/resolve", headers=auth_headers, params={"account": account}
+        )
+    
+    def test_identifiers_resolve_to_user_card(self, auth_headers, user):
+        for account in (user["rfid_card_number"], user["email"].upper(), f"  {user['name']} ", user["placa"].lower()):
+            response = self.resolve(auth_headers, account)
+            assert response.status_code == 200, account
+            card = response.json()
+            assert card["card_number"] == user["rfid_card_number"]
+            assert card["user_id"] == user["id"]
+            assert card["balance"] == 10000000
+        print("✓ Card number, email, name and placa resolve to the user's card")
+    
+    def test_unknown_account(self, auth_headers):
+        response = self.resolve(auth_headers, f"nobody-{uuid.uuid4().hex}")
+        assert response.status_code == 404
+        print("✓ Unknown account not resolved")
+    
+    def test_user_balance_lives_on_card(self, auth_headers, user):
+        response = requests.patch(f"{BASE_URL}/api/users/{user['id']}", headers=auth_headers, json={"rfid_balance": 20000})
+        assert response.status_code == 200
+        assert response.json()["rfid_balance"] == 20000
+        assert self.resolve(auth_headers, user["email"]).json()["balance"] == 20000
+        
+        response = requests.post(f"{BASE_URL}/api/users/{user['id']}/topup", headers=auth_headers, json={"amount": 500})
+        assert response.status_code == 200
+        assert response.json()["new_balance"] == 20500
+        
+        fetched = requests.get(f"{BASE_URL}/api/users/{user['id']}", headers=auth_headers).json()
+        assert fetched["rfid_balance"] == 20500
+        
+        card = self.resolve(auth_headers, user["email"]).json()
+        history = requests.get(f"{BASE_URL}/api/rfid-cards/{card['id']}/history", headers=auth_headers).json()
+        adjustments = {
+            (entry["balance_before"], entry["balance_after"])
+            for entry in history if entry["transaction_type"] == "ADJUSTMENT"
+        }
+        assert (0, 10000000) in adjustments  # initial balance
+        assert (10000000, 20000) in adjustments
+        assert any(entry["transaction_type"] == "TOPUP" and entry["amount"] == 500 for entry in history)
+        print("✓ User balance edits and top-ups are kept on the card with history")
+    
+    def test_balance_edit_needs_card(self, auth_headers, user):
+        response = requests.patch(f"{BASE_URL}/api/users/{user['id']}", headers=auth_headers, json={
+            "rfid_card_number": "", "rfid_balance": 100
+        })
+        assert response.status_code == 400
+        
+        response = requests.patch(f"{BASE_URL}/api/users/{user['id']}", headers=auth_headers, json={"rfid_balance": -1})
+        assert response.status_code == 400
+        print("✓ Balance edits without a card or below zero rejected")
+    
+    def test_transaction_charged_to_card(self, auth_headers, user):
+        response = requests.post(f"{BASE_URL}/api/transactions", headers=auth_headers, json={
+            "tx_id": f"TESTALIAS{uuid.uuid4().hex[:8]}",
+            "station": "Test Station",
+            "connector": "1",
+            "connector_type": "CCS",
+            "account": user["email"],
+            "start_time": "2026-01-01 10:00:00",
+            "end_time": "2026-01-01 10:30:00",
+            "meter_value": 10
+        })
+        assert response.status_code == 200, response.text
+        transaction = response.json()
+        try:
+            assert transaction["payment_status"] == "PAID"
+            card = self.resolve(auth_headers, user["rfid_card_number"]).json()
+            assert card["balance"] == pytest.approx(10000000 - transaction["cost"])
+            
+            history = requests.get(f"{BASE_URL}/api/rfid-cards/{card['id']}/history", headers=auth_headers).json()
+            assert any(entry["transaction_type"] == "CHARGE" for entry in history)
+            print(f"✓ Transaction for {user['email']} charged {transaction['cost']} to the card")
+        finally:
+            requests.delete(f"{BASE_URL}/api/transactions/{transaction['id']}", headers=auth_headers)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
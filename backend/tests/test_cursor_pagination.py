@@ -0,0 +1,200 @@
+"""
+Cursor Pagination Tests
+Tests the keyset-paginated listings:
+- /api/transactions/page walks every row exactly once
+- next_cursor is absent on the last page, invalid cursors return 400
+- /api/expenses/page and /api/ocpp/boots/page return the page shape
+- Pages continue from dated rows into rows without a start time
+- Every listing's page query is an index scan in page order (EXPLAIN, no Sort)
+"""
+import pytest
+import requests
+import os
+import sys
+import asyncio
+import json
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestCursorPagination:
+    """Keyset pagination with opaque cursors"""
+    
+    @pytest.fixture
+    def auth_headers(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@evcharge.com",
+            "password": "admin123"
+        })
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    @pytest.fixture
+    def transactions(self, auth_headers):
+        account = f"TEST_PAGE_ACCOUNT_{uuid.uuid4().hex[:6]}"
+        created = []
+        for i in range(5):
+            response = requests.post(f"{BASE_URL}/api/transactions", headers=auth_headers, json={
+                "tx_id": f"TEST_PAGE_{uuid.uuid4().hex[:8]}",
+                "station": "TEST_PAGE_STATION",
+                "connector": "1",
+                "account": account,
+                # Two rows share a start time to exercise the id tie-breaker
+                "start_time": f"2026-03-0{min(i, 3) + 1}T08:00:00",
+                "end_time": f"2026-03-0{min(i, 3) + 1}T09:00:00",
+                "meter_value": 1.0
+            })
+            assert response.status_code == 200
+            created.append(response.json())
+        yield account, created
+        requests.post(f"{BASE_URL}/api/transactions/bulk-delete", headers=auth_headers, json={
+            "ids": [tx["id"] for tx in created]
+        })
+    
+    def test_walk_all_pages(self, auth_headers, transactions):
+        """Following next_cursor visits every transaction once, newest first"""
+        account, created = transactions
+        seen = []
+        cursor = None
+        while True:
+            params = {"account": account, "limit": 2, "include_total": True}
+            if cursor:
+                params["cursor"] = cursor
+            response = requests.get(f"{BASE_URL}/api/transactions/page", headers=auth_headers, params=params)
+            assert response.status_code == 200
+            data = response.json()
+            assert data["total_estimate"] == len(created)
+            seen.extend(data["transactions"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        
+        assert sorted(tx["id"] for tx in seen) == sorted(tx["id"] for tx in created)
+        start_times = [tx["start_time"] for tx in seen]
+        assert start_times == sorted(start_times, reverse=True)
+        print(f"✓ Walked {len(seen)} transactions in pages of 2")
+    
+    def test_invalid_cursor(self, auth_headers):
+        """Garbage cursors are rejected"""
+        response = requests.get(f"{BASE_URL}/api/transactions/page", headers=auth_headers, params={
+            "cursor": "not-a-cursor"
+        })
+        assert response.status_code == 400
+        print("✓ Invalid cursor rejected")
+    
+    def test_other_listings(self, auth_headers):
+        """Expenses and boot notifications expose the same page shape"""
+        for path, key in (("/api/expenses/page", "expenses"), ("/api/ocpp/boots/page", "boots")):
+            response = requests.get(f"{BASE_URL}{path}", headers=auth_headers, params={"limit": 5})
+            assert response.status_code == 200
+            data = response.json()
+            assert key in data
+            assert "next_cursor" in data
+            assert len(data[key]) <= 5
+        print("✓ Expenses and boots pages available")
+    
+    def test_walk_into_null_start_times(self, auth_headers):
+        """A page that runs out of dated rows continues with the undated ones"""
+        account = f"TEST_PAGE_NULLS_{uuid.uuid4().hex[:6]}"
+        created = []
+        for start_time in ("2026-03-01T08:00:00", "2026-03-02T08:00:00", "", ""):
+            response = requests.post(f"{BASE_URL}/api/transactions", headers=auth_headers, json={
+                "tx_id": f"TEST_PAGE_{uuid.uuid4().hex[:8]}",
+                "station": "TEST_PAGE_STATION",
+                "connector": "1",
+                "account": account,
+                "start_time": start_time,
+                "end_time": "",
+                "meter_value": 1.0
+            })
+            assert response.status_code == 200
+            created.append(response.json())
+        try:
+            seen = []
+            cursor = None
+            while True:
+                params = {"account": account, "limit": 3}
+                if cursor:
+                    params["cursor"] = cursor
+                data = requests.get(f"{BASE_URL}/api/transactions/page", headers=auth_headers, params=params).json()
+                seen.append(data["transactions"])
+                cursor = data["next_cursor"]
+                if not cursor:
+                    break
+            
+            # Second page starts after the first undated row and is not cut short
+            assert [len(page) for page in seen] == [3, 1]
+            rows = [tx for page in seen for tx in page]
+            assert sorted(tx["id"] for tx in rows) == sorted(tx["id"] for tx in created)
+            assert [tx["start_time"] is None for tx in rows] == [False, False, True, True]
+            print("✓ Pagination crosses into rows without a start time")
+        finally:
+            requests.post(f"{BASE_URL}/api/transactions/bulk-delete", headers=auth_headers, json={
+                "ids": [tx["id"] for tx in created]
+            })
+
+
+class TestKeysetPlans:
+    """EXPLAIN of the page queries against the database the backend uses"""
+    
+    async def explain(self, conn, query) -> dict:
+        import re
+        from sqlalchemy import text
+        from sqlalchemy.dialects import postgresql
+        
+        # Re-bind the compiled statement's %(name)s parameters as :name
+        compiled = query.compile(dialect=postgresql.dialect())
+        statement = re.sub(r"%\((\w+)\)s", r":\1", compiled.string)
+        result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {statement}"), compiled.params)
+        plan = result.scalar()
+        return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+    
+    def nodes(self, plan: dict):
+        yield plan
+        for child in plan.get("Plans", []):
+            yield from self.nodes(child)
+    
+    def page_queries(self):
+        from datetime import datetime, timezone
+        from sqlalchemy import select
+        from database import Transaction, RFIDCard, RFIDHistory, OCPPBoot, Expense
+        from services.pagination import apply_keyset, null_tail, encode_cursor
+        
+        moment = datetime(2026, 3, 1, tzinfo=timezone.utc)
+        listings = [
+            (select(Transaction), Transaction.start_time, Transaction.id, moment, "ix_transactions_start_time_id"),
+            (select(RFIDCard), RFIDCard.created_at, RFIDCard.id, moment, "ix_rfid_cards_created_at_id"),
+            (select(RFIDHistory).where(RFIDHistory.card_id == "card"), RFIDHistory.created_at, RFIDHistory.id,
+             moment, "ix_rfid_history_card_created_at"),
+            (select(OCPPBoot), OCPPBoot.timestamp, OCPPBoot.id, moment, "ix_ocpp_boots_timestamp_id"),
+            (select(Expense), Expense.date, Expense.id, "2026-03-01", "ix_expenses_date_id"),
+        ]
+        for query, sort_column, id_column, sort_value, index in listings:
+            yield index, "first page", apply_keyset(query, sort_column, id_column, None, 100)
+            yield index, "after cursor", apply_keyset(query, sort_column, id_column, encode_cursor(sort_value, "m"), 100)
+            yield index, "null tail", apply_keyset(query, sort_column, id_column, encode_cursor(None, "m"), 100)
+            yield index, "null tail start", null_tail(query, sort_column, id_column, 100)
+    
+    def test_pages_are_index_scans(self):
+        from sqlalchemy import text
+        from database import engine
+        
+        async def check():
+            checked = 0
+            async with engine.connect() as conn:
+                # Small test tables would otherwise be read sequentially and sorted
+                await conn.execute(text("SET LOCAL enable_seqscan = off"))
+                for index, name, query in self.page_queries():
+                    nodes = list(self.nodes(await self.explain(conn, query)))
+                    assert not any(node["Node Type"] in ("Sort", "Incremental Sort") for node in nodes), (index, name)
+                    assert any(node.get("Index Name") == index for node in nodes), (index, name)
+                    checked += 1
+            await engine.dispose()
+            return checked
+        
+        checked = asyncio.run(check())
+        print(f"✓ {checked} page queries scan their index in page order without sorting")
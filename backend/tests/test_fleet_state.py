@@ -0,0 +1,83 @@
+"""
+Fleet State Tests
+Tests the in-memory charger status endpoints:
+- /ocpp/status and /ocpp/chargers/status return an ETag and honour If-None-Match
+- Charger writes change the ETag
+- The frontend WebSocket starts with a snapshot
+"""
+import pytest
+import requests
+import os
+import json
+import asyncio
+import websockets
+from datetime import datetime
+
+pytest_plugins = ('pytest_asyncio',)
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+FRONTEND_WS_URL = BASE_URL.replace("https://", "wss://").replace("http://", "ws://") + "/api/ocpp/ws"
+
+
+def admin_headers():
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": "admin@evcharge.com",
+        "password": "admin123"
+    })
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestFleetState:
+    """Status endpoints answered from memory"""
+    
+    @pytest.mark.parametrize("path", ["/api/ocpp/status", "/api/ocpp/chargers/status"])
+    def test_not_modified(self, path):
+        headers = admin_headers()
+        response = requests.get(f"{BASE_URL}{path}", headers=headers)
+        assert response.status_code == 200
+        etag = response.headers.get("ETag")
+        assert etag
+        
+        response = requests.get(f"{BASE_URL}{path}", headers={**headers, "If-None-Match": etag})
+        assert response.status_code in (200, 304)  # 200 only if an OCPP event arrived in between
+        if response.status_code == 304:
+            assert response.headers.get("ETag") == etag
+        print(f"✓ {path} revalidates with ETag {etag}")
+    
+    def test_charger_write_changes_etag(self):
+        headers = admin_headers()
+        charger_id = f"TEST-FLEET-{datetime.utcnow().strftime('%H%M%S%f')}"
+        before = requests.get(f"{BASE_URL}/api/ocpp/chargers/status", headers=headers)
+        assert before.status_code == 200
+        
+        response = requests.post(f"{BASE_URL}/api/chargers", headers=headers, json={
+            "charger_id": charger_id, "name": "Fleet test charger"
+        })
+        assert response.status_code == 200
+        try:
+            after = requests.get(
+                f"{BASE_URL}/api/ocpp/chargers/status",
+                headers={**headers, "If-None-Match": before.headers["ETag"]}
+            )
+            assert after.status_code == 200
+            assert after.headers["ETag"] != before.headers["ETag"]
+            record = next(c for c in after.json() if c["charger_id"] == charger_id)
+            assert record["connected"] is False
+            print(f"✓ New charger {charger_id} listed under a new ETag")
+        finally:
+            requests.delete(f"{BASE_URL}/api/chargers/{response.json()['id']}", headers=headers)
+    
+    @pytest.mark.asyncio(loop_scope="function")
+    async def test_websocket_snapshot(self):
+        async with websockets.connect(FRONTEND_WS_URL) as ws:
+            snapshot = json.loads(await asyncio.wait_for(ws.recv(), timeout=5))
+            assert snapshot["event"] == "snapshot"
+            assert "version" in snapshot
+            assert "online_chargers" in snapshot["summary"]
+            assert isinstance(snapshot["chargers"], list)
+            print(f"✓ Snapshot at version {snapshot['version']} with {len(snapshot['chargers'])} chargers")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
@@ -0,0 +1,114 @@
+"""
+Background Job Tests
+Tests imports and exports run through the job runner:
+- Uploads return a job id (202) and the ImportResult appears on /api/jobs/{id}
+- Row errors are recorded on the job
+- Background exports are downloadable once finished
+- Finished jobs cannot be cancelled; unknown jobs are 404
+"""
+import pytest
+import requests
+import os
+import time
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+def admin_headers():
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": "admin@evcharge.com",
+        "password": "admin123"
+    })
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def wait_for_job(headers, job_id, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        response = requests.get(f"{BASE_URL}/api/jobs/{job_id}", headers=headers)
+        assert response.status_code == 200
+        job = response.json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        assert time.monotonic() < deadline, f"Job still {job['status']}: {job}"
+        time.sleep(0.2)
+
+
+class TestJobs:
+    """Job runner endpoints"""
+    
+    def test_rfid_import_job(self):
+        headers = admin_headers()
+        prefix = f"TEST-JOB-{uuid.uuid4().hex[:6]}"
+        content = f"Card Number,Balance\n{prefix}-1,1000\n,500\n{prefix}-2,2000\n".encode()
+        
+        response = requests.post(
+            f"{BASE_URL}/api/rfid/import", headers=headers, files={"file": ("cards.csv", content, "text/csv")}
+        )
+        assert response.status_code == 202
+        submitted = response.json()
+        assert submitted["kind"] == "rfid_import"
+        
+        job = wait_for_job(headers, submitted["job_id"])
+        try:
+            assert job["status"] == "succeeded"
+            assert job["result"]["imported"] == 2
+            assert [error["row"] for error in job["result"]["errors"]] == [3]
+            assert [error["row"] for error in job["errors"]] == [3]
+            assert job["finished_at"]
+            print(f"✓ Import job {job['id']} imported {job['result']['imported']} cards")
+            
+            response = requests.post(f"{BASE_URL}/api/jobs/{job['id']}/cancel", headers=headers)
+            assert response.status_code == 409
+            print("✓ Finished job cannot be cancelled")
+        finally:
+            cards = requests.get(f"{BASE_URL}/api/rfid", headers=headers).json()
+            for card in cards:
+                if card["card_number"].startswith(prefix):
+                    requests.delete(f"{BASE_URL}/api/rfid/{card['id']}", headers=headers)
+    
+    def test_unreadable_file_fails_job(self):
+        headers = admin_headers()
+        response = requests.post(
+            f"{BASE_URL}/api/users/import", headers=headers,
+            files={"file": ("users.xlsx", b"not a workbook", "application/octet-stream")}
+        )
+        assert response.status_code == 202
+        job = wait_for_job(headers, response.json()["job_id"])
+        assert job["status"] == "failed"
+        assert "Failed to read file" in job["error"]
+        print("✓ Unreadable upload fails the job with a message")
+    
+    def test_background_export(self):
+        headers = admin_headers()
+        response = requests.get(f"{BASE_URL}/api/export/users?format=csv&background=true", headers=headers)
+        assert response.status_code == 202
+        job = wait_for_job(headers, response.json()["job_id"])
+        assert job["status"] == "succeeded"
+        assert job["result"]["rows"] >= 1
+        assert job["download_url"]
+        
+        response = requests.get(f"{BASE_URL}{job['download_url']}", headers=headers)
+        assert response.status_code == 200
+        assert response.text.startswith("Name,Email,Role")
+        assert "admin@evcharge.com" in response.text
+        print(f"✓ Background export of {job['result']['rows']} users downloaded")
+    
+    def test_unknown_job(self):
+        response = requests.get(f"{BASE_URL}/api/jobs/{uuid.uuid4()}", headers=admin_headers())
+        assert response.status_code == 404
+        print("✓ Unknown job returns 404")
+    
+    def test_stats_require_admin(self):
+        response = requests.get(f"{BASE_URL}/api/jobs/stats")
+        assert response.status_code in (401, 403)
+        response = requests.get(f"{BASE_URL}/api/jobs/stats", headers=admin_headers())
+        assert response.status_code == 200
+        assert "active" in response.json()
+        print("✓ Job stats are admin-only")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
@@ -0,0 +1,103 @@
+"""
+MeterValues Time Series Tests
+Tests that sampled values are stored and served per session:
+- MeterValues sent over WebSocket appear in the raw and 1m series
+- Invalid resolutions are rejected
+"""
+import pytest
+import requests
+import os
+import time
+import asyncio
+import websockets
+from datetime import datetime, timezone, timedelta
+
+pytest_plugins = ('pytest_asyncio',)
+
+try:
+    from ocpp.v16 import call, ChargePoint as cp
+    OCPP_AVAILABLE = True
+except ImportError:
+    OCPP_AVAILABLE = False
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+WS_URL = "ws://localhost:9000/ocpp/1.6/"
+
+
+def admin_headers():
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": "admin@evcharge.com",
+        "password": "admin123"
+    })
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.mark.skipif(not OCPP_AVAILABLE, reason="OCPP library not available")
+class TestMeterValues:
+    """Per-session meter value curves"""
+    
+    @pytest.mark.asyncio(loop_scope="function")
+    async def test_session_curve(self):
+        """Energy samples of a session are returned raw and as 1-minute buckets"""
+        headers = admin_headers()
+        charger_id = f"TEST-METER-{datetime.utcnow().strftime('%H%M%S%f')}"
+        base = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        
+        async with websockets.connect(f"{WS_URL}{charger_id}", subprotocols=['ocpp1.6']) as ws:
+            charger = cp(charger_id, ws)
+            task = asyncio.create_task(charger.start())
+            try:
+                start = await asyncio.wait_for(charger.call(call.StartTransaction(
+                    connector_id=1, id_tag="TEST-METER-TAG", meter_start=0,
+                    timestamp=base.isoformat()
+                )), timeout=5)
+                tx_id = start.transaction_id
+                await asyncio.wait_for(charger.call(call.MeterValues(
+                    connector_id=1,
+                    transaction_id=tx_id,
+                    meter_value=[
+                        {
+                            "timestamp": (base + timedelta(seconds=10 * i)).isoformat(),
+                            "sampledValue": [
+                                {"value": str(100 * i), "measurand": "Energy.Active.Import.Register", "unit": "Wh"},
+                                {"value": "7200", "measurand": "Power.Active.Import", "unit": "W"}
+                            ]
+                        }
+                        for i in range(1, 4)
+                    ]
+                )), timeout=5)
+                await asyncio.wait_for(charger.call(call.StopTransaction(
+                    transaction_id=tx_id, meter_stop=300, timestamp=datetime.utcnow().isoformat()
+                )), timeout=5)
+            finally:
+                await ws.close()
+                task.cancel()
+        
+        params = {"resolution": "raw", "charger_id": charger_id, "measurand": "Energy.Active.Import.Register"}
+        deadline = time.monotonic() + 10
+        while True:
+            response = requests.get(
+                f"{BASE_URL}/api/ocpp/sessions/{tx_id}/meter-values", headers=headers, params=params
+            )
+            assert response.status_code == 200
+            if len(response.json()["points"]) == 3 or time.monotonic() > deadline:
+                break
+            time.sleep(0.25)
+        assert [p["value"] for p in response.json()["points"]] == [100, 200, 300]
+        
+        response = requests.get(f"{BASE_URL}/api/ocpp/sessions/{tx_id}/meter-values", headers=headers, params={
+            "resolution": "1m", "charger_id": charger_id, "measurand": "Energy.Active.Import.Register"
+        })
+        assert response.status_code == 200
+        points = response.json()["points"]
+        assert sum(p["samples"] for p in points) == 3
+        assert points[-1]["last"] == 300
+        print(f"✓ Session {tx_id}: 3 raw samples in {len(points)} one-minute buckets")
+    
+    def test_invalid_resolution(self):
+        response = requests.get(
+            f"{BASE_URL}/api/ocpp/sessions/1/meter-values", headers=admin_headers(), params={"resolution": "5s"}
+        )
+        assert response.status_code == 400
+        print("✓ Invalid resolution rejected")
@@ -87,6 +87,16 @@ def auth_headers(auth_token):
     return {"Authorization": f"Bearer {auth_token}"}
 
 
+def ensure_rfid_card(headers, card_number):
+    """Chargers are only authorized for known cards with a balance"""
+    response = requests.post(
+        f"{BASE_URL}/api/rfid-cards",
+        headers=headers,
+        json={"card_number": card_number, "balance": 10000000}
+    )
+    assert response.status_code in (200, 400)
+
+
 class TestOCPPStatus:
     """Test OCPP status endpoint"""
     
@@ -444,8 +454,9 @@ class TestOCPPWebSocket:
                 await ws.close()
     
     @pytest.mark.asyncio(loop_scope="function")
-    async def test_websocket_authorize(self):
+    async def test_websocket_authorize(self, auth_headers):
         """Test WebSocket Authorize"""
+        ensure_rfid_card(auth_headers, "TEST-RFID-001")
         charger_id = f"TEST-AUTH-{datetime.utcnow().strftime('%H%M%S')}"
         ws_url = f"{WS_URL}{charger_id}"
         
@@ -467,8 +478,9 @@ class TestOCPPWebSocket:
                 await ws.close()
     
     @pytest.mark.asyncio(loop_scope="function")
-    async def test_websocket_full_transaction_flow(self):
+    async def test_websocket_full_transaction_flow(self, auth_headers):
         """Test complete WebSocket transaction flow"""
+        ensure_rfid_card(auth_headers, "TEST-TAG")
         charger_id = f"TEST-TX-{datetime.utcnow().strftime('%H%M%S')}"
         ws_url = f"{WS_URL}{charger_id}"
         
@@ -506,7 +518,7 @@ class TestOCPPWebSocket:
                 
                 # Status Available again
                 await asyncio.wait_for(charger.send_status(1, "Available"), timeout=5)
-                
+            
             finally:
                 await ws.close()
 
@@ -0,0 +1,99 @@
+"""
+Frontend WebSocket Broadcast Tests
+Tests the /api/ocpp/ws event stream:
+- ping/pong and status requests are answered
+- Topic subscriptions only deliver the selected chargers and events
+- Broadcaster stats are admin-only
+"""
+import pytest
+import requests
+import os
+import json
+import asyncio
+import websockets
+from datetime import datetime
+
+pytest_plugins = ('pytest_asyncio',)
+
+try:
+    from ocpp.v16 import call, ChargePoint as cp
+    OCPP_AVAILABLE = True
+except ImportError:
+    OCPP_AVAILABLE = False
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+WS_URL = "ws://localhost:9000/ocpp/1.6/"
+FRONTEND_WS_URL = BASE_URL.replace("https://", "wss://").replace("http://", "ws://") + "/api/ocpp/ws"
+
+
+def admin_headers():
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": "admin@evcharge.com",
+        "password": "admin123"
+    })
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestOCPPBroadcast:
+    """Frontend event stream"""
+    
+    def test_broadcaster_stats(self):
+        response = requests.get(f"{BASE_URL}/api/ocpp/broadcaster", headers=admin_headers())
+        assert response.status_code == 200
+        data = response.json()
+        assert "clients" in data
+        assert "dropped" in data
+        print(f"✓ Broadcaster has {data['clients']} clients")
+    
+    def test_broadcaster_stats_requires_admin(self):
+        response = requests.get(f"{BASE_URL}/api/ocpp/broadcaster")
+        assert response.status_code in (401, 403)
+        print("✓ Broadcaster stats require authentication")
+    
+    @pytest.mark.asyncio(loop_scope="function")
+    async def test_ping_and_status(self):
+        async with websockets.connect(FRONTEND_WS_URL) as ws:
+            snapshot = json.loads(await asyncio.wait_for(ws.recv(), timeout=5))
+            assert snapshot["event"] == "snapshot"
+            
+            await ws.send("ping")
+            assert await asyncio.wait_for(ws.recv(), timeout=5) == "pong"
+            
+            await ws.send("status")
+            status = json.loads(await asyncio.wait_for(ws.recv(), timeout=5))
+            assert status["event"] == "status"
+            assert "online_chargers" in status
+            print("✓ ping/pong and status answered")
+    
+    @pytest.mark.skipif(not OCPP_AVAILABLE, reason="OCPP library not available")
+    @pytest.mark.asyncio(loop_scope="function")
+    async def test_charger_subscription(self):
+        suffix = datetime.utcnow().strftime('%H%M%S%f')
+        watched = f"TEST-BCAST-A-{suffix}"
+        other = f"TEST-BCAST-B-{suffix}"
+        
+        url = f"{FRONTEND_WS_URL}?chargers={watched}&events=charger_connected"
+        async with websockets.connect(url) as frontend:
+            snapshot = json.loads(await asyncio.wait_for(frontend.recv(), timeout=5))
+            assert snapshot["event"] == "snapshot"
+            
+            # Other charger first, so its event would arrive before ours if not filtered
+            for charger_id in (other, watched):
+                async with websockets.connect(f"{WS_URL}{charger_id}", subprotocols=['ocpp1.6']) as ws:
+                    charger = cp(charger_id, ws)
+                    task = asyncio.create_task(charger.start())
+                    try:
+                        await asyncio.wait_for(charger.call(call.Heartbeat()), timeout=5)
+                    finally:
+                        await ws.close()
+                        task.cancel()
+            
+            message = json.loads(await asyncio.wait_for(frontend.recv(), timeout=5))
+            assert message["event"] == "charger_connected"
+            assert message["data"]["charger_id"] == watched
+            print(f"✓ Subscription delivered only {watched}")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
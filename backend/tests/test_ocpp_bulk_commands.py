@@ -0,0 +1,104 @@
+"""
+Bulk OCPP Remote Command Tests
+Tests the /api/ocpp/bulk/* endpoints:
+- Every requested charger gets a result, disconnected ones NotConnected
+- Request validation and admin-only access
+- Progress is streamed over /api/ocpp/ws
+"""
+import pytest
+import requests
+import os
+import json
+import asyncio
+import websockets
+from datetime import datetime
+
+pytest_plugins = ('pytest_asyncio',)
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+FRONTEND_WS_URL = BASE_URL.replace("https://", "wss://").replace("http://", "ws://") + "/api/ocpp/ws"
+
+
+def admin_headers():
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": "admin@evcharge.com",
+        "password": "admin123"
+    })
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def offline_chargers(count):
+    suffix = datetime.utcnow().strftime('%H%M%S%f')
+    return [f"TEST-BULK-{suffix}-{i}" for i in range(count)]
+
+
+class TestBulkCommands:
+    """Concurrent remote commands"""
+    
+    def test_bulk_requires_admin(self):
+        response = requests.post(f"{BASE_URL}/api/ocpp/bulk/reset", json={"charger_ids": ["CP001"]})
+        assert response.status_code in (401, 403)
+        print("✓ Bulk commands require authentication")
+    
+    @pytest.mark.parametrize("path", ["reset", "availability", "unlock", "remote-stop"])
+    def test_disconnected_chargers(self, path):
+        charger_ids = offline_chargers(3)
+        response = requests.post(
+            f"{BASE_URL}/api/ocpp/bulk/{path}",
+            headers=admin_headers(),
+            json={"charger_ids": charger_ids}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["sent"] == 3
+        assert data["accepted"] == 0
+        assert data["results"] == {charger_id: "NotConnected" for charger_id in charger_ids}
+        print(f"✓ bulk/{path} reported NotConnected for {len(charger_ids)} chargers")
+    
+    def test_invalid_requests(self):
+        headers = admin_headers()
+        response = requests.post(
+            f"{BASE_URL}/api/ocpp/bulk/reset?reset_type=Invalid", headers=headers, json={"charger_ids": ["CP001"]}
+        )
+        assert response.status_code == 400
+        response = requests.post(
+            f"{BASE_URL}/api/ocpp/bulk/reset", headers=headers, json={"charger_ids": ["CP001"], "timeout_seconds": 0}
+        )
+        assert response.status_code == 400
+        response = requests.post(f"{BASE_URL}/api/ocpp/bulk/reset", headers=headers, json={"charger_ids": []})
+        assert response.status_code == 400
+        print("✓ Invalid bulk requests rejected")
+    
+    @pytest.mark.asyncio(loop_scope="function")
+    async def test_progress_streamed(self):
+        charger_ids = offline_chargers(2)
+        url = f"{FRONTEND_WS_URL}?events=bulk_command_started,bulk_command_progress,bulk_command_completed"
+        async with websockets.connect(url) as ws:
+            snapshot = json.loads(await asyncio.wait_for(ws.recv(), timeout=5))
+            assert snapshot["event"] == "snapshot"
+            
+            response = await asyncio.to_thread(
+                requests.post,
+                f"{BASE_URL}/api/ocpp/bulk/reset",
+                headers=admin_headers(),
+                json={"charger_ids": charger_ids}
+            )
+            assert response.status_code == 200
+            bulk_id = response.json()["bulk_id"]
+            
+            progress = []
+            while True:
+                message = json.loads(await asyncio.wait_for(ws.recv(), timeout=5))
+                if message["data"].get("bulk_id") != bulk_id:
+                    continue
+                if message["event"] == "bulk_command_progress":
+                    progress.append(message["data"]["charger_id"])
+                elif message["event"] == "bulk_command_completed":
+                    break
+            assert sorted(progress) == sorted(charger_ids)
+            print(f"✓ Progress for bulk {bulk_id} streamed for {len(progress)} chargers")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
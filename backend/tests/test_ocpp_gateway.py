@@ -0,0 +1,52 @@
+"""
+OCPP Gateway Tests
+Tests command routing through the gateway:
+- Gateway stats are admin-only and report the mode
+- Commands for chargers without a live WebSocket are refused
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+def admin_headers():
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": "admin@evcharge.com",
+        "password": "admin123"
+    })
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestOCPPGateway:
+    """Gateway registry and command routing"""
+    
+    def test_gateway_stats(self):
+        response = requests.get(f"{BASE_URL}/api/ocpp/gateway", headers=admin_headers())
+        assert response.status_code == 200
+        data = response.json()
+        assert data["mode"] in ("embedded", "external")
+        assert "multi_process" in data
+        assert "commands_sent" in data
+        print(f"✓ Gateway mode {data['mode']}, multi_process={data['multi_process']}")
+    
+    def test_gateway_stats_requires_admin(self):
+        response = requests.get(f"{BASE_URL}/api/ocpp/gateway")
+        assert response.status_code in (401, 403)
+        print("✓ Gateway stats require authentication")
+    
+    def test_command_to_disconnected_charger(self):
+        response = requests.post(
+            f"{BASE_URL}/api/ocpp/reset/TEST-GATEWAY-OFFLINE",
+            headers=admin_headers(),
+            params={"reset_type": "Soft"}
+        )
+        assert response.status_code == 400
+        assert "not connected" in response.json()["detail"]
+        print("✓ Reset for a disconnected charger refused")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
@@ -0,0 +1,66 @@
+"""
+OCPP Load Harness Tests
+Runs ocpp_simulator.py in load mode against the local OCPP server (ws://localhost:9000):
+- A short busy run reports throughput and per-Action latency
+- The process pool merges statistics from every worker
+"""
+import pytest
+import os
+import sys
+import json
+import subprocess
+import tempfile
+from datetime import datetime
+
+try:
+    import ocpp  # noqa: F401
+    OCPP_AVAILABLE = True
+except ImportError:
+    OCPP_AVAILABLE = False
+
+SIMULATOR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ocpp_simulator.py")
+
+
+def run_harness(*extra):
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = os.path.join(tmp, "load.json")
+        result = subprocess.run(
+            [
+                sys.executable, SIMULATOR,
+                "--prefix", f"TEST-LOAD-{datetime.utcnow().strftime('%H%M%S%f')}",
+                "--profile", "busy", "--duration", "4", "--ramp-up", "1",
+                "--session-seconds", "2", "--idle-seconds", "0.5",
+                "--json", report_path, *extra
+            ],
+            capture_output=True, text=True, timeout=60
+        )
+        assert result.returncode == 0, result.stdout + result.stderr
+        with open(report_path, encoding="utf-8") as f:
+            return json.load(f)
+
+
+@pytest.mark.skipif(not OCPP_AVAILABLE, reason="OCPP library not available")
+class TestOCPPLoadHarness:
+    """Load generator built on the charger simulator"""
+    
+    def test_single_process_report(self):
+        report = run_harness("--chargers", "3")
+        assert report["chargers"] == 3
+        assert report["messages"] > 0
+        assert report["throughput_msg_s"] > 0
+        for action in ("Connect", "BootNotification", "StatusNotification", "Authorize"):
+            assert action in report["actions"], f"{action} missing"
+        boot = report["actions"]["BootNotification"]
+        assert boot["count"] == 3
+        assert boot["p50_ms"] <= boot["p95_ms"] <= boot["p99_ms"] <= boot["max_ms"]
+        print(f"✓ {report['messages']} messages at {report['throughput_msg_s']} msg/s")
+    
+    def test_process_pool(self):
+        report = run_harness("--chargers", "4", "--processes", "2", "--max-error-rate", "0.05")
+        assert report["processes"] == 2
+        assert report["actions"]["BootNotification"]["count"] == 4
+        print(f"✓ Pool of {report['processes']} processes reported {report['messages']} messages")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
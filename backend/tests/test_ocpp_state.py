@@ -0,0 +1,94 @@
+"""
+OCPP Transaction State Tests
+Tests durable transaction id allocation:
+- Simulated and WebSocket transactions draw unique, increasing ids
+- Stopped transactions leave the active list
+"""
+import pytest
+import requests
+import os
+import asyncio
+import websockets
+from datetime import datetime
+
+pytest_plugins = ('pytest_asyncio',)
+
+try:
+    from ocpp.v16 import call, ChargePoint as cp
+    OCPP_AVAILABLE = True
+except ImportError:
+    OCPP_AVAILABLE = False
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+WS_URL = "ws://localhost:9000/ocpp/1.6/"
+
+
+def admin_headers():
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": "admin@evcharge.com",
+        "password": "admin123"
+    })
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestOCPPState:
+    """Transaction ids from the database sequence"""
+    
+    def simulate_start(self, headers, charger_id):
+        response = requests.post(f"{BASE_URL}/api/ocpp/simulate/start-transaction", headers=headers, params={
+            "charger_id": charger_id, "id_tag": "TEST-STATE-TAG"
+        })
+        assert response.status_code == 200
+        return response.json()["transactionId"]
+    
+    def simulate_stop(self, headers, transaction_id):
+        requests.post(f"{BASE_URL}/api/ocpp/simulate/stop-transaction", headers=headers, params={
+            "transaction_id": transaction_id, "meter_stop": 1000
+        })
+    
+    def test_simulated_ids_unique(self):
+        headers = admin_headers()
+        charger_id = f"TEST-STATE-{datetime.utcnow().strftime('%H%M%S%f')}"
+        ids = [self.simulate_start(headers, charger_id) for _ in range(3)]
+        try:
+            assert len(set(ids)) == 3
+            assert ids == sorted(ids)
+            print(f"✓ Simulated transaction ids: {ids}")
+        finally:
+            for tx_id in ids:
+                self.simulate_stop(headers, tx_id)
+    
+    @pytest.mark.skipif(not OCPP_AVAILABLE, reason="OCPP library not available")
+    @pytest.mark.asyncio(loop_scope="function")
+    async def test_websocket_id_does_not_collide(self):
+        """A charger's transaction id never reuses one issued to the simulator"""
+        headers = admin_headers()
+        charger_id = f"TEST-STATE-WS-{datetime.utcnow().strftime('%H%M%S%f')}"
+        simulated = self.simulate_start(headers, f"{charger_id}-SIM")
+        
+        async with websockets.connect(f"{WS_URL}{charger_id}", subprotocols=['ocpp1.6']) as ws:
+            charger = cp(charger_id, ws)
+            task = asyncio.create_task(charger.start())
+            try:
+                start = await asyncio.wait_for(charger.call(call.StartTransaction(
+                    connector_id=1, id_tag="TEST-STATE-TAG", meter_start=0,
+                    timestamp=datetime.utcnow().isoformat()
+                )), timeout=5)
+                assert start.transaction_id != simulated
+                
+                active = requests.get(f"{BASE_URL}/api/ocpp/active-transactions", headers=headers).json()
+                assert any(tx["transaction_id"] == start.transaction_id for tx in active)
+                
+                await asyncio.wait_for(charger.call(call.StopTransaction(
+                    transaction_id=start.transaction_id, meter_stop=1000,
+                    timestamp=datetime.utcnow().isoformat()
+                )), timeout=5)
+                
+                active = requests.get(f"{BASE_URL}/api/ocpp/active-transactions", headers=headers).json()
+                assert all(tx["transaction_id"] != start.transaction_id for tx in active)
+                print(f"✓ WebSocket id {start.transaction_id} distinct from simulated id {simulated}")
+            finally:
+                await ws.close()
+                task.cancel()
+                self.simulate_stop(headers, simulated)
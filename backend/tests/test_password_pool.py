@@ -0,0 +1,53 @@
+"""
+Password Worker Pool Tests
+Tests that bcrypt work runs off the event loop without changing behavior:
+- Concurrent logins all succeed and the health check stays responsive
+- Wrong passwords are still rejected
+- Pool counters are exposed on /api/health
+"""
+import pytest
+import requests
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestPasswordPool:
+    """Bounded bcrypt pool"""
+    
+    def login(self, password="admin123"):
+        return requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@evcharge.com",
+            "password": password
+        })
+    
+    def test_concurrent_logins(self):
+        """A burst of logins succeeds while /api/health keeps answering quickly"""
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            logins = [pool.submit(self.login) for _ in range(16)]
+            start = time.monotonic()
+            health = requests.get(f"{BASE_URL}/api/health")
+            health_latency = time.monotonic() - start
+            statuses = [future.result().status_code for future in logins]
+        
+        assert health.status_code == 200
+        assert all(status in (200, 503) for status in statuses)
+        assert statuses.count(200) > 0
+        print(f"✓ {statuses.count(200)}/16 logins succeeded, health answered in {health_latency:.3f}s")
+    
+    def test_wrong_password_rejected(self):
+        response = self.login("not-the-password")
+        assert response.status_code == 401
+        print("✓ Wrong password rejected")
+    
+    def test_health_reports_pool(self):
+        self.login()
+        response = requests.get(f"{BASE_URL}/api/health")
+        assert response.status_code == 200
+        pool = response.json()["password_pool"]
+        for key in ("workers", "pending", "queue_depth", "max_pending", "completed", "rejected"):
+            assert key in pool
+        assert pool["completed"] > 0
+        print(f"✓ Password pool stats: {pool}")
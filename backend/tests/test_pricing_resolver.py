@@ -0,0 +1,78 @@
+"""
+Pricing Resolver Tests
+Tests the in-memory pricing indexes:
+- Transaction costs follow account pricing rules
+- Changing a rule is reflected immediately (cache invalidation)
+- Hit/miss counters are exposed to admins
+"""
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestPricingResolver:
+    """Process-wide pricing resolver"""
+    
+    @pytest.fixture
+    def auth_headers(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@evcharge.com",
+            "password": "admin123"
+        })
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    def create_transaction(self, headers, account):
+        response = requests.post(f"{BASE_URL}/api/transactions", headers=headers, json={
+            "tx_id": f"TEST_PRICE_{uuid.uuid4().hex[:8]}",
+            "station": "TEST_PRICE_STATION",
+            "connector": "1",
+            "connector_type": "CCS2",
+            "account": account,
+            "start_time": "2026-05-01T10:00:00",
+            "end_time": "2026-05-01T11:00:00",
+            "meter_value": 10.0
+        })
+        assert response.status_code == 200
+        return response.json()
+    
+    def test_rule_changes_apply_immediately(self, auth_headers):
+        """Updating a pricing rule invalidates the cached indexes"""
+        account = f"TEST_PRICE_ACCOUNT_{uuid.uuid4().hex[:6]}"
+        created = []
+        
+        response = requests.post(f"{BASE_URL}/api/pricing", headers=auth_headers, json={
+            "account": account, "connector": "1", "price_per_kwh": 100.0
+        })
+        assert response.status_code == 200
+        rule_id = response.json()["id"]
+        
+        try:
+            created.append(self.create_transaction(auth_headers, account))
+            assert created[-1]["cost"] == 1000.0
+            
+            response = requests.post(f"{BASE_URL}/api/pricing", headers=auth_headers, json={
+                "account": account, "connector": "1", "price_per_kwh": 300.0
+            })
+            assert response.status_code == 200
+            
+            created.append(self.create_transaction(auth_headers, account))
+            assert created[-1]["cost"] == 3000.0
+            print("✓ Pricing rule update applied to the next transaction")
+        finally:
+            requests.post(f"{BASE_URL}/api/transactions/bulk-delete", headers=auth_headers, json={
+                "ids": [tx["id"] for tx in created]
+            })
+            requests.delete(f"{BASE_URL}/api/pricing/{rule_id}", headers=auth_headers)
+    
+    def test_cache_stats(self, auth_headers):
+        """Counters are available to admins"""
+        response = requests.get(f"{BASE_URL}/api/pricing/cache-stats", headers=auth_headers)
+        assert response.status_code == 200
+        stats = response.json()
+        for key in ("hits", "misses", "loads", "invalidations"):
+            assert key in stats
+        print(f"✓ Pricing cache stats: {stats['hits']} hits, {stats['misses']} misses")
@@ -0,0 +1,76 @@
+"""
+Reports Engine Tests
+Tests for SQL-side report aggregation:
+- Report totals are exact (no row cap) and match the dashboard
+- Transaction sample pages through /reports/transactions with a cursor
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestReportsEngine:
+    """Report aggregation pushed into PostgreSQL"""
+    
+    @pytest.fixture
+    def auth_headers(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@evcharge.com",
+            "password": "admin123"
+        })
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    def test_report_totals_match_dashboard(self, auth_headers):
+        """Unfiltered report covers every transaction"""
+        response = requests.post(f"{BASE_URL}/api/reports/generate", headers=auth_headers, json={})
+        assert response.status_code == 200
+        report = response.json()
+        
+        stats = requests.get(f"{BASE_URL}/api/dashboard/stats", headers=auth_headers).json()
+        assert report["summary"]["total_transactions"] == stats["total_transactions"]
+        assert len(report["transactions"]) <= 100
+        
+        # Group totals add up to the summary
+        by_payment = sum(g["transactions"] for g in report["by_payment_type"])
+        assert by_payment == report["summary"]["total_transactions"]
+        print(f"✓ Report covers {report['summary']['total_transactions']} transactions")
+    
+    def test_transaction_pages_do_not_overlap(self, auth_headers):
+        """Cursor pagination returns disjoint pages"""
+        response = requests.post(
+            f"{BASE_URL}/api/reports/transactions?limit=5",
+            headers=auth_headers,
+            json={}
+        )
+        assert response.status_code == 200
+        first = response.json()
+        assert len(first["transactions"]) <= 5
+        
+        if not first["next_cursor"]:
+            pytest.skip("Not enough transactions for a second page")
+        
+        response = requests.post(
+            f"{BASE_URL}/api/reports/transactions?limit=5&cursor={first['next_cursor']}",
+            headers=auth_headers,
+            json={}
+        )
+        assert response.status_code == 200
+        second = response.json()
+        
+        first_ids = {tx["id"] for tx in first["transactions"]}
+        second_ids = {tx["id"] for tx in second["transactions"]}
+        assert not first_ids & second_ids
+        print(f"✓ Pages are disjoint ({len(first_ids)} + {len(second_ids)})")
+    
+    def test_invalid_cursor_rejected(self, auth_headers):
+        """Garbage cursors return 400"""
+        response = requests.post(
+            f"{BASE_URL}/api/reports/transactions?cursor=not-a-cursor",
+            headers=auth_headers,
+            json={}
+        )
+        assert response.status_code == 400
+        print("✓ Invalid cursor rejected")
@@ -0,0 +1,97 @@
+"""
+RFID Authorization Tests
+Tests OCPP Authorize answered from the RFID card index:
+- Known active cards are accepted, unknown tags are invalid
+- Blocking and deleting a card takes effect on the next Authorize
+- Authorization stats are admin-only
+"""
+import pytest
+import requests
+import os
+import asyncio
+import websockets
+from datetime import datetime
+
+pytest_plugins = ('pytest_asyncio',)
+
+try:
+    from ocpp.v16 import call, ChargePoint as cp
+    OCPP_AVAILABLE = True
+except ImportError:
+    OCPP_AVAILABLE = False
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+WS_URL = "ws://localhost:9000/ocpp/1.6/"
+
+
+def admin_headers():
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": "admin@evcharge.com",
+        "password": "admin123"
+    })
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestRFIDAuthorization:
+    """Authorize responses follow card writes"""
+    
+    def test_authorization_stats(self):
+        response = requests.get(f"{BASE_URL}/api/ocpp/authorization", headers=admin_headers())
+        assert response.status_code == 200
+        data = response.json()
+        assert "tags" in data
+        assert "hits" in data
+        print(f"✓ Authorization index holds {data['tags']} tags")
+    
+    def test_authorization_stats_requires_admin(self):
+        response = requests.get(f"{BASE_URL}/api/ocpp/authorization")
+        assert response.status_code in (401, 403)
+        print("✓ Authorization stats require authentication")
+    
+    @pytest.mark.skipif(not OCPP_AVAILABLE, reason="OCPP library not available")
+    @pytest.mark.asyncio(loop_scope="function")
+    async def test_authorize_follows_card_status(self):
+        headers = admin_headers()
+        suffix = datetime.utcnow().strftime('%H%M%S%f')
+        card_number = f"TEST-AUTH-CARD-{suffix}"
+        charger_id = f"TEST-AUTH-CP-{suffix}"
+        
+        response = requests.post(f"{BASE_URL}/api/rfid-cards", headers=headers, json={
+            "card_number": card_number, "balance": 50000
+        })
+        assert response.status_code == 200
+        card_id = response.json()["id"]
+        
+        async with websockets.connect(f"{WS_URL}{charger_id}", subprotocols=['ocpp1.6']) as ws:
+            charger = cp(charger_id, ws)
+            task = asyncio.create_task(charger.start())
+            
+            async def authorize(id_tag):
+                result = await asyncio.wait_for(charger.call(call.Authorize(id_tag=id_tag)), timeout=5)
+                return result.id_tag_info["status"]
+            
+            try:
+                assert await authorize(card_number) == "Accepted"
+                assert await authorize(f"TEST-AUTH-UNKNOWN-{suffix}") == "Invalid"
+                
+                response = requests.patch(f"{BASE_URL}/api/rfid-cards/{card_id}", headers=headers, json={
+                    "status": "blocked"
+                })
+                assert response.status_code == 200
+                assert await authorize(card_number) == "Blocked"
+                
+                response = requests.delete(f"{BASE_URL}/api/rfid-cards/{card_id}", headers=headers)
+                assert response.status_code == 200
+                card_id = None
+                assert await authorize(card_number) == "Invalid"
+                print("✓ Authorize follows card create, block and delete")
+            finally:
+                await ws.close()
+                task.cancel()
+                if card_id:
+                    requests.delete(f"{BASE_URL}/api/rfid-cards/{card_id}", headers=headers)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
@@ -0,0 +1,129 @@
+"""
+RFID Card Import Tests
+Tests the set-based RFID card import:
+- New cards are created with their balance and owner; blank and repeated rows are reported/skipped
+- mode=skip leaves existing cards untouched
+- mode=upsert sets balances in bulk and records the change in the card history
+"""
+import pytest
+import requests
+import os
+import time
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestRFIDImport:
+    """Bulk insert and upsert of RFID cards"""
+    
+    @pytest.fixture
+    def auth_headers(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@evcharge.com",
+            "password": "admin123"
+        })
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    @pytest.fixture
+    def prefix(self, auth_headers):
+        prefix = f"TESTIMP{uuid.uuid4().hex[:6].upper()}"
+        yield prefix
+        cards = requests.get(f"{BASE_URL}/api/rfid-cards", headers=auth_headers, params={"search": prefix}).json()
+        for card in cards:
+            requests.delete(f"{BASE_URL}/api/rfid-cards/{card['id']}", headers=auth_headers)
+    
+    def run_import(self, auth_headers, csv, mode=None):
+        response = requests.post(
+            f"{BASE_URL}/api/rfid-cards/import",
+            headers=auth_headers,
+            params={"mode": mode} if mode else None,
+            files={"file": ("cards.csv", csv.encode(), "text/csv")}
+        )
+        assert response.status_code == 202, response.text
+        job_id = response.json()["job_id"]
+        
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            job = requests.get(f"{BASE_URL}/api/jobs/{job_id}", headers=auth_headers).json()
+            if job["status"] not in ("queued", "running"):
+                assert job["status"] == "succeeded", job
+                return job["result"]
+            time.sleep(0.5)
+        pytest.fail(f"Import job {job_id} did not finish")
+    
+    def cards_by_number(self, auth_headers, prefix):
+        cards = requests.get(f"{BASE_URL}/api/rfid-cards", headers=auth_headers, params={"search": prefix}).json()
+        return {card["card_number"]: card for card in cards}
+    
+    def test_import_new_cards(self, auth_headers, prefix):
+        csv = (
+            "Card Number,User Email,Balance\n"
+            f"{prefix}1,admin@evcharge.com,5000\n"
+            f"{prefix}2,,\n"
+            ",,100\n"
+            f"{prefix}1,,9999\n"
+        )
+        result = self.run_import(auth_headers, csv)
+        assert result["imported"] == 2
+        assert result["skipped"] == 1  # repeated card number
+        assert [error["row"] for error in result["errors"]] == [4]
+        
+        cards = self.cards_by_number(auth_headers, prefix)
+        assert cards[f"{prefix}1"]["balance"] == 5000
+        assert cards[f"{prefix}1"]["user_id"] is not None
+        assert cards[f"{prefix}2"]["balance"] == 0
+        print(f"✓ Imported new cards: {result}")
+    
+    def test_skip_mode_keeps_existing(self, auth_headers, prefix):
+        self.run_import(auth_headers, f"Card Number,Balance\n{prefix}1,1000\n")
+        result = self.run_import(auth_headers, f"Card Number,Balance\n{prefix}1,2000\n{prefix}2,300\n")
+        assert result["imported"] == 1
+        assert result["skipped"] == 1
+        assert result["updated"] == 0
+        
+        cards = self.cards_by_number(auth_headers, prefix)
+        assert cards[f"{prefix}1"]["balance"] == 1000
+        print("✓ Existing card left untouched in skip mode")
+    
+    def test_upsert_mode_updates_balance_with_history(self, auth_headers, prefix):
+        self.run_import(auth_headers, f"Card Number,Balance\n{prefix}1,1000\n{prefix}2,500\n")
+        result = self.run_import(
+            auth_headers, f"Card Number,Balance\n{prefix}1,2500\n{prefix}2,\n{prefix}3,700\n", mode="upsert"
+        )
+        assert result["imported"] == 1
+        assert result["updated"] == 2
+        
+        cards = self.cards_by_number(auth_headers, prefix)
+        assert cards[f"{prefix}1"]["balance"] == 2500
+        assert cards[f"{prefix}2"]["balance"] == 500  # blank balance keeps the current one
+        assert cards[f"{prefix}3"]["balance"] == 700
+        
+        history = requests.get(
+            f"{BASE_URL}/api/rfid-cards/{cards[f'{prefix}1']['id']}/history", headers=auth_headers
+        ).json()
+        assert any(
+            entry["transaction_type"] == "IMPORT" and entry["balance_before"] == 1000
+            and entry["balance_after"] == 2500 and entry["amount"] == 1500
+            for entry in history
+        )
+        untouched = requests.get(
+            f"{BASE_URL}/api/rfid-cards/{cards[f'{prefix}2']['id']}/history", headers=auth_headers
+        ).json()
+        assert not any(entry["transaction_type"] == "IMPORT" for entry in untouched)
+        print(f"✓ Upsert updated balances with history: {result}")
+    
+    def test_invalid_mode_rejected(self, auth_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/rfid-cards/import",
+            headers=auth_headers,
+            params={"mode": "replace"},
+            files={"file": ("cards.csv", b"Card Number\nX\n", "text/csv")}
+        )
+        assert response.status_code == 400
+        print("✓ Unknown import mode rejected")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
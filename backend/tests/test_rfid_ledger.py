@@ -0,0 +1,130 @@
+"""
+RFID Balance Ledger Tests
+Tests that balance changes are applied atomically in the database:
+- Concurrent top-ups of one card are all kept, each with its history row
+- Top-up of an unknown card is a 404
+- Ledger counters are exposed on /api/rfid-cards/ledger/stats
+- A balance edited on the card is recorded as an ADJUSTMENT
+- The JSON transaction import charges a card only for rows its balance covers
+"""
+import pytest
+import requests
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestRFIDLedger:
+    """Atomic credits with history"""
+    
+    @pytest.fixture
+    def auth_headers(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@evcharge.com",
+            "password": "admin123"
+        })
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    @pytest.fixture
+    def card(self, auth_headers):
+        response = requests.post(f"{BASE_URL}/api/rfid-cards", headers=auth_headers, json={
+            "card_number": f"TESTLEDGER{uuid.uuid4().hex[:8].upper()}",
+            "balance": 1000
+        })
+        assert response.status_code == 200
+        card = response.json()
+        yield card
+        requests.delete(f"{BASE_URL}/api/rfid-cards/{card['id']}", headers=auth_headers)
+    
+    def test_concurrent_topups_not_lost(self, auth_headers, card):
+        def topup(i):
+            return requests.post(
+                f"{BASE_URL}/api/rfid-cards/{card['id']}/topup",
+                headers=auth_headers,
+                json={"amount": 100, "notes": f"concurrent {i}"}
+            )
+        
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            responses = list(pool.map(topup, range(20)))
+        assert all(response.status_code == 200 for response in responses)
+        
+        current = requests.get(f"{BASE_URL}/api/rfid-cards/{card['id']}", headers=auth_headers).json()
+        assert current["balance"] == 1000 + 20 * 100
+        
+        history = requests.get(f"{BASE_URL}/api/rfid-cards/{card['id']}/history", headers=auth_headers).json()
+        topups = [entry for entry in history if entry["transaction_type"] == "TOPUP"]
+        assert len(topups) == 20
+        # Every entry continues from the balance the previous one left
+        assert sorted(entry["balance_before"] for entry in topups) == [1000 + i * 100 for i in range(20)]
+        assert all(entry["balance_after"] - entry["balance_before"] == 100 for entry in topups)
+        print(f"✓ 20 concurrent top-ups kept, balance {current['balance']}")
+    
+    def test_topup_unknown_card(self, auth_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/rfid-cards/{uuid.uuid4()}/topup",
+            headers=auth_headers,
+            json={"amount": 100}
+        )
+        assert response.status_code == 404
+        print("✓ Top-up of an unknown card rejected")
+    
+    def test_ledger_stats(self, auth_headers, card):
+        requests.post(f"{BASE_URL}/api/rfid-cards/{card['id']}/topup", headers=auth_headers, json={"amount": 50})
+        response = requests.get(f"{BASE_URL}/api/rfid-cards/ledger/stats", headers=auth_headers)
+        assert response.status_code == 200
+        stats = response.json()
+        for key in ("credits", "debits", "rejected", "settled_charges", "settlements"):
+            assert key in stats
+        assert stats["credits"] > 0
+        print(f"✓ Ledger stats: {stats}")
+    
+    def test_balance_edit_recorded(self, auth_headers, card):
+        response = requests.patch(f"{BASE_URL}/api/rfid-cards/{card['id']}", headers=auth_headers, json={"balance": 400})
+        assert response.status_code == 200
+        assert response.json()["balance"] == 400
+        
+        history = requests.get(f"{BASE_URL}/api/rfid-cards/{card['id']}/history", headers=auth_headers).json()
+        adjustments = [entry for entry in history if entry["transaction_type"] == "ADJUSTMENT"]
+        assert len(adjustments) == 1
+        assert adjustments[0]["balance_before"] == 1000
+        assert adjustments[0]["balance_after"] == 400
+        print("✓ Balance edit recorded as an ADJUSTMENT")
+    
+    def test_json_import_settles_charges(self, auth_headers, card):
+        requests.post(f"{BASE_URL}/api/rfid-cards/{card['id']}/topup", headers=auth_headers, json={"amount": 19000})
+        prefix = f"TEST_LEDGER_{uuid.uuid4().hex[:6]}"
+        response = requests.post(f"{BASE_URL}/api/transactions/import-json", headers=auth_headers, json={
+            "transactions": [
+                {
+                    "TxID": f"{prefix}_{i}", "Station": "TEST_LEDGER_STATION", "Connector": "1",
+                    "Account": card["card_number"], "Start Time": "2026-04-02 10:00:00",
+                    "End Time": "2026-04-02 11:00:00", "Meter value(kW.h)": meter_value
+                }
+                for i, meter_value in enumerate([2, 3, 100])
+            ]
+        })
+        assert response.status_code == 200
+        assert response.json()["imported_count"] == 3
+        
+        transactions = requests.get(
+            f"{BASE_URL}/api/transactions", headers=auth_headers, params={"account": card["card_number"]}
+        ).json()
+        paid = [tx for tx in transactions if tx["payment_status"] == "PAID"]
+        # The 100 kWh row is more than the card holds and stays unpaid
+        assert len(paid) == 2
+        
+        current = requests.get(f"{BASE_URL}/api/rfid-cards/{card['id']}", headers=auth_headers).json()
+        assert current["balance"] == pytest.approx(20000 - sum(tx["cost"] for tx in paid))
+        history = requests.get(f"{BASE_URL}/api/rfid-cards/{card['id']}/history", headers=auth_headers).json()
+        assert len([entry for entry in history if entry["transaction_type"] == "CHARGE"]) == 2
+        
+        for tx in transactions:
+            requests.delete(f"{BASE_URL}/api/transactions/{tx['id']}", headers=auth_headers)
+        print(f"✓ JSON import charged {len(paid)} rows, balance {current['balance']}")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
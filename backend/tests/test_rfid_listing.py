@@ -0,0 +1,97 @@
+"""
+RFID Card Listing Tests
+Tests the joined RFID card listings:
+- Owner names are filled in, filters and card prefix search narrow the list
+- /api/rfid-cards/page walks every matching card once
+- /api/rfid-cards/lookup resolves many card numbers and reports missing ones
+"""
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestRFIDListing:
+    """RFID card listing, pagination and batch lookup"""
+    
+    @pytest.fixture
+    def auth_headers(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@evcharge.com",
+            "password": "admin123"
+        })
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    @pytest.fixture
+    def cards(self, auth_headers):
+        prefix = f"TESTLIST{uuid.uuid4().hex[:6].upper()}"
+        me = requests.get(f"{BASE_URL}/api/auth/me", headers=auth_headers).json()
+        created = []
+        for i in range(5):
+            response = requests.post(f"{BASE_URL}/api/rfid-cards", headers=auth_headers, json={
+                "card_number": f"{prefix}{i}",
+                "user_id": me["id"] if i % 2 == 0 else None,
+                "balance": 1000
+            })
+            assert response.status_code == 200
+            created.append(response.json())
+        yield prefix, me, created
+        for card in created:
+            requests.delete(f"{BASE_URL}/api/rfid-cards/{card['id']}", headers=auth_headers)
+    
+    def test_prefix_search_with_owner_names(self, auth_headers, cards):
+        """search matches the card prefix and owner names come from the join"""
+        prefix, me, created = cards
+        response = requests.get(f"{BASE_URL}/api/rfid-cards", headers=auth_headers, params={"search": prefix})
+        assert response.status_code == 200
+        listed = response.json()
+        assert {c["card_number"] for c in listed} == {c["card_number"] for c in created}
+        for card in listed:
+            if card["user_id"]:
+                assert card["user_name"] == me["name"]
+            else:
+                assert card["user_name"] is None
+        print(f"✓ Prefix search returned {len(listed)} cards with owner names")
+    
+    def test_owner_filter(self, auth_headers, cards):
+        prefix, me, created = cards
+        response = requests.get(f"{BASE_URL}/api/rfid-cards", headers=auth_headers, params={
+            "search": prefix, "user_id": me["id"]
+        })
+        assert response.status_code == 200
+        assert len(response.json()) == 3
+        print("✓ Owner filter applied server-side")
+    
+    def test_walk_all_pages(self, auth_headers, cards):
+        prefix, me, created = cards
+        seen = []
+        cursor = None
+        while True:
+            params = {"search": prefix, "limit": 2, "include_total": True}
+            if cursor:
+                params["cursor"] = cursor
+            response = requests.get(f"{BASE_URL}/api/rfid-cards/page", headers=auth_headers, params=params)
+            assert response.status_code == 200
+            data = response.json()
+            assert data["total_estimate"] == 5
+            seen.extend(c["id"] for c in data["cards"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        assert sorted(seen) == sorted(c["id"] for c in created)
+        print(f"✓ Walked {len(seen)} cards across pages")
+    
+    def test_batch_lookup(self, auth_headers, cards):
+        prefix, me, created = cards
+        wanted = [created[0]["card_number"], created[3]["card_number"], f"{prefix}MISSING"]
+        response = requests.post(f"{BASE_URL}/api/rfid-cards/lookup", headers=auth_headers, json={
+            "card_numbers": wanted
+        })
+        assert response.status_code == 200
+        data = response.json()
+        assert [c["card_number"] for c in data["cards"]] == wanted[:2]
+        assert data["missing"] == [f"{prefix}MISSING"]
+        print("✓ Batch lookup resolved 2 cards, 1 missing")
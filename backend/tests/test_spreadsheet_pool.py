@@ -0,0 +1,86 @@
+"""
+Spreadsheet Process Pool Tests
+Tests that pandas/openpyxl work runs in the process pool without changing behavior:
+- Import templates are still valid workbooks
+- An uploaded CSV is parsed by the pool and imported
+- Pool counters are exposed on /api/jobs/spreadsheet-pool
+"""
+import pytest
+import requests
+import os
+import time
+from io import BytesIO
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestSpreadsheetPool:
+    """pandas parsing and XLSX rendering off the event loop"""
+    
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@evcharge.com",
+            "password": "admin123"
+        })
+        assert response.status_code == 200
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    def pool_stats(self):
+        response = requests.get(f"{BASE_URL}/api/jobs/spreadsheet-pool", headers=self.headers)
+        assert response.status_code == 200
+        return response.json()
+    
+    def wait_for_job(self, job_id, timeout=60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = requests.get(f"{BASE_URL}/api/jobs/{job_id}", headers=self.headers).json()
+            if job["status"] not in ("queued", "running"):
+                return job
+            time.sleep(0.5)
+        pytest.fail(f"Job {job_id} did not finish in {timeout}s")
+    
+    def test_template_rendered_by_pool(self):
+        from openpyxl import load_workbook
+        
+        before = self.pool_stats()["completed"]
+        response = requests.get(f"{BASE_URL}/api/export/template/rfid-cards")
+        assert response.status_code == 200
+        
+        sheet = load_workbook(BytesIO(response.content)).active
+        rows = list(sheet.iter_rows(values_only=True))
+        assert rows[0] == ("Card Number", "User Email", "Balance")
+        assert len(rows) == 3
+        assert self.pool_stats()["completed"] > before
+        print(f"✓ Template rendered by the pool: {rows}")
+    
+    def test_csv_import_parsed_by_pool(self):
+        card = f"POOL{int(time.time() * 1000)}"
+        csv = f"Card Number,Balance\n{card},1000\n".encode()
+        response = requests.post(
+            f"{BASE_URL}/api/rfid-cards/import",
+            headers=self.headers,
+            files={"file": ("cards.csv", csv, "text/csv")}
+        )
+        assert response.status_code == 202
+        
+        job = self.wait_for_job(response.json()["job_id"])
+        assert job["status"] == "succeeded", job
+        print(f"✓ CSV import parsed by the pool: {job['result']}")
+    
+    def test_pool_stats(self):
+        stats = self.pool_stats()
+        for key in ("workers", "pending", "queued", "max_pending", "saturated", "completed",
+                    "failed", "timeouts", "rejected", "recycled", "retiring_pools", "retried",
+                    "avg_queue_wait_ms", "avg_run_ms"):
+            assert key in stats
+        print(f"✓ Spreadsheet pool stats: {stats}")
+    
+    def test_pool_stats_admin_only(self):
+        response = requests.get(f"{BASE_URL}/api/jobs/spreadsheet-pool")
+        assert response.status_code in (401, 403)
+        print("✓ Pool stats require admin")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
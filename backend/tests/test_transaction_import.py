@@ -0,0 +1,131 @@
+"""
+Transaction Excel Import Tests
+Tests the batched import pipeline:
+- Missing TxIDs and invalid meter values are reported per row
+- Zero kWh rows and repeated TxIDs are skipped
+- Cost and duration are computed for imported rows
+- Re-importing the same file imports nothing
+- TxIDs are unique across manual entry and the JSON import
+The import runs as a background job; its ImportResult is read from /api/jobs/{id}.
+"""
+import pytest
+import requests
+import os
+import time
+import uuid
+from io import BytesIO
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class TestTransactionImport:
+    """Vectorized Excel transaction import"""
+    
+    @pytest.fixture
+    def auth_headers(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@evcharge.com",
+            "password": "admin123"
+        })
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    @pytest.fixture
+    def import_file(self, auth_headers):
+        from openpyxl import Workbook
+        
+        account = f"TEST_IMPORT_ACCOUNT_{uuid.uuid4().hex[:6]}"
+        prefix = f"TEST_IMPORT_{uuid.uuid4().hex[:6]}"
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(["TxID", "Station", "Connector", "Account", "Start Time", "End Time", "Meter value(kW.h)"])
+        sheet.append([f"{prefix}_1", "TEST_IMPORT_STATION", "CCS2", account, "2026-04-01 10:00:00", "2026-04-01 11:30:00", 10])
+        sheet.append([f"{prefix}_2", "TEST_IMPORT_STATION", "CCS2", account, "2026-04-01 12:00:00", "2026-04-01 12:45:00", "2,5"])
+        sheet.append([None, "TEST_IMPORT_STATION", "CCS2", account, "2026-04-01 13:00:00", "2026-04-01 14:00:00", 5])
+        sheet.append([f"{prefix}_3", "TEST_IMPORT_STATION", "CCS2", account, "2026-04-01 13:00:00", "2026-04-01 14:00:00", "abc"])
+        sheet.append([f"{prefix}_4", "TEST_IMPORT_STATION", "CCS2", account, "2026-04-01 15:00:00", "2026-04-01 16:00:00", 0])
+        sheet.append([f"{prefix}_1", "TEST_IMPORT_STATION", "CCS2", account, "2026-04-01 17:00:00", "2026-04-01 18:00:00", 7])
+        output = BytesIO()
+        workbook.save(output)
+        
+        yield account, output.getvalue()
+        
+        response = requests.get(f"{BASE_URL}/api/transactions", headers=auth_headers, params={"account": account})
+        ids = [tx["id"] for tx in response.json()]
+        if ids:
+            requests.post(f"{BASE_URL}/api/transactions/bulk-delete", headers=auth_headers, json={"ids": ids})
+    
+    def upload(self, headers, content):
+        """Submit the import and wait for its job; returns the finished job"""
+        response = requests.post(
+            f"{BASE_URL}/api/transactions/import",
+            headers=headers,
+            files={"file": ("transactions.xlsx", content, XLSX_MEDIA_TYPE)}
+        )
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        deadline = time.monotonic() + 30
+        while True:
+            job = requests.get(f"{BASE_URL}/api/jobs/{job_id}", headers=headers).json()
+            if job["status"] not in ("queued", "running"):
+                return job
+            assert time.monotonic() < deadline, f"Import job still {job['status']}"
+            time.sleep(0.2)
+    
+    def test_import_counts_and_errors(self, auth_headers, import_file):
+        """Valid rows import, bad rows are reported, zero/duplicate rows are skipped"""
+        account, content = import_file
+        
+        job = self.upload(auth_headers, content)
+        assert job["status"] == "succeeded"
+        result = job["result"]
+        assert result["imported_count"] == 2
+        assert result["skipped_count"] == 2
+        assert [(e["row"], e["field"]) for e in result["errors"]] == [(4, "TxID"), (5, "Meter value")]
+        
+        response = requests.get(f"{BASE_URL}/api/transactions", headers=auth_headers, params={"account": account})
+        transactions = {tx["meter_value"]: tx for tx in response.json()}
+        assert set(transactions) == {10.0, 2.5}
+        assert transactions[10.0]["charging_duration"] == "1h 30m"
+        assert transactions[10.0]["cost"] > 0
+        print(f"✓ Imported {result['imported_count']}, skipped {result['skipped_count']}")
+        
+        job = self.upload(auth_headers, content)
+        assert job["status"] == "succeeded"
+        assert job["result"]["imported_count"] == 0
+        print("✓ Re-import skips existing TxIDs")
+    
+    def test_tx_id_unique_across_writers(self, auth_headers, import_file):
+        """A TxID stored once is refused by manual entry and skipped by the JSON import"""
+        account, _ = import_file
+        tx_id = f"TEST_IMPORT_{uuid.uuid4().hex[:8]}"
+        payload = {
+            "tx_id": tx_id,
+            "station": "TEST_IMPORT_STATION",
+            "connector": "CCS2",
+            "account": account,
+            "start_time": "2026-04-02T10:00:00",
+            "end_time": "2026-04-02T11:00:00",
+            "meter_value": 3.0
+        }
+        response = requests.post(f"{BASE_URL}/api/transactions", headers=auth_headers, json=payload)
+        assert response.status_code == 200
+        
+        response = requests.post(f"{BASE_URL}/api/transactions", headers=auth_headers, json=payload)
+        assert response.status_code == 400
+        
+        response = requests.post(f"{BASE_URL}/api/transactions/import-json", headers=auth_headers, json={
+            "transactions": [{
+                "TxID": tx_id, "Station": "TEST_IMPORT_STATION", "Connector": "CCS2", "Account": account,
+                "Start Time": "2026-04-02 10:00:00", "End Time": "2026-04-02 11:00:00", "Meter value(kW.h)": 3
+            }]
+        })
+        assert response.status_code == 200
+        assert response.json()["imported_count"] == 0
+        assert response.json()["skipped_count"] == 1
+        
+        response = requests.get(f"{BASE_URL}/api/transactions", headers=auth_headers, params={"account": account})
+        assert [tx["tx_id"] for tx in response.json()].count(tx_id) == 1
+        print("✓ Duplicate TxID refused by manual entry and skipped by JSON import")
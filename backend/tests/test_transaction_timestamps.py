@@ -0,0 +1,109 @@
+"""
+Transaction Timestamp Tests
+Tests that start/end times are stored as real timestamps:
+- Naive input times come back as ISO strings with an offset
+- Date filters include the whole end day
+- Duration is calculated from the parsed times
+- Unparseable times in an update are rejected instead of erasing the stored time
+- Unparseable times are rejected on create
+"""
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestTransactionTimestamps:
+    """Transaction start/end times as timestamptz"""
+    
+    @pytest.fixture
+    def auth_headers(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@evcharge.com",
+            "password": "admin123"
+        })
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    @pytest.fixture
+    def transaction(self, auth_headers):
+        account = f"TEST_TS_ACCOUNT_{uuid.uuid4().hex[:6]}"
+        response = requests.post(f"{BASE_URL}/api/transactions", headers=auth_headers, json={
+            "tx_id": f"TEST_TS_{uuid.uuid4().hex[:8]}",
+            "station": "TEST_TS_STATION",
+            "connector": "1",
+            "connector_type": "CCS2",
+            "account": account,
+            "start_time": "2026-02-10T22:30:00",
+            "end_time": "2026-02-11T00:15:00",
+            "meter_value": 5.0
+        })
+        assert response.status_code == 200
+        tx = response.json()
+        yield tx
+        requests.delete(f"{BASE_URL}/api/transactions/{tx['id']}", headers=auth_headers)
+    
+    def test_times_returned_with_offset(self, transaction):
+        """Stored times are timezone-aware and the duration is computed"""
+        assert transaction["start_time"].startswith("2026-02-10T22:30:00")
+        assert transaction["start_time"][19:] != ""
+        assert transaction["charging_duration"] == "1h 45m"
+        print(f"✓ Start time stored as {transaction['start_time']}")
+    
+    def test_date_filter_includes_end_day(self, auth_headers, transaction):
+        """A date-only end_date includes transactions later that day"""
+        response = requests.get(f"{BASE_URL}/api/transactions", headers=auth_headers, params={
+            "account": transaction["account"],
+            "start_date": "2026-02-10",
+            "end_date": "2026-02-10"
+        })
+        assert response.status_code == 200
+        assert [tx["id"] for tx in response.json()] == [transaction["id"]]
+        
+        response = requests.get(f"{BASE_URL}/api/transactions", headers=auth_headers, params={
+            "account": transaction["account"],
+            "start_date": "2026-02-11"
+        })
+        assert response.status_code == 200
+        assert response.json() == []
+        print("✓ Date range filters match on timestamps")
+    
+    def test_invalid_date_rejected(self, auth_headers):
+        """Unparseable date filters return 400"""
+        response = requests.get(f"{BASE_URL}/api/transactions", headers=auth_headers, params={
+            "start_date": "not-a-date"
+        })
+        assert response.status_code == 400
+        print("✓ Invalid start_date rejected")
+    
+    def test_invalid_time_in_update_rejected(self, auth_headers, transaction):
+        """A typo in a PATCHed time returns 400 and leaves the stored time alone"""
+        response = requests.patch(f"{BASE_URL}/api/transactions/{transaction['id']}", headers=auth_headers, json={
+            "end_time": "2026-02-1l 00:15"
+        })
+        assert response.status_code == 400
+        
+        response = requests.get(f"{BASE_URL}/api/transactions/page", headers=auth_headers, params={
+            "account": transaction["account"]
+        })
+        stored = response.json()["transactions"][0]
+        assert stored["end_time"] == transaction["end_time"]
+        assert stored["charging_duration"] == "1h 45m"
+        print("✓ Invalid end_time in update rejected")
+    
+    def test_invalid_time_in_create_rejected(self, auth_headers):
+        """A typo in a new transaction's time returns 400 instead of storing no time"""
+        response = requests.post(f"{BASE_URL}/api/transactions", headers=auth_headers, json={
+            "tx_id": f"TEST_TS_{uuid.uuid4().hex[:8]}",
+            "station": "TEST_TS_STATION",
+            "connector": "1",
+            "connector_type": "CCS2",
+            "account": f"TEST_TS_ACCOUNT_{uuid.uuid4().hex[:6]}",
+            "start_time": "2026-02-1O 22:30",
+            "end_time": "2026-02-11T00:15:00",
+            "meter_value": 5.0
+        })
+        assert response.status_code == 400
+        print("✓ Invalid start_time in create rejected")
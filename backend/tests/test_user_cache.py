@@ -0,0 +1,77 @@
+"""
+Authenticated User Cache Tests
+Tests that cached users never outlive an admin change:
+- Role changes apply to the user's next request
+- Deleted users are rejected immediately
+"""
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestUserCache:
+    """get_current_user cache invalidation"""
+    
+    @pytest.fixture
+    def auth_headers(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@evcharge.com",
+            "password": "admin123"
+        })
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    @pytest.fixture
+    def test_user(self, auth_headers):
+        email = f"test_cache_{uuid.uuid4().hex[:8]}@example.com"
+        response = requests.post(f"{BASE_URL}/api/users", headers=auth_headers, json={
+            "name": "TEST Cache User",
+            "email": email,
+            "password": "cachetest123",
+            "role": "user"
+        })
+        assert response.status_code == 200
+        user = response.json()
+        
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": email,
+            "password": "cachetest123"
+        })
+        assert response.status_code == 200
+        user_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        
+        yield user, user_headers
+        requests.delete(f"{BASE_URL}/api/users/{user['id']}", headers=auth_headers)
+    
+    def test_role_change_applies_immediately(self, auth_headers, test_user):
+        """A cached user sees a role change on the next request"""
+        user, user_headers = test_user
+        
+        response = requests.get(f"{BASE_URL}/api/auth/me", headers=user_headers)
+        assert response.status_code == 200
+        assert response.json()["role"] == "user"
+        
+        response = requests.patch(
+            f"{BASE_URL}/api/users/{user['id']}/role", headers=auth_headers, params={"role": "viewer"}
+        )
+        assert response.status_code == 200
+        
+        response = requests.get(f"{BASE_URL}/api/auth/me", headers=user_headers)
+        assert response.status_code == 200
+        assert response.json()["role"] == "viewer"
+        print("✓ Role change visible on next request")
+    
+    def test_deleted_user_rejected(self, auth_headers, test_user):
+        """A deleted user's cached token stops working"""
+        user, user_headers = test_user
+        
+        assert requests.get(f"{BASE_URL}/api/auth/me", headers=user_headers).status_code == 200
+        response = requests.delete(f"{BASE_URL}/api/users/{user['id']}", headers=auth_headers)
+        assert response.status_code == 200
+        
+        response = requests.get(f"{BASE_URL}/api/auth/me", headers=user_headers)
+        assert response.status_code == 401
+        print("✓ Deleted user rejected")
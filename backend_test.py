@@ -7,6 +7,7 @@ Tests authentication, role-based access, CRUD operations, Excel import, and data
 import requests
 import sys
 import json
+import time
 from datetime import datetime
 from pathlib import Path
 
@@ -278,17 +279,28 @@ class EVChargingAPITester:
                     "Import Excel File",
                     "POST",
                     "transactions/import",
-                    200,
+                    202,
                     files=files,
                     headers={'Authorization': f'Bearer {self.admin_token}'}
                 )
                 
                 if success:
-                    imported = response.get('imported_count', 0)
-                    skipped = response.get('skipped_count', 0)
-                    errors = response.get('errors', [])
+                    # The import runs as a background job
+                    job = {}
+                    for _ in range(60):
+                        job = requests.get(
+                            f"{self.base_url}/jobs/{response['job_id']}",
+                            headers={'Authorization': f'Bearer {self.admin_token}'}
+                        ).json()
+                        if job.get('status') not in ('queued', 'running'):
+                            break
+                        time.sleep(0.5)
+                    result = job.get('result') or {}
+                    imported = result.get('imported_count', 0)
+                    skipped = result.get('skipped_count', 0)
+                    errors = result.get('errors', [])
                     
-                    self.log_test("Excel Import Results", True, 
+                    self.log_test("Excel Import Results", job.get('status') == 'succeeded', 
                                 f"Imported: {imported}, Skipped: {skipped}, Errors: {len(errors)}")
         except Exception as e:
             self.log_test("Excel Import Test", False, f"File handling error: {str(e)}")
@@ -127,8 +127,18 @@ function Users() {
     formData.append('file', importFile);
     
     try {
-      const response = await axios.post(`${API}/users/import`, formData);
-      setImportResult(response.data);
+      // The import runs as a background job; poll it until it finishes
+      const { data: submitted } = await axios.post(`${API}/users/import`, formData);
+      let job = submitted;
+      while (['queued', 'running'].includes(job.status)) {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        ({ data: job } = await axios.get(`${API}/jobs/${submitted.job_id}`));
+      }
+      setImportResult(job.status === 'succeeded' ? job.result : {
+        imported: 0,
+        skipped: 0,
+        errors: [{ row: 0, message: job.error || `Import ${job.status}` }]
+      });
       fetchUsers();
     } catch (error) {
       setImportResult({